@@ -59,6 +59,7 @@ from database.traffic_db import init_logs_db as ensure_traffic_logs_exists
 from database.latency_db import init_latency_db as ensure_latency_tables_exists
 from database.strategy_db import init_db as ensure_strategy_tables_exists
 from database.sandbox_db import init_db as ensure_sandbox_tables_exists
+from database.ohlc_db import init_db as ensure_ohlc_tables_exists
 
 from utils.plugin_loader import load_broker_auth_functions
 
@@ -355,10 +356,11 @@ def setup_environment(app):
             ('Latency DB', ensure_latency_tables_exists),
             ('Strategy DB', ensure_strategy_tables_exists),
             ('Sandbox DB', ensure_sandbox_tables_exists),
+            ('OHLC DB', ensure_ohlc_tables_exists),
         ]
 
         db_init_start = time.time()
-        with ThreadPoolExecutor(max_workers=11) as executor:
+        with ThreadPoolExecutor(max_workers=12) as executor:
             # Submit all database initialization tasks
             futures = {executor.submit(func): name for name, func in db_init_functions}
 
@@ -3,6 +3,8 @@ from database.latency_db import OrderLatency, latency_session
 from utils.session import check_session_validity
 from limiter import limiter
 from utils.logging import get_logger
+from utils.single_flight import get_single_flight_stats
+from database.auth_db import get_api_key_verify_stats
 from sqlalchemy import func
 from collections import defaultdict
 import numpy as np
@@ -166,7 +168,9 @@ def latency_dashboard():
                          stats=stats,
                          logs=recent_logs,
                          logs_json=logs_json,
-                         broker_histograms=broker_histograms)
+                         broker_histograms=broker_histograms,
+                         coalescing=get_single_flight_stats(),
+                         api_key_verify=get_api_key_verify_stats())
 
 @latency_bp.route('/api/logs', methods=['GET'])
 @check_session_validity
@@ -209,6 +213,8 @@ def get_stats():
             broker_histograms[broker] = get_histogram_data(broker)
         
         stats['broker_histograms'] = broker_histograms
+        stats['coalescing'] = get_single_flight_stats()
+        stats['api_key_verify'] = get_api_key_verify_stats()
         return jsonify(stats)
     except Exception as e:
         logger.error(f"Error fetching latency stats: {e}")
@@ -6,6 +6,9 @@ from utils.logging import get_logger
 
 logger = get_logger(__name__)
 
+# Number of typeahead suggestions returned by /search/api/search
+SUGGESTION_LIMIT = 50
+
 search_bp = Blueprint('search_bp', __name__, url_prefix='/search')
 
 @search_bp.route('/token')
@@ -63,7 +66,7 @@ def api_search():
         return jsonify({'results': []})
     
     logger.debug(f"API search for symbol: {query}, exchange: {exchange}")
-    results = enhanced_search_symbols(query, exchange)
+    results = enhanced_search_symbols(query, exchange, limit=SUGGESTION_LIMIT)
     results_dicts = [{
         'symbol': result.symbol,
         'brsymbol': result.brsymbol,
@@ -175,8 +175,9 @@ class AngelWebSocketAdapter(BaseBrokerWebSocketAdapter):
                 )
         
         # Create token list for Angel API
+        exchange_type = AngelExchangeMapper.get_exchange_type(brexchange)
         token_list = [{
-            "exchangeType": AngelExchangeMapper.get_exchange_type(brexchange),
+            "exchangeType": exchange_type,
             "tokens": [token]
         }]
         
@@ -200,6 +201,9 @@ class AngelWebSocketAdapter(BaseBrokerWebSocketAdapter):
                 'is_fallback': is_fallback
             }
         
+        # Angel tokens are unique per exchange type: route ticks by (exchange type, token)
+        self.registry.add((exchange_type, token), symbol, exchange, mode)
+        
         # Subscribe if connected
         if self.connected and self.ws_client:
             try:
@@ -249,6 +253,16 @@ class AngelWebSocketAdapter(BaseBrokerWebSocketAdapter):
         # Generate correlation ID
         correlation_id = f"{symbol}_{exchange}_{mode}"
         
+        # Other clients still subscribed in this mode: keep the broker subscription
+        subscription, mode_released, _ = self.registry.remove(symbol, exchange, mode)
+        if subscription is not None and not mode_released:
+            return self._create_success_response(
+                f"Unsubscribed from {symbol}.{exchange}",
+                symbol=symbol,
+                exchange=exchange,
+                mode=mode
+            )
+        
         # Remove from subscriptions
         with self.lock:
             if correlation_id in self.subscriptions:
@@ -325,27 +339,21 @@ class AngelWebSocketAdapter(BaseBrokerWebSocketAdapter):
             self.logger.debug(f"Processing message with token: {token}, exchange_type: {exchange_type}")
             
             # Find the subscription that matches this token
-            subscription = None
-            with self.lock:
-                for sub in self.subscriptions.values():
-                    if sub['token'] == token and AngelExchangeMapper.get_exchange_type(sub['brexchange']) == exchange_type:
-                        subscription = sub
-                        break
+            subscription = self.registry.get((exchange_type, token))
             
             if not subscription:
                 self.logger.warning(f"Received data for unsubscribed token: {token}")
                 return
             
             # Create topic for ZeroMQ
-            symbol = subscription['symbol']
-            exchange = subscription['exchange']
-            mode = subscription['mode']
+            symbol = subscription.symbol
+            exchange = subscription.exchange
             
             # Important: Always use the actual mode from the message rather than the subscription
             # This ensures data is published with the correct mode identifier
             actual_msg_mode = message.get('subscription_mode')
-            mode_str = {1: 'LTP', 2: 'QUOTE', 3: 'DEPTH'}[actual_msg_mode]  # Mode 3 is Snap Quote (includes depth data)
-            topic = f"{exchange}_{symbol}_{mode_str}"
+            mode = actual_msg_mode if subscription.has_mode(actual_msg_mode) else subscription.highest_mode
+            topic = subscription.topics[actual_msg_mode]  # Mode 3 is Snap Quote (includes depth data)
             
             # Normalize the data based on the actual message mode, not subscription mode
             market_data = self._normalize_market_data(message, actual_msg_mode)
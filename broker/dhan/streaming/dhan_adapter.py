@@ -21,7 +21,7 @@ import os
 # Add parent directory to path to allow imports
 sys.path.append(os.path.join(os.path.dirname(__file__), '../../../'))
 
-from websocket_proxy.base_adapter import BaseBrokerWebSocketAdapter
+from websocket_proxy.base_adapter import BaseBrokerWebSocketAdapter, SubscriptionRegistry
 from websocket_proxy.mapping import SymbolMapper
 from .dhan_mapping import DhanExchangeMapper, DhanCapabilityRegistry
 from .dhan_websocket import DhanWebSocket
@@ -29,6 +29,11 @@ from .dhan_websocket import DhanWebSocket
 
 class DhanWebSocketAdapter(BaseBrokerWebSocketAdapter):
     """Dhan-specific implementation of the WebSocket adapter"""
+
+    # 5-depth feed packet types published under a subscription mode topic
+    PACKET_MODES = {'ticker': 1, 'quote': 2, 'full': 3}
+    # Packet types without a subscription mode of their own
+    PACKET_TOPIC_NAMES = {'oi': 'OI', 'prev_close': 'PREV_CLOSE'}
     
     def __init__(self):
         super().__init__()
@@ -43,6 +48,12 @@ class DhanWebSocketAdapter(BaseBrokerWebSocketAdapter):
         # Track subscriptions by depth level
         self.subscriptions_5depth = {}
         self.subscriptions_20depth = {}
+
+        # Tick routing: self.registry holds the 5-depth feed, keyed by
+        # (exchange segment, security id) since ids are only unique per segment
+        self.registry_20depth = SubscriptionRegistry()
+        # Feed keys whose segment differs from the subscribed exchange's segment
+        self.segment_aliases = {}
         
         # Track 20-depth data accumulation
         self.depth_20_accumulator = {}
@@ -250,6 +261,8 @@ class DhanWebSocketAdapter(BaseBrokerWebSocketAdapter):
                     return self._create_error_response("SUBSCRIPTION_LIMIT", 
                                                       f"Maximum {DhanCapabilityRegistry.MAX_SUBSCRIPTIONS_20_DEPTH} subscriptions allowed for 20-depth")
                 
+                if correlation_id not in self.subscriptions_20depth:
+                    self.registry_20depth.add(self._registry_token(exchange, token), symbol, exchange, mode)
                 self.subscriptions_20depth[correlation_id] = {
                     'symbol': symbol,
                     'exchange': exchange,
@@ -280,6 +293,8 @@ class DhanWebSocketAdapter(BaseBrokerWebSocketAdapter):
                     return self._create_error_response("SUBSCRIPTION_LIMIT", 
                                                       f"Maximum {DhanCapabilityRegistry.MAX_SUBSCRIPTIONS_5_DEPTH} subscriptions allowed")
                 
+                if correlation_id not in self.subscriptions_5depth:
+                    self.registry.add(self._registry_token(exchange, token), symbol, exchange, mode)
                 self.subscriptions_5depth[correlation_id] = {
                     'symbol': symbol,
                     'exchange': exchange,
@@ -359,12 +374,14 @@ class DhanWebSocketAdapter(BaseBrokerWebSocketAdapter):
                 
                 if correlation_id in self.subscriptions_5depth:
                     del self.subscriptions_5depth[correlation_id]
+                    self.registry.remove(symbol, exchange, mode)
                     if self.ws_client_5depth:
                         self.ws_client_5depth.unsubscribe([instrument])
                     removed = True
                 
                 if correlation_id in self.subscriptions_20depth:
                     del self.subscriptions_20depth[correlation_id]
+                    self.registry_20depth.remove(symbol, exchange, mode)
                     # Clean up fallback tracking
                     if correlation_id in self.depth_20_timeouts:
                         del self.depth_20_timeouts[correlation_id]
@@ -408,6 +425,9 @@ class DhanWebSocketAdapter(BaseBrokerWebSocketAdapter):
             self.subscriptions_5depth.clear()
             self.subscriptions_20depth.clear()
             self.subscriptions.clear()
+            self.registry.clear()
+            self.registry_20depth.clear()
+            self.segment_aliases.clear()
 
             # Clear fallback tracking
             self.depth_20_timeouts.clear()
@@ -474,59 +494,51 @@ class DhanWebSocketAdapter(BaseBrokerWebSocketAdapter):
     def _on_data_5depth(self, ws, data):
         """Handle data from 5-depth connection"""
         try:
-            # Find matching subscription by token and exchange segment
             security_id = data.get('security_id')
             exchange_segment = data.get('exchange_segment')
             data_type = data.get('type')
             
-            # Find the subscription that matches this token
-            # First try exact match (token + exchange segment)
-            subscription = None
-            with self.lock:
-                for sub in self.subscriptions_5depth.values():
-                    expected_segment = DhanExchangeMapper.get_segment_from_exchange(sub['exchange'])
-                    
-                    if (sub['token'] == security_id and expected_segment == exchange_segment):
-                        subscription = sub
-                        self.logger.debug(f"Exact match found: {sub['symbol']}.{sub['exchange']}")
-                        break
-                
-                # If no exact match, try token-only match (for flexibility)
-                if not subscription:
-                    for sub in self.subscriptions_5depth.values():
-                        if sub['token'] == security_id:
-                            subscription = sub
-                            expected_segment = DhanExchangeMapper.get_segment_from_exchange(sub['exchange'])
-                            self.logger.debug(f"Token-only match found: {sub['symbol']}.{sub['exchange']} (expected segment {expected_segment}, got {exchange_segment})")
-                            break
-            
+            subscription = self._find_subscription(self.registry, exchange_segment, security_id)
             if not subscription:
                 #self.logger.warning(f"Received data for unsubscribed token: {security_id}, segment: {exchange_segment}")
                 return
             
-            # Get symbol and exchange from subscription
-            symbol = subscription['symbol']
-            exchange = subscription['exchange']
-            
             # Normalize and publish data
-            market_data = self._normalize_5depth_data(data, symbol, exchange)
+            market_data = self._normalize_5depth_data(data, subscription.symbol, subscription.exchange)
             if market_data:
-                # Determine topic based on data type
-                mode_map = {
-                    'ticker': 'LTP',
-                    'quote': 'QUOTE',
-                    'full': 'DEPTH',
-                    'oi': 'OI',
-                    'prev_close': 'PREV_CLOSE'
-                }
-                
-                mode_str = mode_map.get(data_type, 'UNKNOWN')
-                topic = f"{exchange}_{symbol}_{mode_str}"
+                mode = self.PACKET_MODES.get(data_type)
+                if mode:
+                    topic = subscription.topics[mode]
+                else:
+                    mode_str = self.PACKET_TOPIC_NAMES.get(data_type, 'UNKNOWN')
+                    topic = f"{subscription.exchange}_{subscription.symbol}_{mode_str}"
                 
                 self.publish_market_data(topic, market_data)
                 
         except Exception as e:
             self.logger.error(f"Error processing 5-depth data: {e}", exc_info=True)
+
+    @staticmethod
+    def _registry_token(exchange, token):
+        """Registry key of an instrument: (Dhan exchange segment, security id)"""
+        return (DhanExchangeMapper.get_segment_from_exchange(exchange), str(token))
+
+    def _find_subscription(self, registry, exchange_segment, security_id):
+        """
+        Subscription for a feed packet: exact (segment, security id) match first,
+        then a security id only match, which is remembered for the next packet
+        """
+        key = (exchange_segment, security_id)
+        subscription = registry.get(self.segment_aliases.get(key, key))
+        if subscription:
+            return subscription
+        
+        for candidate in registry.subscriptions():
+            if candidate.token[1] == security_id:
+                self.logger.debug(f"Token-only match found: {candidate.symbol}.{candidate.exchange} (expected segment {candidate.token[0]}, got {exchange_segment})")
+                self.segment_aliases[key] = candidate.token
+                return candidate
+        return None
     
     # Callbacks for 20-depth connection
     def _on_open_20depth(self, ws):
@@ -574,14 +586,7 @@ class DhanWebSocketAdapter(BaseBrokerWebSocketAdapter):
                 # Find matching subscription by token and exchange segment
                 exchange_segment = data.get('exchange_segment')
                 
-                # Find the subscription that matches this token and exchange segment
-                subscription = None
-                with self.lock:
-                    for sub in self.subscriptions_20depth.values():
-                        if (sub['token'] == security_id and 
-                            DhanExchangeMapper.get_segment_from_exchange(sub['exchange']) == exchange_segment):
-                            subscription = sub
-                            break
+                subscription = self.registry_20depth.get((exchange_segment, security_id))
                 
                 if not subscription:
                     self.logger.warning(f"Received 20-depth data for unsubscribed token: {security_id}, segment: {exchange_segment}")
@@ -589,9 +594,8 @@ class DhanWebSocketAdapter(BaseBrokerWebSocketAdapter):
                     del self.depth_20_accumulator[security_id]
                     return
                 
-                # Get symbol and exchange from subscription
-                symbol = subscription['symbol']
-                exchange = subscription['exchange']
+                symbol = subscription.symbol
+                exchange = subscription.exchange
                 
                 # Create combined depth data
                 market_data = {
@@ -607,8 +611,7 @@ class DhanWebSocketAdapter(BaseBrokerWebSocketAdapter):
                 }
                 
                 # Publish with standard DEPTH topic (mode 3)
-                topic = f"{exchange}_{symbol}_DEPTH"
-                self.publish_market_data(topic, market_data)
+                self.publish_market_data(subscription.topics[3], market_data)
                 
                 # Clear accumulator
                 del self.depth_20_accumulator[security_id]
@@ -747,6 +750,7 @@ class DhanWebSocketAdapter(BaseBrokerWebSocketAdapter):
                 
                 # Remove from 20-depth subscriptions and timeouts
                 del self.subscriptions_20depth[correlation_id]
+                self.registry_20depth.remove(symbol, exchange, subscription['mode'])
                 if correlation_id in self.depth_20_timeouts:
                     del self.depth_20_timeouts[correlation_id]
                 if correlation_id in self.depth_20_data_received:
@@ -755,6 +759,9 @@ class DhanWebSocketAdapter(BaseBrokerWebSocketAdapter):
                 # Create new 5-depth subscription
                 correlation_id_5depth = f"{symbol}_{exchange}_3_5"
                 
+                if correlation_id_5depth not in self.subscriptions_5depth:
+                    self.registry.add(self._registry_token(exchange, subscription['token']),
+                                      symbol, exchange, subscription['mode'])
                 self.subscriptions_5depth[correlation_id_5depth] = {
                     'symbol': symbol,
                     'exchange': exchange,
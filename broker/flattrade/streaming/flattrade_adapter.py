@@ -6,7 +6,7 @@ import threading
 import json
 import logging
 import time
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional
 from enum import IntEnum
 
 from database.auth_db import get_auth_token
@@ -268,8 +268,7 @@ class FlattradeWebSocketAdapter(BaseBrokerWebSocketAdapter):
     def _setup_market_cache(self):
         """Initialize market data caching system"""
         self.market_cache = MarketDataCache()
-        self.subscriptions = {}
-        self.token_to_symbol = {}
+        self.subscriptions = {}  # "SYMBOL_EXCHANGE_MODE" -> subscription, client counts live in self.registry
         self.ws_subscription_refs = {}  # Reference counting for WebSocket subscriptions
     
     def _setup_connection_management(self):
@@ -369,34 +368,24 @@ class FlattradeWebSocketAdapter(BaseBrokerWebSocketAdapter):
 
             # Create subscription
             subscription = self._create_subscription(symbol, exchange, mode, depth_level, token_info)
-
-            # Generate a unique correlation_id for each subscription
-            # This allows multiple clients to subscribe to the same symbol
-            import uuid
-            unique_id = str(uuid.uuid4())[:8]
-            correlation_id = f"{symbol}_{exchange}_{mode}_{unique_id}"
-            base_correlation_id = f"{symbol}_{exchange}_{mode}"
+            correlation_id = f"{symbol}_{exchange}_{mode}"
 
             # CRITICAL: Entire check-store-subscribe operation must be atomic to prevent race conditions
             # with unsubscribe_all() or other concurrent operations
             with self.lock:
-                # Check if we need to subscribe to WebSocket
-                already_ws_subscribed = any(
-                    cid.startswith(base_correlation_id)
-                    for cid in self.subscriptions.keys()
-                )
+                # Each client adds a reference; the WebSocket is only subscribed for a new mode
+                registered, _, new_mode = self.registry.add(subscription['token'], symbol, exchange, mode)
 
-                if already_ws_subscribed:
-                    self.logger.info(f"[SUBSCRIBE] WebSocket already subscribed for {base_correlation_id}, adding client subscription {correlation_id}")
-                else:
-                    self.logger.info(f"[SUBSCRIBE] New WebSocket subscription needed for {correlation_id}")
+                if not new_mode:
+                    self.logger.info(f"[SUBSCRIBE] WebSocket already subscribed for {correlation_id}, client count: {registered.refcounts[mode]}")
+                    return self._create_success_response(f'Subscribed to {symbol}.{exchange}',
+                                                       symbol=symbol, exchange=exchange, mode=mode)
 
-                # Store the subscription (inline to avoid nested locks)
+                self.logger.info(f"[SUBSCRIBE] New WebSocket subscription needed for {correlation_id}")
                 self.subscriptions[correlation_id] = subscription
-                self.token_to_symbol[subscription['token']] = (subscription['symbol'], subscription['exchange'])
 
                 # Subscribe via WebSocket if needed (reference counting will handle duplicates)
-                if self.connected and not already_ws_subscribed:
+                if self.connected:
                     self._websocket_subscribe(subscription)
                     self.logger.info(f"[SUBSCRIBE] WebSocket subscription sent for {subscription['scrip']}")
                 elif not self.connected:
@@ -415,45 +404,17 @@ class FlattradeWebSocketAdapter(BaseBrokerWebSocketAdapter):
 
     def unsubscribe(self, symbol: str, exchange: str, mode: int = Config.MODE_QUOTE) -> Dict[str, Any]:
         """Unsubscribe from market data"""
-        base_correlation_id = f"{symbol}_{exchange}_{mode}"
+        correlation_id = f"{symbol}_{exchange}_{mode}"
 
         with self.lock:
-            # Find the first matching subscription for this client
-            matching_subscriptions = [
-                (cid, sub) for cid, sub in self.subscriptions.items()
-                if cid.startswith(base_correlation_id)
-            ]
-
-            if not matching_subscriptions:
+            registered, mode_released, token_released = self.registry.remove(symbol, exchange, mode)
+            if registered is None:
                 return self._create_error_response("NOT_SUBSCRIBED",
                                                   f"Not subscribed to {symbol}.{exchange}")
 
-            # Remove the first matching subscription
-            correlation_id, subscription = matching_subscriptions[0]
-
-            # Check if this is the last subscription for this symbol/exchange/mode
-            is_last = len(matching_subscriptions) == 1
-
-            # Remove the subscription
-            del self.subscriptions[correlation_id]
-
-            # Clean up token mapping if no other subscriptions use it
-            token = subscription['token']
-            if not any(sub['token'] == token for sub in self.subscriptions.values()):
-                self.token_to_symbol.pop(token, None)
-
-            # Only unsubscribe from WebSocket if this was the last subscription
-            if is_last:
-                scrip = subscription['scrip']
-                if scrip in self.ws_subscription_refs:
-                    if mode in [Config.MODE_LTP, Config.MODE_QUOTE]:
-                        self.ws_subscription_refs[scrip]['touchline_count'] -= 1
-                        if self.ws_subscription_refs[scrip]['touchline_count'] <= 0:
-                            self._websocket_unsubscribe(subscription)
-                    elif mode == Config.MODE_DEPTH:
-                        self.ws_subscription_refs[scrip]['depth_count'] -= 1
-                        if self.ws_subscription_refs[scrip]['depth_count'] <= 0:
-                            self._websocket_unsubscribe(subscription)
+            # Only unsubscribe from WebSocket if this was the last client in this mode
+            if mode_released:
+                self._remove_subscription(correlation_id, token_released)
 
         return self._create_success_response(
             f"Unsubscribed from {symbol}.{exchange}",
@@ -489,12 +450,6 @@ class FlattradeWebSocketAdapter(BaseBrokerWebSocketAdapter):
             'scrip': scrip
         }
 
-    def _store_subscription(self, correlation_id: str, subscription: Dict) -> None:
-        """Store subscription and update mappings"""
-        with self.lock:
-            self.subscriptions[correlation_id] = subscription
-            self.token_to_symbol[subscription['token']] = (subscription['symbol'], subscription['exchange'])
-
     def _websocket_subscribe(self, subscription: Dict) -> None:
         """Handle WebSocket subscription with reference counting"""
         scrip = subscription['scrip']
@@ -544,41 +499,23 @@ class FlattradeWebSocketAdapter(BaseBrokerWebSocketAdapter):
                 self.ws_client.unsubscribe_depth(scrip)
                 self.ws_subscription_refs[scrip]['depth_count'] = 0
 
-    def _remove_subscription(self, correlation_id: str, subscription: Dict) -> None:
-        """Remove subscription and clean up mappings"""
-        token = subscription['token']
-        scrip = subscription['scrip']
-        mode = subscription['mode']
+    def _remove_subscription(self, correlation_id: str, token_released: bool) -> None:
+        """Remove a released subscription mode and unsubscribe it from the WebSocket"""
+        subscription = self.subscriptions.pop(correlation_id, None)
+        if subscription is None:
+            return
 
-        # Remove subscription
-        del self.subscriptions[correlation_id]
+        if self.ws_client:
+            self._websocket_unsubscribe(subscription)
 
-        # Check if there are any other subscriptions for the same scrip and mode
-        has_other_subscriptions = any(
-            sub['scrip'] == scrip and sub['mode'] == mode
-            for sub in self.subscriptions.values()
-        )
+        scrip = subscription['scrip']
+        refs = self.ws_subscription_refs.get(scrip)
+        # Clean up reference count if both counts are 0
+        if refs and refs['touchline_count'] <= 0 and refs['depth_count'] <= 0:
+            del self.ws_subscription_refs[scrip]
 
-        # Only decrement reference count if no other subscriptions exist
-        if not has_other_subscriptions and scrip in self.ws_subscription_refs:
-            if mode in [Config.MODE_LTP, Config.MODE_QUOTE]:
-                self.ws_subscription_refs[scrip]['touchline_count'] -= 1
-                if self.ws_subscription_refs[scrip]['touchline_count'] <= 0:
-                    self.ws_subscription_refs[scrip]['touchline_count'] = 0
-            elif mode == Config.MODE_DEPTH:
-                self.ws_subscription_refs[scrip]['depth_count'] -= 1
-                if self.ws_subscription_refs[scrip]['depth_count'] <= 0:
-                    self.ws_subscription_refs[scrip]['depth_count'] = 0
-
-            # Clean up reference count if both counts are 0
-            if (self.ws_subscription_refs[scrip]['touchline_count'] <= 0 and
-                self.ws_subscription_refs[scrip]['depth_count'] <= 0):
-                del self.ws_subscription_refs[scrip]
-
-        # Remove token mapping if no other subscriptions use it
-        if not any(sub['token'] == token for sub in self.subscriptions.values()):
-            self.token_to_symbol.pop(token, None)
-            self.market_cache.clear(token)
+        if token_released:
+            self.market_cache.clear(subscription['token'])
 
     def _on_open(self, ws):
         """Handle WebSocket connection open"""
@@ -715,36 +652,20 @@ class FlattradeWebSocketAdapter(BaseBrokerWebSocketAdapter):
         try:
             msg_type = data.get('t')
             token = data.get('tk')
-            
-            if not self._is_valid_market_message(msg_type, token):
+            if not msg_type or not token:
                 return
             
-            symbol, exchange = self._get_symbol_info(token)
-            if not symbol:
+            registered = self.registry.get(token)
+            if registered is None:
                 return
             
-            matching_subscriptions = self._find_matching_subscriptions(token)
-            
-            for subscription in matching_subscriptions:
-                if self._should_process_message(msg_type, subscription['mode']):
-                    self._process_subscription_message(data, subscription, symbol, exchange)
+            for mode in registered.modes:
+                if self._should_process_message(msg_type, mode):
+                    self._process_subscription_message(data, registered, mode)
                     
         except Exception as e:
             self.logger.error(f"Message processing error: {e}")
 
-    def _is_valid_market_message(self, msg_type: str, token: str) -> bool:
-        """Validate market message"""
-        return msg_type and token and token in self.token_to_symbol
-
-    def _get_symbol_info(self, token: str) -> tuple:
-        """Get symbol and exchange from token"""
-        return self.token_to_symbol.get(token, (None, None))
-
-    def _find_matching_subscriptions(self, token: str) -> List[Dict]:
-        """Find all subscriptions matching the token"""
-        with self.lock:
-            return [sub for sub in self.subscriptions.values() if sub['token'] == token]
-
     def _should_process_message(self, msg_type: str, mode: int) -> bool:
         """Determine if message should be processed for given mode"""
         touchline_messages = {Config.MSG_TOUCHLINE_FULL, Config.MSG_TOUCHLINE_PARTIAL}
@@ -757,27 +678,24 @@ class FlattradeWebSocketAdapter(BaseBrokerWebSocketAdapter):
         
         return False
 
-    def _process_subscription_message(self, data: Dict, subscription: Dict, symbol: str, exchange: str) -> None:
-        """Process message for a specific subscription"""
-        mode = subscription['mode']
+    def _process_subscription_message(self, data: Dict, registered, mode: int) -> None:
+        """Process message for one subscribed mode of a registry entry"""
         msg_type = data.get('t')
 
         # Normalize data
         normalized_data = self._normalize_market_data(data, msg_type, mode)
         normalized_data.update({
-            'symbol': symbol,
-            'exchange': exchange,
+            'symbol': registered.symbol,
+            'exchange': registered.exchange,
             'timestamp': int(time.time() * 1000)
         })
 
-        # Create topic and publish
-        mode_str = {Config.MODE_LTP: 'LTP', Config.MODE_QUOTE: 'QUOTE', Config.MODE_DEPTH: 'DEPTH'}[mode]
-        topic = f"{exchange}_{symbol}_{mode_str}"
+        topic = registered.topics[mode]
 
         # Get client count for this subscription
-        client_count = subscription.get('client_count', 1)
+        client_count = registered.refcounts.get(mode, 1)
 
-        self.logger.debug(f"[PUBLISH] Publishing {mode_str} data for {symbol} on topic: {topic}, ZMQ port: {self.zmq_port}, client_count: {client_count}")
+        self.logger.debug(f"[PUBLISH] Publishing data for {registered.symbol} on topic: {topic}, ZMQ port: {self.zmq_port}, client_count: {client_count}")
 
         # Debug: Check if data is actually being sent
         try:
@@ -866,7 +784,7 @@ class FlattradeWebSocketAdapter(BaseBrokerWebSocketAdapter):
                 # Clear all subscription tracking but keep WebSocket connection alive
                 subscription_count = len(self.subscriptions)
                 self.subscriptions.clear()
-                self.token_to_symbol.clear()
+                self.registry.clear()
                 self.ws_subscription_refs.clear()
                 
                 # Clear market data cache
@@ -5,8 +5,8 @@ from database.token_db import get_br_symbol, get_oa_symbol
 import pandas as pd
 from datetime import datetime
 import urllib.parse
-import time
 from utils.httpx_client import get_httpx_client
+from utils.history_scheduler import RateLimitError, date_chunks, fetch_chunks, parse_retry_after
 from utils.logging import get_logger
 
 logger = get_logger(__name__)
@@ -68,6 +68,31 @@ def get_api_response(endpoint, auth, method="GET", payload=''):
         logger.exception("An unexpected error occurred during API request")
         return {"s": "error", "message": f"General error: {str(e)}"}
 
+def get_history_response(endpoint, auth):
+    """
+    Make a history request to Fyers API using shared connection pooling.
+    
+    Unlike get_api_response, errors are raised so the history scheduler can
+    retry the chunk, and HTTP 429 raises RateLimitError.
+    
+    Returns:
+        dict: Parsed JSON response from the API
+    """
+    client = get_httpx_client()
+    api_key = os.getenv('BROKER_API_KEY')
+    
+    url = f"https://api-t1.fyers.in{endpoint}"
+    headers = {
+        'Authorization': f'{api_key}:{auth}',
+        'Content-Type': 'application/json'
+    }
+    
+    response = client.get(url, headers=headers)
+    if response.status_code == 429:
+        raise RateLimitError(parse_retry_after(response.headers.get('Retry-After')))
+    response.raise_for_status()
+    return response.json()
+
 class BrokerData:
     def __init__(self, auth_token):
         """Initialize Fyers data handler with authentication token"""
@@ -190,9 +215,6 @@ class BrokerData:
                                  f"Adjusting start date from {start_dt.date()} to {max_days_ago.date()}")
                     start_dt = max_days_ago
 
-            # Initialize empty list to store DataFrames
-            dfs = []
-            
             # Determine chunk size based on resolution
             if resolution == '1D':
                 chunk_days = 300  # For daily data
@@ -201,113 +223,71 @@ class BrokerData:
             else:
                 chunk_days = 60   # For minute/hour data
             
-            # Process data in chunks
-            current_start = start_dt
-            retry_count = 0
-            max_retries = 3
+            # URL encode the symbol to handle special characters
+            encoded_symbol = urllib.parse.quote(br_symbol)
             
-            while current_start <= end_dt:
-                try:
-                    # Calculate chunk end date
-                    current_end = min(current_start + pd.Timedelta(days=chunk_days-1), end_dt)
-                    
-                    # Format dates for API call
-                    chunk_start = current_start.strftime('%Y-%m-%d')
-                    chunk_end = current_end.strftime('%Y-%m-%d')
-                    
-                    logger.debug(f"Fetching {resolution} data for {exchange}:{br_symbol} from {chunk_start} to {chunk_end}")
-                    
-                    # URL encode the symbol to handle special characters
-                    encoded_symbol = urllib.parse.quote(br_symbol)
-                    
-                    # Determine if OI flag should be enabled based on exchange
-                    # OI is only available for derivatives (NFO, BFO, MCX, CDS)
-                    derivative_exchanges = ['NFO', 'BFO', 'MCX', 'CDS']
-                    enable_oi = exchange in derivative_exchanges
-                    
-                    # Construct endpoint with query parameters
-                    endpoint = (f"/data/history?"
-                              f"symbol={encoded_symbol}&"
-                              f"resolution={resolution}&"
-                              f"date_format=1&"  # Keep epoch format
-                               f"range_from={chunk_start}&"
-                               f"range_to={chunk_end}&"
-                               f"cont_flag=1")   # For continuous data
-                    
-                    # Add OI flag only for derivatives
-                    if enable_oi:
-                        endpoint += "&oi_flag=1"
-                    
-                    logger.debug(f"Making request to endpoint: {endpoint}")
-                    response = get_api_response(endpoint, self.auth_token)
-                    
-                    if response.get('s') != 'ok':
-                        error_msg = response.get('message', 'Unknown error')
-                        logger.error(f"Error for chunk {chunk_start} to {chunk_end}: {error_msg}")
-                        
-                        if retry_count < max_retries:
-                            retry_count += 1
-                            logger.debug(f"Retrying... Attempt {retry_count} of {max_retries}")
-                            time.sleep(2 * retry_count)  # Exponential backoff
-                            continue
-                        
-                        # If max retries reached, move to next chunk
-                        retry_count = 0
-                        current_start = current_end + pd.Timedelta(days=1)
-                        time.sleep(1)
-                        continue
-                    
-                    # Reset retry count on success
-                    retry_count = 0
-                    
-                    # Get candles from response
-                    candles = response.get('candles', [])
-                    if candles:
-                        # Handle dynamic column count based on whether OI is enabled
-                        if enable_oi and len(candles[0]) == 7:
-                            # Derivatives with OI: [timestamp, open, high, low, close, volume, oi]
-                            df = pd.DataFrame(candles, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume', 'oi'])
-                        else:
-                            # Equity without OI: [timestamp, open, high, low, close, volume]
-                            df = pd.DataFrame(candles, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-                            # Add zero OI column for consistency
-                            df['oi'] = 0
-                        
-                        dfs.append(df)
-                        logger.debug(f"Got {len(candles)} candles for period {chunk_start} to {chunk_end}")
-                    else:
-                        logger.debug(f"No data available for period {chunk_start} to {chunk_end}")
-                    
-                    # Add a small delay between chunks to avoid rate limiting
-                    time.sleep(0.5)
-                    
-                    # Move to next chunk
-                    current_start = current_end + pd.Timedelta(days=1)
-                    
-                except Exception as e:
-                    logger.error(f"Error fetching chunk {chunk_start} to {chunk_end}: {e}")
-                    if retry_count < max_retries:
-                        retry_count += 1
-                        logger.debug(f"Retrying... Attempt {retry_count} of {max_retries}")
-                        time.sleep(2 * retry_count)
-                        continue
-                    
-                    # If max retries reached, move to next chunk
-                    retry_count = 0
-                    current_start = current_end + pd.Timedelta(days=1)
-                    time.sleep(1)
-                    continue
+            # Determine if OI flag should be enabled based on exchange
+            # OI is only available for derivatives (NFO, BFO, MCX, CDS)
+            derivative_exchanges = ['NFO', 'BFO', 'MCX', 'CDS']
+            enable_oi = exchange in derivative_exchanges
+            
+            def fetch_chunk(chunk):
+                chunk_start, chunk_end = chunk
+                logger.debug(f"Fetching {resolution} data for {exchange}:{br_symbol} from {chunk_start} to {chunk_end}")
+                
+                # Construct endpoint with query parameters
+                endpoint = (f"/data/history?"
+                          f"symbol={encoded_symbol}&"
+                          f"resolution={resolution}&"
+                          f"date_format=1&"  # Keep epoch format
+                           f"range_from={chunk_start}&"
+                           f"range_to={chunk_end}&"
+                           f"cont_flag=1")   # For continuous data
+                
+                # Add OI flag only for derivatives
+                if enable_oi:
+                    endpoint += "&oi_flag=1"
+                
+                response = get_history_response(endpoint, self.auth_token)
+                if response.get('s') == 'no_data':
+                    logger.debug(f"No data available for period {chunk_start} to {chunk_end}")
+                    return []
+                if response.get('s') != 'ok':
+                    if response.get('code') == 429:
+                        raise RateLimitError()
+                    raise Exception(response.get('message', 'Unknown error'))
+                
+                candles = response.get('candles', [])
+                logger.debug(f"Got {len(candles)} candles for period {chunk_start} to {chunk_end}")
+                return candles
+            
+            # Fetch chunks concurrently under the shared Fyers rate limit, in date order.
+            # A chunk that still fails after its retries raises HistoryChunkError, so a
+            # partial download is never returned (or cached) as the complete range.
+            chunks = date_chunks(start_dt, end_dt, chunk_days)
+            results = fetch_chunks('fyers', chunks, fetch_chunk)
+            candles = [candle for chunk_candles in results for candle in chunk_candles]
             
             # If no data was found, return empty DataFrame
-            if not dfs:
+            if not candles:
                 logger.warning("No data was collected for the entire period")
                 return pd.DataFrame(columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
             
-            # Combine all chunks
-            final_df = pd.concat(dfs, ignore_index=True)
+            # Build one frame from all chunks
+            if enable_oi and all(len(candle) == 7 for candle in candles):
+                # Derivatives with OI: [timestamp, open, high, low, close, volume, oi]
+                final_df = pd.DataFrame(candles, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume', 'oi'])
+            else:
+                # Equity without OI: [timestamp, open, high, low, close, volume]
+                final_df = pd.DataFrame([candle[:6] for candle in candles],
+                                        columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+                # Add zero OI column for consistency
+                final_df['oi'] = 0
             
-            # Sort by timestamp and remove duplicates
-            final_df = final_df.sort_values('timestamp').drop_duplicates(subset=['timestamp'], keep='first')
+            # Chunks are already in order; remove duplicates at chunk boundaries
+            if not final_df['timestamp'].is_monotonic_increasing:
+                final_df = final_df.sort_values('timestamp')
+            final_df = final_df.drop_duplicates(subset=['timestamp'], keep='first')
             
             logger.info(f"Successfully collected data: {len(final_df)} total candles")
             return final_df
@@ -36,8 +36,7 @@ class ZerodhaWebSocketAdapter(BaseBrokerWebSocketAdapter):
         self.running = False
         self.connected = False
         self.lock = threading.Lock()
-        self.subscribed_symbols = {}  # {symbol: {exchange, token, mode}}
-        self.token_to_symbol = {}  # {token: (symbol, exchange)}
+        # Subscriptions are tracked in self.registry (token -> symbol, exchange, modes, topics)
         
         # Authentication
         self.api_key = None
@@ -214,8 +213,7 @@ class ZerodhaWebSocketAdapter(BaseBrokerWebSocketAdapter):
                     self.logger.info("✅ WebSocket disconnected")
                     
                     # Reset subscriptions tracking
-                    self.subscribed_symbols.clear()
-                    self.token_to_symbol.clear()
+                    self.registry.clear()
                 
                 # Always clean up ZMQ resources to ensure proper cleanup
                 self.cleanup_zmq()
@@ -286,31 +284,30 @@ class ZerodhaWebSocketAdapter(BaseBrokerWebSocketAdapter):
             # Track subscription with mapped exchange for consistency
             subscription_exchange = 'NSE' if exchange == 'NSE_INDEX' else exchange
             
-            # Add to queue for batch processing
-            with self.lock:
-                self.subscription_queue.append({
-                    'token': token,
-                    'mode': zerodha_mode,
-                    'symbol': symbol,
-                    'exchange': exchange,
-                    'subscription_exchange': subscription_exchange,
-                    'mode_int': mode
-                })
-                
-                # If this is the first subscription in queue, start the batch timer
-                if len(self.subscription_queue) == 1:
-                    self._start_batch_timer()
-            
             # Immediately track subscription (even before actual WebSocket subscription)
-            with self.lock:
-                self.subscribed_symbols[f"{exchange}:{symbol}"] = {
-                    'exchange': exchange,  # Original exchange for unsubscribe
-                    'symbol': symbol,
-                    'token': token,
-                    'mode': mode,
-                    'mapped_exchange': subscription_exchange  # Mapped exchange for data matching
-                }
-                self.token_to_symbol[token] = (symbol, exchange)
+            previous = self.registry.find(symbol, exchange)
+            previous_mode = previous.highest_mode if previous else 0
+            subscription, _, _ = self.registry.add(token, symbol, exchange, mode)
+            subscription.extra['mapped_exchange'] = subscription_exchange
+            
+            # Only the first subscription, or one needing a richer mode, reaches the broker
+            if subscription.highest_mode > previous_mode:
+                zerodha_mode = self.mode_map.get(subscription.highest_mode, ZerodhaWebSocket.MODE_QUOTE)
+                
+                # Add to queue for batch processing
+                with self.lock:
+                    self.subscription_queue.append({
+                        'token': token,
+                        'mode': zerodha_mode,
+                        'symbol': symbol,
+                        'exchange': exchange,
+                        'subscription_exchange': subscription_exchange,
+                        'mode_int': subscription.highest_mode
+                    })
+                    
+                    # If this is the first subscription in queue, start the batch timer
+                    if len(self.subscription_queue) == 1:
+                        self._start_batch_timer()
             
             self.logger.info(f"✅ Subscribed to {exchange}:{symbol} (token: [REDACTED], mode: {zerodha_mode})")
             return {'status': 'success', 'message': f'Subscribed to {symbol}'}
@@ -329,25 +326,16 @@ class ZerodhaWebSocketAdapter(BaseBrokerWebSocketAdapter):
             depth_level: Optional depth level parameter (for compatibility)
         """
         try:
-            key = f"{exchange}:{symbol}"
+            subscription, _, token_released = self.registry.remove(symbol, exchange, mode)
+            if subscription is None:
+                return {'status': 'error', 'message': f'Not subscribed to {symbol}'}
             
-            with self.lock:
-                if key not in self.subscribed_symbols:
-                    return {'status': 'error', 'message': f'Not subscribed to {symbol}'}
-                
-                subscription = self.subscribed_symbols[key]
-                token = subscription['token']
-                
-                # Unsubscribe using WebSocket client
-                if self.ws_client:
-                    asyncio.run_coroutine_threadsafe(
-                        self.ws_client.unsubscribe([token]),
-                        self.ws_client.loop
-                    )
-                
-                # Remove from tracking
-                del self.subscribed_symbols[key]
-                self.token_to_symbol.pop(token, None)
+            # Other clients still use the token: keep the broker subscription
+            if token_released and self.ws_client:
+                asyncio.run_coroutine_threadsafe(
+                    self.ws_client.unsubscribe([subscription.token]),
+                    self.ws_client.loop
+                )
             
             self.logger.info(f"✅ Unsubscribed from {exchange}:{symbol}")
             return {'status': 'success', 'message': f'Unsubscribed from {symbol}'}
@@ -358,12 +346,12 @@ class ZerodhaWebSocketAdapter(BaseBrokerWebSocketAdapter):
     
     def get_subscriptions(self) -> Dict[str, Any]:
         """Get current subscriptions"""
-        with self.lock:
-            return {
-                'status': 'success',
-                'subscriptions': list(self.subscribed_symbols.keys()),
-                'count': len(self.subscribed_symbols)
-            }
+        subscriptions = self.registry.keys()
+        return {
+            'status': 'success',
+            'subscriptions': subscriptions,
+            'count': len(subscriptions)
+        }
     
     def is_connected(self) -> bool:
         """Check if WebSocket is connected"""
@@ -402,26 +390,18 @@ class ZerodhaWebSocketAdapter(BaseBrokerWebSocketAdapter):
         
         try:
             for tick in ticks:
-                transformed_tick = self._transform_tick(tick)
+                # O(1) routing: the registry maps the token to its subscription
+                subscription = self.registry.get(tick.get('instrument_token'))
+                if subscription is None:
+                    self.logger.debug(f"No subscription info found for token: {tick.get('instrument_token')}")
+                    continue
+                
+                transformed_tick = self._transform_tick(tick, subscription)
                 if transformed_tick:
                     symbol = transformed_tick['symbol']
-                    token = tick.get('instrument_token')
                     original_tick_mode = transformed_tick.get('mode', 'ltp')  # Original mode from the tick
-                    subscription_exchange = None
-                    subscribed_modes = set()  # Track which modes this symbol is subscribed to
-                    
-                    # Get subscription info to determine exchange and subscribed modes
-                    with self.lock:
-                        for key, sub_info in self.subscribed_symbols.items():
-                            if sub_info['token'] == token:
-                                # Found a subscription for this token
-                                subscription_exchange = sub_info['exchange']
-                                mode_num = sub_info['mode']
-                                subscribed_modes.add(mode_num)
-                    
-                    if not subscription_exchange:
-                        self.logger.warning(f"No subscription info found for token: {token}")
-                        continue
+                    subscription_exchange = subscription.exchange
+                    topics = subscription.topics
                     
                     # Set the data exchange field
                     data_exchange = self._map_data_exchange(subscription_exchange)
@@ -432,23 +412,23 @@ class ZerodhaWebSocketAdapter(BaseBrokerWebSocketAdapter):
                         # Always publish the full depth data first
                         depth_tick = transformed_tick.copy()
                         depth_tick['mode'] = 'full'
-                        depth_topic = self._generate_topic(symbol, subscription_exchange, 'DEPTH')
+                        depth_topic = topics[3]
                         self.logger.debug(f"📊 Publishing DEPTH data to topic: {depth_topic}")
                         self.publish_market_data(depth_topic, depth_tick)
                         
                         # If subscribed to Quote (mode 2), publish quote data
-                        if 2 in subscribed_modes:
+                        if subscription.has_mode(2):
                             quote_tick = transformed_tick.copy()
                             # Remove depth data for quote message
                             if 'depth' in quote_tick:
                                 del quote_tick['depth']
                             quote_tick['mode'] = 'quote'
-                            quote_topic = self._generate_topic(symbol, subscription_exchange, 'QUOTE')
+                            quote_topic = topics[2]
                             self.logger.debug(f"📊 Publishing QUOTE data to topic: {quote_topic}")
                             self.publish_market_data(quote_topic, quote_tick)
                         
                         # If subscribed to LTP (mode 1), publish LTP data
-                        if 1 in subscribed_modes:
+                        if subscription.has_mode(1):
                             ltp_tick = {
                                 'symbol': symbol,
                                 'exchange': data_exchange,
@@ -456,29 +436,33 @@ class ZerodhaWebSocketAdapter(BaseBrokerWebSocketAdapter):
                                 'ltp': transformed_tick.get('ltp', 0),
                                 'timestamp': transformed_tick.get('timestamp', int(time.time() * 1000))
                             }
-                            ltp_topic = self._generate_topic(symbol, subscription_exchange, 'LTP')
+                            ltp_topic = topics[1]
                             self.logger.debug(f"📊 Publishing LTP data to topic: {ltp_topic}")
                             self.publish_market_data(ltp_topic, ltp_tick)
                             self.logger.debug(f"📊 LTP Data should be available for polling: {subscription_exchange}:{symbol}")
                     else:
                         # For non-full modes, just publish as-is
-                        mode_str = {
-                            'ltp': 'LTP',
-                            'quote': 'QUOTE',
-                            'full': 'DEPTH'
-                        }.get(original_tick_mode, 'LTP')
-                        
-                        topic = self._generate_topic(symbol, subscription_exchange, mode_str)
+                        topic = topics[{'quote': 2, 'full': 3}.get(original_tick_mode, 1)]
                         self.logger.debug(f"📊 Publishing to topic: {topic}")
                         self.logger.debug(f"📊 Data structure: {transformed_tick}")
                         
                         # Publish to ZeroMQ
                         self.publish_market_data(topic, transformed_tick)
                         
+                        # The token streams in the highest subscribed mode: serve LTP subscribers too
+                        if original_tick_mode == 'quote' and subscription.has_mode(1):
+                            self.publish_market_data(topics[1], {
+                                'symbol': symbol,
+                                'exchange': data_exchange,
+                                'mode': 'ltp',
+                                'ltp': transformed_tick.get('ltp', 0),
+                                'timestamp': transformed_tick.get('timestamp', int(time.time() * 1000))
+                            })
+                        
         except Exception as e:
             self.logger.error(f"Error handling ticks: {e}")
     
-    def _transform_tick(self, tick: Dict) -> Optional[Dict]:
+    def _transform_tick(self, tick: Dict, subscription=None) -> Optional[Dict]:
         """Transform Zerodha tick to OpenAlgo format with index support"""
         try:
             token = tick.get('instrument_token')
@@ -486,12 +470,12 @@ class ZerodhaWebSocketAdapter(BaseBrokerWebSocketAdapter):
                 return None
             
             # Get symbol info
-            symbol_info = self.token_to_symbol.get(token)
-            if not symbol_info:
+            subscription = subscription or self.registry.get(token)
+            if not subscription:
                 self.logger.warning(f"No symbol mapping for token: {token}")
                 return None
             
-            symbol, exchange = symbol_info
+            symbol, exchange = subscription.symbol, subscription.exchange
             mode = tick.get('mode', 'ltp')
             
             # Check if this is an index based on exchange
@@ -679,7 +663,7 @@ class ZerodhaWebSocketAdapter(BaseBrokerWebSocketAdapter):
         """Handle WebSocket errors"""
         self.logger.error(f"WebSocket error: {error}")
         
-    def _transform_tick(self, tick: Dict) -> Optional[Dict]:
+    def _transform_tick(self, tick: Dict, subscription=None) -> Optional[Dict]:
         """Transform Zerodha tick to OpenAlgo format with index support"""
         try:
             token = tick.get('instrument_token')
@@ -687,12 +671,12 @@ class ZerodhaWebSocketAdapter(BaseBrokerWebSocketAdapter):
                 return None
             
             # Get symbol info
-            symbol_info = self.token_to_symbol.get(token)
-            if not symbol_info:
+            subscription = subscription or self.registry.get(token)
+            if not subscription:
                 self.logger.warning(f"No symbol mapping for token: {token}")
                 return None
             
-            symbol, exchange = symbol_info
+            symbol, exchange = subscription.symbol, subscription.exchange
             mode = tick.get('mode', 'ltp')
             
             # Check if this is an index based on exchange
@@ -891,8 +875,7 @@ class ZerodhaWebSocketAdapter(BaseBrokerWebSocketAdapter):
                     self.running = False
                     self.connected = False
                     self.reconnect_attempts = 0
-                    self.subscribed_symbols.clear()
-                    self.token_to_symbol.clear()
+                    self.registry.clear()
                     self.logger.info("WebSocket client stopped and references cleared")
                 
             # Clean up ZeroMQ resources
@@ -927,8 +910,7 @@ class ZerodhaWebSocketAdapter(BaseBrokerWebSocketAdapter):
                 self.reconnect_attempts = 0
                 
                 # Clear subscription records
-                self.subscribed_symbols.clear()
-                self.token_to_symbol.clear()
+                self.registry.clear()
             
             # Clean up ZMQ resources using base class method
             self.cleanup_zmq()
@@ -0,0 +1,174 @@
+"""
+Decoder for Zerodha Kite binary market data frames.
+
+A frame is a 2 byte packet count followed by length-prefixed packets; the
+packet length gives the mode (8 = LTP, 28/32 = index, 44 = quote, 184 = full).
+Every layout is a precompiled struct.Struct read with unpack_from on a
+memoryview of the frame, so a full-mode packet (quote fields, extended fields
+and 5+5 depth levels) is a single unpack call and no intermediate bytes are
+sliced out of the frame.
+"""
+
+import struct
+import time
+from typing import Dict, List, Mapping, Optional
+
+MODE_LTP = "ltp"
+MODE_QUOTE = "quote"
+MODE_FULL = "full"
+
+_COUNT = struct.Struct('>H')
+_LTP = struct.Struct('>Ii')
+_QUOTE = struct.Struct('>I10i')
+_EXTENDED = struct.Struct('>5i')
+# 10 depth levels of quantity, price, orders and 2 bytes padding
+_DEPTH = struct.Struct('>' + 'iih2x' * 10)
+_FULL = struct.Struct('>I10i5i' + 'iih2x' * 10)
+
+LTP_PACKET = _LTP.size          # 8
+QUOTE_PACKET = _QUOTE.size      # 44
+EXTENDED_PACKET = QUOTE_PACKET + _EXTENDED.size  # 64
+FULL_PACKET = _FULL.size        # 184
+
+
+def _depth(values, start: int) -> Optional[Dict]:
+    """Buy and sell levels from 30 unpacked depth values, skipping empty prices"""
+    middle = start + 15
+    end = start + 30
+    buy = [{'quantity': quantity, 'price': price / 100.0, 'orders': orders}
+           for quantity, price, orders in zip(values[start:middle:3], values[start + 1:middle:3],
+                                              values[start + 2:middle:3])
+           if price > 0]
+    sell = [{'quantity': quantity, 'price': price / 100.0, 'orders': orders}
+            for quantity, price, orders in zip(values[middle:end:3], values[middle + 1:end:3],
+                                               values[middle + 2:end:3])
+            if price > 0]
+    return {'buy': buy, 'sell': sell} if (buy or sell) else None
+
+
+def _quote_tick(values, mode: str, timestamp: int) -> Dict:
+    last_price = values[1] / 100.0
+    average_price = values[3] / 100.0
+    open_price = values[7] / 100.0
+    high_price = values[8] / 100.0
+    low_price = values[9] / 100.0
+    close_price = values[10] / 100.0
+    return {
+        'instrument_token': values[0],
+        'last_traded_price': last_price,
+        'last_price': last_price,
+        'mode': mode,
+        'timestamp': timestamp,
+        'last_traded_quantity': values[2],
+        'average_traded_price': average_price,
+        'average_price': average_price,
+        'volume_traded': values[4],
+        'volume': values[4],
+        'total_buy_quantity': values[5],
+        'total_sell_quantity': values[6],
+        'open_price': open_price,
+        'high_price': high_price,
+        'low_price': low_price,
+        'close_price': close_price,
+        'ohlc': {
+            'open': open_price,
+            'high': high_price,
+            'low': low_price,
+            'close': close_price
+        }
+    }
+
+
+def decode_packet(buffer, offset: int, length: int, timestamp: int,
+                  token_exchange_map: Mapping[int, str] = None,
+                  mode_map: Mapping[int, str] = None) -> Optional[Dict]:
+    """
+    Decode one packet of a frame
+
+    Args:
+        buffer: Frame bytes or memoryview
+        offset: Start of the packet
+        length: Packet length
+        timestamp: Receive time in milliseconds for the tick
+        token_exchange_map: Token to exchange, added as source_exchange
+        mode_map: Subscribed mode per token, for packets of non-standard length
+    """
+    if length >= FULL_PACKET:
+        values = _FULL.unpack_from(buffer, offset)
+        tick = _quote_tick(values, MODE_FULL, timestamp)
+    elif length >= QUOTE_PACKET:
+        values = _QUOTE.unpack_from(buffer, offset)
+        if length >= EXTENDED_PACKET:
+            values += _EXTENDED.unpack_from(buffer, offset + QUOTE_PACKET)
+        mode = MODE_QUOTE if length == QUOTE_PACKET else (mode_map or {}).get(values[0], MODE_QUOTE)
+        tick = _quote_tick(values, mode, timestamp)
+    elif length >= LTP_PACKET:
+        # LTP packets, and index packets of which only the price is used
+        token, price = _LTP.unpack_from(buffer, offset)
+        last_price = price / 100.0
+        tick = {
+            'instrument_token': token,
+            'last_traded_price': last_price,
+            'last_price': last_price,
+            'mode': MODE_LTP if length == LTP_PACKET else (mode_map or {}).get(token, MODE_QUOTE),
+            'timestamp': timestamp
+        }
+    else:
+        return None
+
+    if token_exchange_map:
+        exchange = token_exchange_map.get(tick['instrument_token'])
+        if exchange:
+            tick['source_exchange'] = exchange
+
+    if length >= EXTENDED_PACKET:
+        tick['last_traded_timestamp'] = values[11]
+        tick['open_interest'] = values[12]
+        tick['oi'] = values[12]
+        tick['exchange_timestamp'] = values[15]
+
+        if length >= FULL_PACKET:
+            depth = _depth(values, 16)
+            if depth:
+                tick['depth'] = depth
+
+    return tick
+
+
+def decode_depth(buffer, offset: int = 0) -> Optional[Dict]:
+    """Decode a 120 byte market depth block (5 buy then 5 sell levels)"""
+    if len(buffer) - offset < _DEPTH.size:
+        return None
+    return _depth(_DEPTH.unpack_from(buffer, offset), 0)
+
+
+def decode_frame(data, token_exchange_map: Mapping[int, str] = None,
+                 mode_map: Mapping[int, str] = None) -> List[Dict]:
+    """
+    Decode all packets of a binary frame
+
+    Truncated trailing packets are ignored, like the Kite client libraries do.
+    """
+    size = len(data)
+    if size < 4:
+        return []
+
+    buffer = memoryview(data)
+    timestamp = int(time.time() * 1000)
+    count = _COUNT.unpack_from(buffer, 0)[0]
+    unpack_length = _COUNT.unpack_from
+
+    ticks = []
+    offset = 2
+    for _ in range(count):
+        if offset + 2 > size:
+            break
+        length = unpack_length(buffer, offset)[0]
+        offset += 2
+        if offset + length > size:
+            break
+        tick = decode_packet(buffer, offset, length, timestamp, token_exchange_map, mode_map)
+        if tick:
+            ticks.append(tick)
+        offset += length
+    return ticks
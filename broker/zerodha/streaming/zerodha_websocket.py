@@ -13,7 +13,6 @@ Implements:
 """
 import asyncio
 import json
-import struct
 import threading
 import time
 from typing import Dict, List, Optional, Callable, Any, Set
@@ -22,6 +21,8 @@ import websockets.exceptions
 from datetime import datetime
 from collections import deque
 
+from .zerodha_decoder import decode_depth, decode_frame, decode_packet
+
 class ZerodhaWebSocket:
     """
     Enhanced WebSocket client for Zerodha's market data streaming API.
@@ -721,139 +722,17 @@ class ZerodhaWebSocket:
     def _parse_binary_message(self, data: bytes) -> List[Dict]:
         """Parse binary message according to Zerodha specification"""
         try:
-            if len(data) < 4:
-                return []
-            
-            # Parse header: first 2 bytes = number of packets
-            num_packets = struct.unpack('>H', data[0:2])[0]
-            
-            packets = []
-            offset = 2
-            
-            for packet_idx in range(num_packets):
-                if offset + 2 > len(data):
-                    break
-                
-                # Next 2 bytes: packet length
-                packet_length = struct.unpack('>H', data[offset:offset+2])[0]
-                offset += 2
-                
-                if offset + packet_length > len(data):
-                    break
-                
-                # Extract and parse packet
-                packet_data = data[offset:offset+packet_length]
-                tick = self._parse_packet(packet_data)
-                if tick:
-                    packets.append(tick)
-                
-                offset += packet_length
-            
-            return packets
-            
+            # Dict reads need no lock; the maps are only updated in place
+            return decode_frame(data, self.token_exchange_map, self.mode_map)
         except Exception as e:
             self.logger.error(f"❌ Error parsing binary message: {e}")
             return []
     
     def _parse_packet(self, packet: bytes) -> Optional[Dict]:
-        """
-        Parse individual packet with improved error handling.
-        ✅ ENHANCED: Adds exchange information to tick data.
-        """
+        """Parse individual packet (exchange information added from the token mapping)"""
         try:
-            if len(packet) < 8:
-                return None
-            
-            # Extract instrument token and last price
-            instrument_token = struct.unpack('>I', packet[0:4])[0]
-            last_price_paise = struct.unpack('>i', packet[4:8])[0]
-            last_price = last_price_paise / 100.0
-            
-            # Determine mode based on packet length
-            if len(packet) == 8:
-                mode = self.MODE_LTP
-            elif len(packet) == 44:
-                mode = self.MODE_QUOTE
-            elif len(packet) >= 184:
-                mode = self.MODE_FULL
-            else:
-                mode = self.mode_map.get(instrument_token, self.MODE_QUOTE)
-            
-            # ✅ NEW: Get exchange information for this token
-            exchange = None
-            with self.lock:
-                exchange = self.token_exchange_map.get(instrument_token)
-            
-            # Basic tick structure
-            tick = {
-                'instrument_token': instrument_token,
-                'last_traded_price': last_price,
-                'last_price': last_price,
-                'mode': mode,
-                'timestamp': int(time.time() * 1000)
-            }
-            
-            # ✅ NEW: Add exchange information if available
-            if exchange:
-                tick['source_exchange'] = exchange  # Add source exchange from mapping
-            
-            # Parse additional fields for quote mode (44 bytes)
-            if len(packet) >= 44:
-                try:
-                    # Only unpack exactly 44 bytes for quote mode
-                    fields = struct.unpack('>11i', packet[0:44])  # 11 integers * 4 bytes = 44 bytes
-                    
-                    tick.update({
-                        'instrument_token': fields[0],
-                        'last_traded_price': fields[1] / 100.0,
-                        'last_price': fields[1] / 100.0,
-                        'last_traded_quantity': fields[2],
-                        'average_traded_price': fields[3] / 100.0,
-                        'average_price': fields[3] / 100.0,
-                        'volume_traded': fields[4],
-                        'volume': fields[4],
-                        'total_buy_quantity': fields[5],
-                        'total_sell_quantity': fields[6],
-                        'open_price': fields[7] / 100.0,
-                        'high_price': fields[8] / 100.0,
-                        'low_price': fields[9] / 100.0,
-                        'close_price': fields[10] / 100.0,
-                        'ohlc': {
-                            'open': fields[7] / 100.0,
-                            'high': fields[8] / 100.0,
-                            'low': fields[9] / 100.0,
-                            'close': fields[10] / 100.0
-                        }
-                    })
-                except struct.error as e:
-                    self.logger.debug(f"⚠️ Quote parsing issue (packet length: {len(packet)}): {e}")
-                    # Fallback - just use LTP data
-                    pass
-            
-            # Parse full mode fields if available (64+ bytes)
-            if len(packet) >= 64:
-                try:
-                    extended_fields = struct.unpack('>iiiii', packet[44:64])
-                    tick.update({
-                        'last_traded_timestamp': extended_fields[0],
-                        'open_interest': extended_fields[1],
-                        'oi': extended_fields[1],
-                        'exchange_timestamp': extended_fields[4]
-                    })
-                except struct.error:
-                    pass
-            
-            # Parse market depth for full mode (184+ bytes)
-            if len(packet) >= 184:
-                try:
-                    depth = self._parse_market_depth(packet[64:184])
-                    if depth:
-                        tick['depth'] = depth
-                except Exception:
-                    pass
-            
-            return tick
-            
+            return decode_packet(packet, 0, len(packet), int(time.time() * 1000),
+                                 self.token_exchange_map, self.mode_map)
         except Exception as e:
             self.logger.error(f"❌ Error parsing packet: {e}")
             return None
@@ -861,37 +740,7 @@ class ZerodhaWebSocket:
     def _parse_market_depth(self, depth_data: bytes) -> Optional[Dict]:
         """Parse market depth data"""
         try:
-            if len(depth_data) < 120:
-                return None
-            
-            depth = {'buy': [], 'sell': []}
-            
-            # Parse buy side (first 5 entries)
-            for i in range(5):
-                offset = i * 12
-                if offset + 10 <= len(depth_data):
-                    quantity, price, orders = struct.unpack('>iih', depth_data[offset:offset+10])
-                    if price > 0:  # Only add valid prices
-                        depth['buy'].append({
-                            'quantity': quantity,
-                            'price': price / 100.0,
-                            'orders': orders
-                        })
-            
-            # Parse sell side (next 5 entries)
-            for i in range(5):
-                offset = 60 + (i * 12)
-                if offset + 10 <= len(depth_data):
-                    quantity, price, orders = struct.unpack('>iih', depth_data[offset:offset+10])
-                    if price > 0:  # Only add valid prices
-                        depth['sell'].append({
-                            'quantity': quantity,
-                            'price': price / 100.0,
-                            'orders': orders
-                        })
-            
-            return depth if (depth['buy'] or depth['sell']) else None
-            
+            return decode_depth(depth_data)
         except Exception as e:
             self.logger.error(f"❌ Error parsing market depth: {e}")
             return None
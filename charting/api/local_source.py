@@ -8,6 +8,12 @@ class LocalSource(IDataSource):
         self.base_dir = base_dir or current_app.root_path
 
     def get_ohlcv(self, symbol: str, interval: str = "1", limit: int = 1000):
+        # Local candle store first
+        from database.ohlc_db import get_candles
+        bars = get_candles(symbol, interval, limit=limit)
+        if bars:
+            return bars
+
         # Look for file: static/data/{symbol}_{interval}.json or static/data/{symbol}.json
         possible = [
             os.path.join(self.base_dir, "static", "data", f"{symbol}_{interval}.json"),
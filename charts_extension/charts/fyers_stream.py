@@ -9,14 +9,8 @@ except ImportError:
     raise ImportError("websocket-client required: pip install websocket-client")
 
 from dotenv import load_dotenv
-def emit_update(data):
-    """Emit chart update through socketio"""
-    try:
-        from extensions import socketio
-        socketio.emit("chart_update", data)
-    except ImportError:
-        print("[Stream] SocketIO not available")
 
+from .live_candles import aggregator
 
 load_dotenv()
 
@@ -30,12 +24,15 @@ SYMBOLS = [
 ]
 
 def emit_update(data):
-    """Emit chart update - imported inside function to avoid circular dependency"""
-    try:
-        from extensions import socketio
-        socketio.emit("chart_update", data)
-    except ImportError:
-        logger.warning("SocketIO not available")
+    """Feed ticks to the live candle rooms of their symbols"""
+    for tick in data if isinstance(data, list) else [data]:
+        symbol = tick.get("symbol")
+        if not symbol:
+            continue
+        aggregator.on_chart_tick(symbol, {
+            "ltp": tick.get("ltp"),
+            "volume": tick.get("vol_traded_today", tick.get("volume"))
+        })
 
 def on_message(ws, message):
     try:
@@ -79,10 +76,4 @@ def run_stream_threaded():
     thread = threading.Thread(target=run_stream, daemon=True)
     thread.start()
     return thread
-def on_message(ws, message):
-    try:
-        data = json.loads(message)
-        emit_update(data)  # Use new function
-        print("[TICK]", data)
-    except Exception as e:
-        print("[ERROR]", e, message)
+
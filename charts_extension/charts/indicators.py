@@ -1,6 +1,39 @@
 # extensions/charts/indicators.py
+"""
+Technical indicators for chart overlays and strategies.
+
+Every indicator keeps running state, so a new bar, or a revision of the bar that
+is still forming, is applied in O(1): the state of the closed bars is kept apart
+from the forming bar, which is recomputed from it on every tick. backfill()
+seeds the state from a full history in one vectorized NumPy/SciPy pass.
+
+IndicatorEngine keeps one running indicator per (symbol, interval, spec), so
+repeated /api/ohlc calls only process the bars that are new since the last call.
+
+Specs are 'name' or 'name:param[:param]':
+    ema:20, rsi:14, atr:14, vwap, bb:20:2, supertrend:10:3
+"""
+
+import os
+import math
+import logging
+import threading
+from bisect import bisect_left
+from collections import OrderedDict, deque
+
+import numpy as np
 import pandas as pd
 
+logger = logging.getLogger(__name__)
+
+# Running indicators kept by the engine, and bars of values kept per indicator
+INDICATOR_CACHE_SIZE = int(os.getenv('INDICATOR_CACHE_SIZE', '512'))
+INDICATOR_MAX_HISTORY = int(os.getenv('INDICATOR_MAX_HISTORY', '20000'))
+
+IST_OFFSET = 19800  # +05:30, VWAP sessions start at 00:00 IST
+DAY = 86400
+
+
 def compute_ema(series, period):
     return series.ewm(span=period, adjust=False).mean()
 
@@ -13,26 +46,573 @@ def compute_rsi(series, period=14):
     rsi = 100 - (100 / (1 + rs))
     return rsi
 
-def attach_indicators(ohlc_list, emas=None, rsi_period=None):
+
+def _ewm(x, alpha, seed):
+    """y[i] = y[i-1] + alpha * (x[i] - y[i-1]) with y[-1] = seed, as one linear filter"""
+    from scipy.signal import lfilter
+
+    if not len(x):
+        return np.empty(0)
+    y, _ = lfilter([alpha], [1.0, alpha - 1.0], x, zi=[(1.0 - alpha) * seed])
+    return y
+
+
+def _bar_time(bar):
+    return bar.get('time', bar.get('t'))
+
+
+class Indicator:
+    """
+    Base class of the incremental indicators.
+
+    Subclasses implement _initial_state(), _step() which computes the value of a
+    bar from the closed-bar state without changing it, and _batch() for backfill.
+    """
+
+    outputs = ('value',)
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._state = self._initial_state()
+        self._pending = None
+        self.time = None
+        self.value = None
+
+    def _initial_state(self):
+        return None
+
+    def _commit(self, pending):
+        """Fold the forming bar into the closed-bar state"""
+        self._state = pending
+
+    def update(self, t, o, h, l, c, v=0.0):
+        """
+        Apply a bar and return the indicator value (None while warming up).
+
+        A bar with the same time as the previous one revises the forming bar;
+        bars older than that are ignored.
+        """
+        if self.time is not None:
+            if t < self.time:
+                return self.value
+            if t > self.time:
+                self._commit(self._pending)
+        self.value, self._pending = self._step(t, o, h, l, c, v)
+        self.time = t
+        return self.value
+
+    def update_bar(self, bar):
+        """update() for a bar dict with time (or t), open, high, low, close and volume"""
+        return self.update(_bar_time(bar), bar['open'], bar['high'], bar['low'], bar['close'],
+                           bar.get('volume') or 0.0)
+
+    def backfill(self, t, o, h, l, c, v=None):
+        """
+        Seed the state from full history columns (oldest first), replacing any state.
+
+        Returns:
+            ndarray: Values per bar, shape (n,) or (n, len(outputs)); NaN while warming up
+        """
+        t = np.asarray(t, dtype=np.int64)
+        o, h, l, c = (np.asarray(column, dtype=np.float64) for column in (o, h, l, c))
+        v = np.zeros(len(t)) if v is None else np.asarray(v, dtype=np.float64)
+
+        self.reset()
+        if not len(t):
+            return np.empty((0,) if len(self.outputs) == 1 else (0, len(self.outputs)))
+
+        # _batch returns the state before the last bar, which goes through update()
+        # so later ticks can revise it
+        values, self._state = self._batch(t, o, h, l, c, v)
+        value = self.update(int(t[-1]), o[-1], h[-1], l[-1], c[-1], v[-1])
+        values[-1] = np.nan if value is None else value
+        return values
+
+    def backfill_bars(self, bars):
+        """backfill() for a list of bar dicts"""
+        columns = _columns(bars)
+        return self.backfill(*columns)
+
+    def sync(self, bars):
+        """
+        Bring the indicator up to date with a bar list (oldest first).
+
+        Only bars from the last one seen onwards are applied; the first call, or a
+        list that no longer reaches back to it, backfills from the whole list.
+
+        Returns:
+            The latest value
+        """
+        if not bars:
+            return self.value
+        if self.time is None or not _bar_time(bars[0]) <= self.time <= _bar_time(bars[-1]):
+            self.backfill_bars(bars)
+            return self.value
+
+        start = len(bars) - 1
+        while start > 0 and _bar_time(bars[start - 1]) >= self.time:
+            start -= 1
+        for bar in bars[start:]:
+            self.update_bar(bar)
+        return self.value
+
+
+class EMA(Indicator):
+    """Exponential moving average (alpha = 2 / (period + 1), seeded with the first close)"""
+
+    def __init__(self, period=20):
+        self.period = period
+        self.alpha = 2.0 / (period + 1)
+        super().__init__()
+
+    def _step(self, t, o, h, l, c, v):
+        ema = c if self._state is None else self._state + self.alpha * (c - self._state)
+        return ema, ema
+
+    def _batch(self, t, o, h, l, c, v):
+        ema = _ewm(c, self.alpha, c[0])
+        return ema, (ema[-2] if len(ema) > 1 else None)
+
+
+class RSI(Indicator):
+    """Wilder RSI (alpha = 1 / period); 50 for the first bar"""
+
+    def __init__(self, period=14):
+        self.period = period
+        self.alpha = 1.0 / period
+        super().__init__()
+
+    def _initial_state(self):
+        return (None, None, None)  # previous close, average gain, average loss
+
+    @staticmethod
+    def _rsi(avg_up, avg_down):
+        return 100 - 100 / (1 + avg_up / (avg_down if avg_down != 0 else 1e-8))
+
+    def _step(self, t, o, h, l, c, v):
+        prev_close, avg_up, avg_down = self._state
+        if prev_close is None:
+            return 50.0, (c, None, None)
+        delta = c - prev_close
+        up, down = max(delta, 0.0), max(-delta, 0.0)
+        if avg_up is None:
+            avg_up, avg_down = up, down
+        else:
+            avg_up += self.alpha * (up - avg_up)
+            avg_down += self.alpha * (down - avg_down)
+        return self._rsi(avg_up, avg_down), (c, avg_up, avg_down)
+
+    def _batch(self, t, o, h, l, c, v):
+        n = len(c)
+        if n == 1:
+            return np.array([50.0]), self._initial_state()
+        delta = np.diff(c)
+        up, down = np.maximum(delta, 0.0), np.maximum(-delta, 0.0)
+        avg_up = _ewm(up, self.alpha, up[0])
+        avg_down = _ewm(down, self.alpha, down[0])
+        rs = avg_up / np.where(avg_down == 0, 1e-8, avg_down)
+        rsi = np.concatenate(([50.0], 100 - 100 / (1 + rs)))
+        state = (c[-2], None, None) if n == 2 else (c[-2], avg_up[-2], avg_down[-2])
+        return rsi, state
+
+
+class ATR(Indicator):
+    """Average true range with Wilder smoothing (alpha = 1 / period), seeded with the first range"""
+
+    def __init__(self, period=14):
+        self.period = period
+        self.alpha = 1.0 / period
+        super().__init__()
+
+    def _initial_state(self):
+        return (None, None)  # previous close, ATR
+
+    def _step(self, t, o, h, l, c, v):
+        prev_close, atr = self._state
+        tr = h - l if prev_close is None else max(h - l, abs(h - prev_close), abs(l - prev_close))
+        atr = tr if atr is None else atr + self.alpha * (tr - atr)
+        return atr, (c, atr)
+
+    def _batch(self, t, o, h, l, c, v):
+        prev_close = c[:-1]
+        tr = np.concatenate((
+            h[:1] - l[:1],
+            np.maximum(h[1:] - l[1:], np.maximum(np.abs(h[1:] - prev_close), np.abs(l[1:] - prev_close)))
+        ))
+        atr = _ewm(tr, self.alpha, tr[0])
+        return atr, ((c[-2], atr[-2]) if len(c) > 1 else self._initial_state())
+
+
+class VWAP(Indicator):
+    """Session VWAP of the typical price, restarting at 00:00 IST each day"""
+
+    def _initial_state(self):
+        return (None, 0.0, 0.0)  # session day, cumulative price * volume, cumulative volume
+
+    def _step(self, t, o, h, l, c, v):
+        day, cum_pv, cum_v = self._state
+        bar_day = (t + IST_OFFSET) // DAY
+        if bar_day != day:
+            cum_pv = cum_v = 0.0
+        typical = (h + l + c) / 3
+        cum_pv += typical * v
+        cum_v += v
+        return (cum_pv / cum_v if cum_v > 0 else typical), (bar_day, cum_pv, cum_v)
+
+    def _batch(self, t, o, h, l, c, v):
+        n = len(t)
+        day = (t + IST_OFFSET) // DAY
+        typical = (h + l + c) / 3
+        pv = typical * v
+
+        # Cumulative sums that restart at every session
+        new_session = np.concatenate(([True], np.diff(day) != 0))
+        session_start = np.maximum.accumulate(np.where(new_session, np.arange(n), 0))
+        sum_pv, sum_v = np.cumsum(pv), np.cumsum(v)
+        cum_pv = sum_pv - (sum_pv[session_start] - pv[session_start])
+        cum_v = sum_v - (sum_v[session_start] - v[session_start])
+
+        vwap = typical.copy()
+        np.divide(cum_pv, cum_v, out=vwap, where=cum_v > 0)
+        state = (int(day[-2]), cum_pv[-2], cum_v[-2]) if n > 1 else self._initial_state()
+        return vwap, state
+
+
+class Bollinger(Indicator):
+    """Bollinger bands: SMA of the close +/- k population standard deviations"""
+
+    outputs = ('middle', 'upper', 'lower')
+
+    def __init__(self, period=20, k=2.0):
+        if period < 2:
+            raise ValueError('Bollinger period must be at least 2')
+        self.period = period
+        self.k = k
+        super().__init__()
+
+    def _initial_state(self):
+        # Closed closes of the window (the forming bar completes it), their sum and
+        # sum of squares, and commits since the sums were last recomputed
+        return [deque(maxlen=self.period - 1), 0.0, 0.0, 0]
+
+    def _bands(self, mean, sd):
+        return mean, mean + self.k * sd, mean - self.k * sd
+
+    def _step(self, t, o, h, l, c, v):
+        window, total, total_sq, _ = self._state
+        n = len(window) + 1
+        if n < self.period:
+            return None, c
+        mean = (total + c) / n
+        sd = math.sqrt(max((total_sq + c * c) / n - mean * mean, 0.0))
+        return self._bands(mean, sd), c
+
+    def _commit(self, close):
+        state = self._state
+        window = state[0]
+        if len(window) == window.maxlen:
+            old = window[0]
+            state[1] -= old
+            state[2] -= old * old
+        window.append(close)
+        state[1] += close
+        state[2] += close * close
+
+        # Recompute the running sums every window length to stop rounding drift (amortized O(1))
+        state[3] += 1
+        if state[3] >= self.period:
+            state[1] = math.fsum(window)
+            state[2] = math.fsum(x * x for x in window)
+            state[3] = 0
+
+    def _batch(self, t, o, h, l, c, v):
+        n = len(c)
+        values = np.full((n, 3), np.nan)
+        if n >= self.period:
+            windows = np.lib.stride_tricks.sliding_window_view(c, self.period)
+            mean, sd = windows.mean(axis=1), windows.std(axis=1)
+            values[self.period - 1:] = np.column_stack(self._bands(mean, sd))
+
+        state = self._initial_state()
+        for close in c[max(0, n - self.period):n - 1]:
+            state[0].append(float(close))
+        state[1] = math.fsum(state[0])
+        state[2] = math.fsum(x * x for x in state[0])
+        return values, state
+
+
+class SuperTrend(Indicator):
+    """SuperTrend on the ATR bands around (high + low) / 2; direction 1 = up, -1 = down"""
+
+    outputs = ('supertrend', 'direction')
+
+    def __init__(self, period=10, multiplier=3.0):
+        self.period = period
+        self.multiplier = multiplier
+        self._atr = ATR(period)
+        super().__init__()
+
+    def reset(self):
+        self._atr.reset()
+        super().reset()
+
+    def _initial_state(self):
+        return (None, None, None, 1, 0)  # previous close, final upper, final lower, direction, bars
+
+    def _bands(self, prev_close, final_upper, final_lower, direction, h, l, c, atr):
+        hl2 = (h + l) / 2
+        upper = hl2 + self.multiplier * atr
+        lower = hl2 - self.multiplier * atr
+        if final_upper is None:
+            return upper, lower, direction
+        if not (upper < final_upper or prev_close > final_upper):
+            upper = final_upper
+        if not (lower > final_lower or prev_close < final_lower):
+            lower = final_lower
+        if direction == -1 and c > upper:
+            direction = 1
+        elif direction == 1 and c < lower:
+            direction = -1
+        return upper, lower, direction
+
+    def _step(self, t, o, h, l, c, v):
+        atr, atr_pending = self._atr._step(t, o, h, l, c, v)
+        prev_close, final_upper, final_lower, direction, bars = self._state
+        upper, lower, direction = self._bands(prev_close, final_upper, final_lower, direction, h, l, c, atr)
+        value = None
+        if bars + 1 >= self.period:
+            value = (lower if direction == 1 else upper, direction)
+        return value, (atr_pending, (c, upper, lower, direction, bars + 1))
+
+    def _commit(self, pending):
+        self._atr._commit(pending[0])
+        self._state = pending[1]
+
+    def _batch(self, t, o, h, l, c, v):
+        n = len(c)
+        atr, self._atr._state = self._atr._batch(t, o, h, l, c, v)
+
+        # The band ratchet is path dependent, so it runs as a loop over the precomputed ATR
+        values = np.full((n, 2), np.nan)
+        state = self._initial_state()
+        highs, lows, closes, atrs = h.tolist(), l.tolist(), c.tolist(), atr.tolist()
+        for i in range(n - 1):
+            prev_close, final_upper, final_lower, direction, bars = state
+            upper, lower, direction = self._bands(prev_close, final_upper, final_lower, direction,
+                                                  highs[i], lows[i], closes[i], atrs[i])
+            if bars + 1 >= self.period:
+                values[i] = (lower if direction == 1 else upper, direction)
+            state = (closes[i], upper, lower, direction, bars + 1)
+        return values, state
+
+
+INDICATORS = {
+    'ema': (EMA, (int,), (20,)),
+    'rsi': (RSI, (int,), (14,)),
+    'atr': (ATR, (int,), (14,)),
+    'vwap': (VWAP, (), ()),
+    'bb': (Bollinger, (int, float), (20, 2.0)),
+    'supertrend': (SuperTrend, (int, float), (10, 3.0)),
+}
+
+
+def parse_spec(spec):
+    """
+    Parse an indicator spec such as 'ema:20' or 'bb:20:2'.
+
+    Returns:
+        tuple: (name, params) with missing params filled from the defaults
+
+    Raises:
+        ValueError: Unknown indicator or invalid parameters
+    """
+    name, *args = str(spec).strip().lower().split(':')
+    if name not in INDICATORS:
+        raise ValueError(f"Unknown indicator '{name}'")
+    _, types, defaults = INDICATORS[name]
+    if len(args) > len(types):
+        raise ValueError(f"Too many parameters for '{name}'")
+    try:
+        params = tuple(cast(arg) for cast, arg in zip(types, args)) + defaults[len(args):]
+    except ValueError:
+        raise ValueError(f"Invalid parameters in indicator spec '{spec}'")
+    if any(param <= 0 for param in params):
+        raise ValueError(f"Indicator parameters must be positive in '{spec}'")
+    return name, params
+
+
+def create_indicator(name, params):
+    return INDICATORS[name][0](*params)
+
+
+def output_names(name, params):
+    """Response keys of an indicator, e.g. ema_20 or bb_20_2_upper"""
+    base = '_'.join([name] + [f'{param:g}' for param in params])
+    outputs = INDICATORS[name][0].outputs
+    if len(outputs) == 1:
+        return [base]
+    return [base if output == name else f'{base}_{output}' for output in outputs]
+
+
+def _columns(bars):
+    """Time and OHLCV columns of a bar dict list; times fall back to bar positions"""
+    n = len(bars)
+    if n and _bar_time(bars[0]) is not None:
+        t = np.fromiter((_bar_time(bar) for bar in bars), dtype=np.int64, count=n)
+    else:
+        t = np.arange(n, dtype=np.int64)
+    return (t,) + tuple(_column(bars, field, n) for field in ('open', 'high', 'low', 'close', 'volume'))
+
+
+def _column(bars, field, n):
+    try:
+        return np.fromiter((bar.get(field) or 0 for bar in bars), dtype=np.float64, count=n)
+    except (TypeError, ValueError):
+        # Prices sent as strings or with junk values
+        return pd.to_numeric(pd.Series([bar.get(field) for bar in bars], dtype=object),
+                             errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+
+
+def _to_lists(values, count):
+    """Split backfill values into one list per output with None for NaN"""
+    values = np.asarray(values, dtype=np.float64).reshape(len(values), count)
+    return [[None if math.isnan(x) else x for x in values[:, i].tolist()] for i in range(count)]
+
+
+class _Series:
+    """A running indicator and its values per bar"""
+
+    __slots__ = ('indicator', 'count', 'times', 'columns')
+
+    def __init__(self, indicator):
+        self.indicator = indicator
+        self.count = len(indicator.outputs)
+        self.times = []
+        self.columns = [[] for _ in range(self.count)]
+
+    def backfill(self, columns):
+        values = self.indicator.backfill(*columns)
+        self.times = columns[0].tolist()
+        self.columns = _to_lists(values, self.count)
+
+    def _append(self, t, value):
+        if value is None:
+            value = (None,) * self.count
+        elif self.count == 1:
+            value = (value,)
+        if self.times and self.times[-1] == t:
+            for column, x in zip(self.columns, value):
+                column[-1] = x
+        else:
+            self.times.append(t)
+            for column, x in zip(self.columns, value):
+                column.append(x)
+
+    def extend(self, columns):
+        """
+        Apply the bars from the last one seen onwards and return the values aligned
+        with the columns, or None if the history does not line up with them.
+        """
+        t = columns[0]
+        n = len(t)
+        if not self.times or not n or t[0] < self.times[0]:
+            return None
+        last = self.times[-1]
+        k = int(np.searchsorted(t, last))
+        if k >= n or t[k] != last:
+            return None
+
+        o, h, l, c, v = columns[1:]
+        for i in range(k, n):
+            self._append(int(t[i]), self.indicator.update(int(t[i]), o[i], h[i], l[i], c[i], v[i]))
+
+        excess = len(self.times) - INDICATOR_MAX_HISTORY
+        if excess > 0:
+            del self.times[:excess]
+            for column in self.columns:
+                del column[:excess]
+
+        start = bisect_left(self.times, int(t[0]))
+        if len(self.times) - start != n or self.times[start] != t[0]:
+            return None
+        return [column[start:] for column in self.columns]
+
+
+class IndicatorEngine:
+    """LRU of running indicators keyed by (symbol, interval, name, params)"""
+
+    def __init__(self, maxsize=INDICATOR_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._series = OrderedDict()
+        self._lock = threading.Lock()
+
+    def compute(self, symbol, interval, bars, specs):
+        """
+        Indicator values aligned with bars (oldest first).
+
+        Returns:
+            dict: {output name: list of values}, None while an indicator warms up
+        """
+        columns = _columns(bars)
+        out = {}
+        for spec in specs:
+            name, params = parse_spec(spec)
+            key = (symbol, str(interval), name, params)
+            with self._lock:
+                series = self._series.get(key)
+                lists = series.extend(columns) if series is not None else None
+                if lists is None:
+                    series = self._series[key] = _Series(create_indicator(name, params))
+                    series.backfill(columns)
+                    lists = series.columns
+                self._series.move_to_end(key)
+                while len(self._series) > self.maxsize:
+                    self._series.popitem(last=False)
+            out.update(zip(output_names(name, params), lists))
+        return out
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+# Process-wide engine shared by the chart routes
+engine = IndicatorEngine()
+
+
+def compute_indicators(bars, specs):
+    """Indicator values aligned with bars, computed from scratch"""
+    columns = _columns(bars)
+    out = {}
+    for spec in specs:
+        name, params = parse_spec(spec)
+        values = create_indicator(name, params).backfill(*columns)
+        out.update(zip(output_names(name, params), _to_lists(values, len(INDICATORS[name][0].outputs))))
+    return out
+
+
+def attach_indicators(ohlc_list, emas=None, rsi_period=None, specs=None, symbol=None, interval=None):
     """
-    ohlc_list: list of dicts with 'date','open','high','low','close','volume'
+    ohlc_list: list of dicts with 'time' (or 'date'),'open','high','low','close','volume'
     emas: list of integer periods [20,50]
     rsi_period: int or None
+    specs: further indicator specs, e.g. ['atr:14', 'vwap', 'bb:20:2', 'supertrend:10:3']
+    symbol, interval: keep running state in the shared engine so later calls only
+                      process new bars
     returns: dict of arrays aligned with ohlc_list: {'ema_20': [...], 'rsi_14': [...]}
     """
     try:
-        df = pd.DataFrame(ohlc_list)
-        if df.empty:
+        if not ohlc_list:
             return {}
-        df['close'] = pd.to_numeric(df['close'], errors='coerce')
-        out = {}
-        if emas:
-            for p in emas:
-                out[f'ema_{p}'] = compute_ema(df['close'], p).bfill().tolist()
+        all_specs = [f'ema:{p}' for p in (emas or [])]
         if rsi_period:
-            out[f'rsi_{rsi_period}'] = compute_rsi(df['close'], rsi_period).fillna(50).tolist()
-        return out
+            all_specs.append(f'rsi:{rsi_period}')
+        all_specs.extend(specs or [])
+        if symbol and interval:
+            return engine.compute(symbol, interval, ohlc_list, all_specs)
+        return compute_indicators(ohlc_list, all_specs)
     except Exception as e:
-        import logging
-        logging.getLogger(__name__).error(f"Indicator calculation failed: {e}")
-        return {}
\ No newline at end of file
+        logger.error(f"Indicator calculation failed: {e}")
+        return {}
@@ -0,0 +1,236 @@
+"""
+OpenAlgo Charts Extension - Instrument Index
+File: charts_extension/charts/instrument_index.py
+
+In-memory form of config/instrument_index.json (written by
+generate_instrument_index.py / export_symbol_cache.py) for /api/search and
+/api/instruments. The file is parsed once per version, not on every keystroke.
+
+A snapshot is rebuilt when the file's mtime or size changes, or when the broker
+symbol cache reloads the master contract. Each snapshot holds:
+
+- Sorted uppercase symbol (without exchange) and name keys: a query prefix maps
+  to one bisect range.
+- One newline-joined haystack of "SYMBOL<tab>NAME" lines for infix matches, so a
+  substring search is a few str.find calls instead of a loop over every entry.
+- Serialized (and gzip-compressed) /api/instruments pages with a content ETag.
+"""
+
+import os
+import sys
+import gzip
+import json
+import hashlib
+import logging
+import threading
+from bisect import bisect_left, bisect_right
+
+logger = logging.getLogger(__name__)
+
+INSTRUMENT_INDEX_PATH = os.getenv('INSTRUMENT_INDEX_PATH', os.path.join('config', 'instrument_index.json'))
+
+# Default and maximum entries per /api/instruments page
+INSTRUMENTS_PAGE_SIZE = int(os.getenv('INSTRUMENTS_PAGE_SIZE', '5000'))
+INSTRUMENTS_MAX_PAGE_SIZE = 50000
+
+# Serialized pages kept per snapshot
+MAX_CACHED_PAGES = 64
+
+# Bodies smaller than this are not worth compressing
+GZIP_MIN_BYTES = 1024
+
+
+def _master_contract_version():
+    """Load counter of the broker symbol cache, or None when the app has not loaded it"""
+    module = sys.modules.get('database.token_db_enhanced')
+    if module is None:
+        return None
+    try:
+        cache = module.get_cache()
+        return cache.stats.cache_loads if cache.cache_loaded else 0
+    except Exception:
+        return None
+
+
+class InstrumentSnapshot:
+    """Search structures and serialized pages for one version of the index file"""
+
+    def __init__(self, instruments, digest):
+        self.instruments = instruments
+        self.digest = digest
+        self.results = [
+            {'symbol': inst.get('symbol'), 'name': inst.get('name'), 'type': inst.get('type', 'EQUITY')}
+            for inst in instruments
+        ]
+
+        symbols = [str(inst.get('symbol') or '').upper() for inst in instruments]
+        names = [str(inst.get('name') or '').upper() for inst in instruments]
+        # Symbol prefixes are matched after the exchange (NSE:SBIN-EQ -> SBIN-EQ)
+        tickers = [symbol.partition(':')[2] or symbol for symbol in symbols]
+        self.symbol_rows = sorted(range(len(tickers)), key=tickers.__getitem__)
+        self.symbol_keys = [tickers[row] for row in self.symbol_rows]
+        self.name_rows = sorted(range(len(names)), key=names.__getitem__)
+        self.name_keys = [names[row] for row in self.name_rows]
+
+        # Line starts of the haystack, to map a match offset back to its row
+        lines = [f'{symbol}\t{name}' for symbol, name in zip(symbols, names)]
+        self.haystack = '\n'.join(lines)
+        self.line_starts = []
+        offset = 0
+        for line in lines:
+            self.line_starts.append(offset)
+            offset += len(line) + 1
+
+        self._pages = {}
+        self._pages_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.instruments)
+
+    def search(self, query, limit=25):
+        """
+        Entries whose symbol or name contains the query (case-insensitive).
+
+        Symbol prefix matches come first, then name prefix matches, then other
+        matches in file order.
+        """
+        query = query.upper()
+        if not query or '\n' in query or '\t' in query:
+            return []
+
+        rows = []
+        seen = set()
+
+        def take(candidates):
+            for row in candidates:
+                if row not in seen:
+                    seen.add(row)
+                    rows.append(row)
+                    if len(rows) >= limit:
+                        return True
+            return False
+
+        for keys, ordered in ((self.symbol_keys, self.symbol_rows), (self.name_keys, self.name_rows)):
+            lo = bisect_left(keys, query)
+            hi = bisect_right(keys, query + '\uffff', lo)
+            if take(ordered[lo:min(hi, lo + limit)]):
+                return [self.results[row] for row in rows]
+
+        take(self._infix_rows(query, limit + len(seen)))
+        return [self.results[row] for row in rows]
+
+    def _infix_rows(self, query, limit):
+        haystack, starts = self.haystack, self.line_starts
+        found = 0
+        last = -1
+        position = haystack.find(query)
+        while position != -1 and found < limit:
+            row = bisect_right(starts, position) - 1
+            if row != last:
+                yield row
+                found += 1
+                last = row
+            # Continue from the next line
+            next_start = starts[row + 1] if row + 1 < len(starts) else len(haystack)
+            position = haystack.find(query, next_start)
+
+    def page(self, page, page_size, compress):
+        """
+        Serialized /api/instruments body
+
+        Args:
+            page: 1-based page number, or None for the full list
+            page_size: Entries per page
+            compress: Whether the client accepts gzip
+
+        Returns:
+            (body bytes, etag, gzipped)
+        """
+        key = (page, page_size)
+        with self._pages_lock:
+            cached = self._pages.get(key)
+        if cached is None:
+            if page is None:
+                items = self.instruments
+                body = {'status': 'success', 'count': len(items), 'instruments': items}
+            else:
+                items = self.instruments[(page - 1) * page_size:page * page_size]
+                body = {
+                    'status': 'success',
+                    'count': len(items),
+                    'total': len(self.instruments),
+                    'page': page,
+                    'page_size': page_size,
+                    'pages': (len(self.instruments) + page_size - 1) // page_size,
+                    'instruments': items,
+                }
+            raw = json.dumps(body, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+            etag = f'{self.digest}-{page or "all"}-{page_size}'
+            cached = {'raw': raw, 'etag': etag, 'gzip': None}
+            with self._pages_lock:
+                if len(self._pages) >= MAX_CACHED_PAGES:
+                    self._pages.pop(next(iter(self._pages)))
+                self._pages[key] = cached
+
+        if compress and len(cached['raw']) >= GZIP_MIN_BYTES:
+            if cached['gzip'] is None:
+                cached['gzip'] = gzip.compress(cached['raw'], compresslevel=6)
+            return cached['gzip'], cached['etag'] + '-gz', True
+        return cached['raw'], cached['etag'], False
+
+
+class InstrumentIndex:
+    """Instrument index file loaded on first use and reloaded when it changes"""
+
+    def __init__(self, path=INSTRUMENT_INDEX_PATH):
+        self.path = path
+        self._snapshot = None
+        self._version = None
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def _current_version(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, _master_contract_version()
+
+    def get(self):
+        """
+        Snapshot of the current index file
+
+        Returns:
+            InstrumentSnapshot, or None if the file does not exist
+
+        Raises:
+            json.JSONDecodeError: if the file is not valid JSON
+        """
+        version = self._current_version()
+        if version is None:
+            return None
+        if version == self._version:
+            return self._snapshot
+
+        with self._lock:
+            if version != self._version:
+                with open(self.path, 'rb') as f:
+                    raw = f.read()
+                instruments = json.loads(raw)
+                if not isinstance(instruments, list):
+                    instruments = []
+                digest = hashlib.blake2b(raw, digest_size=8).hexdigest()
+                self._snapshot = InstrumentSnapshot(instruments, digest)
+                self._version = version
+                self.loads += 1
+                logger.info(f'Loaded {len(instruments)} instruments from {self.path}')
+            return self._snapshot
+
+    def invalidate(self):
+        """Force a reload on next use"""
+        with self._lock:
+            self._version = None
+
+
+# Process-wide index used by the chart routes
+instrument_index = InstrumentIndex()
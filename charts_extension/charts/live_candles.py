@@ -0,0 +1,391 @@
+"""
+OpenAlgo Charts Extension - Live Candle Aggregator
+File: charts_extension/charts/live_candles.py
+
+Builds the forming bar of every subscribed (symbol, interval) from the ticks the
+broker adapters publish on the ZeroMQ market data bus, and pushes only that bar
+to the Socket.IO room of the pair. Charts load history once from /api/ohlc and
+then apply these updates, so they neither poll nor receive other symbols' ticks.
+
+Bars are aligned like the candle resampler's (exchange session start for
+intraday intervals); bar volume is the change in the cumulative day volume of
+quote ticks. Updates are conflated: a room gets at most one update per
+LIVE_CANDLE_FLUSH_MS with the latest state of its bar, preceded by the final
+state of a bar that closed in between.
+"""
+
+import os
+import time
+import logging
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Conflation window for bar updates sent to a room (milliseconds)
+LIVE_CANDLE_FLUSH_MS = int(os.getenv('LIVE_CANDLE_FLUSH_MS', '250'))
+
+CANDLE_EVENT = 'candle_update'
+
+
+def room_name(symbol, interval):
+    """Socket.IO room of a chart (symbol, interval) pair"""
+    return f'candles:{symbol}:{interval}'
+
+
+def resolve_chart_symbol(symbol):
+    """
+    OpenAlgo (exchange, symbol) of a chart symbol such as NSE:SBIN-EQ or NSE:NIFTY50-INDEX.
+
+    Chart symbols are Fyers broker symbols; the master contract maps them to the
+    symbols used on the market data bus.
+    """
+    exchange, _, name = symbol.partition(':')
+    if not name:
+        return None
+    exchanges = [f'{exchange}_INDEX', exchange] if name.endswith('-INDEX') else [exchange]
+    try:
+        from database.token_db import get_oa_symbol
+
+        for candidate in exchanges:
+            oa_symbol = get_oa_symbol(symbol, candidate)
+            if oa_symbol:
+                return candidate, oa_symbol
+    except Exception as e:
+        logger.debug(f'Master contract lookup failed for {symbol}: {str(e)}')
+
+    # Not in the master contract: drop the Fyers series suffix
+    if name.endswith(('-EQ', '-INDEX')):
+        name = name.rsplit('-', 1)[0]
+    return exchanges[0], name
+
+
+class _LiveSeries:
+    """Forming bar of one chart (symbol, interval)"""
+
+    __slots__ = ('symbol', 'interval', 'exchange', 'bar', 'closed', 'base_volume', 'day_volume', 'dirty')
+
+    def __init__(self, symbol, interval, exchange):
+        self.symbol = symbol
+        self.interval = interval
+        self.exchange = exchange
+        self.bar = None
+        self.closed = None          # final state of the previous bar, if not sent yet
+        self.base_volume = None     # cumulative day volume when the bar opened
+        self.day_volume = None
+        self.dirty = False
+
+    def apply(self, ltp, day_volume, ts):
+        from services.candle_resampler import bucket_starts
+
+        start = int(bucket_starts(np.array([ts]), self.interval, self.exchange)[0])
+        bar = self.bar
+        if bar is not None and start < bar['time']:
+            return
+
+        if bar is None or start > bar['time']:
+            if bar is not None and self.dirty:
+                self.closed = dict(bar)
+            self.base_volume = self.day_volume
+            bar = self.bar = {'time': start, 'open': ltp, 'high': ltp, 'low': ltp, 'close': ltp, 'volume': 0}
+        else:
+            if ltp > bar['high']:
+                bar['high'] = ltp
+            if ltp < bar['low']:
+                bar['low'] = ltp
+            bar['close'] = ltp
+
+        if day_volume is not None:
+            if self.base_volume is None or day_volume < self.base_volume:
+                # First quote tick, or the day volume restarted
+                self.base_volume = day_volume if self.day_volume is None else 0
+            self.day_volume = day_volume
+            bar['volume'] = day_volume - self.base_volume
+        self.dirty = True
+
+
+class LiveCandleAggregator:
+    """
+    Tick-to-bar aggregator for chart rooms.
+
+    Rooms are reference counted per Socket.IO session id; ticks of instruments
+    without a room are dropped after one dict lookup. Each instrument remembers
+    the (username, broker) whose WebSocket client subscribed it, so it is
+    released through that same client whichever session leaves last.
+    """
+
+    def __init__(self, emit=None, flush_ms=LIVE_CANDLE_FLUSH_MS):
+        self._emit = emit
+        self.flush_interval = flush_ms / 1000
+        self._lock = threading.Lock()
+        self._series = {}           # (symbol, interval) -> _LiveSeries
+        self._instruments = {}      # (exchange, oa symbol) -> [_LiveSeries]
+        self._room_instrument = {}  # (symbol, interval) -> (exchange, oa symbol)
+        self._owners = {}           # (exchange, oa symbol) -> (username, broker), None while subscribing
+        self._by_chart_symbol = {}  # chart symbol -> [_LiveSeries]
+        self._members = {}          # (symbol, interval) -> set of sids
+        self._sid_rooms = {}        # sid -> set of (symbol, interval)
+        self._threads = []
+        self.stats = {'ticks': 0, 'bar_ticks': 0, 'emitted': 0}
+
+    # ---------------- rooms ----------------
+
+    def join(self, sid, symbol, interval):
+        """
+        Add a session to the room of (symbol, interval).
+
+        Returns:
+            (exchange, symbol) of the instrument if it is not subscribed at the
+            broker yet (first room, or an earlier subscribe failed); the caller
+            subscribes it and reports the outcome with subscribed(). Otherwise None
+
+        Raises:
+            ValueError: for an interval bars cannot be aligned to
+        """
+        from services.candle_resampler import bucket_starts
+
+        key = (symbol, str(interval))
+        bucket_starts(np.array([0]), key[1])
+        with self._lock:
+            members = self._members.setdefault(key, set())
+            members.add(sid)
+            self._sid_rooms.setdefault(sid, set()).add(key)
+            instrument = self._room_instrument.get(key)
+            if instrument is None:
+                instrument = resolve_chart_symbol(symbol)
+                if instrument is None:
+                    return None
+                series = self._series[key] = _LiveSeries(symbol, key[1], instrument[0].replace('_INDEX', ''))
+                self._room_instrument[key] = instrument
+                self._by_chart_symbol.setdefault(symbol, []).append(series)
+                self._instruments.setdefault(instrument, []).append(series)
+            subscribe = instrument not in self._owners
+            if subscribe:
+                self._owners[instrument] = None
+        self.start()
+        return instrument if subscribe else None
+
+    def subscribed(self, instrument, owner, success):
+        """
+        Record the outcome of subscribing an instrument returned by join().
+
+        Args:
+            owner: (username, broker) whose WebSocket client was asked to subscribe
+            success: False leaves the instrument unsubscribed, so the next join retries
+
+        Returns:
+            owner if no room needs the instrument any more (the caller
+            unsubscribes it again), otherwise None
+        """
+        with self._lock:
+            if instrument not in self._instruments:
+                self._owners.pop(instrument, None)
+                return owner if success else None
+            if success:
+                self._owners[instrument] = owner
+            else:
+                self._owners.pop(instrument, None)
+            return None
+
+    def leave(self, sid, symbol, interval):
+        """
+        Remove a session from a room.
+
+        Returns:
+            (instrument, (username, broker)) to unsubscribe if no room needs
+            the instrument any more, otherwise None
+        """
+        with self._lock:
+            return self._leave(sid, (symbol, str(interval)))
+
+    def leave_all(self, sid):
+        """Remove a disconnected session from all its rooms; returns the (instrument, owner) pairs to unsubscribe"""
+        with self._lock:
+            released = [self._leave(sid, key) for key in list(self._sid_rooms.get(sid, ()))]
+        return [release for release in released if release]
+
+    def _leave(self, sid, key):
+        rooms = self._sid_rooms.get(sid)
+        if rooms is not None:
+            rooms.discard(key)
+            if not rooms:
+                del self._sid_rooms[sid]
+        members = self._members.get(key)
+        if members is None:
+            return None
+        members.discard(sid)
+        if members:
+            return None
+
+        del self._members[key]
+        series = self._series.pop(key, None)
+        if series is None:
+            return None
+        self._by_chart_symbol[series.symbol].remove(series)
+        if not self._by_chart_symbol[series.symbol]:
+            del self._by_chart_symbol[series.symbol]
+        instrument = self._room_instrument.pop(key)
+        entries = self._instruments[instrument]
+        entries.remove(series)
+        if entries:
+            return None
+        del self._instruments[instrument]
+        # A subscribe still in flight (owner None) is released by subscribed()
+        owner = self._owners.get(instrument)
+        if owner is None:
+            return None
+        del self._owners[instrument]
+        return instrument, owner
+
+    def rooms(self):
+        with self._lock:
+            return {room_name(*key): len(members) for key, members in self._members.items()}
+
+    # ---------------- ticks ----------------
+
+    def on_tick(self, exchange, symbol, data, ts=None):
+        """Apply a market data bus tick (OpenAlgo exchange and symbol)"""
+        self.stats['ticks'] += 1
+        entries = self._instruments.get((exchange, symbol))
+        if entries:
+            self._apply(entries, data, ts)
+
+    def on_chart_tick(self, symbol, data, ts=None):
+        """Apply a tick keyed by chart symbol (e.g. from the Fyers stream)"""
+        self.stats['ticks'] += 1
+        entries = self._by_chart_symbol.get(symbol)
+        if entries:
+            self._apply(entries, data, ts)
+
+    def _apply(self, entries, data, ts):
+        ltp = data.get('ltp')
+        if not ltp:
+            return
+        volume = data.get('volume')
+        ts = ts if ts is not None else time.time()
+        with self._lock:
+            self.stats['bar_ticks'] += 1
+            for series in entries:
+                series.apply(float(ltp), float(volume) if volume is not None else None, ts)
+
+    # ---------------- delivery ----------------
+
+    def flush(self):
+        """Send the changed bars to their rooms"""
+        updates = []
+        with self._lock:
+            for series in self._series.values():
+                if not series.dirty:
+                    continue
+                room = room_name(series.symbol, series.interval)
+                for bar in (series.closed, series.bar):
+                    if bar is not None:
+                        updates.append((room, dict(bar, symbol=series.symbol, interval=series.interval)))
+                series.closed = None
+                series.dirty = False
+
+        emit = self._emit or _socketio_emit
+        for room, payload in updates:
+            try:
+                emit(CANDLE_EVENT, payload, room)
+            except Exception as e:
+                logger.error(f'Live candle emit failed for {room}: {str(e)}')
+        self.stats['emitted'] += len(updates)
+        return len(updates)
+
+    def start(self):
+        """Start the ZeroMQ listener and the flusher (once)"""
+        with self._lock:
+            if self._threads:
+                return
+            self._threads = [
+                threading.Thread(target=self._listen, name='live-candles-zmq', daemon=True),
+                threading.Thread(target=self._flush_loop, name='live-candles-flush', daemon=True),
+            ]
+        for thread in self._threads:
+            thread.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f'Live candle flush error: {str(e)}')
+
+    def _listen(self):
+        """Subscribe to the adapters' ZeroMQ publisher and feed ticks to the rooms"""
+        try:
+            import zmq
+            from websocket_proxy.wire_format import decode_market_data
+        except ImportError as e:
+            logger.warning(f'Live candles disabled, market data bus not available: {str(e)}')
+            return
+
+        host = os.getenv('ZMQ_HOST', '127.0.0.1')
+        port = os.getenv('ZMQ_PORT', '5555')
+        socket = zmq.Context.instance().socket(zmq.SUB)
+        socket.connect(f'tcp://{host}:{port}')
+        socket.setsockopt(zmq.SUBSCRIBE, b'')
+        poller = zmq.Poller()
+        poller.register(socket, zmq.POLLIN)
+        logger.info(f'Live candles listening on tcp://{host}:{port}')
+        # Topic frames already reported as undecodable (logged once each)
+        unknown_topics = set()
+
+        while True:
+            try:
+                if not poller.poll(1000):
+                    continue
+                while True:
+                    try:
+                        frames = socket.recv_multipart(flags=zmq.NOBLOCK)
+                    except zmq.Again:
+                        break
+                    if len(frames) != 2:
+                        continue
+                    topic, data = decode_market_data(frames[0], frames[1])
+                    if topic is None:
+                        if frames[0] not in unknown_topics:
+                            unknown_topics.add(frames[0])
+                            logger.error(f'Live candles cannot decode market data topic {frames[0]!r}')
+                        continue
+                    self.on_tick(topic.exchange, topic.symbol, data)
+            except Exception as e:
+                logger.error(f'Live candle listener error: {str(e)}')
+                time.sleep(1)
+
+
+def _socketio_emit(event, payload, room):
+    from extensions import socketio
+    socketio.emit(event, payload, to=room)
+
+
+# Process-wide aggregator used by the chart Socket.IO handlers
+aggregator = LiveCandleAggregator()
+
+
+def subscribe_instrument(username, broker, instrument):
+    """Ask the WebSocket proxy to stream an instrument so its ticks reach the bus"""
+    try:
+        from services.websocket_service import subscribe_to_symbols
+
+        exchange, symbol = instrument
+        success, response, _ = subscribe_to_symbols(username, broker, [{'symbol': symbol, 'exchange': exchange}], 'Quote')
+        if not success:
+            logger.warning(f'Live candles: could not subscribe {exchange}:{symbol}: {response.get("message")}')
+        return success
+    except Exception as e:
+        logger.error(f'Live candles: subscribe error: {str(e)}')
+        return False
+
+
+def unsubscribe_instrument(username, broker, instrument):
+    try:
+        from services.websocket_service import unsubscribe_from_symbols
+
+        exchange, symbol = instrument
+        unsubscribe_from_symbols(username, broker, [{'symbol': symbol, 'exchange': exchange}], 'Quote')
+    except Exception as e:
+        logger.error(f'Live candles: unsubscribe error: {str(e)}')
@@ -15,8 +15,9 @@ import json
 import sqlite3
 import logging
 import time
-from datetime import datetime, timedelta
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
+
+from .instrument_index import INSTRUMENTS_MAX_PAGE_SIZE, INSTRUMENTS_PAGE_SIZE, instrument_index
 
 print(">>> routes.py LOADED")
 
@@ -39,11 +40,19 @@ def get_db_connection(db_path):
 
 @bp.route('/ohlc', methods=['GET'])
 def get_ohlc():
-    """Fetch OHLC candlestick data from Fyers broker."""
+    """
+    Fetch OHLC candlestick data from the local candle cache and Fyers broker.
+
+    Optional `indicators` adds overlays aligned with the bars, e.g.
+    indicators=ema:20,rsi:14,atr:14,vwap,bb:20:2,supertrend:10:3
+    """
     try:
+        from .indicators import attach_indicators, parse_spec
+
         symbol = request.args.get('symbol', '').strip()
         interval = request.args.get('interval', '5').strip()
         limit = min(int(request.args.get('limit', '200')), 500)
+        specs = [spec for spec in request.args.get('indicators', '').split(',') if spec.strip()]
         
         if not symbol:
             return jsonify({'error': 'Symbol parameter required'}), 400
@@ -51,22 +60,31 @@ def get_ohlc():
         if limit < 1:
             return jsonify({'error': 'Limit must be greater than 0'}), 400
         
-    
+        for spec in specs:
+            try:
+                parse_spec(spec)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        
+        def ohlc_response(data):
+            body = {'status': 'success', 'data': data}
+            if specs:
+                # Running indicator state per symbol/interval: only new bars are computed
+                body['indicators'] = attach_indicators(data, specs=specs, symbol=symbol, interval=interval)
+            return jsonify(body), 200
+        
+        # Stored candles, with the uncovered part of the window fetched from Fyers
+        data = get_candles_from_fyers(symbol, interval, limit)
+        if data and len(data) > 0:
+            logger.info(f'[OHLC] Got {len(data)} candles from candle cache for {symbol}')
+            return ohlc_response(data)
         
-        # Try database first (if table exists)
+        # Fallback to the most recent stored bars (e.g. Fyers not configured)
         logger.info(f'get_candles_from_db called with symbol={symbol}, interval={interval}, limit={limit}')
-
         data = get_candles_from_db(symbol, interval, limit)
         if data and len(data) > 0:
             logger.info(f'[OHLC] Got {len(data)} candles from database for {symbol}')
-            return jsonify({'status': 'success', 'data': data}), 200
-        
-        # Fallback to Fyers API
-        logger.info(f'[OHLC] Database failed, using Fyers API for {symbol}')
-        data = get_candles_from_fyers(symbol, interval, limit)
-        if data and len(data) > 0:
-            logger.info(f'[OHLC] Got {len(data)} candles from Fyers for {symbol}')
-            return jsonify({'status': 'success', 'data': data}), 200
+            return ohlc_response(data)
         
         logger.warning(f'[OHLC] No data available for {symbol}')
         # Return consistent envelope so frontend does not crash
@@ -161,94 +179,120 @@ def fyers_data_route():
 
 
 def get_candles_from_db(symbol, interval, limit):
-    """Query master_contract database for OHLC data."""
+    """Read the most recent bars from the local OHLC candle store."""
     try:
-        db_path = os.path.join('db', 'master_contract.db')
-        conn = get_db_connection(db_path)
-        if not conn:
-            return []
-        
-        cur = conn.cursor()
-        query = """
-            SELECT
-                timestamp as time,
-                CAST(open as FLOAT) as open,
-                CAST(high as FLOAT) as high,
-                CAST(low as FLOAT) as low,
-                CAST(close as FLOAT) as close,
-                volume
-            FROM ohlc_data
-            WHERE symbol = ? AND interval = ?
-            ORDER BY timestamp DESC
-            LIMIT ?
-        """
-        logger.debug(f'Querying DB at {db_path} with symbol={symbol} interval={interval} limit={limit}')
+        from database.ohlc_db import get_candles
+
+        logger.debug(f'Querying candle store with symbol={symbol} interval={interval} limit={limit}')
+        return get_candles(symbol, interval, limit=limit)
 
-        cur.execute(query, (symbol, interval, limit))
-        rows = cur.fetchall()
-        conn.close()
-        
-        if not rows:
-            return []
-        
-        data = [dict(row) for row in rows]
-        data.reverse()
-        return data
-    
     except Exception as e:
-        logger.debug(f'Database query error (expected if no ohlc_data table): {str(e)}')
+        logger.debug(f'Candle store query error: {str(e)}')
         return []
 
     logger.info(f'get_candles_from_fyers called for symbol={symbol} interval={interval} limit={limit}')
 
+# Map interval to Fyers resolution in minutes
+FYERS_RESOLUTION_MINUTES = {
+    '1': 1,
+    '5': 5,
+    '15': 15,
+    '30': 30,
+    '60': 60,
+    '240': 240,
+    '1D': 1440,
+    'D': 1440,
+    'W': 10080,
+    'M': 43200
+}
+
+# Longest range Fyers serves per history request (days)
+FYERS_MAX_DAYS_INTRADAY = 100
+FYERS_MAX_DAYS_DAILY = 366
+
 def get_candles_from_fyers(symbol, interval, limit):
-    """Fetch OHLC data from Fyers broker API."""
+    """
+    Fetch OHLC data for the last `limit` bars through the local candle cache.
+
+    Only the part of the window not already stored is requested from Fyers;
+    fetched bars are written back to the store. Higher timeframes are built
+    from stored 1 minute (or daily, for W/M) bars, so switching interval on a
+    chart does not call Fyers again.
+    """
+    try:
+        from services.candle_cache_service import OHLC_CACHE_ENABLED, get_cached_candles
+        from services.candle_resampler import base_interval, can_derive, get_resampled_candles
+
+        resolution = FYERS_RESOLUTION_MINUTES.get(str(interval).upper(), 5)
+        end_time = int(time.time())
+        start_time = end_time - (limit * resolution * 60)
+
+        if not OHLC_CACHE_ENABLED:
+            return (fetch_fyers_range(symbol, interval, start_time, end_time) or [])[-limit:]
+
+        if can_derive(interval, start_time, end_time):
+            base = base_interval(interval)
+            data = get_resampled_candles(
+                symbol, interval, start_time, end_time,
+                lambda range_from, range_to: fetch_fyers_range(symbol, base, range_from, range_to)
+            )
+        else:
+            data = get_cached_candles(
+                symbol, interval, start_time, end_time,
+                lambda range_from, range_to: fetch_fyers_range(symbol, interval, range_from, range_to)
+            )
+        logger.info(f'Candle cache returned {len(data)} candles for {symbol}')
+        return data[-limit:]
+
+    except Exception as e:
+        logger.error(f'Fyers candle cache error: {str(e)}')
+        return []
+
+def fetch_fyers_range(symbol, interval, range_from, range_to):
+    """
+    Fetch [range_from, range_to] from Fyers in pieces no longer than one history request allows.
+
+    Returns a list of candles, or None if any request failed.
+    """
+    max_days = FYERS_MAX_DAYS_DAILY if FYERS_RESOLUTION_MINUTES.get(str(interval).upper(), 5) >= 1440 else FYERS_MAX_DAYS_INTRADAY
+    step = max_days * 86400
+    data = []
+    for chunk_from in range(int(range_from), int(range_to) + 1, step):
+        candles = fetch_fyers_candles(symbol, interval, chunk_from, min(chunk_from + step - 1, int(range_to)))
+        if candles is None:
+            return None
+        data.extend(candles)
+    return data
+
+def fetch_fyers_candles(symbol, interval, range_from, range_to):
+    """
+    Fetch OHLC data for [range_from, range_to] (unix seconds) from Fyers broker API.
+
+    Returns a list of candles, or None if the request failed.
+    """
     try:
         # Ensure requests is available
         try:
             import requests
         except ImportError:
             logger.error('requests library not installed')
-            return []
+            return None
         
         # Get token from environment
         token = os.getenv('FYERS_ACCESS_TOKEN')
         if not token or ':' not in token:
             logger.warning('FYERS_ACCESS_TOKEN not configured properly')
-            return []
+            return None
         
         # Parse token
         try:
             client_id, jwt_token = token.split(':', 1)
         except:
             logger.error('Invalid FYERS_ACCESS_TOKEN format (should be client_id:jwt_token)')
-            return []
+            return None
         
         # Fyers API endpoint for historical data
         url = "https://api.fyers.in/api/v3/history"
-
-
-
-        
-        # Map interval to Fyers resolution format
-        interval_map = {
-            '1': 1,
-            '5': 5,
-            '15': 15,
-            '30': 30,
-            '60': 60,
-            '240': 240,
-            '1D': 1440,
-            'D': 1440,
-            'W': 10080,
-            'M': 43200
-        }
-        
-        resolution = interval_map.get(str(interval).upper(), 5)
-        
-        # Calculate date range
-        end_time = int(datetime.now().timestamp())
-        start_time = end_time - (limit * resolution * 60)
         
         # Prepare request
         headers = {
@@ -261,8 +305,8 @@ def get_candles_from_fyers(symbol, interval, limit):
     "symbol": symbol,
     "resolution": str(interval),
     "date_format": 0,
-    "range_from": int(time.time()) - (limit * interval * 60),
-    "range_to": int(time.time()),
+    "range_from": int(range_from),
+    "range_to": int(range_to),
     "cont_flag": "1"
 }
 
@@ -277,19 +321,22 @@ def get_candles_from_fyers(symbol, interval, limit):
         
         if response.status_code != 200:
             logger.warning(f'Fyers API returned {response.status_code}: {response.text}')
-            return []
+            return None
         
         fyers_data = response.json()
         
         # Handle Fyers response
+        if fyers_data.get('s') not in (None, 'ok', 'no_data'):
+            logger.warning(f'Fyers history error: {fyers_data}')
+            return None
         if 'candles' not in fyers_data or not fyers_data['candles']:
-            logger.warning(f'No candles in Fyers response: {fyers_data}')
+            logger.info(f'No candles in Fyers response: {fyers_data}')
             return []
         
         candles = fyers_data.get('candles', [])
         data = []
         
-        for candle in candles[:limit]:
+        for candle in candles:
             if len(candle) >= 5:
                 data.append({
             'time': int(candle[0]),
@@ -306,10 +353,10 @@ def get_candles_from_fyers(symbol, interval, limit):
     
     except requests.exceptions.RequestException as e:
         logger.error(f'Fyers API request error: {str(e)}')
-        return []
+        return None
     except Exception as e:
         logger.error(f'Fyers API error: {str(e)}')
-        return []
+        return None
 
 @bp.route('/search', methods=['GET'])
 def search_symbols():
@@ -321,29 +368,12 @@ def search_symbols():
             return jsonify([]), 200
         
         results = []
-        index_path = os.path.join('config', 'instrument_index.json')
-        
-        if os.path.exists(index_path):
-            try:
-                with open(index_path, 'r', encoding='utf-8') as f:
-                    instruments = json.load(f)
-                    
-                for inst in instruments:
-                    symbol = inst.get('symbol', '').upper()
-                    name = inst.get('name', '').upper()
-                    
-                    if query in symbol or query in name:
-                        results.append({
-                            'symbol': inst.get('symbol'),
-                            'name': inst.get('name'),
-                            'type': inst.get('type', 'EQUITY')
-                        })
-                    
-                    if len(results) >= 25:
-                        break
-            
-            except json.JSONDecodeError as e:
-                logger.error(f'Invalid JSON in instrument index: {str(e)}')
+        try:
+            snapshot = instrument_index.get()
+            if snapshot is not None:
+                results = snapshot.search(query, limit=25)
+        except json.JSONDecodeError as e:
+            logger.error(f'Invalid JSON in instrument index: {str(e)}')
         
         # Fallback to database
         if len(results) == 0:
@@ -440,21 +470,38 @@ def get_signals():
 
 @bp.route('/instruments', methods=['GET'])
 def get_instruments():
-    """Get complete list of available trading instruments."""
+    """
+    Get the list of available trading instruments.
+
+    Without `page` the complete list is returned; `page` (1-based) and
+    `page_size` return one slice with paging metadata. Responses carry an ETag
+    of the index version and are gzip-compressed when the client accepts it.
+    """
     try:
-        index_path = os.path.join('config', 'instrument_index.json')
-        
-        if not os.path.exists(index_path):
+        page = request.args.get('page')
+        page_size = request.args.get('page_size')
+        try:
+            page = int(page) if page is not None else None
+            page_size = int(page_size) if page_size is not None else INSTRUMENTS_PAGE_SIZE
+        except ValueError:
+            return jsonify({'error': 'page and page_size must be integers'}), 400
+        if (page is not None and page < 1) or not 1 <= page_size <= INSTRUMENTS_MAX_PAGE_SIZE:
+            return jsonify({'error': f'page must be >= 1 and page_size between 1 and {INSTRUMENTS_MAX_PAGE_SIZE}'}), 400
+        
+        snapshot = instrument_index.get()
+        if snapshot is None:
             return jsonify({'error': 'Instruments not indexed yet'}), 404
         
-        with open(index_path, 'r', encoding='utf-8') as f:
-            instruments = json.load(f)
+        accepts_gzip = 'gzip' in request.accept_encodings
+        body, etag, gzipped = snapshot.page(page, page_size, accepts_gzip)
         
-        return jsonify({
-            'status': 'success',
-            'count': len(instruments),
-            'instruments': instruments
-        }), 200
+        response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add('Accept-Encoding')
+        if gzipped:
+            response.headers['Content-Encoding'] = 'gzip'
+        return response.make_conditional(request)
     
     except json.JSONDecodeError as e:
         logger.error(f'Invalid JSON in instrument index: {str(e)}')
@@ -466,6 +513,15 @@ def get_instruments():
 # WebSocket support (optional, requires socketio)
 try:
     from extensions import socketio
+    from flask import session
+    from flask_socketio import join_room, leave_room
+
+    from .live_candles import aggregator, room_name, subscribe_instrument, unsubscribe_instrument
+
+    def _release_instruments(releases):
+        """Stop broker streams no chart room needs any more, through the client that started them"""
+        for instrument, (username, broker) in releases:
+            unsubscribe_instrument(username, broker, instrument)
     
     @socketio.on('connect')
     def handle_connect():
@@ -477,30 +533,47 @@ try:
     def handle_disconnect(reason):
         """Handle WebSocket client disconnection."""
         logger.info(f'[WebSocket] Client disconnected ({reason})')
+        _release_instruments(aggregator.leave_all(request.sid))
     
     @socketio.on('subscribe')
     def handle_subscribe(data):
-        """Subscribe to live data for a symbol."""
+        """Join the live candle room of a symbol and interval."""
         try:
             symbol = data.get('symbol')
-            interval = data.get('interval', 5)
+            interval = str(data.get('interval', 5))
             
             if not symbol:
                 return {'error': 'Symbol required'}
             
+            instrument = aggregator.join(request.sid, symbol, interval)
+            join_room(room_name(symbol, interval))
+            live = True
+            if instrument:
+                # First chart on this instrument: stream it through the WebSocket proxy
+                owner = (session.get('user'), session.get('broker'))
+                live = subscribe_instrument(owner[0], owner[1], instrument)
+                released = aggregator.subscribed(instrument, owner, live)
+                if released:
+                    _release_instruments([(instrument, released)])
+            
             logger.info(f'[WebSocket] Subscribed to {symbol} ({interval}m)')
-            return {'status': 'subscribed', 'symbol': symbol}
+            return {'status': 'subscribed', 'symbol': symbol, 'room': room_name(symbol, interval), 'live': live}
         
+        except ValueError as e:
+            return {'error': str(e)}
         except Exception as e:
             logger.error(f'WebSocket subscribe error: {str(e)}')
             return {'error': str(e)}
     
     @socketio.on('unsubscribe')
     def handle_unsubscribe(data):
-        """Unsubscribe from live data."""
+        """Leave the live candle room of a symbol and interval."""
         try:
             symbol = data.get('symbol')
             if symbol:
+                interval = str(data.get('interval', 5))
+                leave_room(room_name(symbol, interval))
+                _release_instruments(filter(None, [aggregator.leave(request.sid, symbol, interval)]))
                 logger.info(f'[WebSocket] Unsubscribed from {symbol}')
             return {'status': 'unsubscribed'}
         
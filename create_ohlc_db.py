@@ -1,26 +1,12 @@
-import sqlite3, os
+"""
+Create the local OHLC candle store (db/ohlc_data.db, or OHLC_DB_PATH).
 
-db_dir = 'db'  # relative to project root
-db_path = os.path.join(db_dir, 'ohlc_data.db')  # name it as you like
+Bars from an older ohlc_data table in the same file are copied into the
+candles table on first run.
+"""
+from database.ohlc_db import get_candle_store
 
-os.makedirs(db_dir, exist_ok=True)
-conn = sqlite3.connect(db_path)
-cur = conn.cursor()
+store = get_candle_store()
+store.init_db()
 
-cur.execute("""
-CREATE TABLE IF NOT EXISTS ohlc_data (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    symbol TEXT NOT NULL,
-    interval TEXT NOT NULL,
-    timestamp INTEGER NOT NULL,
-    open REAL NOT NULL,
-    high REAL NOT NULL,
-    low REAL NOT NULL,
-    close REAL NOT NULL,
-    volume REAL
-)
-""")
-conn.commit()
-conn.close()
-
-print("Created OHLC DB at", db_path)
+print("Created OHLC DB at", store.path)
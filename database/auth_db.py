@@ -1,8 +1,12 @@
 # database/auth_db.py
 
 import os
+import hmac
+import time
 import base64
-from sqlalchemy import create_engine, UniqueConstraint
+import hashlib
+import threading
+from sqlalchemy import create_engine, UniqueConstraint, inspect, text
 from sqlalchemy.orm import scoped_session, sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean
@@ -15,6 +19,7 @@ from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from utils.logging import get_logger
+from database.shared_cache import UserCache, registry as cache_registry
 
 # Initialize logger
 logger = get_logger(__name__)
@@ -77,19 +82,29 @@ def get_session_based_cache_ttl():
         logger.warning(f"Could not calculate session-based cache TTL, using 5-minute default: {e}")
         return 300  # Fallback to 5 minutes
 
+# User caches are shared between workers (see database/shared_cache.py); entries are
+# tagged with their user so a credential change invalidates only that user's entries.
+# Shared values are encrypted with the Fernet key above.
 # Define auth token cache with TTL until session expiry to minimize DB hits
-auth_cache = TTLCache(maxsize=1024, ttl=get_session_based_cache_ttl())
+auth_cache = UserCache('auth', maxsize=1024, ttl=get_session_based_cache_ttl(),
+                       registry=cache_registry, cipher=fernet)
 # Define feed token cache with same TTL
-feed_token_cache = TTLCache(maxsize=1024, ttl=get_session_based_cache_ttl())
+feed_token_cache = UserCache('feed', maxsize=1024, ttl=get_session_based_cache_ttl(),
+                             registry=cache_registry, cipher=fernet)
 # Define a cache for broker names with a 5-minute TTL (longer since broker rarely changes)
-broker_cache = TTLCache(maxsize=1024, ttl=3000)
+broker_cache = UserCache('broker', maxsize=1024, ttl=3000, registry=cache_registry, cipher=fernet)
 # Define a cache for verified API keys with 24-hour TTL
 # Security: Only caches user_id (not sensitive), invalidated on key regeneration
 # Long TTL is safe because cache is invalidated when keys are regenerated
-verified_api_key_cache = TTLCache(maxsize=1024, ttl=36000)  # 10 hours
+verified_api_key_cache = UserCache('api_key', maxsize=1024, ttl=36000,  # 10 hours
+                                   registry=cache_registry, cipher=fernet)
 # Define a cache for invalid API keys with shorter 5-minute TTL (prevent cache poisoning)
+# Kept per process: rejected keys belong to no user
 invalid_api_key_cache = TTLCache(maxsize=512, ttl=300)  # 5 minutes
 
+# Caches holding a user's broker session, refreshed on login and logout
+AUTH_CACHE_NAMESPACES = ('auth', 'feed', 'broker')
+
 # Conditionally create engine based on DB type
 if DATABASE_URL and 'sqlite' in DATABASE_URL:
     # SQLite: Use NullPool to prevent connection pool exhaustion
@@ -128,11 +143,32 @@ class ApiKeys(Base):
     user_id = Column(String, nullable=False, unique=True)
     api_key_hash = Column(Text, nullable=False)  # For verification
     api_key_encrypted = Column(Text, nullable=False)  # For retrieval
+    # HMAC-SHA256 of the key with the pepper, to find the row without trying every hash
+    api_key_fingerprint = Column(String(64), nullable=True, index=True)
     created_at = Column(DateTime(timezone=True), default=func.now())
 
 def init_db():
     from database.db_init_helper import init_db_with_logging
     init_db_with_logging(Base, engine, "Auth DB", logger)
+    ensure_api_key_fingerprint_column()
+
+def ensure_api_key_fingerprint_column():
+    """
+    Add the api_key_fingerprint column to api_keys tables created before it existed.
+    Existing rows are fingerprinted on their next successful verification, or all at
+    once by upgrade/migrate_api_key_fingerprint.py.
+    """
+    try:
+        columns = [col['name'] for col in inspect(engine).get_columns('api_keys')]
+        if columns and 'api_key_fingerprint' not in columns:
+            with engine.begin() as conn:
+                conn.execute(text("ALTER TABLE api_keys ADD COLUMN api_key_fingerprint VARCHAR(64)"))
+                conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_api_keys_api_key_fingerprint ON api_keys (api_key_fingerprint)"
+                ))
+            logger.info("Added api_key_fingerprint column to api_keys")
+    except Exception as e:
+        logger.warning(f"Could not add api_key_fingerprint column: {e}")
 
 def encrypt_token(token):
     """Encrypt auth token"""
@@ -162,22 +198,22 @@ def upsert_auth(name, auth_token, broker, feed_token=None, user_id=None, revoke=
         auth_obj.broker = broker
         auth_obj.user_id = user_id
         auth_obj.is_revoked = revoke
-        
-        # Clear cache entries when revoking
-        if revoke:
-            cache_key_auth = f"auth-{name}"
-            cache_key_feed = f"feed-{name}"
-            if cache_key_auth in auth_cache:
-                del auth_cache[cache_key_auth]
-            if cache_key_feed in feed_token_cache:
-                del feed_token_cache[cache_key_feed]
-            logger.info(f"Cleared cache entries for revoked tokens of user: {name}")
     else:
         auth_obj = Auth(name=name, auth=encrypted_token, feed_token=encrypted_feed_token, broker=broker, user_id=user_id, is_revoked=revoke)
         db_session.add(auth_obj)
     db_session.commit()
+
+    # New or revoked tokens: drop this user's cached session in every worker
+    cache_registry.invalidate_user(name, AUTH_CACHE_NAMESPACES)
+    if revoke:
+        logger.info(f"Cleared cache entries for revoked tokens of user: {name}")
     return auth_obj.id
 
+def _cached_auth(auth_obj):
+    """Cache entry for an Auth row (tokens stay encrypted)"""
+    return {'auth': auth_obj.auth, 'feed_token': auth_obj.feed_token, 'broker': auth_obj.broker,
+            'is_revoked': bool(auth_obj.is_revoked)}
+
 def get_auth_token(name):
     """Get decrypted auth token"""
     # Handle None or empty name gracefully
@@ -186,17 +222,17 @@ def get_auth_token(name):
         return None
         
     cache_key = f"auth-{name}"
-    if cache_key in auth_cache:
-        auth_obj = auth_cache[cache_key]
-        if isinstance(auth_obj, Auth) and not auth_obj.is_revoked:
-            return decrypt_token(auth_obj.auth)
+    cached = auth_cache.get(cache_key)
+    if cached is not None:
+        if isinstance(cached, dict) and not cached['is_revoked']:
+            return decrypt_token(cached['auth'])
         else:
             del auth_cache[cache_key]
             return None
     else:
         auth_obj = get_auth_token_dbquery(name)
         if isinstance(auth_obj, Auth) and not auth_obj.is_revoked:
-            auth_cache[cache_key] = auth_obj
+            auth_cache.set(cache_key, _cached_auth(auth_obj), user=name)
             return decrypt_token(auth_obj.auth)
         return None
 
@@ -227,17 +263,17 @@ def get_feed_token(name):
         return None
         
     cache_key = f"feed-{name}"
-    if cache_key in feed_token_cache:
-        auth_obj = feed_token_cache[cache_key]
-        if isinstance(auth_obj, Auth) and not auth_obj.is_revoked:
-            return decrypt_token(auth_obj.feed_token) if auth_obj.feed_token else None
+    cached = feed_token_cache.get(cache_key)
+    if cached is not None:
+        if isinstance(cached, dict) and not cached['is_revoked']:
+            return decrypt_token(cached['feed_token']) if cached['feed_token'] else None
         else:
             del feed_token_cache[cache_key]
             return None
     else:
         auth_obj = get_feed_token_dbquery(name)
         if isinstance(auth_obj, Auth) and not auth_obj.is_revoked:
-            feed_token_cache[cache_key] = auth_obj
+            feed_token_cache.set(cache_key, _cached_auth(auth_obj), user=name)
             return decrypt_token(auth_obj.feed_token) if auth_obj.feed_token else None
         return None
 
@@ -282,15 +318,53 @@ def invalidate_user_cache(user_id):
     """
     Invalidate all cached data for a user when their credentials change.
     Security: Ensures old API keys/tokens are not usable after regeneration.
+    Only this user's entries are dropped, in this and every other worker.
     """
-    # Clear all caches that might contain this user's data
-    auth_cache.clear()
-    broker_cache.clear()
-    feed_token_cache.clear()
-    verified_api_key_cache.clear()
-    invalid_api_key_cache.clear()
+    cache_registry.invalidate_user(user_id)
     logger.info(f"Cleared all caches for user_id: {user_id}")
 
+def api_key_fingerprint(api_key):
+    """Keyed fingerprint of an API key used to look up its row (HMAC-SHA256 with the pepper)"""
+    return hmac.new(PEPPER.encode(), api_key.encode(), hashlib.sha256).hexdigest()
+
+# Outcome counts and timings of verify_api_key
+_verify_stats_lock = threading.Lock()
+_verify_stats = {
+    path: {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+    for path in ('cache_hit', 'invalid_cache', 'fingerprint', 'legacy_scan', 'rejected')
+}
+
+def _record_verify(path, started):
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    with _verify_stats_lock:
+        entry = _verify_stats[path]
+        entry['count'] += 1
+        entry['total_ms'] += elapsed_ms
+        if elapsed_ms > entry['max_ms']:
+            entry['max_ms'] = elapsed_ms
+
+def get_api_key_verify_stats():
+    """
+    Count and time per API key verification outcome:
+    cache_hit, invalid_cache, fingerprint (one Argon2 verify),
+    legacy_scan (row without a fingerprint) and rejected.
+    """
+    with _verify_stats_lock:
+        return {
+            path: {
+                'count': entry['count'],
+                'avg_ms': round(entry['total_ms'] / entry['count'], 3) if entry['count'] else 0.0,
+                'max_ms': round(entry['max_ms'], 3)
+            }
+            for path, entry in _verify_stats.items()
+        }
+
+def reset_api_key_verify_stats():
+    """Reset the verification counters"""
+    with _verify_stats_lock:
+        for entry in _verify_stats.values():
+            entry.update(count=0, total_ms=0.0, max_ms=0.0)
+
 def upsert_api_key(user_id, api_key):
     """Store both hashed and encrypted API key"""
     # Hash with Argon2 for verification
@@ -299,22 +373,27 @@ def upsert_api_key(user_id, api_key):
 
     # Encrypt for retrieval
     encrypted_key = encrypt_token(api_key)
+    fingerprint = api_key_fingerprint(api_key)
 
     api_key_obj = ApiKeys.query.filter_by(user_id=user_id).first()
     if api_key_obj:
         api_key_obj.api_key_hash = hashed_key
         api_key_obj.api_key_encrypted = encrypted_key
+        api_key_obj.api_key_fingerprint = fingerprint
     else:
         api_key_obj = ApiKeys(
             user_id=user_id,
             api_key_hash=hashed_key,
-            api_key_encrypted=encrypted_key
+            api_key_encrypted=encrypted_key,
+            api_key_fingerprint=fingerprint
         )
         db_session.add(api_key_obj)
     db_session.commit()
 
     # Security: Invalidate all caches when API key changes
     invalidate_user_cache(user_id)
+    # The new key may have been tried (and rejected) before it was stored
+    invalid_api_key_cache.pop(hashlib.sha256(api_key.encode()).hexdigest(), None)
 
     return api_key_obj.id
 
@@ -348,11 +427,16 @@ def verify_api_key(provided_api_key):
     - Invalid keys cached for 5min (prevents brute force)
     - Valid keys cached for 1hr (balances security vs performance)
     - Cache invalidated on key regeneration
+
+    On a cache miss the row is found by its keyed fingerprint and verified with
+    a single Argon2 check. Rows stored before fingerprints existed are tried one
+    by one and fingerprinted once they match.
     """
     from flask import request, has_request_context
     from utils.ip_helper import get_real_ip
     from database.traffic_db import InvalidAPIKeyTracker
-    import hashlib
+
+    started = time.perf_counter()
 
     # Generate secure cache key (SHA256 hash of API key)
     # Security: Never store plaintext API key in cache
@@ -361,35 +445,49 @@ def verify_api_key(provided_api_key):
     # Step 1: Check invalid cache first (fast rejection of known bad keys)
     if cache_key in invalid_api_key_cache:
         logger.debug(f"API key rejected from invalid cache")
+        _record_verify('invalid_cache', started)
         return None
 
     # Step 2: Check valid cache (fast path for legitimate requests)
-    if cache_key in verified_api_key_cache:
-        user_id = verified_api_key_cache[cache_key]
+    user_id = verified_api_key_cache.get(cache_key)
+    if user_id is not None:
         logger.debug(f"API key verified from cache for user_id: {user_id}")
+        _record_verify('cache_hit', started)
         return user_id
 
-    # Step 3: Cache miss - perform expensive Argon2 verification
+    # Step 3: Cache miss - look up the row by fingerprint, then one Argon2 verification
     peppered_key = provided_api_key + PEPPER
+    fingerprint = api_key_fingerprint(provided_api_key)
     try:
-        # Query all API keys
-        api_keys = ApiKeys.query.all()
-
-        # Try to verify against each stored hash
-        for api_key_obj in api_keys:
+        api_key_obj = ApiKeys.query.filter_by(api_key_fingerprint=fingerprint).first()
+        if api_key_obj:
             try:
                 ph.verify(api_key_obj.api_key_hash, peppered_key)
-                # Valid key found - cache it
-                verified_api_key_cache[cache_key] = api_key_obj.user_id
+                verified_api_key_cache.set(cache_key, api_key_obj.user_id, user=api_key_obj.user_id)
                 logger.debug(f"API key verified and cached for user_id: {api_key_obj.user_id}")
+                _record_verify('fingerprint', started)
                 return api_key_obj.user_id
             except VerifyMismatchError:
-                continue
+                pass
+        else:
+            # Step 4: Keys stored before fingerprints were added
+            for api_key_obj in ApiKeys.query.filter(ApiKeys.api_key_fingerprint.is_(None)).all():
+                try:
+                    ph.verify(api_key_obj.api_key_hash, peppered_key)
+                except VerifyMismatchError:
+                    continue
+                api_key_obj.api_key_fingerprint = fingerprint
+                db_session.commit()
+                verified_api_key_cache.set(cache_key, api_key_obj.user_id, user=api_key_obj.user_id)
+                logger.info(f"API key fingerprint backfilled for user_id: {api_key_obj.user_id}")
+                _record_verify('legacy_scan', started)
+                return api_key_obj.user_id
 
         # If we reach here, the API key is invalid
         # Cache the invalid result to prevent repeated expensive verifications
         invalid_api_key_cache[cache_key] = True
         logger.debug(f"Invalid API key cached")
+        _record_verify('rejected', started)
 
         # Track the invalid attempt
         try:
@@ -400,7 +498,7 @@ def verify_api_key(provided_api_key):
                 client_ip = '127.0.0.1'
 
             # Hash the API key for tracking (don't store plaintext)
-            api_key_hash = hashlib.sha256(provided_api_key.encode()).hexdigest()[:16]
+            api_key_hash = cache_key[:16]
 
             # Track the invalid API key attempt
             InvalidAPIKeyTracker.track_invalid_api_key(client_ip, api_key_hash)
@@ -410,6 +508,7 @@ def verify_api_key(provided_api_key):
 
         return None
     except Exception as e:
+        db_session.rollback()
         logger.error(f"Error verifying API key: {e}")
         return None
 
@@ -419,9 +518,11 @@ def get_username_by_apikey(provided_api_key):
 
 def get_broker_name(provided_api_key):
     """Get only the broker name for a valid API key with caching"""
-    # Check if broker name is in cache
-    if provided_api_key in broker_cache:
-        return broker_cache[provided_api_key]
+    # Check if broker name is in cache (keyed by the key's hash, never the plaintext key)
+    cache_key = hashlib.sha256(provided_api_key.encode()).hexdigest()
+    broker = broker_cache.get(cache_key)
+    if broker is not None:
+        return broker
     
     # Not in cache, need to look it up
     user_id = verify_api_key(provided_api_key)
@@ -431,7 +532,7 @@ def get_broker_name(provided_api_key):
             auth_obj = Auth.query.filter_by(name=user_id).first()
             if auth_obj and not auth_obj.is_revoked:
                 # Cache the broker name
-                broker_cache[provided_api_key] = auth_obj.broker
+                broker_cache.set(cache_key, auth_obj.broker, user=user_id)
                 return auth_obj.broker
             else:
                 logger.warning(f"No valid broker found for user_id '{user_id}'.")
@@ -450,14 +551,13 @@ def get_auth_token_broker(provided_api_key, include_feed_token=False):
     - Cache cleared on credential changes
     - TTL based on session expiry time
     """
-    import hashlib
-
     # Generate cache key
     cache_key = f"{hashlib.sha256(provided_api_key.encode()).hexdigest()}_{include_feed_token}"
 
     # Check cache first (but still verify revocation status)
-    if cache_key in auth_cache:
-        cached_result = auth_cache[cache_key]
+    cached_result = auth_cache.get(cache_key)
+    if cached_result is not None:
+        cached_result = tuple(cached_result)
         # Security: Still check if auth is revoked even with cached data
         user_id = verify_api_key(provided_api_key)
         if user_id:
@@ -491,7 +591,7 @@ def get_auth_token_broker(provided_api_key, include_feed_token=False):
                     result = (decrypted_token, auth_obj.broker)
 
                 # Cache the result
-                auth_cache[cache_key] = result
+                auth_cache.set(cache_key, list(result), user=user_id)
                 logger.debug(f"Auth token cached for user_id: {user_id}")
                 return result
             else:
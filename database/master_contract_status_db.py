@@ -165,4 +165,35 @@ def check_if_ready(broker):
         logger.error(f"Error checking if ready for {broker}: {str(e)}")
         return False
     finally:
-        session.close()
\ No newline at end of file
+        session.close()
+
+def get_contract_timestamp(broker):
+    """Get the completion time of the last successful master contract download for a broker"""
+    session = SessionLocal()
+    try:
+        status = session.query(MasterContractStatus).filter_by(broker=broker).first()
+        if status and status.is_ready:
+            return status.last_updated
+        return None
+    except Exception as e:
+        logger.error(f"Error getting contract timestamp for {broker}: {str(e)}")
+        return None
+    finally:
+        session.close()
+
+def get_latest_ready_broker():
+    """Get the broker whose master contract download completed most recently"""
+    session = SessionLocal()
+    try:
+        status = (
+            session.query(MasterContractStatus)
+            .filter_by(is_ready=True)
+            .order_by(MasterContractStatus.last_updated.desc())
+            .first()
+        )
+        return status.broker if status else None
+    except Exception as e:
+        logger.error(f"Error getting latest ready broker: {str(e)}")
+        return None
+    finally:
+        session.close()
@@ -0,0 +1,413 @@
+"""
+Local OHLC candle store
+
+Candles live in a single WITHOUT ROWID table whose primary key is
+(symbol, interval, ts), so rows are physically clustered by series and time.
+A range query for one symbol and interval is a single contiguous b-tree scan,
+and an upsert of a bar that already exists rewrites it in place.
+
+Alongside the bars, the store records coverage intervals per series: time
+ranges that were fetched completely from a broker. Callers ask for the missing
+ranges of a request and fetch only those, so repeated chart loads and history
+calls do not re-download bars that are already on disk.
+
+The database runs in WAL mode: chart reads never block on the writer. Each
+thread keeps one read-only connection for its lifetime, and writes go through a
+single connection guarded by a lock.
+
+Timestamps are unix seconds (bar open time).
+"""
+
+import os
+import re
+import math
+import time
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Separate SQLite file for candles (same file create_ohlc_db.py creates)
+OHLC_DB_PATH = os.getenv('OHLC_DB_PATH', os.path.join('db', 'ohlc_data.db'))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS candles (
+    symbol TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    open REAL NOT NULL,
+    high REAL NOT NULL,
+    low REAL NOT NULL,
+    close REAL NOT NULL,
+    volume REAL NOT NULL DEFAULT 0,
+    oi REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (symbol, interval, ts)
+) WITHOUT ROWID
+"""
+
+_COVERAGE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS candle_coverage (
+    symbol TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    start_ts INTEGER NOT NULL,
+    end_ts INTEGER NOT NULL,
+    PRIMARY KEY (symbol, interval, start_ts)
+) WITHOUT ROWID
+"""
+
+_UPSERT = """
+INSERT INTO candles (symbol, interval, ts, open, high, low, close, volume, oi)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (symbol, interval, ts) DO UPDATE SET
+    open = excluded.open,
+    high = excluded.high,
+    low = excluded.low,
+    close = excluded.close,
+    volume = excluded.volume,
+    oi = excluded.oi
+"""
+
+# Row as accepted by upsert: a bar dict or a (ts, open, high, low, close[, volume[, oi]]) sequence
+Candle = Union[Dict[str, Any], Sequence[Any]]
+
+# Interval strings: '1', '5' (minutes, chart format), '5s', '5m', '1h', 'D', '1D', 'W', 'M'
+_INTERVAL_PATTERN = re.compile(r'^(\d*)([SMHDW]?)$')
+_UNIT_SECONDS = {'S': 1, 'M': 60, 'H': 3600, 'D': 86400, 'W': 604800}
+
+
+def interval_seconds(interval: str) -> int:
+    """
+    Length of one bar in seconds
+
+    Bare numbers are minutes (chart resolution format). 'M' on its own is a
+    month (approximated as 30 days); with a number it means minutes.
+    """
+    text = str(interval).strip()
+    if text == 'M':
+        return 30 * 86400
+    match = _INTERVAL_PATTERN.match(text.upper())
+    if not match or not (match.group(1) or match.group(2)):
+        raise ValueError(f"Unsupported interval: {interval}")
+    count = int(match.group(1) or 1)
+    return count * _UNIT_SECONDS[match.group(2) or 'M']
+
+
+def _count(value: Any) -> float:
+    """Volume or open interest; missing and NaN (pandas gaps) are stored as 0"""
+    if value is None:
+        return 0.0
+    value = float(value)
+    return 0.0 if math.isnan(value) else value
+
+
+def _value(candle: Sequence[Any], index: int) -> float:
+    return _count(candle[index]) if len(candle) > index else 0.0
+
+
+def _to_row(symbol: str, interval: str, candle: Candle) -> Tuple:
+    if isinstance(candle, dict):
+        ts = candle.get('time', candle.get('timestamp'))
+        return (symbol, interval, int(ts), float(candle['open']), float(candle['high']),
+                float(candle['low']), float(candle['close']),
+                _count(candle.get('volume')), _count(candle.get('oi')))
+    return (symbol, interval, int(candle[0]), float(candle[1]), float(candle[2]),
+            float(candle[3]), float(candle[4]), _value(candle, 5), _value(candle, 6))
+
+
+class CandleStore:
+    """OHLC candles in one SQLite file"""
+
+    def __init__(self, path: str = OHLC_DB_PATH):
+        self.path = path
+        self._write_lock = threading.Lock()
+        self._writer: Optional[sqlite3.Connection] = None
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+
+    # Connections
+
+    def _writer_connection(self) -> sqlite3.Connection:
+        """Write connection; caller holds the write lock"""
+        if self._writer is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(_SCHEMA)
+            conn.execute(_COVERAGE_SCHEMA)
+            self._migrate_schema(conn)
+            conn.commit()
+            self._writer = conn
+        return self._writer
+
+    def _reader(self) -> sqlite3.Connection:
+        """Read-only connection owned by the calling thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if self._writer is None:
+                # Make sure the file and schema exist before the first read
+                with self._write_lock:
+                    self._writer_connection()
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute('PRAGMA query_only=ON')
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    def _migrate_schema(self, conn: sqlite3.Connection):
+        """Add columns missing from older files and import the legacy ohlc_data table"""
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(candles)')}
+        if 'oi' not in columns:
+            conn.execute('ALTER TABLE candles ADD COLUMN oi REAL NOT NULL DEFAULT 0')
+
+        # Copy bars from the old ohlc_data table (id, symbol, interval, timestamp, ...) once
+        legacy = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ohlc_data'"
+        ).fetchone()
+        if not legacy or conn.execute('SELECT 1 FROM candles LIMIT 1').fetchone():
+            return
+        copied = conn.execute("""
+            INSERT OR IGNORE INTO candles (symbol, interval, ts, open, high, low, close, volume)
+            SELECT symbol, interval, timestamp, open, high, low, close, COALESCE(volume, 0)
+            FROM ohlc_data
+        """).rowcount
+        if copied:
+            logger.info(f"OHLC DB: Migrated {copied} bars from legacy ohlc_data table")
+
+    def init_db(self):
+        """Create the database file and schema"""
+        with self._write_lock:
+            self._writer_connection()
+        logger.debug(f"OHLC DB: Verified candles table at {self.path}")
+
+    def close(self):
+        """Close every connection held by the store"""
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        with self._readers_lock:
+            for conn in self._readers:
+                try:
+                    conn.close()
+                except sqlite3.ProgrammingError:
+                    pass
+            self._readers.clear()
+        self._local = threading.local()
+
+    # Writes
+
+    def upsert_candles(self, symbol: str, interval: str, candles: Iterable[Candle]) -> int:
+        """
+        Insert or replace bars of one series in a single transaction
+
+        Args:
+            symbol: Symbol as used by the caller (e.g. 'NSE:SBIN-EQ' or 'SBIN')
+            interval: Interval string (e.g. '1', '5', 'D')
+            candles: Bar dicts with time/timestamp, open, high, low, close, volume, oi,
+                     or (ts, open, high, low, close, volume, oi) sequences
+
+        Returns:
+            int: Number of bars written
+        """
+        rows = [_to_row(symbol, str(interval), candle) for candle in candles]
+        if not rows:
+            return 0
+        with self._write_lock:
+            conn = self._writer_connection()
+            with conn:
+                conn.executemany(_UPSERT, rows)
+        return len(rows)
+
+    def store_range(self, symbol: str, interval: str, start: int, end: int,
+                    candles: Iterable[Candle], now: Optional[float] = None) -> int:
+        """
+        Write bars fetched for [start, end] and record the range as covered
+
+        Coverage stops one bar before now: the latest bar is still forming and
+        must be fetched again on the next request.
+
+        Returns:
+            int: Number of bars written
+        """
+        interval = str(interval)
+        rows = [_to_row(symbol, interval, candle) for candle in candles]
+        covered_end = min(int(end), int(now if now is not None else time.time()) - interval_seconds(interval))
+
+        with self._write_lock:
+            conn = self._writer_connection()
+            with conn:
+                if rows:
+                    conn.executemany(_UPSERT, rows)
+                if covered_end >= start:
+                    self._add_coverage(conn, symbol, interval, int(start), covered_end)
+        return len(rows)
+
+    @staticmethod
+    def _add_coverage(conn: sqlite3.Connection, symbol: str, interval: str, start: int, end: int):
+        """Merge [start, end] with the overlapping or adjacent coverage intervals"""
+        overlapping = conn.execute(
+            'SELECT start_ts, end_ts FROM candle_coverage '
+            'WHERE symbol = ? AND interval = ? AND start_ts <= ? AND end_ts >= ?',
+            (symbol, interval, end + 1, start - 1)
+        ).fetchall()
+        if overlapping:
+            start = min(start, min(row[0] for row in overlapping))
+            end = max(end, max(row[1] for row in overlapping))
+            conn.executemany(
+                'DELETE FROM candle_coverage WHERE symbol = ? AND interval = ? AND start_ts = ?',
+                [(symbol, interval, row[0]) for row in overlapping]
+            )
+        conn.execute(
+            'INSERT INTO candle_coverage (symbol, interval, start_ts, end_ts) VALUES (?, ?, ?, ?)',
+            (symbol, interval, start, end)
+        )
+
+    def delete_candles(self, symbol: str, interval: str,
+                       start: Optional[int] = None, end: Optional[int] = None) -> int:
+        """
+        Delete bars of one series, optionally limited to [start, end]
+
+        The coverage of the series is dropped as well, so the next request
+        fetches the deleted range again.
+        """
+        query, params = self._range_clause(symbol, interval, start, end)
+        with self._write_lock:
+            conn = self._writer_connection()
+            with conn:
+                conn.execute('DELETE FROM candle_coverage WHERE symbol = ? AND interval = ?',
+                             (symbol, str(interval)))
+                return conn.execute(f'DELETE FROM candles WHERE {query}', params).rowcount
+
+    # Reads
+
+    @staticmethod
+    def _range_clause(symbol: str, interval: str, start: Optional[int], end: Optional[int]):
+        query = 'symbol = ? AND interval = ?'
+        params: List[Any] = [symbol, str(interval)]
+        if start is not None:
+            query += ' AND ts >= ?'
+            params.append(int(start))
+        if end is not None:
+            query += ' AND ts <= ?'
+            params.append(int(end))
+        return query, params
+
+    def get_candles(self, symbol: str, interval: str, start: Optional[int] = None,
+                    end: Optional[int] = None, limit: Optional[int] = None,
+                    include_oi: bool = False) -> List[Dict[str, Any]]:
+        """
+        Bars of one series in ascending time order
+
+        Args:
+            start: First bar time to include (unix seconds)
+            end: Last bar time to include (unix seconds)
+            limit: Return at most this many bars, keeping the most recent ones
+            include_oi: Add the oi field to every bar
+
+        Returns:
+            list: Bars as {time, open, high, low, close, volume[, oi]} dicts
+        """
+        query, params = self._range_clause(symbol, interval, start, end)
+        sql = f'SELECT ts, open, high, low, close, volume, oi FROM candles WHERE {query} ORDER BY ts'
+        if limit is not None:
+            # Walk the index backwards from the newest bar and flip the page
+            sql += ' DESC LIMIT ?'
+            params.append(int(limit))
+
+        rows = self._reader().execute(sql, params).fetchall()
+        if limit is not None:
+            rows.reverse()
+        if include_oi:
+            return [
+                {'time': ts, 'open': o, 'high': h, 'low': l, 'close': c, 'volume': v, 'oi': oi}
+                for ts, o, h, l, c, v, oi in rows
+            ]
+        return [
+            {'time': ts, 'open': o, 'high': h, 'low': l, 'close': c, 'volume': v}
+            for ts, o, h, l, c, v, _ in rows
+        ]
+
+    def get_coverage(self, symbol: str, interval: str) -> List[Tuple[int, int]]:
+        """Covered [start, end] intervals of a series in ascending order"""
+        return self._reader().execute(
+            'SELECT start_ts, end_ts FROM candle_coverage WHERE symbol = ? AND interval = ? ORDER BY start_ts',
+            (symbol, str(interval))
+        ).fetchall()
+
+    def missing_ranges(self, symbol: str, interval: str, start: int, end: int) -> List[Tuple[int, int]]:
+        """Parts of [start, end] not covered by earlier fetches, as [start, end] pairs"""
+        gaps = []
+        cursor = int(start)
+        for covered_start, covered_end in self._reader().execute(
+            'SELECT start_ts, end_ts FROM candle_coverage '
+            'WHERE symbol = ? AND interval = ? AND start_ts <= ? AND end_ts >= ? ORDER BY start_ts',
+            (symbol, str(interval), int(end), int(start))
+        ):
+            if covered_start > cursor:
+                gaps.append((cursor, covered_start - 1))
+            cursor = max(cursor, covered_end + 1)
+        if cursor <= end:
+            gaps.append((cursor, int(end)))
+        return gaps
+
+    def get_time_range(self, symbol: str, interval: str) -> Optional[Tuple[int, int]]:
+        """(first, last) bar time of a series, or None if it has no bars"""
+        row = self._reader().execute(
+            'SELECT MIN(ts), MAX(ts) FROM candles WHERE symbol = ? AND interval = ?',
+            (symbol, str(interval))
+        ).fetchone()
+        return None if row[0] is None else (row[0], row[1])
+
+    def count(self, symbol: str, interval: str) -> int:
+        """Number of bars stored for a series"""
+        return self._reader().execute(
+            'SELECT COUNT(*) FROM candles WHERE symbol = ? AND interval = ?',
+            (symbol, str(interval))
+        ).fetchone()[0]
+
+
+_store: Optional[CandleStore] = None
+_store_lock = threading.Lock()
+
+
+def get_candle_store() -> CandleStore:
+    """Process-wide candle store for OHLC_DB_PATH"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = CandleStore()
+    return _store
+
+
+def init_db():
+    """Create the OHLC database and candles table"""
+    get_candle_store().init_db()
+
+
+def upsert_candles(symbol: str, interval: str, candles: Iterable[Candle]) -> int:
+    """Insert or replace bars of one series; returns 0 on error"""
+    try:
+        return get_candle_store().upsert_candles(symbol, interval, candles)
+    except (sqlite3.Error, KeyError, TypeError, ValueError) as e:
+        logger.error(f"Error storing candles for {symbol} {interval}: {e}")
+        return 0
+
+
+def get_candles(symbol: str, interval: str, start: Optional[int] = None,
+                end: Optional[int] = None, limit: Optional[int] = None,
+                include_oi: bool = False) -> List[Dict[str, Any]]:
+    """Bars of one series in ascending time order; returns an empty list on error"""
+    try:
+        return get_candle_store().get_candles(symbol, interval, start, end, limit, include_oi)
+    except sqlite3.Error as e:
+        logger.error(f"Error reading candles for {symbol} {interval}: {e}")
+        return []
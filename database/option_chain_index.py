@@ -0,0 +1,229 @@
+"""
+Option Chain Index
+Structured derivatives index over the columnar symbol store, built once per cache load.
+
+Every F&O contract in OpenAlgo symbol format (BASE + DDMMMYY + STRIKE + CE/PE, or
+BASE + DDMMMYY + FUT) is parsed once and indexed as:
+
+    (exchange, underlying) -> sorted expiries -> sorted strike array -> CE/PE row ids
+                           -> futures row per expiry
+
+so option lookup, expiry listing and chain enumeration are dictionary and bisect
+lookups instead of SQL pattern queries or per-call regex parsing.
+"""
+
+import re
+import sys
+from array import array
+from bisect import bisect_left
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from database.symbol_store import SymbolStore
+
+# Exchanges carrying futures and options contracts
+DERIVATIVE_EXCHANGES = ('NFO', 'BFO', 'MCX', 'CDS')
+
+# BASE + DDMMMYY + (STRIKE + CE/PE | FUT)
+_CONTRACT_PATTERN = re.compile(r'^(.+?)(\d{2}[A-Z]{3}\d{2})(?:(\d+(?:\.\d+)?)(CE|PE)|FUT)$')
+
+# Contract kinds stored per row
+KIND_NONE = 0
+KIND_FUT = 1
+KIND_CE = 2
+KIND_PE = 3
+
+_OPTION_KINDS = {'CE': KIND_CE, 'PE': KIND_PE}
+_KIND_NAMES = {KIND_FUT: 'FUT', KIND_CE: 'CE', KIND_PE: 'PE'}
+
+# Row id placeholder for a strike listed on one side only
+NO_ROW = -1
+
+
+def parse_expiry_code(code: str) -> Optional[date]:
+    """Parse a DDMMMYY expiry code (e.g. 28NOV24) into a date"""
+    try:
+        return datetime.strptime(code.upper(), '%d%b%y').date()
+    except ValueError:
+        return None
+
+
+def format_expiry_code(expiry: date) -> str:
+    """Format a date as a DDMMMYY expiry code (e.g. 28NOV24)"""
+    return expiry.strftime('%d%b%y').upper()
+
+
+class ExpiryChain:
+    """Options of one underlying and expiry, ordered by strike"""
+
+    __slots__ = ('expiry', 'label', 'strikes', 'ce', 'pe')
+
+    def __init__(self, expiry: date, label: str, legs: Dict[float, List[int]]):
+        self.expiry = expiry
+        self.label = label
+        ordered = sorted(legs)
+        self.strikes = array('d', ordered)
+        self.ce = array('i', (legs[strike][0] for strike in ordered))
+        self.pe = array('i', (legs[strike][1] for strike in ordered))
+
+    def position(self, strike: float) -> Optional[int]:
+        """Position of an exactly listed strike"""
+        i = bisect_left(self.strikes, strike)
+        if i < len(self.strikes) and abs(self.strikes[i] - strike) < 1e-9:
+            return i
+        return None
+
+    def row(self, position: int, option_type: str) -> Optional[int]:
+        """CE or PE row id at a strike position"""
+        legs = self.ce if option_type.upper() == 'CE' else self.pe
+        row = legs[position]
+        return None if row == NO_ROW else row
+
+
+class UnderlyingChain:
+    """All futures and option expiries of one underlying on one exchange"""
+
+    __slots__ = ('option_expiries', 'options', 'future_expiries', 'futures', 'labels')
+
+    def __init__(self):
+        self.option_expiries: List[date] = []
+        self.options: Dict[date, ExpiryChain] = {}
+        self.future_expiries: List[date] = []
+        self.futures: Dict[date, int] = {}
+        self.labels: Dict[date, str] = {}
+
+
+class OptionChainIndex:
+    """Derivatives index keyed by (exchange, underlying)"""
+
+    def __init__(self, store: SymbolStore):
+        self.store = store
+        strings = store.pool.strings
+        rows = len(store)
+
+        # Per-row contract description
+        self.row_underlying = array('I', bytes(4 * rows))
+        self.row_expiry = array('i', bytes(4 * rows))
+        self.row_kind = array('b', bytes(rows))
+        self.underlyings: List[str] = ['']
+        underlying_ids: Dict[str, int] = {}
+
+        derivative_exchange_ids = {
+            sid for sid, value in enumerate(strings) if value in DERIVATIVE_EXCHANGES
+        }
+        expiry_codes: Dict[str, Optional[date]] = {}
+        options: Dict[Tuple[str, str], Dict[date, Dict[float, List[int]]]] = {}
+        chains: Dict[Tuple[str, str], UnderlyingChain] = {}
+
+        for row in range(rows):
+            exchange_id = store.exchange[row]
+            if exchange_id not in derivative_exchange_ids:
+                continue
+            match = _CONTRACT_PATTERN.match(strings[store.symbol[row]])
+            if not match:
+                continue
+            base, code, strike_text, option_type = match.groups()
+
+            expiry = expiry_codes.get(code, False)
+            if expiry is False:
+                expiry = expiry_codes[code] = parse_expiry_code(code)
+            if expiry is None:
+                continue
+
+            key = (strings[exchange_id], base)
+            chain = chains.get(key)
+            if chain is None:
+                chain = chains[key] = UnderlyingChain()
+            if expiry not in chain.labels:
+                chain.labels[expiry] = strings[store.expiry[row]] or expiry.strftime('%d-%b-%y').upper()
+
+            if option_type:
+                kind = _OPTION_KINDS[option_type]
+                legs = options.setdefault(key, {}).setdefault(expiry, {})
+                pair = legs.get(float(strike_text))
+                if pair is None:
+                    pair = legs[float(strike_text)] = [NO_ROW, NO_ROW]
+                pair[0 if kind == KIND_CE else 1] = row
+            else:
+                kind = KIND_FUT
+                chain.futures[expiry] = row
+
+            underlying_id = underlying_ids.get(base)
+            if underlying_id is None:
+                underlying_id = underlying_ids[base] = len(self.underlyings)
+                self.underlyings.append(base)
+            self.row_underlying[row] = underlying_id
+            self.row_expiry[row] = expiry.toordinal()
+            self.row_kind[row] = kind
+
+        for key, chain in chains.items():
+            for expiry, legs in options.get(key, {}).items():
+                chain.options[expiry] = ExpiryChain(expiry, chain.labels[expiry], legs)
+            chain.option_expiries = sorted(chain.options)
+            chain.future_expiries = sorted(chain.futures)
+        self.chains = chains
+
+    # Lookups
+
+    def get_underlying(self, underlying: str, exchange: str) -> Optional[UnderlyingChain]:
+        return self.chains.get((exchange.upper(), underlying.upper()))
+
+    def get_expiry_chain(self, underlying: str, exchange: str, expiry_code: str) -> Optional[ExpiryChain]:
+        """Option chain for an underlying and DDMMMYY expiry code"""
+        chain = self.get_underlying(underlying, exchange)
+        expiry = parse_expiry_code(expiry_code)
+        if chain is None or expiry is None:
+            return None
+        return chain.options.get(expiry)
+
+    def find_option(self, underlying: str, exchange: str, expiry_code: str,
+                    strike: float, option_type: str) -> Optional[int]:
+        """Row id of an option contract, or None if it is not listed"""
+        expiry_chain = self.get_expiry_chain(underlying, exchange, expiry_code)
+        if expiry_chain is None:
+            return None
+        position = expiry_chain.position(strike)
+        return None if position is None else expiry_chain.row(position, option_type)
+
+    def expiries(self, underlying: str, exchange: str, instrumenttype: str = 'options') -> List[str]:
+        """
+        Sorted expiry labels (as stored in the expiry column, e.g. 28-NOV-24)
+
+        Args:
+            instrumenttype: 'options' or 'futures'
+        """
+        chain = self.get_underlying(underlying, exchange)
+        if chain is None:
+            return []
+        dates = chain.future_expiries if instrumenttype == 'futures' else chain.option_expiries
+        return [chain.labels[expiry] for expiry in dates]
+
+    def describe(self, row: int) -> Optional[Tuple[str, date, Optional[float], str]]:
+        """
+        Contract details of a row: (underlying, expiry date, strike, 'CE'/'PE'/'FUT')
+        Strike is None for futures.
+        """
+        kind = self.row_kind[row]
+        if kind == KIND_NONE:
+            return None
+        strike = None
+        if kind != KIND_FUT:
+            strike = float(_CONTRACT_PATTERN.match(self.store.text('symbol', row)).group(3))
+        return (
+            self.underlyings[self.row_underlying[row]],
+            date.fromordinal(self.row_expiry[row]),
+            strike,
+            _KIND_NAMES[kind],
+        )
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the index structures"""
+        size = sys.getsizeof(self.row_underlying) + sys.getsizeof(self.row_expiry) + sys.getsizeof(self.row_kind)
+        size += sys.getsizeof(self.underlyings) + sum(sys.getsizeof(name) for name in self.underlyings)
+        size += sys.getsizeof(self.chains)
+        for chain in self.chains.values():
+            size += sys.getsizeof(chain.options) + sys.getsizeof(chain.futures) + sys.getsizeof(chain.labels)
+            size += sys.getsizeof(chain.option_expiries) + sys.getsizeof(chain.future_expiries)
+            for expiry_chain in chain.options.values():
+                size += sys.getsizeof(expiry_chain.strikes) + sys.getsizeof(expiry_chain.ce) + sys.getsizeof(expiry_chain.pe)
+        return size
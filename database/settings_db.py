@@ -5,14 +5,20 @@ from sqlalchemy.orm import scoped_session, sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.pool import NullPool
 import os
+import time
+import threading
 from utils.logging import get_logger
 from cryptography.fernet import Fernet
 import base64
+from database.shared_cache import registry as cache_registry
 
 logger = get_logger(__name__)
 
 DATABASE_URL = os.getenv('DATABASE_URL')
 
+# Without a shared cache backend no invalidations arrive, so the snapshot is reloaded this often
+SETTINGS_LOCAL_TTL_MS = int(os.getenv('SETTINGS_LOCAL_TTL_MS', '1000'))
+
 # Conditionally create engine based on DB type
 if DATABASE_URL and 'sqlite' in DATABASE_URL:
     # SQLite: Use NullPool to prevent connection pool exhaustion
@@ -55,6 +61,107 @@ class Settings(Base):
     security_api_ban_duration = Column(Integer, default=48)  # Ban duration in hours
     security_repeat_offender_limit = Column(Integer, default=3)  # Bans before permanent ban
 
+class SettingsSnapshot:
+    """
+    In-memory copy of the settings row, so order paths read configuration
+    without a database query.
+
+    Loaded on first use and replaced as a whole (with a new version number)
+    whenever a set_* function commits. Other workers are told through the shared
+    cache registry and reload on their next read, within AUTH_CACHE_SYNC_MS.
+    Without a shared backend (AUTH_CACHE_BACKEND=local, or the backend could not
+    be opened) nothing is told, so the snapshot is reloaded every local_ttl_ms.
+    """
+
+    namespace = 'settings'
+
+    def __init__(self, registry=cache_registry, local_ttl_ms=SETTINGS_LOCAL_TTL_MS):
+        self.registry = registry
+        self.local_ttl = local_ttl_ms / 1000.0
+        self.values = None
+        self.version = 0
+        self._stale = True
+        self._expires = 0.0
+        self._warned = False
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def get(self):
+        """Current settings values (a dict that is never modified in place)"""
+        self.registry.sync()
+        if self._stale or (time.monotonic() >= self._expires and self._unshared()):
+            with self._lock:
+                if self._stale or time.monotonic() >= self._expires:
+                    self._load()
+        return self.values
+
+    def _unshared(self):
+        """True when changes made by other workers are not propagated"""
+        if self.registry.backend is not None:
+            return False
+        if not self._warned:
+            self._warned = True
+            logger.warning(
+                "Settings DB: no shared cache backend, settings changed by other workers "
+                f"are picked up by reloading every {self.local_ttl * 1000:.0f} ms"
+            )
+        return True
+
+    def _load(self):
+        try:
+            settings = Settings.query.first()
+            if not settings:
+                settings = Settings(analyze_mode=False)  # Default to Live Mode
+                db_session.add(settings)
+                db_session.commit()
+            self._replace(settings)
+        except Exception:
+            db_session.rollback()
+            if self.values is None:
+                raise
+            # Keep serving the previous values; the next read retries
+            logger.exception("Settings DB: Could not reload settings, using cached values")
+
+    def _replace(self, settings):
+        self.values = {
+            'analyze_mode': bool(settings.analyze_mode),
+            'smtp_server': settings.smtp_server,
+            'smtp_port': settings.smtp_port,
+            'smtp_username': settings.smtp_username,
+            'smtp_password_encrypted': settings.smtp_password_encrypted,
+            'smtp_use_tls': settings.smtp_use_tls,
+            'smtp_from_email': settings.smtp_from_email,
+            'smtp_helo_hostname': settings.smtp_helo_hostname,
+            'security_404_threshold': settings.security_404_threshold,
+            'security_404_ban_duration': settings.security_404_ban_duration,
+            'security_api_threshold': settings.security_api_threshold,
+            'security_api_ban_duration': settings.security_api_ban_duration,
+            'security_repeat_offender_limit': settings.security_repeat_offender_limit,
+        }
+        self.version += 1
+        self._stale = False
+        self._expires = time.monotonic() + self.local_ttl
+
+    def committed(self, settings):
+        """Publish a row this worker just committed"""
+        with self._lock:
+            self._replace(settings)
+        self.registry.publish([(None, self.namespace, None)])
+
+    # Invalidation messages from other workers
+
+    def clear_local(self):
+        self._stale = True
+
+    def discard_local(self, key):
+        self._stale = True
+
+    def invalidate_local_user(self, user):
+        pass
+
+# Settings of this process
+snapshot = SettingsSnapshot()
+
 def init_db():
     """Initialize the settings database"""
     from database.db_init_helper import init_db_with_logging
@@ -72,13 +179,8 @@ def init_db():
         logger.debug(f"Settings DB: Default config may already exist (race condition): {e}")
 
 def get_analyze_mode():
-    """Get current analyze mode setting"""
-    settings = Settings.query.first()
-    if not settings:
-        settings = Settings(analyze_mode=False)  # Default to Live Mode
-        db_session.add(settings)
-        db_session.commit()
-    return settings.analyze_mode
+    """Get current analyze mode setting (from the in-memory snapshot)"""
+    return snapshot.get()['analyze_mode']
 
 def set_analyze_mode(mode: bool):
     """Set analyze mode setting"""
@@ -89,6 +191,7 @@ def set_analyze_mode(mode: bool):
     else:
         settings.analyze_mode = mode
     db_session.commit()
+    snapshot.committed(settings)
 
 def _get_encryption_key():
     """Get or create encryption key for SMTP password"""
@@ -118,18 +221,16 @@ def _decrypt_password(encrypted_password: str) -> str:
 
 def get_smtp_settings():
     """Get SMTP configuration"""
-    settings = Settings.query.first()
-    if not settings:
-        return None
-    
+    settings = snapshot.get()
+
     return {
-        'smtp_server': settings.smtp_server,
-        'smtp_port': settings.smtp_port,
-        'smtp_username': settings.smtp_username,
-        'smtp_password': _decrypt_password(settings.smtp_password_encrypted) if settings.smtp_password_encrypted else None,
-        'smtp_use_tls': settings.smtp_use_tls,
-        'smtp_from_email': settings.smtp_from_email,
-        'smtp_helo_hostname': settings.smtp_helo_hostname
+        'smtp_server': settings['smtp_server'],
+        'smtp_port': settings['smtp_port'],
+        'smtp_username': settings['smtp_username'],
+        'smtp_password': _decrypt_password(settings['smtp_password_encrypted']) if settings['smtp_password_encrypted'] else None,
+        'smtp_use_tls': settings['smtp_use_tls'],
+        'smtp_from_email': settings['smtp_from_email'],
+        'smtp_helo_hostname': settings['smtp_helo_hostname']
     }
 
 def set_smtp_settings(smtp_server=None, smtp_port=None, smtp_username=None, 
@@ -156,30 +257,19 @@ def set_smtp_settings(smtp_server=None, smtp_port=None, smtp_username=None,
         settings.smtp_helo_hostname = smtp_helo_hostname
     
     db_session.commit()
+    snapshot.committed(settings)
     logger.info("SMTP settings updated successfully")
 
 def get_security_settings():
     """Get security configuration"""
-    settings = Settings.query.first()
-    if not settings:
-        # Create with defaults
-        settings = Settings(
-            analyze_mode=False,
-            security_404_threshold=20,
-            security_404_ban_duration=24,
-            security_api_threshold=10,
-            security_api_ban_duration=48,
-            security_repeat_offender_limit=3
-        )
-        db_session.add(settings)
-        db_session.commit()
+    settings = snapshot.get()
 
     return {
-        '404_threshold': settings.security_404_threshold or 20,
-        '404_ban_duration': settings.security_404_ban_duration or 24,
-        'api_threshold': settings.security_api_threshold or 10,
-        'api_ban_duration': settings.security_api_ban_duration or 48,
-        'repeat_offender_limit': settings.security_repeat_offender_limit or 3
+        '404_threshold': settings['security_404_threshold'] or 20,
+        '404_ban_duration': settings['security_404_ban_duration'] or 24,
+        'api_threshold': settings['security_api_threshold'] or 10,
+        'api_ban_duration': settings['security_api_ban_duration'] or 48,
+        'repeat_offender_limit': settings['security_repeat_offender_limit'] or 3
     }
 
 def set_security_settings(threshold_404=None, ban_duration_404=None,
@@ -203,4 +293,5 @@ def set_security_settings(threshold_404=None, ban_duration_404=None,
         settings.security_repeat_offender_limit = repeat_offender_limit
 
     db_session.commit()
+    snapshot.committed(settings)
     logger.info("Security settings updated successfully")
@@ -0,0 +1,462 @@
+"""
+Shared auth and token cache
+
+The auth caches in database/auth_db.py (auth tokens, feed tokens, broker names
+and verified API keys) are UserCache objects: a per-process TTLCache in front of
+a store shared by all workers, with every entry tagged by the user it belongs
+to. A worker that misses locally reads the shared store before the database, so
+a value loaded by one worker is reused by the others.
+
+Changing one user's credentials invalidates only that user's entries: they are
+deleted from the shared store and an invalidation message is published. Every
+worker applies pending messages to its local tier at most once per
+AUTH_CACHE_SYNC_MS, on its next cache access.
+
+The settings snapshot in database/settings_db.py registers with the same
+registry (namespace 'settings') to learn about changes made by other workers.
+
+Backends (AUTH_CACHE_BACKEND):
+
+- sqlite (default): WAL-mode file at AUTH_CACHE_DB_PATH; messages are rows of
+  an append-only invalidation log read by sequence number.
+- redis: Redis 7+ compatible server at AUTH_CACHE_REDIS_URL; entries expire
+  with their TTL and messages go through pub/sub. Needs the redis package; falls
+  back to sqlite without it.
+- local: per-process caches only, as before.
+
+Shared values are JSON encrypted with the caller's cipher (the auth_db Fernet
+key derived from API_KEY_PEPPER), so tokens are never stored in plain text.
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from collections import deque
+
+from cachetools import TTLCache
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+AUTH_CACHE_BACKEND = os.getenv('AUTH_CACHE_BACKEND', 'sqlite').lower()
+AUTH_CACHE_DB_PATH = os.getenv('AUTH_CACHE_DB_PATH', os.path.join('db', 'auth_cache.db'))
+AUTH_CACHE_REDIS_URL = os.getenv('AUTH_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+# How often a worker applies invalidations published by other workers
+AUTH_CACHE_SYNC_MS = int(os.getenv('AUTH_CACHE_SYNC_MS', '500'))
+
+# Invalidation log rows are kept this long (longer than any worker's sync interval)
+INVALIDATION_RETENTION_SECONDS = 3600
+
+REDIS_PREFIX = 'openalgo:authcache'
+
+_MISSING = object()
+
+
+class SQLiteCacheBackend:
+    """Shared entries and invalidation log in one SQLite file"""
+
+    def __init__(self, path=AUTH_CACHE_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._ready = False
+        self._last_seq = None
+        self._last_prune = 0.0
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            with self._init_lock:
+                if not self._ready:
+                    directory = os.path.dirname(self.path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute('PRAGMA synchronous=NORMAL')
+                if not self._ready:
+                    conn.executescript("""
+                        CREATE TABLE IF NOT EXISTS cache_entries (
+                            namespace TEXT NOT NULL,
+                            key TEXT NOT NULL,
+                            user TEXT,
+                            value BLOB NOT NULL,
+                            expires REAL NOT NULL,
+                            PRIMARY KEY (namespace, key)
+                        ) WITHOUT ROWID;
+                        CREATE INDEX IF NOT EXISTS idx_cache_entries_user ON cache_entries (user);
+                        CREATE TABLE IF NOT EXISTS cache_invalidations (
+                            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                            origin TEXT NOT NULL,
+                            user TEXT,
+                            namespace TEXT,
+                            key TEXT,
+                            created REAL NOT NULL
+                        );
+                    """)
+                    self._ready = True
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace, key):
+        row = self._connection().execute(
+            'SELECT value FROM cache_entries WHERE namespace = ? AND key = ? AND expires > ?',
+            (namespace, key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, namespace, key, user, value, ttl):
+        self._connection().execute(
+            'INSERT OR REPLACE INTO cache_entries (namespace, key, user, value, expires) VALUES (?, ?, ?, ?, ?)',
+            (namespace, key, user, value, time.time() + ttl)
+        )
+
+    def delete(self, namespace, key):
+        self._connection().execute('DELETE FROM cache_entries WHERE namespace = ? AND key = ?', (namespace, key))
+
+    def delete_user(self, user, namespaces=None):
+        conn = self._connection()
+        if namespaces is None:
+            conn.execute('DELETE FROM cache_entries WHERE user = ?', (user,))
+        else:
+            conn.executemany('DELETE FROM cache_entries WHERE user = ? AND namespace = ?',
+                             [(user, namespace) for namespace in namespaces])
+
+    def clear(self, namespace):
+        self._connection().execute('DELETE FROM cache_entries WHERE namespace = ?', (namespace,))
+
+    def publish(self, origin, messages):
+        now = time.time()
+        conn = self._connection()
+        conn.executemany(
+            'INSERT INTO cache_invalidations (origin, user, namespace, key, created) VALUES (?, ?, ?, ?, ?)',
+            [(origin, user, namespace, key, now) for user, namespace, key in messages]
+        )
+        if now - self._last_prune > 60:
+            self._last_prune = now
+            conn.execute('DELETE FROM cache_invalidations WHERE created < ?', (now - INVALIDATION_RETENTION_SECONDS,))
+            conn.execute('DELETE FROM cache_entries WHERE expires <= ?', (now,))
+
+    def poll(self, origin):
+        """Invalidations published by other processes since the last poll"""
+        conn = self._connection()
+        if self._last_seq is None:
+            # Start from the current end of the log; older messages predate this process's caches
+            self._last_seq = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM cache_invalidations').fetchone()[0]
+            return []
+        rows = conn.execute(
+            'SELECT seq, origin, user, namespace, key FROM cache_invalidations WHERE seq > ? ORDER BY seq',
+            (self._last_seq,)
+        ).fetchall()
+        if rows:
+            self._last_seq = rows[-1][0]
+        return [(user, namespace, key) for _, row_origin, user, namespace, key in rows if row_origin != origin]
+
+
+class RedisCacheBackend:
+    """Shared entries as expiring Redis keys, invalidations over pub/sub"""
+
+    def __init__(self, url=AUTH_CACHE_REDIS_URL):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.client.ping()
+        self._messages = deque()
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(**{f'{REDIS_PREFIX}:invalidate': self._on_message})
+        self._listener = self._pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    def _on_message(self, message):
+        try:
+            self._messages.append(json.loads(message['data']))
+        except (ValueError, TypeError):
+            pass
+
+    @staticmethod
+    def _entry(namespace, key):
+        return f'{REDIS_PREFIX}:{namespace}:{key}'
+
+    @staticmethod
+    def _user_keys(user):
+        return f'{REDIS_PREFIX}:user:{user}'
+
+    def get(self, namespace, key):
+        return self.client.get(self._entry(namespace, key))
+
+    def set(self, namespace, key, user, value, ttl):
+        entry = self._entry(namespace, key)
+        ttl = max(1, int(ttl))
+        pipe = self.client.pipeline()
+        pipe.set(entry, value, ex=ttl)
+        if user is not None:
+            # The user's key set must outlive the longest-lived entry it lists, so its
+            # expiry is set when new (NX) and otherwise only ever extended (GT)
+            user_keys = self._user_keys(user)
+            pipe.sadd(user_keys, entry)
+            pipe.expire(user_keys, ttl, nx=True)
+            pipe.expire(user_keys, ttl, gt=True)
+        pipe.execute()
+
+    def delete(self, namespace, key):
+        self.client.delete(self._entry(namespace, key))
+
+    def delete_user(self, user, namespaces=None):
+        entries = [entry.decode() if isinstance(entry, bytes) else entry
+                   for entry in self.client.smembers(self._user_keys(user))]
+        if namespaces is not None:
+            prefixes = tuple(f'{REDIS_PREFIX}:{namespace}:' for namespace in namespaces)
+            entries = [entry for entry in entries if entry.startswith(prefixes)]
+        if entries:
+            pipe = self.client.pipeline()
+            pipe.delete(*entries)
+            pipe.srem(self._user_keys(user), *entries)
+            pipe.execute()
+
+    def clear(self, namespace):
+        entries = list(self.client.scan_iter(match=self._entry(namespace, '*')))
+        if entries:
+            self.client.delete(*entries)
+
+    def publish(self, origin, messages):
+        for user, namespace, key in messages:
+            self.client.publish(f'{REDIS_PREFIX}:invalidate', json.dumps([origin, user, namespace, key]))
+
+    def poll(self, origin):
+        messages = []
+        while self._messages:
+            message_origin, user, namespace, key = self._messages.popleft()
+            if message_origin != origin:
+                messages.append((user, namespace, key))
+        return messages
+
+
+class CacheRegistry:
+    """The caches of one process, their shared backend and invalidation sync"""
+
+    def __init__(self, backend_name=AUTH_CACHE_BACKEND, sync_ms=AUTH_CACHE_SYNC_MS, db_path=AUTH_CACHE_DB_PATH):
+        self.backend_name = backend_name
+        self.db_path = db_path
+        self.sync_interval = sync_ms / 1000.0
+        self.caches = {}
+        self._pid = None
+        self._backend = None
+        self.origin = None
+        self._backend_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._next_sync = 0.0
+
+    @property
+    def backend(self):
+        """Shared backend, created on first use; None for per-process caching"""
+        if self._pid != os.getpid():
+            # First use, or a worker forked after its parent used the cache
+            with self._backend_lock:
+                if self._pid != os.getpid():
+                    self.origin = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+                    self._backend = self._create_backend()
+                    self._pid = os.getpid()
+        return self._backend
+
+    def _create_backend(self):
+        if self.backend_name == 'local':
+            return None
+        if self.backend_name == 'redis':
+            try:
+                backend = RedisCacheBackend()
+                logger.info("Auth cache shared through Redis")
+                return backend
+            except Exception as e:
+                logger.warning(f"Redis auth cache unavailable, using SQLite: {e}")
+        try:
+            backend = SQLiteCacheBackend(self.db_path)
+            backend.poll(self.origin)
+            logger.debug(f"Auth cache shared through {backend.path}")
+            return backend
+        except Exception as e:
+            logger.warning(f"Shared auth cache unavailable, caching per process: {e}")
+            return None
+
+    def register(self, cache):
+        self.caches[cache.namespace] = cache
+
+    def sync(self):
+        """Apply invalidations published by other workers, at most once per sync interval"""
+        now = time.monotonic()
+        if now < self._next_sync or not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_sync = now + self.sync_interval
+            backend = self.backend
+            if backend is None:
+                return
+            for user, namespace, key in backend.poll(self.origin):
+                self._apply(user, namespace, key)
+        except Exception as e:
+            logger.warning(f"Could not read auth cache invalidations: {e}")
+        finally:
+            self._sync_lock.release()
+
+    def _apply(self, user, namespace, key):
+        caches = [self.caches[namespace]] if namespace in self.caches else (
+            [] if namespace else list(self.caches.values()))
+        for cache in caches:
+            if key is not None:
+                cache.discard_local(key)
+            elif user is not None:
+                cache.invalidate_local_user(user)
+            else:
+                cache.clear_local()
+
+    def _shared(self, operation, *args):
+        """Run a backend call; a failing shared store never fails the caller"""
+        backend = self.backend
+        if backend is None:
+            return None
+        try:
+            return getattr(backend, operation)(*args)
+        except Exception as e:
+            logger.warning(f"Shared auth cache {operation} failed: {e}")
+            return None
+
+    def invalidate_user(self, user, namespaces=None):
+        """
+        Drop one user's entries in every worker
+
+        Args:
+            user: User the entries are tagged with
+            namespaces: Cache namespaces to invalidate, or None for all
+        """
+        names = list(self.caches) if namespaces is None else list(namespaces)
+        for name in names:
+            self.caches[name].invalidate_local_user(user)
+        self._shared('delete_user', user, namespaces)
+        self.publish([(user, None, None)] if namespaces is None else [(user, name, None) for name in names])
+
+    def publish(self, messages):
+        """Send (user, namespace, key) invalidations to the other workers"""
+        if self.backend is not None:
+            self._shared('publish', self.origin, messages)
+
+
+class UserCache:
+    """
+    TTL cache whose entries are tagged by user and shared between workers
+
+    Supports the mapping operations the auth code used on TTLCache (in, [],
+    del, clear); use set() to tag an entry with its user.
+    """
+
+    def __init__(self, namespace, maxsize, ttl, registry, cipher=None, shared=True):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.registry = registry
+        self.cipher = cipher
+        self.shared = shared
+        self._local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._user_keys = {}
+        self._lock = threading.RLock()
+        registry.register(self)
+
+    # Local tier
+
+    def _store_local(self, key, value, user):
+        with self._lock:
+            self._local[key] = value
+            if user is not None:
+                keys = self._user_keys.setdefault(user, set())
+                keys.add(key)
+                if len(keys) > self._local.maxsize:
+                    keys.intersection_update(self._local.keys())
+
+    def discard_local(self, key):
+        with self._lock:
+            self._local.pop(key, None)
+
+    def invalidate_local_user(self, user):
+        with self._lock:
+            for key in self._user_keys.pop(user, ()):
+                self._local.pop(key, None)
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+            self._user_keys.clear()
+
+    # Shared tier
+
+    def _encode(self, value, user):
+        raw = json.dumps([user, value], separators=(',', ':')).encode()
+        return self.cipher.encrypt(raw) if self.cipher else raw
+
+    def _decode(self, raw):
+        """(user, value) of a shared entry"""
+        if isinstance(raw, str):
+            raw = raw.encode()
+        user, value = json.loads(self.cipher.decrypt(raw) if self.cipher else raw)
+        return user, value
+
+    def get(self, key, default=None):
+        self.registry.sync()
+        with self._lock:
+            value = self._local.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if not self.shared:
+            return default
+
+        raw = self.registry._shared('get', self.namespace, key)
+        if raw is None:
+            return default
+        try:
+            user, value = self._decode(raw)
+        except Exception:
+            # Written with another key or format
+            return default
+        self._store_local(key, value, user)
+        return value
+
+    def set(self, key, value, user=None):
+        """Cache a JSON-serializable value for this process and the shared store"""
+        self._store_local(key, value, user)
+        if self.shared:
+            self.registry._shared('set', self.namespace, key, user, self._encode(value, user), self.ttl)
+
+    def delete(self, key):
+        """Remove one entry in every worker"""
+        self.discard_local(key)
+        if self.shared:
+            self.registry._shared('delete', self.namespace, key)
+        self.registry.publish([(None, self.namespace, key)])
+
+    def clear(self):
+        """Remove every entry of this cache in every worker"""
+        self.clear_local()
+        if self.shared:
+            self.registry._shared('clear', self.namespace)
+        self.registry.publish([(None, self.namespace, None)])
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __delitem__(self, key):
+        self.delete(key)
+
+    def __len__(self):
+        return len(self._local)
+
+
+# Caches of this process
+registry = CacheRegistry()
@@ -8,6 +8,9 @@ from utils.logging import get_logger
 
 logger = get_logger(__name__)
 
+# Maximum number of rows returned by enhanced_search_symbols
+SEARCH_RESULT_LIMIT = int(os.getenv('SYMBOL_SEARCH_LIMIT', '500'))
+
 DATABASE_URL = os.getenv('DATABASE_URL')
 # Conditionally create engine based on DB type
 if DATABASE_URL and 'sqlite' in DATABASE_URL:
@@ -51,18 +54,30 @@ class SymToken(Base):
         Index('idx_brsymbol_exchange', 'brsymbol', 'exchange'),
     )
 
-def enhanced_search_symbols(query: str, exchange: str = None) -> List[SymToken]:
+def enhanced_search_symbols(query: str, exchange: str = None, limit: int = SEARCH_RESULT_LIMIT) -> List[SymToken]:
     """
     Enhanced search function that searches across multiple fields
     and supports partial matching with multiple terms
     
+    Served from the in-memory symbol search index when the symbol cache is
+    loaded, otherwise from the database.
+    
     Args:
         query (str): Search query string
         exchange (str, optional): Exchange to filter by
+        limit (int, optional): Maximum number of results
         
     Returns:
-        List[SymToken]: List of matching SymToken objects
+        List[SymToken]: List of matching SymToken objects (SymbolData when served from cache)
     """
+    try:
+        from database.token_db_enhanced import get_cache
+        cache = get_cache()
+        if cache.cache_loaded and cache.is_cache_valid():
+            return cache.search_symbols(query, exchange, limit)
+    except Exception as e:
+        logger.error(f"Error in cached search, falling back to database: {str(e)}")
+    
     try:
         # Split the query into terms and clean them
         terms = [term.strip().upper() for term in query.split() if term.strip()]
@@ -102,8 +117,7 @@ def enhanced_search_symbols(query: str, exchange: str = None) -> List[SymToken]:
         else:
             final_query = base_query
 
-        # Execute query - no limit to show all matching results
-        results = final_query.all()
+        results = final_query.limit(limit).all()
         return results
         
     except Exception as e:
@@ -0,0 +1,283 @@
+"""
+Symbol Search Index
+In-memory search structures over the columnar symbol store, built once per cache load.
+
+- Sorted uppercase key arrays over symbol, brsymbol and name act as flattened prefix
+  tries: a prefix maps to one contiguous bisect range.
+- Trigram postings over symbol, brsymbol and token give infix candidates; distinct
+  names are few enough to be scanned directly.
+- A sorted strike array resolves numeric terms.
+
+Query terms are ANDed, each term matching as a case-insensitive substring of symbol,
+brsymbol, name or token (or equal to the strike for numeric terms), like
+database.symbol.enhanced_search_symbols. Results are ranked: symbol prefix matches
+first, then broker symbol and name prefix matches, then infix matches.
+"""
+
+import sys
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from database.symbol_store import SymbolStore
+
+
+# Candidate count up to which a query is verified in full and ranked, rather than
+# streamed in prefix order
+SELECTIVE_CANDIDATES = 2000
+
+
+def _trigrams(value: str) -> Iterator[str]:
+    return (value[i:i + 3] for i in range(len(value) - 2))
+
+
+class SymbolSearchIndex:
+    """Prefix, trigram and strike indexes over a SymbolStore"""
+
+    def __init__(self, store: SymbolStore):
+        self.store = store
+        strings = store.pool.strings
+
+        # Uppercase form of every string id (shares the object when already uppercase)
+        upper: List[Optional[str]] = []
+        for value in strings:
+            if value is None:
+                upper.append(None)
+            else:
+                converted = value.upper()
+                upper.append(value if converted == value else converted)
+        self.upper = upper
+
+        rows = len(store)
+        symbol, brsymbol, token, name = store.symbol, store.brsymbol, store.token, store.name
+
+        # Prefix ranges: rows sorted by uppercase key
+        self.symbol_rows = array('I', sorted(range(rows), key=lambda r: upper[symbol[r]]))
+        self.symbol_keys = [upper[symbol[r]] for r in self.symbol_rows]
+        self.brsymbol_rows = array('I', sorted(range(rows), key=lambda r: upper[brsymbol[r]]))
+        self.brsymbol_keys = [upper[brsymbol[r]] for r in self.brsymbol_rows]
+
+        # Names repeat heavily (one per underlying), so index distinct names
+        rows_by_name: Dict[int, array] = {}
+        for row in range(rows):
+            name_id = name[row]
+            if name_id:
+                bucket = rows_by_name.get(name_id)
+                if bucket is None:
+                    bucket = rows_by_name[name_id] = array('I')
+                bucket.append(row)
+        self.name_ids = sorted(rows_by_name, key=lambda sid: upper[sid])
+        self.name_keys = [upper[sid] for sid in self.name_ids]
+        self.rows_by_name = rows_by_name
+
+        # Trigram postings over distinct names (name string ids)
+        name_postings: Dict[str, list] = {}
+        for sid in self.name_ids:
+            for gram in set(_trigrams(upper[sid])):
+                name_postings.setdefault(gram, []).append(sid)
+        self.name_postings = name_postings
+
+        # Trigram postings (row ids ascending)
+        postings: Dict[str, list] = {}
+        get_posting = postings.get
+        for row in range(rows):
+            grams = set(_trigrams(upper[symbol[row]]))
+            grams.update(_trigrams(upper[brsymbol[row]]))
+            token_value = upper[token[row]]
+            if token_value is not None:
+                grams.update(_trigrams(token_value))
+            for gram in grams:
+                posting = get_posting(gram)
+                if posting is None:
+                    postings[gram] = [row]
+                else:
+                    posting.append(row)
+        self.postings: Dict[str, array] = {gram: array('I', rows) for gram, rows in postings.items()}
+
+        # Strike index
+        strike = store.strike
+        strike_rows = sorted((r for r in range(rows) if not math.isnan(strike[r])), key=lambda r: strike[r])
+        self.strike_rows = array('I', strike_rows)
+        self.strike_values = array('d', (strike[r] for r in strike_rows))
+
+    # Term evaluation
+
+    def _matches(self, row: int, term: str, number: Optional[float]) -> bool:
+        store = self.store
+        upper = self.upper
+        if term in upper[store.symbol[row]] or term in upper[store.brsymbol[row]]:
+            return True
+        token = upper[store.token[row]]
+        if token is not None and term in token:
+            return True
+        name = upper[store.name[row]]
+        if name is not None and term in name:
+            return True
+        return number is not None and store.strike[row] == number
+
+    def _strike_rows(self, number: float) -> array:
+        lo = bisect_left(self.strike_values, number)
+        hi = bisect_right(self.strike_values, number)
+        return self.strike_rows[lo:hi]
+
+    def _name_rows(self, term: str) -> List[array]:
+        """Row sets of every distinct name containing term (len(term) >= 3)"""
+        smallest = None
+        for gram in set(_trigrams(term)):
+            posting = self.name_postings.get(gram)
+            if posting is None:
+                return []
+            if smallest is None or len(posting) < len(smallest):
+                smallest = posting
+        upper = self.upper
+        return [self.rows_by_name[sid] for sid in smallest if term in upper[sid]]
+
+    def _infix_candidates(self, term: str, number: Optional[float]) -> Optional[List[Iterable[int]]]:
+        """
+        Complete candidate row sets for a term, or None when the term is too short
+        for the trigram index
+        """
+        if len(term) < 3:
+            return None
+        smallest = None
+        for gram in set(_trigrams(term)):
+            posting = self.postings.get(gram)
+            if posting is None:
+                smallest = ()
+                break
+            if smallest is None or len(posting) < len(smallest):
+                smallest = posting
+        sources = [smallest] + self._name_rows(term)
+        if number is not None:
+            sources.append(self._strike_rows(number))
+        return sources
+
+    @staticmethod
+    def _prefix_range(keys: List[str], rows: array, prefix: str) -> array:
+        lo = bisect_left(keys, prefix)
+        hi = bisect_left(keys, prefix + '\uffff', lo)
+        return rows[lo:hi]
+
+    # Search
+
+    def search(self, query: str, exchange: Optional[str] = None, limit: Optional[int] = 50) -> List[int]:
+        """
+        Search the index
+
+        Args:
+            query: Space separated search terms
+            exchange: Optional exchange filter
+            limit: Maximum number of rows to return (None for all)
+
+        Returns:
+            Matching row ids in rank order
+        """
+        terms = [term for term in query.upper().split() if term]
+        if not terms:
+            return []
+
+        parsed = []
+        for term in terms:
+            try:
+                parsed.append((term, float(term)))
+            except ValueError:
+                parsed.append((term, None))
+
+        store = self.store
+        strings = store.pool.strings
+        exchange_column = store.exchange
+        matches = self._matches
+        results: List[int] = []
+        seen = set()
+
+        def collect(candidates: Iterable[int]) -> bool:
+            """Verify candidates in order; returns True once the limit is reached"""
+            for row in candidates:
+                if row in seen:
+                    continue
+                if exchange and strings[exchange_column[row]] != exchange:
+                    continue
+                if all(matches(row, term, number) for term, number in parsed):
+                    seen.add(row)
+                    results.append(row)
+                    if limit is not None and len(results) >= limit:
+                        return True
+            return False
+
+        first = terms[0]
+
+        # Infix candidates from the most selective term
+        driver = None
+        for term, number in parsed:
+            sources = self._infix_candidates(term, number)
+            if sources is None:
+                continue
+            size = sum(len(source) for source in sources)
+            if driver is None or size < driver[0]:
+                driver = (size, sources)
+
+        if driver is not None and driver[0] <= SELECTIVE_CANDIDATES:
+            # Selective query: verify the small candidate set once, then rank it
+            collect_limit, limit = limit, None
+            collect(self._union(driver[1]))
+            ranked = sorted(results, key=lambda row: self._rank_key(row, first))
+            return ranked if collect_limit is None else ranked[:collect_limit]
+
+        # Broad query: stream matches in rank order and stop at the limit
+        # Symbol prefix matches (an exact symbol sorts first in its range)
+        if collect(self._prefix_range(self.symbol_keys, self.symbol_rows, first)):
+            return results
+
+        # Broker symbol and name prefix matches
+        if collect(self._prefix_range(self.brsymbol_keys, self.brsymbol_rows, first)):
+            return results
+        lo = bisect_left(self.name_keys, first)
+        hi = bisect_left(self.name_keys, first + '\uffff', lo)
+        for sid in self.name_ids[lo:hi]:
+            if collect(self.rows_by_name[sid]):
+                return results
+
+        # Infix matches
+        if driver is None:
+            # Only short terms - verify every row
+            collect(range(len(store)))
+        else:
+            collect(self._union(driver[1]))
+
+        return results
+
+    @staticmethod
+    def _union(sources: List[Iterable[int]]) -> Iterable[int]:
+        """Merge candidate row sets into ascending row order"""
+        if len(sources) == 1:
+            return sources[0]
+        return sorted(set().union(*sources))
+
+    def _rank_key(self, row: int, first: str):
+        """Sort key: symbol prefix, then broker symbol/name prefix, then infix matches"""
+        store = self.store
+        upper = self.upper
+        symbol = upper[store.symbol[row]]
+        if symbol.startswith(first):
+            tier = 0
+        elif upper[store.brsymbol[row]].startswith(first):
+            tier = 1
+        else:
+            name = upper[store.name[row]]
+            tier = 1 if name is not None and name.startswith(first) else 2
+        return tier, symbol
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the index structures"""
+        size = sys.getsizeof(self.upper)
+        size += sum(sys.getsizeof(value) for value, original in zip(self.upper, self.store.pool.strings)
+                    if value is not None and value is not original)
+        size += sys.getsizeof(self.symbol_rows) + sys.getsizeof(self.symbol_keys)
+        size += sys.getsizeof(self.brsymbol_rows) + sys.getsizeof(self.brsymbol_keys)
+        size += sys.getsizeof(self.name_ids) + sys.getsizeof(self.name_keys) + sys.getsizeof(self.rows_by_name)
+        size += sum(sys.getsizeof(rows) for rows in self.rows_by_name.values())
+        size += sys.getsizeof(self.postings)
+        size += sum(sys.getsizeof(gram) + sys.getsizeof(rows) for gram, rows in self.postings.items())
+        size += sys.getsizeof(self.strike_rows) + sys.getsizeof(self.strike_values)
+        return size
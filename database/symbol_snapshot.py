@@ -0,0 +1,203 @@
+"""
+Symbol Cache Snapshots
+Versioned binary snapshots of the columnar symbol store for instant warm start.
+
+A snapshot is written once per broker and master contract download. Later processes
+(restarts, additional workers) memory-map the file instead of re-querying the symtoken
+table: numeric and string-id columns are used in place from the shared mapping and only
+the string table is decoded.
+
+File layout:
+    MAGIC (8 bytes) | header length (uint32) | JSON header | padding to 8 bytes
+    data sections, each 8-byte aligned:
+        string_offsets  uint64[strings + 1]   byte offsets into string_blob
+        string_blob     utf-8 bytes of every string table entry
+        <column>        raw column buffer for each store column
+"""
+
+import os
+import json
+import mmap
+import glob
+import struct
+from array import array
+from datetime import datetime
+from typing import Optional
+
+from database.symbol_store import SymbolStore, STRING_COLUMNS, NUMERIC_COLUMNS, NULL_ID
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+MAGIC = b'OASYMSNP'
+SNAPSHOT_VERSION = 1
+
+# Directory holding snapshot files
+SNAPSHOT_DIR = os.getenv('SYMBOL_SNAPSHOT_DIR', os.path.join('db', 'symbol_cache'))
+
+_PREAMBLE = struct.Struct('<8sI')
+_ALIGN = 8
+
+# Typecode for every store column
+_COLUMN_TYPECODES = dict(
+    [(column, 'I') for column in STRING_COLUMNS] + list(NUMERIC_COLUMNS)
+)
+
+
+def _aligned(offset: int) -> int:
+    return (offset + _ALIGN - 1) & ~(_ALIGN - 1)
+
+
+def snapshot_key(download_time: datetime) -> str:
+    """Build the snapshot key from a master contract download timestamp"""
+    return download_time.strftime('%Y%m%dT%H%M%S%f')
+
+
+def snapshot_path(broker: str, key: str) -> str:
+    """Path of the snapshot file for a broker and download key"""
+    return os.path.join(SNAPSHOT_DIR, broker, f'{key}.snap')
+
+
+def write_snapshot(store: SymbolStore, broker: str, key: str) -> Optional[str]:
+    """
+    Write a snapshot of the store atomically
+
+    Returns:
+        The snapshot path, or None if writing failed
+    """
+    path = snapshot_path(broker, key)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # String table as one blob plus offsets (NULL id 0 is an empty span)
+        encoded = [b'' if s is None else s.encode('utf-8') for s in store.pool.strings]
+        offsets = array('Q', [0])
+        total = 0
+        for value in encoded:
+            total += len(value)
+            offsets.append(total)
+
+        sections = [
+            ('string_offsets', memoryview(offsets).cast('B')),
+            ('string_blob', memoryview(b''.join(encoded))),
+        ]
+        for column in _COLUMN_TYPECODES:
+            sections.append((column, memoryview(getattr(store, column)).cast('B')))
+
+        # Section offsets are relative to the start of the data area
+        layout = {}
+        position = 0
+        for name, data in sections:
+            position = _aligned(position)
+            layout[name] = [position, data.nbytes]
+            position += data.nbytes
+
+        header = json.dumps({
+            'version': SNAPSHOT_VERSION,
+            'broker': broker,
+            'key': key,
+            'rows': len(store),
+            'strings': len(store.pool.strings),
+            'itemsizes': {code: array(code).itemsize for code in set(_COLUMN_TYPECODES.values())},
+            'sections': layout,
+        }).encode('utf-8')
+        data_start = _aligned(_PREAMBLE.size + len(header))
+
+        with open(tmp_path, 'wb') as f:
+            f.write(_PREAMBLE.pack(MAGIC, len(header)))
+            f.write(header)
+            for name, data in sections:
+                f.seek(data_start + layout[name][0])
+                f.write(data)
+
+        os.replace(tmp_path, path)
+        logger.info(f"Wrote symbol snapshot for {broker}: {path} ({len(store)} symbols)")
+        return path
+
+    except Exception as e:
+        logger.error(f"Error writing symbol snapshot for {broker}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return None
+
+
+def load_snapshot(broker: str, key: str) -> Optional[SymbolStore]:
+    """
+    Memory-map a snapshot and build a store on top of it
+
+    Column buffers reference the read-only mapping directly, so every process
+    loading the same snapshot shares those pages through the OS page cache.
+
+    Returns:
+        The loaded store, or None if no valid snapshot exists
+    """
+    path = snapshot_path(broker, key)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, 'rb') as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not map symbol snapshot {path}: {e}")
+        return None
+
+    try:
+        magic, header_length = _PREAMBLE.unpack_from(mapping, 0)
+        if magic != MAGIC:
+            raise ValueError('bad magic')
+        header = json.loads(mapping[_PREAMBLE.size:_PREAMBLE.size + header_length])
+        if header.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"unsupported version {header.get('version')}")
+        if header['broker'] != broker or header['key'] != key:
+            raise ValueError('broker or key mismatch')
+        for code, itemsize in header['itemsizes'].items():
+            if array(code).itemsize != itemsize:
+                raise ValueError(f"incompatible item size for '{code}'")
+
+        data_start = _aligned(_PREAMBLE.size + header_length)
+        view = memoryview(mapping)
+
+        def section(name: str) -> memoryview:
+            offset, length = header['sections'][name]
+            start = data_start + offset
+            return view[start:start + length]
+
+        # Decode the string table; everything else stays in the mapping
+        offsets = section('string_offsets').cast('Q')
+        blob = section('string_blob').tobytes()
+        strings = [None] * header['strings']
+        for sid in range(header['strings']):
+            if sid != NULL_ID:
+                strings[sid] = blob[offsets[sid]:offsets[sid + 1]].decode('utf-8')
+        offsets.release()
+
+        columns = {
+            column: section(column).cast(code)
+            for column, code in _COLUMN_TYPECODES.items()
+        }
+        store = SymbolStore.from_columns(strings, columns)
+        if len(store) != header['rows']:
+            raise ValueError('row count mismatch')
+        return store
+
+    except Exception as e:
+        logger.warning(f"Ignoring invalid symbol snapshot {path}: {e}")
+        return None
+
+
+def prune_snapshots(broker: str, keep_key: str):
+    """Remove snapshots of older downloads for a broker"""
+    keep = snapshot_path(broker, keep_key)
+    for path in glob.glob(os.path.join(SNAPSHOT_DIR, broker, '*.snap')):
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+            logger.debug(f"Removed stale symbol snapshot: {path}")
+        except OSError as e:
+            # Still mapped by another process on some platforms
+            logger.debug(f"Could not remove symbol snapshot {path}: {e}")
@@ -0,0 +1,248 @@
+"""
+Columnar Symbol Store
+Compact array-backed storage behind BrokerSymbolCache for 150,000+ contracts per broker.
+
+Every string is interned once into a shared string table and referenced by an integer id,
+numeric fields live in typed arrays, and the lookup indexes map keys to integer row ids
+instead of per-symbol objects.
+"""
+
+import sys
+import math
+from array import array
+from typing import Dict, Iterator, List, Optional
+
+# String id reserved for NULL values
+NULL_ID = 0
+
+# Sentinel stored in the lotsize column for NULL values
+LOTSIZE_NONE = -1
+
+# Columns holding string-table ids, in row order
+STRING_COLUMNS = (
+    'symbol', 'brsymbol', 'name', 'exchange', 'brexchange',
+    'token', 'expiry', 'instrumenttype'
+)
+
+# Numeric columns and their array typecodes
+NUMERIC_COLUMNS = (
+    ('strike', 'd'),
+    ('tick_size', 'd'),
+    ('lotsize', 'q'),
+)
+
+
+class StringPool:
+    """Deduplicating string table - each distinct string is stored once and addressed by id"""
+
+    __slots__ = ('strings', '_ids')
+
+    def __init__(self):
+        self.strings: List[Optional[str]] = [None]
+        self._ids: Optional[Dict[str, int]] = {}
+
+    def add(self, value: Optional[str]) -> int:
+        """Return the id for value, adding it to the table if needed"""
+        if value is None:
+            return NULL_ID
+        sid = self._ids.get(value)
+        if sid is None:
+            sid = len(self.strings)
+            self.strings.append(value)
+            self._ids[value] = sid
+        return sid
+
+    def freeze(self):
+        """Drop the reverse lookup once loading is complete to release its memory"""
+        self._ids = None
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+
+class SymbolStore:
+    """
+    Column-oriented symbol table with integer row ids
+
+    Indexes are nested per exchange ({exchange: {key: row}}) so no tuple key
+    is allocated per symbol, and the key strings are the same objects held
+    by the string table.
+    """
+
+    __slots__ = STRING_COLUMNS + tuple(name for name, _ in NUMERIC_COLUMNS) + (
+        'pool',
+        'by_symbol_exchange',
+        'by_token_exchange',
+        'by_brsymbol_exchange',
+        'by_token',
+    )
+
+    def __init__(self):
+        self.pool = StringPool()
+        for column in STRING_COLUMNS:
+            setattr(self, column, array('I'))
+        for column, typecode in NUMERIC_COLUMNS:
+            setattr(self, column, array(typecode))
+
+        self.by_symbol_exchange: Dict[str, Dict[str, int]] = {}
+        self.by_token_exchange: Dict[str, Dict[str, int]] = {}
+        self.by_brsymbol_exchange: Dict[str, Dict[str, int]] = {}
+        self.by_token: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.token)
+
+    def append(self, symbol: str, brsymbol: str, name: Optional[str], exchange: str,
+               brexchange: Optional[str], token: str, expiry: Optional[str] = None,
+               strike: Optional[float] = None, lotsize: Optional[int] = None,
+               instrumenttype: Optional[str] = None, tick_size: Optional[float] = None) -> int:
+        """Append one symbol row, update the indexes and return its row id"""
+        pool = self.pool
+        row = len(self.token)
+
+        symbol_id = pool.add(symbol)
+        brsymbol_id = pool.add(brsymbol)
+        exchange_id = pool.add(exchange)
+        token_id = pool.add(token)
+
+        self.symbol.append(symbol_id)
+        self.brsymbol.append(brsymbol_id)
+        self.name.append(pool.add(name))
+        self.exchange.append(exchange_id)
+        self.brexchange.append(pool.add(brexchange))
+        self.token.append(token_id)
+        self.expiry.append(pool.add(expiry))
+        self.instrumenttype.append(pool.add(instrumenttype))
+        self.strike.append(math.nan if strike is None else strike)
+        self.tick_size.append(math.nan if tick_size is None else tick_size)
+        self.lotsize.append(LOTSIZE_NONE if lotsize is None else lotsize)
+
+        # Index with the pooled string objects so keys are not duplicated
+        strings = pool.strings
+        exchange = strings[exchange_id]
+        token = strings[token_id]
+        self._index(self.by_symbol_exchange, exchange, strings[symbol_id], row)
+        self._index(self.by_token_exchange, exchange, token, row)
+        self._index(self.by_brsymbol_exchange, exchange, strings[brsymbol_id], row)
+        self.by_token[token] = row
+        return row
+
+    @staticmethod
+    def _index(index: Dict[str, Dict[str, int]], exchange: str, key: str, row: int):
+        bucket = index.get(exchange)
+        if bucket is None:
+            bucket = index[exchange] = {}
+        bucket[key] = row
+
+    def freeze(self):
+        """Finish loading - release build-only structures"""
+        self.pool.freeze()
+
+    @classmethod
+    def from_columns(cls, strings: List[Optional[str]], columns: Dict[str, object]) -> 'SymbolStore':
+        """
+        Create a frozen store from an existing string table and column buffers
+
+        Columns may be arrays or memoryviews (e.g. over a memory-mapped snapshot);
+        they are used as-is without copying and the indexes are rebuilt from them.
+        """
+        store = cls()
+        store.pool.strings = strings
+        store.pool.freeze()
+        for column in STRING_COLUMNS:
+            setattr(store, column, columns[column])
+        for column, _ in NUMERIC_COLUMNS:
+            setattr(store, column, columns[column])
+        store.rebuild_indexes()
+        return store
+
+    def rebuild_indexes(self):
+        """Rebuild the lookup indexes from the column data"""
+        strings = self.pool.strings
+        self.by_symbol_exchange = {}
+        self.by_token_exchange = {}
+        self.by_brsymbol_exchange = {}
+        self.by_token = by_token = {}
+        index = self._index
+
+        for row, (symbol_id, brsymbol_id, exchange_id, token_id) in enumerate(
+                zip(self.symbol, self.brsymbol, self.exchange, self.token)):
+            exchange = strings[exchange_id]
+            token = strings[token_id]
+            index(self.by_symbol_exchange, exchange, strings[symbol_id], row)
+            index(self.by_token_exchange, exchange, token, row)
+            index(self.by_brsymbol_exchange, exchange, strings[brsymbol_id], row)
+            by_token[token] = row
+
+    # Lookups - return row ids or None
+
+    def find_by_symbol(self, symbol: str, exchange: str) -> Optional[int]:
+        bucket = self.by_symbol_exchange.get(exchange)
+        return bucket.get(symbol) if bucket is not None else None
+
+    def find_by_token(self, token: str, exchange: str) -> Optional[int]:
+        bucket = self.by_token_exchange.get(exchange)
+        return bucket.get(token) if bucket is not None else None
+
+    def find_by_brsymbol(self, brsymbol: str, exchange: str) -> Optional[int]:
+        bucket = self.by_brsymbol_exchange.get(exchange)
+        return bucket.get(brsymbol) if bucket is not None else None
+
+    # Column accessors
+
+    def text(self, column: str, row: int) -> Optional[str]:
+        """Return the string value of a string column for a row"""
+        return self.pool.strings[getattr(self, column)[row]]
+
+    def strike_at(self, row: int) -> Optional[float]:
+        value = self.strike[row]
+        return None if math.isnan(value) else value
+
+    def tick_size_at(self, row: int) -> Optional[float]:
+        value = self.tick_size[row]
+        return None if math.isnan(value) else value
+
+    def lotsize_at(self, row: int) -> Optional[int]:
+        value = self.lotsize[row]
+        return None if value == LOTSIZE_NONE else value
+
+    def row_dict(self, row: int) -> dict:
+        """Materialize a row as a plain dictionary"""
+        strings = self.pool.strings
+        data = {column: strings[getattr(self, column)[row]] for column in STRING_COLUMNS}
+        data['strike'] = self.strike_at(row)
+        data['tick_size'] = self.tick_size_at(row)
+        data['lotsize'] = self.lotsize_at(row)
+        return data
+
+    def rows(self) -> Iterator[int]:
+        return iter(range(len(self)))
+
+    def memory_bytes(self) -> int:
+        """
+        Measure the memory held by the store
+
+        Sums the string table (list plus every distinct string), all column
+        buffers and the index dictionaries including their row id integers.
+        """
+        strings = self.pool.strings
+        size = sys.getsizeof(self.pool) + sys.getsizeof(strings)
+        size += sum(sys.getsizeof(s) for s in strings if s is not None)
+        if self.pool._ids is not None:
+            size += sys.getsizeof(self.pool._ids)
+
+        # Memory-mapped columns (memoryviews) are counted by their mapped size
+        for column in STRING_COLUMNS + tuple(name for name, _ in NUMERIC_COLUMNS):
+            buffer = getattr(self, column)
+            size += buffer.nbytes if isinstance(buffer, memoryview) else sys.getsizeof(buffer)
+
+        for index in (self.by_symbol_exchange, self.by_token_exchange, self.by_brsymbol_exchange):
+            size += sys.getsizeof(index)
+            size += sum(sys.getsizeof(bucket) for bucket in index.values())
+        size += sys.getsizeof(self.by_token)
+
+        # One int object per row is shared by all indexes (small ints are cached)
+        rows = len(self)
+        if rows > 256:
+            size += (rows - 256) * sys.getsizeof(rows)
+        return size
@@ -29,6 +29,7 @@ from database.token_db_enhanced import (
     get_tokens_bulk,
     get_symbols_bulk,
     search_symbols,
+    get_option_index,
     # Cache management (optional - won't break existing code)
     load_cache_for_broker,
     clear_cache,
@@ -62,6 +63,7 @@ __all__ = [
     'get_tokens_bulk',
     'get_symbols_bulk',
     'search_symbols',
+    'get_option_index',
     'load_cache_for_broker',
     'clear_cache',
     'get_cache_stats'
@@ -3,16 +3,67 @@ Enhanced Token DB with Full Memory Caching for 100,000+ symbols
 Optimized for zero-config deployment with configurable session reset time (SESSION_EXPIRY_TIME)
 """
 
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Iterator, List, Optional, Tuple, Any
 from datetime import datetime, timedelta
 import time
+import threading
 from dataclasses import dataclass, field
 from collections import defaultdict
 import pytz
+from database.symbol_store import SymbolStore
+from database.symbol_search_index import SymbolSearchIndex
+from database.option_chain_index import OptionChainIndex
+from database.symbol_snapshot import load_snapshot, write_snapshot, prune_snapshots, snapshot_key
 from utils.logging import get_logger
 
 logger = get_logger(__name__)
 
+# Rows fetched per round trip when streaming the symtoken table
+LOAD_CHUNK_SIZE = 10000
+
+def _current_rss() -> int:
+    """Resident set size of this process in bytes (0 if unavailable)"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except Exception:
+        return 0
+
+def _stream_symtoken_rows(chunk_size: int = LOAD_CHUNK_SIZE) -> Iterator[list]:
+    """
+    Stream the symtoken table in chunks of plain row tuples
+    
+    Uses a Core select with yield_per so no ORM objects are built and only
+    one chunk of rows is held in memory at a time. Columns are selected in
+    SymbolStore.append argument order.
+    """
+    from sqlalchemy import select
+    from database.symbol import SymToken, db_session
+    
+    table = SymToken.__table__
+    stmt = select(
+        table.c.symbol, table.c.brsymbol, table.c.name, table.c.exchange,
+        table.c.brexchange, table.c.token, table.c.expiry, table.c.strike,
+        table.c.lotsize, table.c.instrumenttype, table.c.tick_size
+    ).execution_options(yield_per=chunk_size)
+    
+    result = db_session.execute(stmt)
+    try:
+        for partition in result.partitions():
+            yield partition
+    finally:
+        result.close()
+
+def _contract_snapshot_key(broker: str) -> Optional[str]:
+    """Snapshot key for the broker's current master contract download (None if not ready)"""
+    try:
+        from database.master_contract_status_db import get_contract_timestamp
+        download_time = get_contract_timestamp(broker)
+        return snapshot_key(download_time) if download_time else None
+    except Exception as e:
+        logger.debug(f"Master contract timestamp unavailable for {broker}: {e}")
+        return None
+
 @dataclass
 class CacheStats:
     """Statistics for cache performance monitoring"""
@@ -24,6 +75,12 @@ class CacheStats:
     last_loaded: Optional[datetime] = None
     total_symbols: int = 0
     memory_usage_mb: float = 0.0
+    load_time_seconds: float = 0.0
+    load_peak_rss_mb: float = 0.0
+    load_rss_delta_mb: float = 0.0
+    load_source: Optional[str] = None
+    search_index_mb: float = 0.0
+    option_index_mb: float = 0.0
     
     def get_hit_rate(self) -> float:
         """Calculate cache hit rate"""
@@ -41,12 +98,18 @@ class CacheStats:
             'cache_loads': self.cache_loads,
             'last_loaded': self.last_loaded.isoformat() if self.last_loaded else None,
             'total_symbols': self.total_symbols,
-            'memory_usage_mb': f"{self.memory_usage_mb:.2f}"
+            'memory_usage_mb': f"{self.memory_usage_mb:.2f}",
+            'load_time_seconds': f"{self.load_time_seconds:.3f}",
+            'load_peak_rss_mb': f"{self.load_peak_rss_mb:.2f}",
+            'load_rss_delta_mb': f"{self.load_rss_delta_mb:.2f}",
+            'load_source': self.load_source,
+            'search_index_mb': f"{self.search_index_mb:.2f}",
+            'option_index_mb': f"{self.option_index_mb:.2f}"
         }
 
-@dataclass
+@dataclass(slots=True)
 class SymbolData:
-    """Lightweight symbol data structure for in-memory storage"""
+    """Lightweight symbol data structure returned by cache lookups"""
     symbol: str
     brsymbol: str
     name: str
@@ -63,6 +126,9 @@ class BrokerSymbolCache:
     """
     High-performance in-memory cache for broker symbols
     Designed to handle 100,000+ symbols with minimal memory footprint
+    
+    Symbols are held in a columnar SymbolStore; SymbolData objects are only
+    materialized for callers that ask for the full record.
     """
     
     def __init__(self):
@@ -70,14 +136,16 @@ class BrokerSymbolCache:
         self.active_broker: Optional[str] = None
         self.cache_loaded: bool = False
         
-        # Primary storage - all symbols in memory
-        self.symbols: Dict[str, SymbolData] = {}
+        # Columnar storage with integer row id indexes
+        self.store = SymbolStore()
+        
+        # Search index over the store, built once per load
+        self.search_index: Optional[SymbolSearchIndex] = None
+        self._search_index_lock = threading.Lock()
         
-        # Multi-index maps for O(1) lookups
-        self.by_symbol_exchange: Dict[Tuple[str, str], SymbolData] = {}
-        self.by_token_exchange: Dict[Tuple[str, str], SymbolData] = {}
-        self.by_brsymbol_exchange: Dict[Tuple[str, str], SymbolData] = {}
-        self.by_token: Dict[str, SymbolData] = {}
+        # Option chain index over the store, built once per load
+        self.option_index: Optional[OptionChainIndex] = None
+        self._option_index_lock = threading.Lock()
         
         # Cache statistics
         self.stats = CacheStats()
@@ -92,77 +160,128 @@ class BrokerSymbolCache:
         """
         Load all symbols for the active broker into memory
         This is called once after master contract download
+        
+        A snapshot of the current master contract download is mapped when one
+        exists; otherwise the symtoken table is streamed and a snapshot written.
         """
         try:
-            from database.symbol import SymToken
-            
             start_time = time.time()
             logger.info(f"Loading all symbols for broker: {broker}")
             
             # Clear existing cache
             self.clear_cache()
             
-            # Query all symbols from database
-            symbols = SymToken.query.all()
+            rss_start = _current_rss()
+            key = _contract_snapshot_key(broker)
+            store = load_snapshot(broker, key) if key else None
+            
+            if store is not None:
+                source = 'snapshot'
+                rss_peak = max(rss_start, _current_rss())
+            else:
+                # Stream rows from the database straight into the columnar store
+                source = 'database'
+                store, rss_peak = self._build_store(_stream_symtoken_rows(), rss_start)
             
-            if not symbols:
+            if not len(store):
                 logger.warning(f"No symbols found in database for broker: {broker}")
                 return False
             
-            # Build in-memory structures
-            for sym in symbols:
-                # Create lightweight data object
-                symbol_data = SymbolData(
-                    symbol=sym.symbol,
-                    brsymbol=sym.brsymbol,
-                    name=sym.name,
-                    exchange=sym.exchange,
-                    brexchange=sym.brexchange,
-                    token=sym.token,
-                    expiry=sym.expiry,
-                    strike=sym.strike,
-                    lotsize=sym.lotsize,
-                    instrumenttype=sym.instrumenttype,
-                    tick_size=sym.tick_size
-                )
-                
-                # Store in primary dict
-                self.symbols[sym.token] = symbol_data
-                
-                # Build indexes
-                self.by_symbol_exchange[(sym.symbol, sym.exchange)] = symbol_data
-                self.by_token_exchange[(sym.token, sym.exchange)] = symbol_data
-                self.by_brsymbol_exchange[(sym.brsymbol, sym.exchange)] = symbol_data
-                self.by_token[sym.token] = symbol_data
+            self._activate(store, broker, source, time.time() - start_time, rss_start, rss_peak)
             
-            # Update cache metadata
-            self.active_broker = broker
-            self.cache_loaded = True
-            self.stats.total_symbols = len(symbols)
-            self.stats.cache_loads += 1
-            self.stats.last_loaded = datetime.now(pytz.timezone('Asia/Kolkata'))
+            if source == 'database' and key:
+                if write_snapshot(store, broker, key):
+                    prune_snapshots(broker, key)
             
-            # Calculate memory usage (rough estimate)
-            self.stats.memory_usage_mb = (
-                len(self.symbols) * 500  # ~500 bytes per symbol
-            ) / (1024 * 1024)
+            return True
             
-            load_time = time.time() - start_time
-            logger.info(
-                f"Successfully loaded {self.stats.total_symbols} symbols "
-                f"in {load_time:.2f} seconds. "
-                f"Memory usage: {self.stats.memory_usage_mb:.2f} MB"
-            )
+        except Exception as e:
+            logger.error(f"Error loading symbols into cache: {e}")
+            return False
+    
+    def warm_start(self) -> bool:
+        """
+        Map the snapshot of the most recent master contract download, if any
+        Lets a fresh process serve lookups without querying the symtoken table
+        """
+        try:
+            from database.master_contract_status_db import get_latest_ready_broker
             
-            # Set session timing
-            self._set_session_timing()
+            broker = get_latest_ready_broker()
+            key = _contract_snapshot_key(broker) if broker else None
+            if not key:
+                return False
             
+            start_time = time.time()
+            rss_start = _current_rss()
+            store = load_snapshot(broker, key)
+            if store is None or not len(store):
+                return False
+            
+            self._activate(store, broker, 'snapshot', time.time() - start_time,
+                           rss_start, max(rss_start, _current_rss()))
             return True
             
         except Exception as e:
-            logger.error(f"Error loading symbols into cache: {e}")
+            logger.error(f"Error warm starting symbol cache: {e}")
             return False
     
+    def _activate(self, store: SymbolStore, broker: str, source: str,
+                  load_time: float, rss_start: int, rss_peak: int):
+        """Install a loaded store and update cache metadata"""
+        self.store = store
+        
+        # Update cache metadata
+        self.active_broker = broker
+        self.cache_loaded = True
+        self.stats.total_symbols = len(store)
+        self.stats.cache_loads += 1
+        self.stats.last_loaded = datetime.now(pytz.timezone('Asia/Kolkata'))
+        self.stats.load_source = source
+        
+        # Measured size of the store (string table, columns and indexes)
+        self.stats.memory_usage_mb = store.memory_bytes() / (1024 * 1024)
+        
+        self.stats.load_time_seconds = load_time
+        self.stats.load_peak_rss_mb = rss_peak / (1024 * 1024)
+        self.stats.load_rss_delta_mb = max(rss_peak - rss_start, 0) / (1024 * 1024)
+        logger.info(
+            f"Successfully loaded {self.stats.total_symbols} symbols from {source} "
+            f"in {load_time:.2f} seconds. "
+            f"Memory usage: {self.stats.memory_usage_mb:.2f} MB, "
+            f"peak RSS during load: {self.stats.load_peak_rss_mb:.2f} MB"
+        )
+        
+        # Set session timing
+        self._set_session_timing()
+        
+        # Build the search and option chain indexes off the request path
+        threading.Thread(target=self._build_indexes, daemon=True).start()
+    
+    def _build_indexes(self):
+        """Build the derived indexes for the current store"""
+        self.get_option_index()
+        self.get_search_index()
+    
+    @staticmethod
+    def _build_store(chunks, rss_start: int = 0) -> Tuple[SymbolStore, int]:
+        """
+        Build a SymbolStore from an iterable of row chunks
+        
+        Returns the frozen store and the peak RSS (bytes) sampled after each chunk.
+        """
+        store = SymbolStore()
+        append = store.append
+        rss_peak = rss_start
+        
+        for chunk in chunks:
+            for row in chunk:
+                append(*row)
+            rss_peak = max(rss_peak, _current_rss())
+        
+        store.freeze()
+        return store, rss_peak
+    
     def _set_session_timing(self):
         """Set session start and next reset time from SESSION_EXPIRY_TIME env variable"""
         import os
@@ -193,81 +312,66 @@ class BrokerSymbolCache:
         now_ist = datetime.now(pytz.timezone('Asia/Kolkata'))
         return now_ist < self.next_reset_time
     
+    def _lookup(self, row: Optional[int]) -> Optional[int]:
+        """Record a hit or miss for an index lookup result"""
+        if row is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return row
+    
+    @staticmethod
+    def _symbol_data(store: SymbolStore, row: int) -> SymbolData:
+        """Materialize a SymbolData record from a store row"""
+        return SymbolData(**store.row_dict(row))
+    
     def get_token(self, symbol: str, exchange: str) -> Optional[str]:
         """Get token for symbol and exchange - O(1) lookup"""
-        self.stats.hits += 1
-        key = (symbol, exchange)
-        if key in self.by_symbol_exchange:
-            return self.by_symbol_exchange[key].token
-        
-        self.stats.hits -= 1
-        self.stats.misses += 1
-        return None
+        store = self.store
+        row = self._lookup(store.find_by_symbol(symbol, exchange))
+        return None if row is None else store.text('token', row)
     
     def get_symbol(self, token: str, exchange: str) -> Optional[str]:
         """Get symbol for token and exchange - O(1) lookup"""
-        self.stats.hits += 1
-        key = (token, exchange)
-        if key in self.by_token_exchange:
-            return self.by_token_exchange[key].symbol
-        
-        self.stats.hits -= 1
-        self.stats.misses += 1
-        return None
+        store = self.store
+        row = self._lookup(store.find_by_token(token, exchange))
+        return None if row is None else store.text('symbol', row)
     
     def get_br_symbol(self, symbol: str, exchange: str) -> Optional[str]:
         """Get broker symbol for symbol and exchange - O(1) lookup"""
-        self.stats.hits += 1
-        key = (symbol, exchange)
-        if key in self.by_symbol_exchange:
-            return self.by_symbol_exchange[key].brsymbol
-        
-        self.stats.hits -= 1
-        self.stats.misses += 1
-        return None
+        store = self.store
+        row = self._lookup(store.find_by_symbol(symbol, exchange))
+        return None if row is None else store.text('brsymbol', row)
     
     def get_oa_symbol(self, brsymbol: str, exchange: str) -> Optional[str]:
         """Get OpenAlgo symbol for broker symbol and exchange - O(1) lookup"""
-        self.stats.hits += 1
-        key = (brsymbol, exchange)
-        if key in self.by_brsymbol_exchange:
-            return self.by_brsymbol_exchange[key].symbol
-        
-        self.stats.hits -= 1
-        self.stats.misses += 1
-        return None
+        store = self.store
+        row = self._lookup(store.find_by_brsymbol(brsymbol, exchange))
+        return None if row is None else store.text('symbol', row)
     
     def get_brexchange(self, symbol: str, exchange: str) -> Optional[str]:
         """Get broker exchange for symbol and exchange - O(1) lookup"""
-        self.stats.hits += 1
-        key = (symbol, exchange)
-        if key in self.by_symbol_exchange:
-            return self.by_symbol_exchange[key].brexchange
-
-        self.stats.hits -= 1
-        self.stats.misses += 1
-        return None
+        store = self.store
+        row = self._lookup(store.find_by_symbol(symbol, exchange))
+        return None if row is None else store.text('brexchange', row)
 
     def get_symbol_info(self, symbol: str, exchange: str) -> Optional[SymbolData]:
         """Get full symbol data for symbol and exchange - O(1) lookup"""
-        self.stats.hits += 1
-        key = (symbol, exchange)
-        if key in self.by_symbol_exchange:
-            return self.by_symbol_exchange[key]
-
-        self.stats.hits -= 1
-        self.stats.misses += 1
-        return None
+        store = self.store
+        row = self._lookup(store.find_by_symbol(symbol, exchange))
+        return None if row is None else self._symbol_data(store, row)
 
     def get_symbol_data(self, token: str) -> Optional[SymbolData]:
         """Get complete symbol data by token - O(1) lookup"""
-        self.stats.hits += 1
-        if token in self.by_token:
-            return self.by_token[token]
-        
-        self.stats.hits -= 1
-        self.stats.misses += 1
-        return None
+        store = self.store
+        row = self._lookup(store.by_token.get(token))
+        return None if row is None else self._symbol_data(store, row)
+    
+    def iter_symbols(self) -> Iterator[SymbolData]:
+        """Iterate over every cached symbol as SymbolData records"""
+        store = self.store
+        for row in store.rows():
+            yield self._symbol_data(store, row)
     
     def get_tokens_bulk(self, symbol_exchange_pairs: List[Tuple[str, str]]) -> List[Optional[str]]:
         """
@@ -275,16 +379,12 @@ class BrokerSymbolCache:
         Optimized for performance with single pass
         """
         self.stats.bulk_queries += 1
+        store = self.store
         results = []
         
         for symbol, exchange in symbol_exchange_pairs:
-            key = (symbol, exchange)
-            if key in self.by_symbol_exchange:
-                results.append(self.by_symbol_exchange[key].token)
-                self.stats.hits += 1
-            else:
-                results.append(None)
-                self.stats.misses += 1
+            row = self._lookup(store.find_by_symbol(symbol, exchange))
+            results.append(None if row is None else store.text('token', row))
         
         return results
     
@@ -293,52 +393,76 @@ class BrokerSymbolCache:
         Bulk retrieve symbols for multiple token-exchange pairs
         """
         self.stats.bulk_queries += 1
+        store = self.store
         results = []
         
         for token, exchange in token_exchange_pairs:
-            key = (token, exchange)
-            if key in self.by_token_exchange:
-                results.append(self.by_token_exchange[key].symbol)
-                self.stats.hits += 1
-            else:
-                results.append(None)
-                self.stats.misses += 1
+            row = self._lookup(store.find_by_token(token, exchange))
+            results.append(None if row is None else store.text('symbol', row))
         
         return results
     
-    def search_symbols(self, query: str, exchange: Optional[str] = None, limit: int = 50) -> List[SymbolData]:
-        """
-        Search symbols by partial match
-        Returns list of matching SymbolData objects
-        """
-        query = query.upper()
-        matches = []
+    def get_search_index(self) -> SymbolSearchIndex:
+        """Get the search index for the current store, building it if needed"""
+        store = self.store
+        index = self.search_index
+        if index is not None and index.store is store:
+            return index
         
-        for symbol_data in self.symbols.values():
-            # Skip if exchange filter doesn't match
-            if exchange and symbol_data.exchange != exchange:
-                continue
-            
-            # Check for match in symbol, brsymbol, or name
-            if (query in symbol_data.symbol.upper() or 
-                query in symbol_data.brsymbol.upper() or 
-                (symbol_data.name and query in symbol_data.name.upper())):
-                matches.append(symbol_data)
-                
-                if len(matches) >= limit:
-                    break
+        with self._search_index_lock:
+            index = self.search_index
+            if index is None or index.store is not self.store:
+                start_time = time.time()
+                store = self.store
+                index = SymbolSearchIndex(store)
+                self.search_index = index
+                self.stats.search_index_mb = index.memory_bytes() / (1024 * 1024)
+                logger.info(
+                    f"Built symbol search index for {len(store)} symbols in "
+                    f"{time.time() - start_time:.2f} seconds ({self.stats.search_index_mb:.2f} MB)"
+                )
+        return index
+    
+    def get_option_index(self) -> OptionChainIndex:
+        """Get the option chain index for the current store, building it if needed"""
+        store = self.store
+        index = self.option_index
+        if index is not None and index.store is store:
+            return index
         
-        return matches
+        with self._option_index_lock:
+            index = self.option_index
+            if index is None or index.store is not self.store:
+                start_time = time.time()
+                store = self.store
+                index = OptionChainIndex(store)
+                self.option_index = index
+                self.stats.option_index_mb = index.memory_bytes() / (1024 * 1024)
+                logger.info(
+                    f"Built option chain index for {len(index.chains)} underlyings in "
+                    f"{time.time() - start_time:.2f} seconds ({self.stats.option_index_mb:.2f} MB)"
+                )
+        return index
+    
+    def search_symbols(self, query: str, exchange: Optional[str] = None, limit: Optional[int] = 50) -> List[SymbolData]:
+        """
+        Search symbols by partial match using the search index
+        Returns ranked list of matching SymbolData objects
+        """
+        index = self.get_search_index()
+        store = index.store
+        return [self._symbol_data(store, row) for row in index.search(query, exchange, limit)]
     
     def clear_cache(self):
         """Clear all cached data"""
-        self.symbols.clear()
-        self.by_symbol_exchange.clear()
-        self.by_token_exchange.clear()
-        self.by_brsymbol_exchange.clear()
-        self.by_token.clear()
+        self.store = SymbolStore()
+        self.search_index = None
+        self.option_index = None
         self.cache_loaded = False
         self.active_broker = None
+        self.stats.memory_usage_mb = 0.0
+        self.stats.search_index_mb = 0.0
+        self.stats.option_index_mb = 0.0
         logger.info("Cache cleared")
     
     def get_cache_info(self) -> dict:
@@ -361,6 +485,8 @@ def get_cache() -> BrokerSymbolCache:
     global _cache_instance
     if _cache_instance is None:
         _cache_instance = BrokerSymbolCache()
+        # Map the latest snapshot so a fresh process starts warm
+        _cache_instance.warm_start()
     return _cache_instance
 
 # Public API - Drop-in replacement for existing token_db functions
@@ -453,6 +579,16 @@ def get_symbol_info(symbol: str, exchange: str) -> Optional[SymbolData]:
     cache.stats.db_queries += 1
     return get_symbol_info_dbquery(symbol, exchange)
 
+def get_option_index() -> Optional[OptionChainIndex]:
+    """
+    Get the option chain index when the cache is loaded and valid
+    Returns None when callers should fall back to the database
+    """
+    cache = get_cache()
+    if cache.cache_loaded and cache.is_cache_valid():
+        return cache.get_option_index()
+    return None
+
 # Database fallback functions (imported from original token_db)
 def get_token_dbquery(symbol: str, exchange: str) -> Optional[str]:
     """Query database for token by symbol and exchange"""
@@ -50,6 +50,7 @@ class HistorySchema(Schema):
     ]))
     start_date = fields.Date(required=True, format='%Y-%m-%d')  # YYYY-MM-DD
     end_date = fields.Date(required=True, format='%Y-%m-%d')    # YYYY-MM-DD
+    format = fields.Str(missing='json', validate=validate.OneOf(["json", "columnar", "arrow", "parquet"]))
     # OI is now always included by default for F&O exchanges
 
 class DepthSchema(Schema):
@@ -1,9 +1,10 @@
 from flask_restx import Namespace, Resource
-from flask import request, jsonify, make_response
+from flask import request, jsonify, make_response, Response
 from marshmallow import ValidationError
 from limiter import limiter
 import os
 import traceback
+import orjson
 
 from .data_schemas import HistorySchema
 from services.history_service import get_history
@@ -18,6 +19,27 @@ logger = get_logger(__name__)
 # Initialize schema
 history_schema = HistorySchema()
 
+# Binary download formats: (mimetype, file extension)
+BINARY_FORMATS = {
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrow'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+def make_history_response(response_data, status_code, data_format, symbol, interval):
+    """Encode history data in the requested format"""
+    if status_code != 200 or data_format == 'json':
+        return make_response(jsonify(response_data), status_code)
+
+    if data_format in BINARY_FORMATS:
+        mimetype, extension = BINARY_FORMATS[data_format]
+        response = Response(response_data['data'], status=status_code, mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename="{symbol}_{interval}.{extension}"'
+        return response
+
+    # Columnar: orjson writes NumPy column arrays directly
+    body = orjson.dumps(response_data, option=orjson.OPT_SERIALIZE_NUMPY, default=str)
+    return Response(body, status=status_code, mimetype='application/json')
+
 @api.route('/', strict_slashes=False)
 class History(Resource):
     @limiter.limit(API_RATE_LIMIT)
@@ -33,6 +55,7 @@ class History(Resource):
             interval = history_data['interval']
             start_date = history_data['start_date']
             end_date = history_data['end_date']
+            data_format = history_data['format']
             
             # Call the service function to get historical data with API key
             success, response_data, status_code = get_history(
@@ -41,10 +64,11 @@ class History(Resource):
                 interval=interval,
                 start_date=start_date,
                 end_date=end_date,
-                api_key=api_key
+                api_key=api_key,
+                data_format=data_format
             )
             
-            return make_response(jsonify(response_data), status_code)
+            return make_history_response(response_data, status_code, data_format, symbol, interval)
 
         except ValidationError as err:
             return make_response(jsonify({
@@ -27,7 +27,7 @@ from database.sandbox_db import (
     db_session
 )
 from sandbox.fund_manager import FundManager
-from services.quotes_service import get_quotes
+from services.quotes_service import get_quotes, get_live_quote
 from database.auth_db import get_auth_token_broker
 from utils.logging import get_logger
 
@@ -106,6 +106,11 @@ class ExecutionEngine:
         Returns dict with ltp, high, low, open, close, etc.
         Returns None if quote cannot be fetched (permission error, API error, etc.)
         """
+        # Subscribed symbols are answered from the live feed without a DB lookup
+        quote_data = get_live_quote(symbol, exchange)
+        if quote_data is not None:
+            return quote_data
+
         try:
             # Get any user's API key for fetching quotes
             from database.auth_db import ApiKeys, decrypt_token
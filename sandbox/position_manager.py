@@ -25,7 +25,7 @@ from database.sandbox_db import (
 )
 from sandbox.fund_manager import FundManager
 from sandbox.holdings_manager import HoldingsManager
-from services.quotes_service import get_quotes
+from services.quotes_service import get_quotes, get_live_quote
 from utils.logging import get_logger
 
 logger = get_logger(__name__)
@@ -310,6 +310,11 @@ class PositionManager:
 
     def _fetch_quote(self, symbol, exchange):
         """Fetch real-time quote for a symbol using API key"""
+        # Subscribed symbols are answered from the live feed without a DB lookup
+        quote_data = get_live_quote(symbol, exchange)
+        if quote_data is not None:
+            return quote_data
+
         try:
             # Get any user's API key for fetching quotes
             from database.auth_db import ApiKeys, decrypt_token
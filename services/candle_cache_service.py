@@ -0,0 +1,112 @@
+"""
+Write-through candle cache
+
+Broker history fetches are written into the local candle store together with
+the time range they covered. A later request for the same series only asks the
+broker for the parts of its range that are not covered yet, then answers from
+the store.
+
+Fetch callbacks receive (start, end) in unix seconds and return a list of bars,
+or None when the broker call failed; failed ranges are not marked covered.
+"""
+
+import os
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import pytz
+
+from database.ohlc_db import get_candle_store
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Set to FALSE to always fetch history from the broker (callers check this)
+OHLC_CACHE_ENABLED = os.getenv('OHLC_CACHE_ENABLED', 'TRUE').upper() == 'TRUE'
+
+IST = pytz.timezone('Asia/Kolkata')
+
+FetchRange = Callable[[int, int], Optional[List[Any]]]
+
+
+def day_start(ts: int) -> int:
+    """Unix time of 00:00 IST on the day containing ts"""
+    day = datetime.fromtimestamp(ts, IST).date()
+    return int(IST.localize(datetime(day.year, day.month, day.day)).timestamp())
+
+
+def _as_date(value: Union[str, date]) -> date:
+    """Calendar date of a YYYY-MM-DD string, date or datetime (HistorySchema passes dates)"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def date_range(start_date: Union[str, date], end_date: Union[str, date]) -> Tuple[int, int]:
+    """[start, end] unix seconds spanning whole IST days from YYYY-MM-DD strings or dates"""
+    start = IST.localize(datetime.combine(_as_date(start_date), datetime.min.time()))
+    end = IST.localize(datetime.combine(_as_date(end_date) + timedelta(days=1), datetime.min.time()))
+    return int(start.timestamp()), int(end.timestamp()) - 1
+
+
+def _align_to_days(gaps: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Widen gaps to whole IST days and merge the ones that now touch"""
+    aligned: List[Tuple[int, int]] = []
+    for start, end in gaps:
+        start = day_start(start)
+        end = day_start(end) + 86400 - 1
+        if aligned and start <= aligned[-1][1] + 1:
+            aligned[-1] = (aligned[-1][0], max(aligned[-1][1], end))
+        else:
+            aligned.append((start, end))
+    return aligned
+
+
+def fill_missing(series: str, interval: str, start: int, end: int,
+                 fetch: FetchRange, whole_days: bool = False) -> List[Tuple[int, int]]:
+    """
+    Fetch and store the parts of [start, end] that are not covered yet
+
+    Args:
+        series: Store key of the series (e.g. 'NSE:SBIN-EQ' or 'fyers:NSE:SBIN')
+        interval: Interval string as stored
+        fetch: Broker fetch for a [start, end] range
+        whole_days: Widen gaps to whole IST days, for brokers that take dates
+
+    Returns:
+        list: [start, end] ranges fetched and stored; gaps whose fetch failed are left out
+    """
+    from services.candle_resampler import rollups
+
+    store = get_candle_store()
+    gaps = store.missing_ranges(series, interval, start, end)
+    if whole_days:
+        gaps = _align_to_days(gaps)
+
+    filled = []
+    for gap_start, gap_end in gaps:
+        candles = fetch(gap_start, gap_end)
+        if candles is None:
+            continue
+        written = store.store_range(series, interval, gap_start, gap_end, candles)
+        logger.debug(f"Candle cache: stored {written} bars for {series} {interval} [{gap_start}, {gap_end}]")
+        filled.append((gap_start, gap_end))
+
+    if filled:
+        # Rollups derived from this series must not miss the new bars
+        rollups.invalidate(series, interval, filled[0][0])
+    return filled
+
+
+def get_cached_candles(series: str, interval: str, start: int, end: int, fetch: FetchRange,
+                       whole_days: bool = False, include_oi: bool = False) -> List[Dict[str, Any]]:
+    """
+    Bars of [start, end] from the store after fetching the uncovered gaps
+
+    Returns:
+        list: Bars as {time, open, high, low, close, volume[, oi]} dicts
+    """
+    fill_missing(series, interval, start, end, fetch, whole_days)
+    return get_candle_store().get_candles(series, interval, start, end, include_oi=include_oi)
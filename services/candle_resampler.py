@@ -0,0 +1,277 @@
+"""
+Candle resampler
+
+Builds higher timeframes from stored base candles (1 minute for intraday
+targets, daily for weekly and monthly) with NumPy, so a chart can switch
+between 5, 15, 60 and 240 minute bars without another broker call.
+
+Intraday buckets are aligned to the exchange session start (09:15 IST for
+NSE/BSE equity and F&O, 09:00 IST for MCX and currency), matching the bars the
+brokers themselves return. Daily bars start at 00:00 IST, weekly bars on
+Monday and monthly bars on the 1st.
+
+Rollups are kept per series and target interval. Each refresh re-reads base
+bars only from the start of the last (still forming) bucket, so keeping a
+rollup current costs one short range query rather than a full resample.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from database.ohlc_db import get_candle_store, interval_seconds
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Set to FALSE to fetch every interval from the broker
+OHLC_RESAMPLE_ENABLED = os.getenv('OHLC_RESAMPLE_ENABLED', 'TRUE').upper() == 'TRUE'
+
+# Longest range (days) derived from 1 minute bars; longer ranges use broker bars
+RESAMPLE_MAX_DAYS = int(os.getenv('OHLC_RESAMPLE_MAX_DAYS', '30'))
+
+# Number of (series, interval) rollups kept in memory
+ROLLUP_CACHE_SIZE = int(os.getenv('OHLC_ROLLUP_CACHE_SIZE', '256'))
+
+IST_OFFSET = 19800  # +05:30
+DAY = 86400
+
+# Session start (seconds after 00:00 IST) per exchange
+SESSION_START = {
+    'NSE': 9 * 3600 + 15 * 60,
+    'BSE': 9 * 3600 + 15 * 60,
+    'NFO': 9 * 3600 + 15 * 60,
+    'BFO': 9 * 3600 + 15 * 60,
+    'NSE_INDEX': 9 * 3600 + 15 * 60,
+    'BSE_INDEX': 9 * 3600 + 15 * 60,
+    'MCX': 9 * 3600,
+    'CDS': 9 * 3600,
+    'BCD': 9 * 3600,
+}
+DEFAULT_SESSION_START = SESSION_START['NSE']
+
+
+class Bars(NamedTuple):
+    """Column arrays of a bar series in ascending time order"""
+    ts: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+    oi: np.ndarray
+
+    @classmethod
+    def empty(cls) -> 'Bars':
+        return cls(np.empty(0, dtype=np.int64), *(np.empty(0) for _ in range(6)))
+
+    @classmethod
+    def from_dicts(cls, bars: List[Dict[str, Any]]) -> 'Bars':
+        if not bars:
+            return cls.empty()
+        return cls(
+            np.fromiter((bar['time'] for bar in bars), dtype=np.int64, count=len(bars)),
+            *(np.fromiter((bar.get(field) or 0 for bar in bars), dtype=np.float64, count=len(bars))
+              for field in ('open', 'high', 'low', 'close', 'volume', 'oi'))
+        )
+
+    def to_dicts(self, include_oi: bool = False) -> List[Dict[str, Any]]:
+        fields = ['time', 'open', 'high', 'low', 'close', 'volume'] + (['oi'] if include_oi else [])
+        columns = [self.ts.tolist()] + [column.tolist() for column in self[1:len(fields)]]
+        return [dict(zip(fields, row)) for row in zip(*columns)]
+
+    def slice(self, start: Optional[int] = None, end: Optional[int] = None) -> 'Bars':
+        """Bars with start <= ts <= end"""
+        lo = 0 if start is None else int(np.searchsorted(self.ts, start, 'left'))
+        hi = len(self.ts) if end is None else int(np.searchsorted(self.ts, end, 'right'))
+        return Bars(*(column[lo:hi] for column in self))
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+
+def _period(interval: str) -> Tuple[str, int]:
+    """('D'|'W'|'M', 0) for calendar periods, otherwise ('', seconds)"""
+    text = str(interval).strip().upper()
+    if text in ('D', '1D'):
+        return 'D', 0
+    if text in ('W', '1W'):
+        return 'W', 0
+    if str(interval).strip() == 'M':
+        return 'M', 0
+    return '', interval_seconds(interval)
+
+
+def base_interval(interval: str, minute_label: str = '1') -> Optional[str]:
+    """
+    Base interval a target can be derived from
+
+    Args:
+        minute_label: How the caller labels 1 minute bars ('1' for charts, '1m' for the API)
+
+    Returns:
+        minute_label for intraday targets, 'D' for weekly/monthly, None if the
+        target is itself a base interval
+    """
+    period, seconds = _period(interval)
+    if period in ('W', 'M'):
+        return 'D'
+    if period == 'D' or seconds <= 60 or seconds % 60:
+        return None
+    return minute_label
+
+
+def bucket_starts(ts: np.ndarray, interval: str, exchange: str = 'NSE') -> np.ndarray:
+    """Start time of the target bar each timestamp falls in"""
+    local = ts.astype(np.int64) + IST_OFFSET
+    day = local - local % DAY
+    period, seconds = _period(interval)
+
+    if period == 'D':
+        start = day
+    elif period == 'W':
+        # 1970-01-01 was a Thursday: (days + 3) % 7 is the weekday with Monday = 0
+        days = day // DAY
+        start = (days - (days + 3) % 7) * DAY
+    elif period == 'M':
+        start = day.astype('datetime64[s]').astype('datetime64[M]').astype('datetime64[s]').astype(np.int64)
+    else:
+        session = SESSION_START.get(exchange.upper(), DEFAULT_SESSION_START)
+        offset = local - day - session
+        start = day + session + (offset // seconds) * seconds
+    return start - IST_OFFSET
+
+
+def resample(bars: Bars, interval: str, exchange: str = 'NSE') -> Bars:
+    """
+    Aggregate bars into a higher timeframe
+
+    Open is the first open, close and oi the last values, high/low the extremes
+    and volume the sum of each bucket. Input must be sorted by time.
+    """
+    if not len(bars):
+        return Bars.empty()
+    buckets = bucket_starts(bars.ts, interval, exchange)
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+    ends = np.concatenate((starts[1:], [len(buckets)])) - 1
+    return Bars(
+        buckets[starts],
+        bars.open[starts],
+        np.maximum.reduceat(bars.high, starts),
+        np.minimum.reduceat(bars.low, starts),
+        bars.close[ends],
+        np.add.reduceat(bars.volume, starts),
+        bars.oi[ends],
+    )
+
+
+def exchange_of(series: str) -> str:
+    """Exchange part of a series key ('NSE:SBIN-EQ' or 'broker:NSE:SBIN')"""
+    parts = series.split(':')
+    if len(parts) >= 3:
+        return parts[-2]
+    return parts[0] if len(parts) == 2 else 'NSE'
+
+
+def can_derive(interval: str, start: int, end: int, minute_label: str = '1') -> bool:
+    """Whether a request should be served by resampling stored base bars"""
+    base = base_interval(interval, minute_label)
+    if not OHLC_RESAMPLE_ENABLED or base is None:
+        return False
+    return base == 'D' or end - start <= RESAMPLE_MAX_DAYS * DAY
+
+
+class Rollup:
+    """Resampled series kept current from the base bars in the candle store"""
+
+    __slots__ = ('bars', 'base_start')
+
+    def __init__(self, bars: Bars, base_start: int):
+        self.bars = bars
+        self.base_start = base_start
+
+    def refresh(self, series: str, base: str, interval: str, exchange: str):
+        """Re-derive the last bucket and append any newer ones"""
+        tail_start = int(self.bars.ts[-1]) if len(self.bars) else self.base_start
+        tail = resample(Bars.from_dicts(get_candle_store().get_candles(series, base, start=tail_start,
+                                                                       include_oi=True)),
+                        interval, exchange)
+        keep = int(np.searchsorted(self.bars.ts, tail_start, 'left'))
+        self.bars = Bars(*(np.concatenate((old[:keep], new)) for old, new in zip(self.bars, tail)))
+
+
+class RollupCache:
+    """LRU of rollups keyed by (series, base interval, target interval)"""
+
+    def __init__(self, maxsize: int = ROLLUP_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._rollups: 'OrderedDict[Tuple[str, str, str], Rollup]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, series: str, base: str, interval: str, start: int, end: int,
+            include_oi: bool = False) -> List[Dict[str, Any]]:
+        """
+        Target bars of [start, end] derived from the stored base bars
+
+        The base range must already be in the store (see candle_cache_service).
+        """
+        exchange = exchange_of(series)
+        aligned_start = int(bucket_starts(np.array([start]), interval, exchange)[0])
+        key = (series, base, str(interval))
+
+        with self._lock:
+            rollup = self._rollups.get(key)
+            if rollup is None or aligned_start < rollup.base_start:
+                base_bars = Bars.from_dicts(get_candle_store().get_candles(
+                    series, base, start=aligned_start, include_oi=True))
+                rollup = Rollup(resample(base_bars, interval, exchange), aligned_start)
+                self._rollups[key] = rollup
+            else:
+                rollup.refresh(series, base, interval, exchange)
+            self._rollups.move_to_end(key)
+            while len(self._rollups) > self.maxsize:
+                self._rollups.popitem(last=False)
+            bars = rollup.bars
+
+        return bars.slice(aligned_start, end).to_dicts(include_oi)
+
+    def invalidate(self, series: str, base: str, since: int):
+        """Drop rollups of a base series whose completed buckets include bars at or after since"""
+        with self._lock:
+            for key in [key for key in self._rollups if key[0] == series and key[1] == base]:
+                bars = self._rollups[key].bars
+                if not len(bars) or since < bars.ts[-1]:
+                    del self._rollups[key]
+
+    def clear(self):
+        with self._lock:
+            self._rollups.clear()
+
+
+# Process-wide rollups shared by the chart routes and the history service
+rollups = RollupCache()
+
+
+def get_resampled_candles(series: str, interval: str, start: int, end: int, fetch,
+                          minute_label: str = '1', whole_days: bool = False,
+                          include_oi: bool = False) -> List[Dict[str, Any]]:
+    """
+    Bars of a higher timeframe built from cached base bars
+
+    Args:
+        fetch: Broker fetch for the base interval, called for uncovered ranges only
+        minute_label: How the caller labels 1 minute bars
+        whole_days: Widen fetched gaps to whole IST days
+
+    Returns:
+        list: Bars as {time, open, high, low, close, volume[, oi]} dicts
+    """
+    from services.candle_cache_service import fill_missing
+
+    base = base_interval(interval, minute_label)
+    aligned_start = int(bucket_starts(np.array([start]), interval, exchange_of(series))[0])
+    fill_missing(series, base, aligned_start, end, fetch, whole_days)
+    return rollups.get(series, base, interval, start, end, include_oi)
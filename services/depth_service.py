@@ -3,6 +3,7 @@ import traceback
 from typing import Tuple, Dict, Any, Optional, List, Union
 from database.auth_db import get_auth_token_broker, Auth, db_session, verify_api_key
 from utils.logging import get_logger
+from utils.single_flight import depth_flight
 
 # Initialize logger
 logger = get_logger(__name__)
@@ -35,6 +36,37 @@ def get_depth_with_auth(
 ) -> Tuple[bool, Dict[str, Any], int]:
     """
     Get market depth for a symbol using provided auth tokens.
+    Concurrent identical requests share one broker call (see utils.single_flight).
+    
+    Args:
+        auth_token: Authentication token for the broker API
+        feed_token: Feed token for market data (if required by broker)
+        broker: Name of the broker
+        symbol: Trading symbol
+        exchange: Exchange (e.g., NSE, BSE)
+        user_id: User ID for broker-specific functionality
+        
+    Returns:
+        Tuple containing:
+        - Success status (bool)
+        - Response data (dict)
+        - HTTP status code (int)
+    """
+    return depth_flight.do(
+        (broker, symbol, exchange),
+        lambda: fetch_depth_with_auth(auth_token, feed_token, broker, symbol, exchange, user_id)
+    )
+
+def fetch_depth_with_auth(
+    auth_token: str, 
+    feed_token: Optional[str], 
+    broker: str, 
+    symbol: str, 
+    exchange: str,
+    user_id: Optional[str] = None
+) -> Tuple[bool, Dict[str, Any], int]:
+    """
+    Fetch market depth for a symbol from the broker using provided auth tokens.
     
     Args:
         auth_token: Authentication token for the broker API
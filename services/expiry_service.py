@@ -1,5 +1,6 @@
 from database.symbol import SymToken, db_session
 from database.auth_db import verify_api_key
+from database.token_db import get_option_index
 from utils.logging import get_logger
 from typing import Tuple, Dict, Any, List
 from sqlalchemy import distinct, func
@@ -75,6 +76,18 @@ def get_expiry_dates(symbol: str, exchange: str, instrumenttype: str, api_key: s
         
         logger.info(f"Getting expiry dates for symbol: {symbol}, exchange: {exchange}, instrumenttype: {instrumenttype}")
         
+        # Answer from the in-memory option chain index when the symbol cache is loaded
+        option_index = get_option_index()
+        if option_index is not None:
+            expiry_dates = option_index.expiries(symbol, exchange, instrumenttype)
+            if expiry_dates:
+                logger.info(f"Found {len(expiry_dates)} expiry dates for symbol: {symbol} in symbol cache")
+                return True, {
+                    'status': 'success',
+                    'message': f'Found {len(expiry_dates)} expiry dates for {symbol} {instrumenttype} in {exchange}',
+                    'data': expiry_dates
+                }, 200
+        
         # Build query based on instrument type
         # For exact matching, we need to ensure the symbol starts with the underlying symbol
         # followed by a date pattern (for F&O instruments)
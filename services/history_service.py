@@ -2,12 +2,28 @@ import importlib
 import traceback
 import pandas as pd
 from typing import Tuple, Dict, Any, Optional, List, Union
+from datetime import date, datetime
 from database.auth_db import get_auth_token_broker
 from utils.logging import get_logger
+from utils.single_flight import history_flight
 
 # Initialize logger
 logger = get_logger(__name__)
 
+HISTORY_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume', 'oi']
+
+# Response data formats: per-row dicts, per-column arrays, or binary Arrow IPC / Parquet
+DATA_FORMATS = ('json', 'columnar', 'arrow', 'parquet')
+
+
+class _UncacheableHistory(Exception):
+    """Broker returned timestamps that are not unix seconds; carries the frame as is"""
+
+    def __init__(self, df: pd.DataFrame, interval: str):
+        super().__init__('history timestamps are not unix seconds')
+        self.df = df
+        self.interval = interval
+
 def import_broker_module(broker_name: str) -> Optional[Any]:
     """
     Dynamically import the broker-specific data module.
@@ -26,6 +42,106 @@ def import_broker_module(broker_name: str) -> Optional[Any]:
         logger.error(f"Error importing broker module '{module_path}': {error}")
         return None
 
+def get_history_cached(
+    data_handler: Any,
+    broker: str,
+    symbol: str,
+    exchange: str,
+    interval: str,
+    start_date: Union[str, date],
+    end_date: Union[str, date]
+) -> pd.DataFrame:
+    """
+    Get historical data through the local candle cache.
+
+    Only the days of the requested range that are not stored yet are fetched
+    from the broker; fetched bars are written back to the store. Short
+    intraday ranges are resampled from stored 1 minute bars and weekly/monthly
+    bars from daily ones, so every timeframe shares one set of broker fetches.
+
+    Returns:
+        DataFrame with timestamp, open, high, low, close, volume and oi columns
+    """
+    from services.candle_cache_service import IST, date_range, get_cached_candles
+    from services.candle_resampler import base_interval, can_derive, get_resampled_candles
+
+    def fetch(fetch_interval: str, range_from: int, range_to: int) -> List[Dict[str, Any]]:
+        frame = data_handler.get_history(
+            symbol,
+            exchange,
+            fetch_interval,
+            datetime.fromtimestamp(range_from, IST).strftime('%Y-%m-%d'),
+            datetime.fromtimestamp(range_to, IST).strftime('%Y-%m-%d')
+        )
+        if not isinstance(frame, pd.DataFrame):
+            raise ValueError("Invalid data format returned from broker")
+        if not frame.empty and not pd.api.types.is_integer_dtype(frame['timestamp']):
+            raise _UncacheableHistory(frame, fetch_interval)
+        return frame.to_dict(orient='records')
+
+    series = f"{broker}:{exchange}:{symbol}"
+    start, end = date_range(start_date, end_date)
+    try:
+        if can_derive(interval, start, end, minute_label='1m'):
+            base = base_interval(interval, minute_label='1m')
+            bars = get_resampled_candles(series, interval, start, end,
+                                         lambda range_from, range_to: fetch(base, range_from, range_to),
+                                         minute_label='1m', whole_days=True, include_oi=True)
+        else:
+            bars = get_cached_candles(series, interval, start, end,
+                                      lambda range_from, range_to: fetch(interval, range_from, range_to),
+                                      whole_days=True, include_oi=True)
+    except _UncacheableHistory as uncacheable:
+        logger.debug(f"History for {series} bypasses the candle cache: non-epoch timestamps")
+        if uncacheable.interval == interval:
+            return uncacheable.df
+        return data_handler.get_history(symbol, exchange, interval, start_date, end_date)
+
+    df = pd.DataFrame(bars, columns=['time', 'open', 'high', 'low', 'close', 'volume', 'oi'])
+    df = df.rename(columns={'time': 'timestamp'})
+    df[['volume', 'oi']] = df[['volume', 'oi']].fillna(0).astype('int64')
+    return df[HISTORY_COLUMNS]
+
+def to_columns(df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Column arrays of a history frame for the columnar response format.
+
+    Numeric columns stay NumPy arrays so the encoder can write them without
+    building per-row Python objects; datetime columns become epoch seconds.
+    """
+    columns = {}
+    for name in df.columns:
+        series = df[name]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            if getattr(series.dt, 'tz', None) is not None:
+                series = series.dt.tz_convert('UTC').dt.tz_localize(None)
+            series = series.astype('int64') // 10**9
+        values = series.to_numpy()
+        if values.dtype.kind in 'iufb':
+            columns[str(name)] = values if values.flags.c_contiguous else values.copy()
+        else:
+            columns[str(name)] = values.tolist()
+    return columns
+
+def to_arrow(df: pd.DataFrame, data_format: str) -> bytes:
+    """
+    Serialize a history frame as an Arrow IPC stream or a Parquet file.
+
+    Raises:
+        ImportError: If pyarrow is not installed
+    """
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    if data_format == 'parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(table, sink)
+    else:
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
 def get_history_with_auth(
     auth_token: str, 
     feed_token: Optional[str], 
@@ -34,10 +150,13 @@ def get_history_with_auth(
     exchange: str, 
     interval: str, 
     start_date: str, 
-    end_date: str
+    end_date: str,
+    data_format: str = 'json'
 ) -> Tuple[bool, Dict[str, Any], int]:
     """
     Get historical data for a symbol using provided auth tokens.
+    Concurrent identical requests share one broker call (see utils.single_flight);
+    the returned data must be treated as read-only.
     
     Args:
         auth_token: Authentication token for the broker API
@@ -48,7 +167,46 @@ def get_history_with_auth(
         interval: Time interval (e.g., 1m, 5m, 15m, 1h, 1d)
         start_date: Start date in YYYY-MM-DD format
         end_date: End date in YYYY-MM-DD format
-        include_oi: Whether to include Open Interest data (if supported by broker)
+        data_format: 'json' (list of row dicts), 'columnar' (dict of column arrays),
+                     'arrow' (Arrow IPC stream bytes) or 'parquet' (Parquet file bytes)
+        
+    Returns:
+        Tuple containing:
+        - Success status (bool)
+        - Response data (dict)
+        - HTTP status code (int)
+    """
+    return history_flight.do(
+        (broker, symbol, exchange, interval, str(start_date), str(end_date), data_format),
+        lambda: fetch_history_with_auth(auth_token, feed_token, broker, symbol, exchange,
+                                        interval, start_date, end_date, data_format)
+    )
+
+def fetch_history_with_auth(
+    auth_token: str, 
+    feed_token: Optional[str], 
+    broker: str, 
+    symbol: str, 
+    exchange: str, 
+    interval: str, 
+    start_date: str, 
+    end_date: str,
+    data_format: str = 'json'
+) -> Tuple[bool, Dict[str, Any], int]:
+    """
+    Fetch historical data for a symbol from the broker using provided auth tokens.
+    
+    Args:
+        auth_token: Authentication token for the broker API
+        feed_token: Feed token for market data (if required by broker)
+        broker: Name of the broker
+        symbol: Trading symbol
+        exchange: Exchange (e.g., NSE, BSE)
+        interval: Time interval (e.g., 1m, 5m, 15m, 1h, 1d)
+        start_date: Start date in YYYY-MM-DD format
+        end_date: End date in YYYY-MM-DD format
+        data_format: 'json' (list of row dicts), 'columnar' (dict of column arrays),
+                     'arrow' (Arrow IPC stream bytes) or 'parquet' (Parquet file bytes)
         
     Returns:
         Tuple containing:
@@ -76,14 +234,28 @@ def get_history_with_auth(
             # Fallback to just auth token if we can't inspect
             data_handler = broker_module.BrokerData(auth_token)
 
-        # Call the broker's get_history method
-        df = data_handler.get_history(
-            symbol,
-            exchange,
-            interval,
-            start_date,
-            end_date
-        )
+        from services.candle_cache_service import OHLC_CACHE_ENABLED
+
+        if OHLC_CACHE_ENABLED:
+            # Serve stored bars and fetch only the uncovered days
+            df = get_history_cached(
+                data_handler,
+                broker,
+                symbol,
+                exchange,
+                interval,
+                start_date,
+                end_date
+            )
+        else:
+            # Call the broker's get_history method
+            df = data_handler.get_history(
+                symbol,
+                exchange,
+                interval,
+                start_date,
+                end_date
+            )
         
         if not isinstance(df, pd.DataFrame):
             raise ValueError("Invalid data format returned from broker")
@@ -91,10 +263,23 @@ def get_history_with_auth(
         # Ensure all responses include 'oi' field, set to 0 if not present
         if 'oi' not in df.columns:
             df['oi'] = 0
+
+        if data_format == 'columnar':
+            data = to_columns(df)
+        elif data_format in ('arrow', 'parquet'):
+            try:
+                data = to_arrow(df, data_format)
+            except ImportError:
+                return False, {
+                    'status': 'error',
+                    'message': f'{data_format} format requires the pyarrow package'
+                }, 400
+        else:
+            data = df.to_dict(orient='records')
             
         return True, {
             'status': 'success',
-            'data': df.to_dict(orient='records')
+            'data': data
         }, 200
     except Exception as e:
         logger.error(f"Error in broker_module.get_history: {e}")
@@ -113,7 +298,8 @@ def get_history(
     api_key: Optional[str] = None, 
     auth_token: Optional[str] = None, 
     feed_token: Optional[str] = None, 
-    broker: Optional[str] = None
+    broker: Optional[str] = None,
+    data_format: str = 'json'
 ) -> Tuple[bool, Dict[str, Any], int]:
     """
     Get historical data for a symbol.
@@ -129,6 +315,7 @@ def get_history(
         auth_token: Direct broker authentication token (for internal calls)
         feed_token: Direct broker feed token (for internal calls)
         broker: Direct broker name (for internal calls)
+        data_format: Response data format, see get_history_with_auth
         
     Returns:
         Tuple containing:
@@ -152,7 +339,8 @@ def get_history(
             exchange, 
             interval, 
             start_date, 
-            end_date
+            end_date,
+            data_format
         )
     
     # Case 2: Direct internal call with auth_token and broker
@@ -165,7 +353,8 @@ def get_history(
             exchange, 
             interval, 
             start_date, 
-            end_date
+            end_date,
+            data_format
         )
     
     # Case 3: Invalid parameters
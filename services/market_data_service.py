@@ -9,7 +9,7 @@ from typing import Dict, List, Any, Optional, Callable, Set
 from collections import defaultdict
 from datetime import datetime
 from utils.logging import get_logger
-from .websocket_service import register_market_data_callback, get_websocket_connection
+from .websocket_service import get_websocket_connection
 
 # Initialize logger
 logger = get_logger(__name__)
@@ -54,6 +54,9 @@ class MarketDataService:
         self.subscribers = defaultdict(dict)
         self.subscriber_id_counter = 0
         
+        # {username: WebSocket client} whose market data already feeds this cache
+        self.registered_clients = {}
+        
         # User-specific data tracking
         # {user_id: {symbol_key: last_access_time}}
         self.user_access_tracking = defaultdict(dict)
@@ -63,6 +66,8 @@ class MarketDataService:
             'total_updates': 0,
             'cache_hits': 0,
             'cache_misses': 0,
+            'live_quote_hits': 0,
+            'live_quote_misses': 0,
             'last_cleanup': time.time()
         }
         
@@ -89,7 +94,8 @@ class MarketDataService:
                 return
                 
             symbol_key = f"{exchange}:{symbol}"
-            timestamp = int(time.time())
+            received_at = time.time()
+            timestamp = int(received_at)
             
             with self.data_lock:
                 # Initialize cache entry if needed
@@ -100,12 +106,14 @@ class MarketDataService:
                 
                 cache_entry = self.market_data_cache[symbol_key]
                 
-                # Update based on mode
+                # Update based on mode; received_at is the local receive time used
+                # to judge freshness (exchange timestamps vary by broker)
                 if mode == 1:  # LTP
                     cache_entry['ltp'] = {
                         'value': market_data.get('ltp', 0),
                         'timestamp': market_data.get('timestamp', timestamp),
-                        'volume': market_data.get('volume', 0)
+                        'volume': market_data.get('volume', 0),
+                        'received_at': received_at
                     }
                 elif mode == 2:  # Quote
                     cache_entry['quote'] = {
@@ -115,21 +123,38 @@ class MarketDataService:
                         'close': market_data.get('close', 0),
                         'ltp': market_data.get('ltp', 0),
                         'volume': market_data.get('volume', 0),
-                        'timestamp': market_data.get('timestamp', timestamp)
+                        'oi': market_data.get('oi', 0),
+                        'timestamp': market_data.get('timestamp', timestamp),
+                        'received_at': received_at
                     }
                     # Also update LTP from quote
                     cache_entry['ltp'] = {
                         'value': market_data.get('ltp', 0),
                         'timestamp': market_data.get('timestamp', timestamp),
-                        'volume': market_data.get('volume', 0)
+                        'volume': market_data.get('volume', 0),
+                        'received_at': received_at
                     }
                 elif mode == 3:  # Depth
                     cache_entry['depth'] = {
                         'buy': market_data.get('depth', {}).get('buy', []),
                         'sell': market_data.get('depth', {}).get('sell', []),
                         'ltp': market_data.get('ltp', 0),
-                        'timestamp': market_data.get('timestamp', timestamp)
+                        'timestamp': market_data.get('timestamp', timestamp),
+                        'received_at': received_at
                     }
+                    # Depth ticks carry the quote fields as well
+                    if 'open' in market_data:
+                        cache_entry['quote'] = {
+                            'open': market_data.get('open', 0),
+                            'high': market_data.get('high', 0),
+                            'low': market_data.get('low', 0),
+                            'close': market_data.get('close', 0),
+                            'ltp': market_data.get('ltp', 0),
+                            'volume': market_data.get('volume', 0),
+                            'oi': market_data.get('oi', 0),
+                            'timestamp': market_data.get('timestamp', timestamp),
+                            'received_at': received_at
+                        }
                 
                 cache_entry['last_update'] = timestamp
                 self.metrics['total_updates'] += 1
@@ -182,6 +207,56 @@ class MarketDataService:
         self.metrics['cache_misses'] += 1
         return None
     
+    def get_fresh_quote(self, symbol: str, exchange: str, max_age: float) -> Optional[Dict[str, Any]]:
+        """
+        Get a quote built from live ticks, in the shape broker REST quotes use
+        
+        Args:
+            symbol: Trading symbol
+            exchange: Exchange name
+            max_age: Maximum age of the quote tick in seconds
+            
+        Returns:
+            Dictionary with ask, bid, high, low, ltp, open, prev_close, volume and oi,
+            or None if the symbol has no quote tick received within max_age.
+            Bid and ask come from a depth tick of the same age, otherwise they are 0.
+        """
+        symbol_key = f"{exchange}:{symbol}"
+        cutoff = time.time() - max_age
+        
+        with self.data_lock:
+            entry = self.market_data_cache.get(symbol_key)
+            quote = entry.get('quote') if entry else None
+            if not quote or quote.get('received_at', 0) < cutoff:
+                self.metrics['live_quote_misses'] += 1
+                return None
+            self.metrics['live_quote_hits'] += 1
+            
+            ltp = quote['ltp']
+            volume = quote['volume']
+            ltp_entry = entry.get('ltp')
+            if ltp_entry and ltp_entry.get('received_at', 0) > quote['received_at']:
+                ltp = ltp_entry['value']
+                volume = ltp_entry.get('volume') or volume
+            
+            bid = ask = 0
+            depth = entry.get('depth')
+            if depth and depth.get('received_at', 0) >= cutoff:
+                bid = depth['buy'][0].get('price', 0) if depth['buy'] else 0
+                ask = depth['sell'][0].get('price', 0) if depth['sell'] else 0
+        
+        return {
+            'ask': ask,
+            'bid': bid,
+            'high': quote['high'],
+            'low': quote['low'],
+            'ltp': ltp,
+            'open': quote['open'],
+            'prev_close': quote['close'],
+            'volume': volume,
+            'oi': quote['oi']
+        }
+    
     def get_market_depth(self, symbol: str, exchange: str) -> Optional[Dict[str, Any]]:
         """
         Get market depth for a symbol
@@ -290,23 +365,40 @@ class MarketDataService:
         
         return False
     
-    def register_user_callback(self, username: str) -> bool:
+    def register_user_callback(self, username: str, client=None) -> bool:
         """
         Register market data callback for a specific user
         
+        Registration is tracked per WebSocket client, so a new client for the
+        user (regenerated API key, close_all_clients()) is registered again.
+        
         Args:
             username: Username
+            client: The user's WebSocket client (looked up when not given)
             
         Returns:
             Success status
         """
-        def user_callback(data):
-            try:
-                self.process_market_data(data)
-            except Exception as e:
-                logger.error(f"Error processing market data in callback: {e}")
+        if client is None:
+            success, client, error = get_websocket_connection(username)
+            if not success:
+                logger.error(f"Failed to register callback: {error}")
+                return False
+        
+        with self.data_lock:
+            if self.registered_clients.get(username) is client:
+                return True
+            self.registered_clients[username] = client
         
-        return register_market_data_callback(username, user_callback)
+        client.register_callback('market_data', self._on_market_data)
+        return True
+    
+    def _on_market_data(self, data):
+        """Market data callback of the registered WebSocket clients"""
+        try:
+            self.process_market_data(data)
+        except Exception as e:
+            logger.error(f"Error processing market data in callback: {e}")
     
     def track_user_access(self, user_id: int, symbol: str, exchange: str) -> None:
         """
@@ -335,6 +427,8 @@ class MarketDataService:
                 'cache_hits': self.metrics['cache_hits'],
                 'cache_misses': self.metrics['cache_misses'],
                 'hit_rate': round(hit_rate, 2),
+                'live_quote_hits': self.metrics['live_quote_hits'],
+                'live_quote_misses': self.metrics['live_quote_misses'],
                 'total_subscribers': sum(len(subs) for subs in self.subscribers.values())
             }
     
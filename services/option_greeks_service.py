@@ -5,8 +5,9 @@ for options across all supported exchanges (NFO, BFO, CDS, MCX)
 """
 
 import re
-from datetime import datetime
+from datetime import datetime, date
 from typing import Dict, Any, Tuple, Optional
+from database.token_db import get_option_index
 from utils.logging import get_logger
 
 # Import mibian for Black-Scholes calculations
@@ -81,20 +82,36 @@ def parse_option_symbol(symbol: str, exchange: str, custom_expiry_time: Optional
         opt_type: CE or PE
     """
     try:
-        # Pattern: SYMBOL + DD + MMM + YY + STRIKE + CE/PE
-        # Strike can have decimal point for currencies
-        match = re.match(r"([A-Z]+)(\d{2})([A-Z]{3})(\d{2})([\d.]+)(CE|PE)", symbol.upper())
+        # Contract details from the option chain index when the symbol cache is loaded
+        contract = None
+        option_index = get_option_index()
+        if option_index is not None:
+            row = option_index.store.find_by_symbol(symbol.upper(), exchange)
+            if row is not None:
+                contract = option_index.describe(row)
+
+        if contract is not None and contract[3] in ('CE', 'PE'):
+            base_symbol, expiry_date, strike, opt_type = contract
+        else:
+            # Pattern: SYMBOL + DD + MMM + YY + STRIKE + CE/PE
+            # Strike can have decimal point for currencies
+            match = re.match(r"([A-Z]+)(\d{2})([A-Z]{3})(\d{2})([\d.]+)(CE|PE)", symbol.upper())
 
-        if not match:
-            raise ValueError(f"Invalid option symbol format: {symbol}")
+            if not match:
+                raise ValueError(f"Invalid option symbol format: {symbol}")
 
-        base_symbol, day, month_str, year, strike_str, opt_type = match.groups()
+            base_symbol, day, month_str, year, strike_str, opt_type = match.groups()
 
-        # Month mapping
-        month_map = {
-            'JAN': 1, 'FEB': 2, 'MAR': 3, 'APR': 4, 'MAY': 5, 'JUN': 6,
-            'JUL': 7, 'AUG': 8, 'SEP': 9, 'OCT': 10, 'NOV': 11, 'DEC': 12
-        }
+            # Month mapping
+            month_map = {
+                'JAN': 1, 'FEB': 2, 'MAR': 3, 'APR': 4, 'MAY': 5, 'JUN': 6,
+                'JUL': 7, 'AUG': 8, 'SEP': 9, 'OCT': 10, 'NOV': 11, 'DEC': 12
+            }
+            expiry_date = date(int('20' + year), month_map[month_str], int(day))
+
+            # Convert strike to proper format
+            # Strike must be in same units as spot price for Black-Scholes
+            strike = float(strike_str)
 
         # Determine expiry time
         if custom_expiry_time:
@@ -126,17 +143,13 @@ def parse_option_symbol(symbol: str, exchange: str, custom_expiry_time: Optional
                 expiry_minute = 30
 
         expiry = datetime(
-            int('20' + year),
-            month_map[month_str],
-            int(day),
+            expiry_date.year,
+            expiry_date.month,
+            expiry_date.day,
             expiry_hour,
             expiry_minute
         )
 
-        # Convert strike to proper format
-        # Strike must be in same units as spot price for Black-Scholes
-        strike = float(strike_str)
-
         logger.info(f"Parsed symbol {symbol}: base={base_symbol}, expiry={expiry}, strike={strike}, type={opt_type}")
 
         return base_symbol, expiry, strike, opt_type.upper()
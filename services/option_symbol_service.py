@@ -23,6 +23,7 @@ from typing import Tuple, Dict, Any, Optional
 from datetime import datetime
 from database.auth_db import get_auth_token_broker
 from database.symbol import SymToken, db_session
+from database.token_db import get_option_index
 from services.quotes_service import get_quotes
 from utils.logging import get_logger
 
@@ -163,6 +164,32 @@ def construct_option_symbol(base_symbol: str, expiry_date: str, strike: float, o
     return option_symbol
 
 
+def find_option_in_index(option_index, base_symbol: str, expiry_date: str, strike: float,
+                         option_type: str, exchange: str) -> Optional[Dict[str, Any]]:
+    """
+    Find the option contract in the in-memory option chain index.
+
+    Args:
+        option_index: OptionChainIndex of the loaded symbol cache
+        base_symbol: Underlying like "NIFTY"
+        expiry_date: Expiry in DDMMMYY format like "28OCT25"
+        strike: Strike price
+        option_type: "CE" or "PE"
+        exchange: Exchange like "NFO", "BFO", "MCX", "CDS"
+
+    Returns:
+        Dictionary with symbol details or None if not listed
+    """
+    row = option_index.find_option(base_symbol, exchange, expiry_date, strike, option_type)
+    if row is None:
+        logger.warning(f"Option not found in symbol cache: {base_symbol} {expiry_date} {strike} {option_type} on {exchange}")
+        return None
+
+    details = option_index.store.row_dict(row)
+    logger.info(f"Found option in symbol cache: {details['symbol']} on {exchange}")
+    return details
+
+
 def find_option_in_database(option_symbol: str, exchange: str) -> Optional[Dict[str, Any]]:
     """
     Find the option symbol in the database and return its details.
@@ -333,8 +360,14 @@ def get_option_symbol(
         # Step 7: Map to options exchange
         options_exchange = get_option_exchange(quote_exchange)
 
-        # Step 8: Find option in database
-        option_details = find_option_in_database(option_symbol, options_exchange)
+        # Step 8: Find option in the symbol cache, or the database when it is not loaded
+        option_index = get_option_index()
+        if option_index is not None:
+            option_details = find_option_in_index(
+                option_index, base_symbol, final_expiry, target_strike, option_type, options_exchange
+            )
+        else:
+            option_details = find_option_in_database(option_symbol, options_exchange)
 
         if not option_details:
             logger.warning(f"Option symbol {option_symbol} not found in database for {options_exchange}")
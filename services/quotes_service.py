@@ -1,12 +1,39 @@
+import os
 import importlib
 import traceback
 from typing import Tuple, Dict, Any, Optional, Union
 from database.auth_db import get_auth_token_broker
 from utils.logging import get_logger
+from utils.single_flight import quotes_flight
 
 # Initialize logger
 logger = get_logger(__name__)
 
+# Quotes are answered from the live WebSocket feed when the symbol's last quote
+# tick is at most this old (milliseconds); 0 always asks the broker
+LIVE_QUOTE_MAX_AGE_MS = int(os.getenv('LIVE_QUOTE_MAX_AGE_MS', '2000'))
+
+def get_live_quote(symbol: str, exchange: str) -> Optional[Dict[str, Any]]:
+    """
+    Get a quote from the live market data cache.
+    
+    Args:
+        symbol: Trading symbol
+        exchange: Exchange (e.g., NSE, BSE)
+        
+    Returns:
+        Quote dictionary in the broker quote format, or None if the symbol is not
+        streaming or its last tick is older than LIVE_QUOTE_MAX_AGE_MS
+    """
+    if LIVE_QUOTE_MAX_AGE_MS <= 0:
+        return None
+    try:
+        from services.market_data_service import get_market_data_service
+        return get_market_data_service().get_fresh_quote(symbol, exchange, LIVE_QUOTE_MAX_AGE_MS / 1000)
+    except Exception as e:
+        logger.debug(f"Live quote lookup failed for {exchange}:{symbol}: {e}")
+        return None
+
 def import_broker_module(broker_name: str) -> Optional[Any]:
     """
     Dynamically import the broker-specific data module.
@@ -28,6 +55,37 @@ def import_broker_module(broker_name: str) -> Optional[Any]:
 def get_quotes_with_auth(auth_token: str, feed_token: Optional[str], broker: str, symbol: str, exchange: str) -> Tuple[bool, Dict[str, Any], int]:
     """
     Get real-time quotes for a symbol using provided auth tokens.
+    Symbols with a fresh live feed are answered from the market data cache;
+    concurrent identical broker requests share one call (see utils.single_flight).
+    
+    Args:
+        auth_token: Authentication token for the broker API
+        feed_token: Feed token for market data (if required by broker)
+        broker: Name of the broker
+        symbol: Trading symbol
+        exchange: Exchange (e.g., NSE, BSE)
+        
+    Returns:
+        Tuple containing:
+        - Success status (bool)
+        - Response data (dict)
+        - HTTP status code (int)
+    """
+    quotes = get_live_quote(symbol, exchange)
+    if quotes is not None:
+        return True, {
+            'status': 'success',
+            'data': quotes
+        }, 200
+
+    return quotes_flight.do(
+        (broker, symbol, exchange),
+        lambda: fetch_quotes_with_auth(auth_token, feed_token, broker, symbol, exchange)
+    )
+
+def fetch_quotes_with_auth(auth_token: str, feed_token: Optional[str], broker: str, symbol: str, exchange: str) -> Tuple[bool, Dict[str, Any], int]:
+    """
+    Fetch real-time quotes for a symbol from the broker using provided auth tokens.
     
     Args:
         auth_token: Authentication token for the broker API
@@ -198,6 +198,11 @@ def subscribe_to_symbols(username: str, broker: str, symbols: List[Dict[str, str
         result = client.subscribe(symbols, mode)
         
         if result.get('status') == 'success':
+            # Feed the shared market data cache so REST quote calls can be
+            # answered from live ticks
+            from .market_data_service import get_market_data_service
+            get_market_data_service().register_user_callback(username, client)
+            
             return True, {
                 'status': 'success',
                 'message': result.get('message'),
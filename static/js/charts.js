@@ -7,13 +7,14 @@ window.LWCharts = {
     // State variables (namespaced to prevent collisions)
     chart: null,
     candleSeries: null,
-    pollTimer: null,
+    socket: null,
+    liveRoom: null,
+    lastBar: null,
     lastFetchAt: 0,
     clientCache: {},
     currentFetchController: null,
 
     // Constants
-    POLL_MS: 10000,  // 10 seconds
     CACHE_TTL: 30,   // 30 seconds
 
     // ============ Utility Functions ============
@@ -229,6 +230,10 @@ try {
 
             // Set data on chart
             this.candleSeries.setData(candles);
+            this.lastBar = candles.length ? candles[candles.length - 1] : null;
+
+            // Live updates of the forming bar replace polling
+            this.subscribeLive(sym, interval);
 
             // Auto-scale
             this.chart.timeScale().fitContent();
@@ -252,6 +257,60 @@ try {
         }
     },
 
+    // ============ Live Candles ============
+
+    subscribeLive(sym, interval) {
+        if (typeof io === 'undefined') return;
+        if (!this.socket) {
+            this.socket = io();
+            this.socket.on('candle_update', bar => this.applyLiveBar(bar));
+            // Rooms are per connection: rejoin after a reconnect
+            this.socket.on('connect', () => {
+                if (this.liveRoom) this.socket.emit('subscribe', this.liveRoom);
+            });
+        }
+
+        const room = { symbol: sym, interval: String(interval) };
+        if (this.liveRoom && this.liveRoom.symbol === room.symbol && this.liveRoom.interval === room.interval) {
+            return;
+        }
+        if (this.liveRoom) {
+            this.socket.emit('unsubscribe', this.liveRoom);
+        }
+        this.liveRoom = room;
+        this.socket.emit('subscribe', room, ack => {
+            if (ack && ack.error) console.warn('[LWCharts] Live candles unavailable:', ack.error);
+        });
+    },
+
+    applyLiveBar(bar) {
+        const room = this.liveRoom;
+        if (!room || bar.symbol !== room.symbol || String(bar.interval) !== room.interval) return;
+
+        const last = this.lastBar;
+        if (last && bar.time < last.time) return;
+
+        let candle = {
+            time: bar.time,
+            open: bar.open,
+            high: bar.high,
+            low: bar.low,
+            close: bar.close
+        };
+        if (last && bar.time === last.time) {
+            // Same bar as loaded from history: keep its open and extremes
+            candle = {
+                time: last.time,
+                open: last.open,
+                high: Math.max(last.high, bar.high),
+                low: Math.min(last.low, bar.low),
+                close: bar.close
+            };
+        }
+        this.candleSeries.update(candle);
+        this.lastBar = candle;
+    },
+
     // ============ Event Handlers ============
 
 onResize() {
@@ -12,11 +12,17 @@ DISCLAIMER
 These templates are intended as drop-in starting points for simulated testing only. Adapt order API calls to your OpenAlgo client.
 """
 
+import os
+import sys
 import math
 import time
 from dataclasses import dataclass
 from typing import Dict, Any, Optional
 
+# Shared incremental indicators (charts_extension/charts/indicators.py)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from charts_extension.charts.indicators import ATR, RSI
+
 # -------------------------------
 # Helper utilities (shared)
 # -------------------------------
@@ -115,16 +121,8 @@ class MomentumBreakoutStrategy:
         self.state = {}
         self.atr = None
         self.avg_vol = None
-
-    def compute_atr(self, highs, lows, closes, period):
-        # simple ATR calculation; expects lists with newest at end
-        trs = []
-        for i in range(1, len(closes)):
-            tr = max(highs[i] - lows[i], abs(highs[i] - closes[i-1]), abs(lows[i] - closes[i-1]))
-            trs.append(tr)
-        if len(trs) < period:
-            return sum(trs)/len(trs) if trs else 0.0
-        return sum(trs[-period:]) / period
+        # Wilder ATR kept up to date bar by bar instead of recomputed over the history
+        self.atr_indicator = ATR(self.PARAMETERS['atr_period'])
 
     def on_bar(self, bar_history):
         """bar_history: list of dicts with keys ['t','open','high','low','close','volume'] sorted oldest->newest
@@ -132,14 +130,10 @@ class MomentumBreakoutStrategy:
         """
         if len(bar_history) < 20:
             return
-        highs = [b['high'] for b in bar_history]
-        lows = [b['low'] for b in bar_history]
-        closes = [b['close'] for b in bar_history]
-        volumes = [b['volume'] for b in bar_history]
+        volumes = [b['volume'] for b in bar_history[-20:]]
 
-        atr = self.compute_atr(highs, lows, closes, self.PARAMETERS['atr_period'])
-        self.atr = atr
-        self.avg_vol = sum(volumes[-20:])/20
+        self.atr = self.atr_indicator.sync(bar_history)
+        self.avg_vol = sum(volumes)/20
 
         last = bar_history[-1]
         prev = bar_history[-2]
@@ -191,6 +185,7 @@ class MeanReversionVWAPStrategy:
         if params:
             self.PARAMETERS.update(params)
         self.open_orders = {}
+        self.rsi_indicator = RSI(self.PARAMETERS['rsi_period'])
 
     def compute_vwap(self, bars):
         # bars: list oldest->newest
@@ -202,28 +197,13 @@ class MeanReversionVWAPStrategy:
             vol += b['volume']
         return pv/vol if vol>0 else bars[-1]['close']
 
-    def compute_rsi(self, closes, period):
-        if len(closes) < period+1:
-            return 50
-        gains = 0.0
-        losses = 0.0
-        for i in range(-period, 0):
-            diff = closes[i] - closes[i-1]
-            if diff>0: gains += diff
-            else: losses += abs(diff)
-        avg_gain = gains/period
-        avg_loss = losses/period if losses>0 else 1e-6
-        rs = avg_gain/avg_loss
-        rsi = 100 - (100/(1+rs))
-        return rsi
-
     def on_bar(self, bar_history):
         if len(bar_history) < self.PARAMETERS['vwap_lookback'] + 5:
             return
         lookback = self.PARAMETERS['vwap_lookback']
         vwap = self.compute_vwap(bar_history[-lookback:])
-        closes = [b['close'] for b in bar_history]
-        rsi = self.compute_rsi(closes, self.PARAMETERS['rsi_period'])
+        # Wilder RSI, updated with the new bar only
+        rsi = self.rsi_indicator.sync(bar_history)
         last = bar_history[-1]
 
         # price far above vwap and RSI overbought -> short via limit
@@ -0,0 +1,125 @@
+"""
+Test suite for fingerprint-based API key verification
+
+Tests:
+- A stored key is found by fingerprint and verified once
+- Keys stored before fingerprints existed are verified and backfilled
+- Rejected keys and cache hits are counted with their timings
+- The column is added to an existing api_keys table
+"""
+
+import sys
+import os
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.pool import NullPool
+
+# Add parent directory to path to import database modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+os.environ.setdefault('AUTH_CACHE_BACKEND', 'local')
+
+from database import auth_db
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    engine = create_engine(f'sqlite:///{tmp_path / "auth.db"}', poolclass=NullPool)
+    auth_db.db_session.remove()
+    auth_db.db_session.configure(bind=engine)
+    monkeypatch.setattr(auth_db, 'engine', engine)
+    auth_db.Base.metadata.create_all(engine)
+    auth_db.verified_api_key_cache.clear()
+    auth_db.invalid_api_key_cache.clear()
+    auth_db.reset_api_key_verify_stats()
+    yield engine
+    auth_db.db_session.remove()
+
+
+class CountingHasher:
+    """Argon2 hasher that counts verify calls"""
+
+    def __init__(self, hasher):
+        self.hasher = hasher
+        self.verifies = 0
+
+    def hash(self, password):
+        return self.hasher.hash(password)
+
+    def verify(self, hashed, password):
+        self.verifies += 1
+        return self.hasher.verify(hashed, password)
+
+
+def test_fingerprint_lookup(db, monkeypatch):
+    """Test that one Argon2 verification runs however many keys are stored"""
+    for i in range(5):
+        auth_db.upsert_api_key(f'user{i}', f'key-{i}')
+    hasher = CountingHasher(auth_db.ph)
+    monkeypatch.setattr(auth_db, 'ph', hasher)
+
+    assert auth_db.verify_api_key('key-4') == 'user4'
+    assert hasher.verifies == 1
+    assert auth_db.verify_api_key('key-4') == 'user4'
+    assert hasher.verifies == 1
+
+    stats = auth_db.get_api_key_verify_stats()
+    assert stats['fingerprint']['count'] == 1
+    assert stats['cache_hit']['count'] == 1
+    assert stats['fingerprint']['max_ms'] >= stats['fingerprint']['avg_ms'] > 0
+
+
+def test_legacy_rows_backfilled(db, monkeypatch):
+    """Test that a key without a fingerprint is verified and then fingerprinted"""
+    auth_db.upsert_api_key('olduser', 'old-key')
+    auth_db.upsert_api_key('newuser', 'new-key')
+    with db.begin() as conn:
+        conn.execute(text("UPDATE api_keys SET api_key_fingerprint = NULL WHERE user_id = 'olduser'"))
+    auth_db.db_session.remove()
+
+    assert auth_db.verify_api_key('old-key') == 'olduser'
+    assert auth_db.get_api_key_verify_stats()['legacy_scan']['count'] == 1
+
+    with db.connect() as conn:
+        stored = conn.execute(text("SELECT api_key_fingerprint FROM api_keys WHERE user_id = 'olduser'")).scalar()
+    assert stored == auth_db.api_key_fingerprint('old-key')
+
+    auth_db.verified_api_key_cache.clear()
+    assert auth_db.verify_api_key('old-key') == 'olduser'
+    assert auth_db.get_api_key_verify_stats()['fingerprint']['count'] == 1
+
+
+def test_rejected_keys(db, monkeypatch):
+    """Test that unknown keys are rejected without trying fingerprinted hashes"""
+    auth_db.upsert_api_key('user', 'real-key')
+    hasher = CountingHasher(auth_db.ph)
+    monkeypatch.setattr(auth_db, 'ph', hasher)
+
+    assert auth_db.verify_api_key('wrong-key') is None
+    assert auth_db.verify_api_key('wrong-key') is None
+    assert hasher.verifies == 0
+
+    stats = auth_db.get_api_key_verify_stats()
+    assert stats['rejected']['count'] == 1
+    assert stats['invalid_cache']['count'] == 1
+
+
+def test_column_added_to_existing_table(tmp_path, monkeypatch):
+    """Test that init adds the fingerprint column to an old api_keys table"""
+    engine = create_engine(f'sqlite:///{tmp_path / "old.db"}', poolclass=NullPool)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE api_keys (id INTEGER PRIMARY KEY, user_id VARCHAR NOT NULL UNIQUE, "
+            "api_key_hash TEXT NOT NULL, api_key_encrypted TEXT NOT NULL, created_at DATETIME)"
+        ))
+    monkeypatch.setattr(auth_db, 'engine', engine)
+
+    auth_db.ensure_api_key_fingerprint_column()
+    inspector = inspect(engine)
+    assert 'api_key_fingerprint' in [col['name'] for col in inspector.get_columns('api_keys')]
+    assert 'ix_api_keys_api_key_fingerprint' in [index['name'] for index in inspector.get_indexes('api_keys')]
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-v']))
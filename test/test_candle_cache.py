@@ -0,0 +1,191 @@
+"""
+Test suite for the write-through candle cache
+
+Tests:
+- Only uncovered ranges are fetched from the broker
+- Failed fetches are retried on the next request
+- A chunked download with one failed chunk leaves the whole range uncovered
+- History service answers repeated requests from the store
+- History service accepts the date objects HistorySchema produces
+"""
+
+import sys
+import os
+
+# Add parent directory to path to import service modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+import pandas as pd
+import pytest
+
+import database.ohlc_db as ohlc_db
+from database.ohlc_db import CandleStore
+from services import candle_cache_service
+from services.candle_cache_service import date_range, get_cached_candles
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    candle_store = CandleStore(str(tmp_path / 'ohlc.db'))
+    monkeypatch.setattr(ohlc_db, '_store', candle_store)
+    yield candle_store
+    candle_store.close()
+
+
+class RecordingFetch:
+    """Fake broker returning one bar per minute of the requested range"""
+
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    def __call__(self, start, end):
+        self.calls.append((start, end))
+        if self.fail:
+            return None
+        first = start + (-start % 60)
+        return [{'time': ts, 'open': 1, 'high': 2, 'low': 0.5, 'close': 1.5, 'volume': 10}
+                for ts in range(first, end + 1, 60)]
+
+
+def test_only_gaps_are_fetched(store):
+    """Test that a second, wider request fetches just the new part"""
+    fetch = RecordingFetch()
+
+    bars = get_cached_candles('NSE:SBIN-EQ', '1', 6000, 6599, fetch)
+    assert len(bars) == 10
+    assert fetch.calls == [(6000, 6599)]
+
+    bars = get_cached_candles('NSE:SBIN-EQ', '1', 5400, 6599, fetch)
+    assert [bar['time'] for bar in bars] == list(range(5400, 6600, 60))
+    assert fetch.calls[1:] == [(5400, 5999)]
+
+    get_cached_candles('NSE:SBIN-EQ', '1', 5400, 6599, fetch)
+    assert len(fetch.calls) == 2
+
+
+def test_failed_fetch_is_not_covered(store):
+    """Test that a failed broker call leaves the range to be fetched again"""
+    failing = RecordingFetch(fail=True)
+    assert get_cached_candles('NSE:SBIN-EQ', '1', 6000, 6599, failing) == []
+    assert store.get_coverage('NSE:SBIN-EQ', '1') == []
+
+    fetch = RecordingFetch()
+    assert len(get_cached_candles('NSE:SBIN-EQ', '1', 6000, 6599, fetch)) == 10
+    assert fetch.calls == [(6000, 6599)]
+
+
+def test_failed_chunk_is_fetched_again(store, monkeypatch):
+    """Test that a chunk failing after its retries does not mark the range as covered"""
+    from utils import history_scheduler
+    from utils.history_scheduler import HistoryChunkError, fetch_chunks
+
+    monkeypatch.setattr(history_scheduler, 'BACKOFF_INITIAL', 0.001)
+    monkeypatch.setenv('HISTORY_RATE_LIMIT_CHUNKTEST', '1000')
+    broker = RecordingFetch()
+    broken = {6300}
+
+    def fetch_chunk(chunk):
+        if chunk[0] in broken:
+            raise ConnectionError('broker unavailable')
+        return broker(*chunk)
+
+    def chunked_fetch(start, end):
+        # Same shape as a broker get_history: 5 minute chunks fetched through the scheduler
+        chunks = [(ts, min(ts + 299, end)) for ts in range(start, end + 1, 300)]
+        results = fetch_chunks('chunktest', chunks, fetch_chunk, max_workers=2, max_retries=1)
+        return [bar for bars in results for bar in bars]
+
+    with pytest.raises(HistoryChunkError):
+        get_cached_candles('NSE:SBIN-EQ', '1', 6000, 6599, chunked_fetch)
+    assert store.get_coverage('NSE:SBIN-EQ', '1') == []
+
+    broken.clear()
+    broker.calls.clear()
+    bars = get_cached_candles('NSE:SBIN-EQ', '1', 6000, 6599, chunked_fetch)
+    assert len(bars) == 10
+    assert broker.calls == [(6000, 6299), (6300, 6599)]
+
+
+def test_whole_day_gaps(store):
+    """Test that date-based fetches are widened to whole IST days"""
+    fetch = RecordingFetch()
+    start, end = date_range('2024-01-01', '2024-01-02')
+
+    get_cached_candles('fyers:NSE:SBIN', '1m', start + 3600, start + 7200, fetch, whole_days=True)
+    assert fetch.calls == [(start, start + 86400 - 1)]
+
+    get_cached_candles('fyers:NSE:SBIN', '1m', start, end, fetch, whole_days=True)
+    assert fetch.calls[1:] == [(start + 86400, end)]
+
+
+def test_history_service_uses_cache(store, monkeypatch):
+    """Test that repeated history requests call the broker once"""
+    from services.history_service import get_history_cached
+
+    class FakeBrokerData:
+        def __init__(self):
+            self.calls = []
+
+        def get_history(self, symbol, exchange, interval, start_date, end_date):
+            self.calls.append((start_date, end_date))
+            start, _ = date_range(start_date, start_date)
+            return pd.DataFrame({
+                'timestamp': [start + 33300, start + 33600],
+                'open': [1.0, 2.0], 'high': [2.0, 3.0], 'low': [0.5, 1.5], 'close': [1.5, 2.5],
+                'volume': [100, 200], 'oi': [0, 0]
+            })
+
+    handler = FakeBrokerData()
+    first = get_history_cached(handler, 'fyers', 'SBIN', 'NSE', '5m', '2024-01-01', '2024-01-01')
+    second = get_history_cached(handler, 'fyers', 'SBIN', 'NSE', '5m', '2024-01-01', '2024-01-01')
+
+    assert handler.calls == [('2024-01-01', '2024-01-01')]
+    assert list(first.columns) == ['timestamp', 'open', 'high', 'low', 'close', 'volume', 'oi']
+    assert first.to_dict(orient='records') == second.to_dict(orient='records')
+    assert second['volume'].tolist() == [100, 200]
+
+
+def test_history_service_accepts_dates(store):
+    """Test that datetime.date bounds (as parsed by HistorySchema) work like strings"""
+    from datetime import date
+    from services.history_service import get_history_cached
+
+    class FakeBrokerData:
+        def __init__(self):
+            self.calls = []
+
+        def get_history(self, symbol, exchange, interval, start_date, end_date):
+            self.calls.append((start_date, end_date))
+            start, _ = date_range(start_date, start_date)
+            return pd.DataFrame({
+                'timestamp': [start + 33300], 'open': [1.0], 'high': [2.0], 'low': [0.5],
+                'close': [1.5], 'volume': [100], 'oi': [0]
+            })
+
+    handler = FakeBrokerData()
+    df = get_history_cached(handler, 'fyers', 'SBIN', 'NSE', 'D', date(2024, 1, 1), date(2024, 1, 1))
+
+    assert handler.calls == [('2024-01-01', '2024-01-01')]
+    assert len(df) == 1
+    assert date_range(date(2024, 1, 1), date(2024, 1, 2)) == date_range('2024-01-01', '2024-01-02')
+
+
+def test_history_columnar_format():
+    """Test the columnar history encoding keeps numeric columns as arrays"""
+    import numpy as np
+    import orjson
+    from services.history_service import to_columns
+
+    df = pd.DataFrame({
+        'timestamp': pd.to_datetime([1704080700, 1704081000], unit='s').tz_localize('UTC').tz_convert('Asia/Kolkata'),
+        'open': [1.0, 2.0], 'close': [1.5, 2.5], 'volume': [100, 200], 'oi': [0, 0]
+    })
+    columns = to_columns(df)
+
+    assert isinstance(columns['open'], np.ndarray)
+    assert orjson.loads(orjson.dumps(columns, option=orjson.OPT_SERIALIZE_NUMPY)) == {
+        'timestamp': [1704080700, 1704081000], 'open': [1.0, 2.0], 'close': [1.5, 2.5],
+        'volume': [100, 200], 'oi': [0, 0]
+    }
@@ -0,0 +1,109 @@
+"""
+Test suite for the candle resampler
+
+Tests:
+- Session-aligned intraday buckets for NSE and MCX
+- Daily, weekly and monthly buckets in IST
+- Incremental rollups picking up new and revised base bars
+"""
+
+import sys
+import os
+
+# Add parent directory to path to import service modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+
+import database.ohlc_db as ohlc_db
+from database.ohlc_db import CandleStore
+from services.candle_resampler import (
+    Bars, RollupCache, base_interval, bucket_starts, exchange_of, resample
+)
+
+# 2024-01-01 00:00 IST (a Monday)
+DAY_START = 1704047400
+NSE_OPEN = DAY_START + 9 * 3600 + 15 * 60
+
+
+def _minute_bars(start, count):
+    return [
+        {'time': start + i * 60, 'open': 100 + i, 'high': 101 + i, 'low': 99 + i, 'close': 100.5 + i, 'volume': 10}
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    candle_store = CandleStore(str(tmp_path / 'ohlc.db'))
+    monkeypatch.setattr(ohlc_db, '_store', candle_store)
+    yield candle_store
+    candle_store.close()
+
+
+def test_session_aligned_buckets():
+    """Test that intraday buckets start at the exchange session open"""
+    ts = np.array([NSE_OPEN, NSE_OPEN + 14 * 60, NSE_OPEN + 15 * 60, NSE_OPEN + 60 * 60])
+
+    assert (bucket_starts(ts, '15', 'NSE') - NSE_OPEN).tolist() == [0, 0, 900, 3600]
+    assert (bucket_starts(ts, '60', 'NSE') - NSE_OPEN).tolist() == [0, 0, 0, 3600]
+
+    # MCX opens at 09:00, so 09:15 falls in the 09:00 hour
+    mcx = bucket_starts(np.array([NSE_OPEN]), '1h', 'MCX')
+    assert mcx.tolist() == [DAY_START + 9 * 3600]
+
+
+def test_calendar_buckets():
+    """Test daily, weekly and monthly buckets in IST"""
+    wednesday = DAY_START + 2 * 86400 + 12 * 3600
+    next_month = DAY_START + 31 * 86400 + 3600
+
+    assert bucket_starts(np.array([wednesday]), 'D').tolist() == [DAY_START + 2 * 86400]
+    assert bucket_starts(np.array([wednesday]), 'W').tolist() == [DAY_START]
+    assert bucket_starts(np.array([wednesday, next_month]), 'M').tolist() == [DAY_START, DAY_START + 31 * 86400]
+
+
+def test_resample_ohlcv():
+    """Test open/high/low/close/volume aggregation"""
+    bars = resample(Bars.from_dicts(_minute_bars(NSE_OPEN, 12)), '5', 'NSE')
+
+    assert (bars.ts - NSE_OPEN).tolist() == [0, 300, 600]
+    assert bars.open.tolist() == [100, 105, 110]
+    assert bars.high.tolist() == [105, 110, 112]
+    assert bars.low.tolist() == [99, 104, 109]
+    assert bars.close.tolist() == [104.5, 109.5, 111.5]
+    assert bars.volume.tolist() == [50, 50, 20]
+
+
+def test_base_interval_and_exchange():
+    """Test which targets derive from which base"""
+    assert base_interval('5') == '1'
+    assert base_interval('1h', minute_label='1m') == '1m'
+    assert base_interval('W') == base_interval('M') == 'D'
+    assert base_interval('D') is None
+    assert base_interval('1') is None
+    assert exchange_of('MCX:CRUDEOIL24JANFUT') == 'MCX'
+    assert exchange_of('fyers:NFO:NIFTY24JANFUT') == 'NFO'
+
+
+def test_rollup_refresh(store):
+    """Test that a rollup extends with new bars and revises the forming bucket"""
+    rollups = RollupCache()
+    store.upsert_candles('NSE:SBIN-EQ', '1', _minute_bars(NSE_OPEN, 7))
+
+    bars = rollups.get('NSE:SBIN-EQ', '1', '5', NSE_OPEN, NSE_OPEN + 3600)
+    assert [bar['time'] - NSE_OPEN for bar in bars] == [0, 300]
+    assert bars[1]['close'] == 106.5
+
+    # Revised last minute and new minutes after it
+    store.upsert_candles('NSE:SBIN-EQ', '1', [
+        {'time': NSE_OPEN + 360, 'open': 106, 'high': 200, 'low': 105, 'close': 150, 'volume': 10}
+    ] + _minute_bars(NSE_OPEN + 420, 5)[1:])
+    bars = rollups.get('NSE:SBIN-EQ', '1', '5', NSE_OPEN, NSE_OPEN + 3600)
+    assert [bar['time'] - NSE_OPEN for bar in bars] == [0, 300, 600]
+    assert bars[1]['high'] == 200
+    assert bars[1]['volume'] == 40
+
+    # Earlier start rebuilds the rollup from the store
+    assert rollups.get('NSE:SBIN-EQ', '1', '5', NSE_OPEN - 3600, NSE_OPEN + 3600) == bars
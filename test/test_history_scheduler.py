@@ -0,0 +1,92 @@
+"""
+Test suite for the shared history fetch scheduler
+
+Tests:
+- Date range chunking
+- Concurrent fetches reassembled in chunk order
+- 429 handling and retries of failing chunks
+- A download with a failed chunk raises instead of returning partial data
+- Token bucket pacing
+"""
+
+import sys
+import os
+import time
+import random
+import threading
+from datetime import datetime
+
+import pytest
+
+# Add parent directory to path to import utils modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import history_scheduler
+from utils.history_scheduler import HistoryChunkError, RateLimitError, TokenBucket, date_chunks, fetch_chunks
+
+os.environ['HISTORY_RATE_LIMIT_TESTBROKER'] = '1000'
+
+
+def test_date_chunks():
+    """Test that chunks cover the range without overlap"""
+    chunks = date_chunks(datetime(2024, 1, 1), datetime(2024, 3, 15), 30)
+    assert chunks == [('2024-01-01', '2024-01-30'), ('2024-01-31', '2024-02-29'), ('2024-03-01', '2024-03-15')]
+    assert date_chunks(datetime(2024, 1, 2), datetime(2024, 1, 1), 30) == []
+
+
+def test_results_in_chunk_order():
+    """Test that concurrent chunks come back in order"""
+    active = []
+    peak = [0]
+    lock = threading.Lock()
+
+    def fetch(chunk):
+        with lock:
+            active.append(chunk)
+            peak[0] = max(peak[0], len(active))
+        time.sleep(random.uniform(0, 0.02))
+        with lock:
+            active.remove(chunk)
+        return [chunk * 10, chunk * 10 + 1]
+
+    results = fetch_chunks('testbroker', list(range(12)), fetch, max_workers=4)
+    assert results == [[i * 10, i * 10 + 1] for i in range(12)]
+    assert peak[0] > 1
+
+
+def test_rate_limited_and_failing_chunks(monkeypatch):
+    """Test that 429s back off and retry, and a chunk that keeps failing fails the download"""
+    monkeypatch.setattr(history_scheduler, 'BACKOFF_INITIAL', 0.01)
+    attempts = {}
+
+    def fetch(chunk):
+        attempts[chunk] = attempts.get(chunk, 0) + 1
+        if chunk == 'throttled' and attempts[chunk] < 3:
+            raise RateLimitError(retry_after=0.01)
+        if chunk == 'broken':
+            raise ValueError('bad response')
+        return chunk
+
+    with pytest.raises(HistoryChunkError) as failure:
+        fetch_chunks('testbroker', ['ok', 'throttled', 'broken'], fetch, max_workers=2, max_retries=2)
+    assert failure.value.failed == ['broken']
+    assert failure.value.results == ['ok', 'throttled', None]
+    assert attempts == {'ok': 1, 'throttled': 3, 'broken': 3}
+    assert history_scheduler.get_rate_limiter('testbroker').rate_limited == 2
+
+
+def test_token_bucket_pacing():
+    """Test that the bucket spaces requests beyond the burst and halves on 429"""
+    bucket = TokenBucket(rate=50, burst=1)
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.09
+
+    bucket.on_rate_limited(retry_after=0.05)
+    assert bucket.rate == 25
+    start = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - start >= 0.04
+    bucket.on_success()
+    assert bucket.rate == 30
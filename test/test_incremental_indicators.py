@@ -0,0 +1,139 @@
+"""
+Test suite for the incremental chart indicators
+
+Tests:
+- Bar-by-bar updates match the vectorized backfill
+- Revising the forming bar gives the same result as sending it once
+- EMA/RSI match the previous pandas implementation
+- Engine only processes new bars on repeated calls
+- Spec parsing and output names
+"""
+
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add parent directory to path to import charts_extension modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from charts_extension.charts.indicators import (
+    ATR, EMA, RSI, VWAP, Bollinger, SuperTrend, IndicatorEngine,
+    attach_indicators, compute_ema, compute_rsi, output_names, parse_spec
+)
+
+INDICATORS = [(EMA, (20,)), (RSI, (14,)), (ATR, (14,)), (VWAP, ()), (Bollinger, (20, 2.0)), (SuperTrend, (10, 3.0))]
+
+
+def _columns(n=1500, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 1000 + np.cumsum(rng.normal(0, 2, n))
+    high = close + rng.random(n) * 3
+    low = close - rng.random(n) * 3
+    open_ = close + rng.normal(0, 1, n)
+    volume = rng.integers(1, 1000, n).astype(float)
+    # 5 minute bars spanning several IST sessions
+    times = 1700000000 + np.arange(n) * 60 * 5
+    return times, open_, high, low, close, volume
+
+
+def _bars(columns):
+    return [dict(time=int(t), open=o, high=h, low=l, close=c, volume=v) for t, o, h, l, c, v in zip(*columns)]
+
+
+def _as_array(values, outputs):
+    return np.array([(np.nan,) * outputs if value is None else
+                     (value if outputs > 1 else (value,)) for value in values], dtype=float)
+
+
+@pytest.mark.parametrize('cls,params', INDICATORS)
+def test_updates_match_backfill(cls, params):
+    """Test that incremental updates, including forming-bar revisions, match the batch path"""
+    t, o, h, l, c, v = _columns()
+    batch = cls(*params).backfill(t, o, h, l, c, v).reshape(len(t), -1)
+
+    indicator = cls(*params)
+    values = []
+    for i in range(len(t)):
+        # A tick on the forming bar, then its final values
+        indicator.update(int(t[i]), o[i], h[i] + 4, l[i] - 1, c[i] + 2, v[i] / 2)
+        values.append(indicator.update(int(t[i]), o[i], h[i], l[i], c[i], v[i]))
+    incremental = _as_array(values, len(cls.outputs))
+
+    assert np.array_equal(np.isnan(batch), np.isnan(incremental))
+    np.testing.assert_allclose(incremental, batch, rtol=1e-9, atol=1e-7)
+
+
+def test_matches_pandas():
+    """Test that EMA and RSI keep the values of the previous pandas implementation"""
+    t, o, h, l, c, v = _columns()
+    np.testing.assert_allclose(EMA(20).backfill(t, o, h, l, c, v), compute_ema(pd.Series(c), 20).values)
+    np.testing.assert_allclose(RSI(14).backfill(t, o, h, l, c, v),
+                               compute_rsi(pd.Series(c), 14).fillna(50).values)
+
+
+def test_backfill_then_continue():
+    """Test that an indicator continues correctly after a backfill"""
+    t, o, h, l, c, v = _columns()
+    full = SuperTrend().backfill(t, o, h, l, c, v)
+
+    indicator = SuperTrend()
+    indicator.backfill(t[:1000], o[:1000], h[:1000], l[:1000], c[:1000], v[:1000])
+    for i in range(1000, len(t)):
+        value = indicator.update(int(t[i]), o[i], h[i], l[i], c[i], v[i])
+    np.testing.assert_allclose(value, full[-1])
+
+
+def test_engine_processes_new_bars_only(monkeypatch):
+    """Test that repeated calls extend the running state instead of recomputing"""
+    bars = _bars(_columns(600))
+    engine = IndicatorEngine()
+    first = engine.compute('NSE:SBIN-EQ', '5', bars[:500], ['ema:20', 'bb:20:2'])
+    assert len(first['ema_20']) == 500
+    assert first['bb_20_2_upper'][18] is None and first['bb_20_2_upper'][19] is not None
+
+    updates = []
+    original = EMA.update
+
+    def counting_update(self, *args):
+        updates.append(args[0])
+        return original(self, *args)
+
+    monkeypatch.setattr(EMA, 'update', counting_update)
+    # Window moved forward by 10 bars, the last known bar revised
+    second = engine.compute('NSE:SBIN-EQ', '5', bars[10:510], ['ema:20'])
+    assert len(updates) == 11
+    assert len(second['ema_20']) == 500
+    assert second['ema_20'][:489] == first['ema_20'][10:499]
+
+    # A window reaching back before the kept history is backfilled
+    third = engine.compute('NSE:SBIN-EQ', '5', bars[:510], ['ema:20'])
+    np.testing.assert_allclose(third['ema_20'][10:], second['ema_20'])
+
+
+def test_attach_indicators():
+    """Test the chart helper keeps its keys and accepts further specs"""
+    bars = [{'date': '2024-01-01', 'open': 1, 'high': 2, 'low': 0.5, 'close': str(x), 'volume': 1}
+            for x in range(30)]
+    out = attach_indicators(bars, emas=[5, 10], rsi_period=14, specs=['atr:14'])
+    assert set(out) == {'ema_5', 'ema_10', 'rsi_14', 'atr_14'}
+    assert out['rsi_14'][0] == 50
+    assert attach_indicators([], emas=[5]) == {}
+
+
+def test_parse_spec():
+    """Test spec parsing, defaults and output names"""
+    assert parse_spec('EMA:50') == ('ema', (50,))
+    assert parse_spec('bb') == ('bb', (20, 2.0))
+    assert parse_spec('supertrend:7:2.5') == ('supertrend', (7, 2.5))
+    assert output_names('bb', (20, 2.0)) == ['bb_20_2_middle', 'bb_20_2_upper', 'bb_20_2_lower']
+    assert output_names('supertrend', (10, 3.0)) == ['supertrend_10_3', 'supertrend_10_3_direction']
+    for spec in ('macd', 'ema:x', 'ema:0', 'rsi:14:2'):
+        with pytest.raises(ValueError):
+            parse_spec(spec)
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-v']))
@@ -0,0 +1,110 @@
+"""
+Test suite for the cached chart instrument index
+
+Tests:
+- Search ranks symbol and name prefix matches before infix matches
+- Index reloaded only when the file changes
+- Paged /api/instruments responses
+- ETag revalidation and gzip encoding
+"""
+
+import sys
+import os
+import gzip
+import json
+
+import pytest
+from flask import Flask
+
+# Add parent directory to path to import charts_extension modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from charts_extension.charts import routes
+from charts_extension.charts.instrument_index import InstrumentIndex
+
+INSTRUMENTS = [
+    {'name': 'STATE BANK OF INDIA', 'symbol': 'NSE:SBIN-EQ'},
+    {'name': 'HDFC BANK', 'symbol': 'NSE:HDFCBANK-EQ'},
+    {'name': 'BANK NIFTY', 'symbol': 'NSE:NIFTYBANK-INDEX'},
+    {'name': 'AXIS BANK', 'symbol': 'NSE:AXISBANK-EQ'},
+    {'name': 'BANK OF BARODA', 'symbol': 'NSE:BANKBARODA-EQ'},
+] + [{'name': f'STOCK {i}', 'symbol': f'NSE:STK{i:05d}-EQ'} for i in range(3000)]
+
+
+def _write(path, instruments):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(instruments, f, indent=2)
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    path = tmp_path / 'instrument_index.json'
+    _write(path, INSTRUMENTS)
+    index = InstrumentIndex(str(path))
+    monkeypatch.setattr(routes, 'instrument_index', index)
+    return index
+
+
+@pytest.fixture
+def client(index):
+    app = Flask(__name__)
+    app.register_blueprint(routes.bp, url_prefix='/api')
+    return app.test_client()
+
+
+def test_search_ranking(index):
+    """Test prefix matches first, then infix matches in file order"""
+    results = index.get().search('bank')
+    assert [r['symbol'] for r in results] == [
+        'NSE:BANKBARODA-EQ', 'NSE:NIFTYBANK-INDEX', 'NSE:SBIN-EQ', 'NSE:HDFCBANK-EQ', 'NSE:AXISBANK-EQ'
+    ]
+    assert results[0] == {'symbol': 'NSE:BANKBARODA-EQ', 'name': 'BANK OF BARODA', 'type': 'EQUITY'}
+    assert len(index.get().search('STK', limit=25)) == 25
+    assert index.get().search('NO SUCH') == []
+
+
+def test_reload_on_change(index):
+    """Test that the file is parsed once per version"""
+    first = index.get()
+    assert index.get() is first
+    assert index.loads == 1
+
+    _write(index.path, INSTRUMENTS[:2])
+    os.utime(index.path, ns=(0, os.stat(index.path).st_mtime_ns + 1_000_000))
+    assert len(index.get()) == 2
+    assert index.loads == 2
+
+
+def test_instruments_paged(client):
+    """Test the full list and paged responses"""
+    full = client.get('/api/instruments').get_json()
+    assert full['count'] == len(INSTRUMENTS)
+    assert full['instruments'][0] == INSTRUMENTS[0]
+
+    page = client.get('/api/instruments?page=2&page_size=1000').get_json()
+    assert page['count'] == 1000
+    assert page['total'] == len(INSTRUMENTS)
+    assert page['pages'] == 4
+    assert page['instruments'] == INSTRUMENTS[1000:2000]
+
+    assert client.get('/api/instruments?page=0').status_code == 400
+    assert client.get('/api/instruments?page_size=x').status_code == 400
+
+
+def test_etag_and_gzip(client):
+    """Test conditional requests and compressed bodies"""
+    response = client.get('/api/instruments?page=1&page_size=500')
+    etag = response.headers['ETag']
+    assert response.status_code == 200
+
+    assert client.get('/api/instruments?page=1&page_size=500', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/api/instruments?page=2&page_size=500', headers={'If-None-Match': etag}).status_code == 200
+
+    compressed = client.get('/api/instruments', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert json.loads(gzip.decompress(compressed.data))['count'] == len(INSTRUMENTS)
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-v']))
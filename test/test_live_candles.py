@@ -0,0 +1,131 @@
+"""
+Test suite for the live chart candle aggregator
+
+Tests:
+- Ticks build the forming bar aligned to the session
+- Bar rollover sends the final state of the closed bar
+- Bar volume from cumulative day volume
+- Updates conflated per flush
+- Room reference counting and broker subscription hand-off
+- Instruments are released through the client that subscribed them
+- A failed subscribe is retried by the next join
+"""
+
+import sys
+import os
+
+import pytest
+
+# Add parent directory to path to import charts_extension modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from charts_extension.charts import live_candles
+from charts_extension.charts.live_candles import LiveCandleAggregator, room_name
+
+# 2024-01-01 09:15:00 IST
+SESSION_OPEN = 1704080700
+SBIN = 'NSE:SBIN-EQ'
+
+
+@pytest.fixture
+def aggregator(monkeypatch):
+    monkeypatch.setattr(live_candles, 'resolve_chart_symbol', lambda symbol: ('NSE', symbol.split(':')[1][:-3]))
+    monkeypatch.setattr(LiveCandleAggregator, 'start', lambda self: None)
+    sent = []
+    agg = LiveCandleAggregator(emit=lambda event, payload, room: sent.append((event, payload, room)))
+    agg.sent = sent
+    return agg
+
+
+def test_ticks_build_forming_bar(aggregator):
+    """Test that ticks update one bar per interval"""
+    aggregator.join('sid1', SBIN, '5')
+    for offset, ltp in ((10, 800.0), (70, 803.5), (130, 798.0), (200, 801.0)):
+        aggregator.on_tick('NSE', 'SBIN', {'ltp': ltp}, ts=SESSION_OPEN + offset)
+    aggregator.on_tick('NSE', 'TCS', {'ltp': 3500.0}, ts=SESSION_OPEN)
+
+    assert aggregator.flush() == 1
+    event, bar, room = aggregator.sent[0]
+    assert event == 'candle_update'
+    assert room == room_name(SBIN, '5')
+    assert bar == {'time': SESSION_OPEN, 'open': 800.0, 'high': 803.5, 'low': 798.0, 'close': 801.0,
+                   'volume': 0, 'symbol': SBIN, 'interval': '5'}
+
+
+def test_rollover_sends_closed_bar(aggregator):
+    """Test that a bar closing between flushes is sent before the new one"""
+    aggregator.join('sid1', SBIN, '5')
+    aggregator.on_tick('NSE', 'SBIN', {'ltp': 800.0}, ts=SESSION_OPEN + 10)
+    aggregator.on_tick('NSE', 'SBIN', {'ltp': 802.0}, ts=SESSION_OPEN + 290)
+    aggregator.on_tick('NSE', 'SBIN', {'ltp': 804.0}, ts=SESSION_OPEN + 301)
+    # Late tick of the closed bar is ignored
+    aggregator.on_tick('NSE', 'SBIN', {'ltp': 700.0}, ts=SESSION_OPEN + 299)
+
+    assert aggregator.flush() == 2
+    closed, forming = aggregator.sent[0][1], aggregator.sent[1][1]
+    assert (closed['time'], closed['close'], closed['low']) == (SESSION_OPEN, 802.0, 800.0)
+    assert (forming['time'], forming['open'], forming['close']) == (SESSION_OPEN + 300, 804.0, 804.0)
+
+
+def test_volume_from_day_volume(aggregator):
+    """Test that bar volume is the change in cumulative day volume"""
+    aggregator.join('sid1', SBIN, '1')
+    aggregator.on_tick('NSE', 'SBIN', {'ltp': 800.0, 'volume': 10000}, ts=SESSION_OPEN + 5)
+    aggregator.on_tick('NSE', 'SBIN', {'ltp': 800.5, 'volume': 10250}, ts=SESSION_OPEN + 30)
+    aggregator.on_tick('NSE', 'SBIN', {'ltp': 801.0, 'volume': 10400}, ts=SESSION_OPEN + 65)
+    aggregator.on_tick('NSE', 'SBIN', {'ltp': 801.5, 'volume': 10500}, ts=SESSION_OPEN + 70)
+
+    aggregator.flush()
+    assert [payload['volume'] for _, payload, _ in aggregator.sent] == [250, 250]
+
+
+def test_updates_conflated(aggregator):
+    """Test that a flush sends only bars that changed"""
+    aggregator.join('sid1', SBIN, '5')
+    aggregator.join('sid1', SBIN, '15')
+    for i in range(50):
+        aggregator.on_tick('NSE', 'SBIN', {'ltp': 800.0 + i}, ts=SESSION_OPEN + i)
+    assert aggregator.flush() == 2
+    assert {room for _, _, room in aggregator.sent} == {room_name(SBIN, '5'), room_name(SBIN, '15')}
+    assert aggregator.flush() == 0
+
+
+def test_room_refcounts(aggregator):
+    """Test that the broker subscription follows the first join and the last leave"""
+    assert aggregator.join('sid1', SBIN, '5') == ('NSE', 'SBIN')
+    assert aggregator.subscribed(('NSE', 'SBIN'), ('alice', 'zerodha'), True) is None
+    assert aggregator.join('sid2', SBIN, '5') is None
+    assert aggregator.join('sid2', SBIN, '15') is None
+    assert aggregator.rooms() == {room_name(SBIN, '5'): 2, room_name(SBIN, '15'): 1}
+
+    # sid2 (another user) leaves last; the release goes to the subscribing client
+    assert aggregator.leave('sid1', SBIN, '5') is None
+    assert aggregator.leave_all('sid2') == [(('NSE', 'SBIN'), ('alice', 'zerodha'))]
+    assert aggregator.rooms() == {}
+
+    aggregator.on_tick('NSE', 'SBIN', {'ltp': 800.0}, ts=SESSION_OPEN)
+    assert aggregator.flush() == 0
+
+    with pytest.raises(ValueError):
+        aggregator.join('sid1', SBIN, 'xyz')
+
+
+
+def test_failed_subscribe_retried(aggregator):
+    """Test that a failed subscribe is retried and a late success is released"""
+    instrument = ('NSE', 'SBIN')
+    assert aggregator.join('sid1', SBIN, '5') == instrument
+    assert aggregator.subscribed(instrument, ('alice', 'zerodha'), False) is None
+    assert aggregator.join('sid2', SBIN, '5') == instrument
+    assert aggregator.join('sid3', SBIN, '15') is None
+
+    # Every room closed before the subscribe returned
+    assert aggregator.leave('sid1', SBIN, '5') is None
+    assert aggregator.leave('sid2', SBIN, '5') is None
+    assert aggregator.leave('sid3', SBIN, '15') is None
+    assert aggregator.subscribed(instrument, ('bob', 'angel'), True) == ('bob', 'angel')
+    assert aggregator.join('sid1', SBIN, '5') == instrument
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-v']))
@@ -0,0 +1,137 @@
+"""
+Test suite for answering quotes from the live market data cache
+
+Tests:
+- Quote ticks converted to the broker quote format
+- Bid/ask taken from fresh depth ticks
+- Stale or missing ticks fall back to the broker
+- get_quotes_with_auth skips the broker for streaming symbols
+- The tick callback is registered once per WebSocket client
+"""
+
+import sys
+import os
+import time
+
+# Add parent directory to path to import services modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+from services import quotes_service
+from services.market_data_service import get_market_data_service
+
+QUOTE_TICK = {
+    'symbol': 'SBIN',
+    'exchange': 'NSE',
+    'mode': 2,
+    'data': {'ltp': 801.5, 'open': 795.0, 'high': 805.0, 'low': 790.0, 'close': 793.0,
+             'volume': 120000, 'oi': 0},
+}
+
+DEPTH_TICK = {
+    'symbol': 'SBIN',
+    'exchange': 'NSE',
+    'mode': 3,
+    'data': {'ltp': 801.6, 'open': 795.0, 'high': 805.0, 'low': 790.0, 'close': 793.0,
+             'volume': 120100, 'oi': 0,
+             'depth': {'buy': [{'price': 801.5, 'quantity': 10}],
+                       'sell': [{'price': 801.7, 'quantity': 12}]}},
+}
+
+
+def setup_function():
+    get_market_data_service().clear_cache()
+
+
+def test_quote_from_live_tick():
+    """Test that a quote tick is returned in the broker quote format"""
+    service = get_market_data_service()
+    service.process_market_data(QUOTE_TICK)
+
+    quote = service.get_fresh_quote('SBIN', 'NSE', 2)
+    assert quote == {'ask': 0, 'bid': 0, 'high': 805.0, 'low': 790.0, 'ltp': 801.5,
+                     'open': 795.0, 'prev_close': 793.0, 'volume': 120000, 'oi': 0}
+
+
+def test_depth_supplies_bid_ask():
+    """Test that depth ticks fill in the best bid and ask"""
+    service = get_market_data_service()
+    service.process_market_data(DEPTH_TICK)
+
+    quote = service.get_fresh_quote('SBIN', 'NSE', 2)
+    assert quote['bid'] == 801.5
+    assert quote['ask'] == 801.7
+    assert quote['ltp'] == 801.6
+
+
+def test_stale_tick_not_used():
+    """Test that ticks older than the bound are ignored"""
+    service = get_market_data_service()
+    service.process_market_data(QUOTE_TICK)
+    time.sleep(0.06)
+
+    assert service.get_fresh_quote('SBIN', 'NSE', 0.05) is None
+    assert service.get_fresh_quote('TCS', 'NSE', 2) is None
+
+
+def test_get_quotes_uses_live_cache(monkeypatch):
+    """Test that streaming symbols do not reach the broker"""
+    broker_calls = []
+
+    def fetch(*args):
+        broker_calls.append(args)
+        return True, {'status': 'success', 'data': {'ltp': 1.0}}, 200
+
+    monkeypatch.setattr(quotes_service, 'fetch_quotes_with_auth', fetch)
+    quotes_service.quotes_flight.clear()
+
+    get_market_data_service().process_market_data(QUOTE_TICK)
+    success, response, status = quotes_service.get_quotes_with_auth('token', None, 'zerodha', 'SBIN', 'NSE')
+    assert success and status == 200
+    assert response['data']['ltp'] == 801.5
+    assert broker_calls == []
+
+    success, response, status = quotes_service.get_quotes_with_auth('token', None, 'zerodha', 'TCS', 'NSE')
+    assert response['data'] == {'ltp': 1.0}
+    assert len(broker_calls) == 1
+
+    monkeypatch.setattr(quotes_service, 'LIVE_QUOTE_MAX_AGE_MS', 0)
+    quotes_service.get_quotes_with_auth('token', None, 'zerodha', 'SBIN', 'NSE')
+    assert len(broker_calls) == 2
+
+
+
+class FakeClient:
+    """WebSocket client that records registered callbacks"""
+
+    def __init__(self):
+        self.callbacks = []
+
+    def register_callback(self, event_type, callback):
+        self.callbacks.append((event_type, callback))
+
+
+def test_callback_registered_per_client():
+    """Test that a replacement client for the same user is registered again"""
+    service = get_market_data_service()
+    first, second = FakeClient(), FakeClient()
+
+    assert service.register_user_callback('alice', first)
+    assert service.register_user_callback('alice', first)
+    assert len(first.callbacks) == 1
+
+    # e.g. the API key was regenerated or close_all_clients() ran
+    assert service.register_user_callback('alice', second)
+    assert len(second.callbacks) == 1
+
+    event_type, callback = second.callbacks[0]
+    assert event_type == 'market_data'
+    callback(QUOTE_TICK)
+    assert service.get_fresh_quote('SBIN', 'NSE', 2)['ltp'] == 801.5
+    service.registered_clients.pop('alice')
+
+
+if __name__ == '__main__':
+    import pytest
+    sys.exit(pytest.main([__file__, '-v']))
@@ -0,0 +1,136 @@
+"""
+Test suite for the local OHLC candle store
+
+Tests:
+- Bulk upsert and in-place replacement of existing bars
+- NaN volume and open interest from pandas frames stored as 0
+- Range and most-recent-N queries
+- Migration from the legacy ohlc_data table
+"""
+
+import sys
+import os
+import sqlite3
+
+import pandas as pd
+
+# Add parent directory to path to import database modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.ohlc_db import CandleStore
+
+
+def _bars(start, count, step=60):
+    return [
+        {'time': start + i * step, 'open': 100 + i, 'high': 101 + i, 'low': 99 + i, 'close': 100.5 + i, 'volume': 10 * i}
+        for i in range(count)
+    ]
+
+
+def test_upsert_and_range_queries(tmp_path):
+    """Test bulk upsert, ordering and range filters"""
+    store = CandleStore(str(tmp_path / 'ohlc.db'))
+
+    assert store.upsert_candles('SBIN', '1', _bars(1000, 10)) == 10
+    store.upsert_candles('SBIN', '5', _bars(1000, 3, step=300))
+    store.upsert_candles('INFY', '1', [(1000, 1, 2, 0.5, 1.5, 7)])
+
+    bars = store.get_candles('SBIN', '1')
+    assert [bar['time'] for bar in bars] == [1000 + i * 60 for i in range(10)]
+    assert bars[3] == {'time': 1180, 'open': 103.0, 'high': 104.0, 'low': 102.0, 'close': 103.5, 'volume': 30.0}
+
+    assert [bar['time'] for bar in store.get_candles('SBIN', '1', start=1120, end=1240)] == [1120, 1180, 1240]
+    assert [bar['time'] for bar in store.get_candles('SBIN', '1', limit=2)] == [1480, 1540]
+    assert store.get_candles('INFY', '1')[0]['volume'] == 7.0
+    assert store.get_time_range('SBIN', '5') == (1000, 1600)
+    assert store.get_time_range('TCS', '1') is None
+    store.close()
+
+
+def test_upsert_replaces_existing_bar(tmp_path):
+    """Test that re-writing a bar updates it instead of duplicating it"""
+    store = CandleStore(str(tmp_path / 'ohlc.db'))
+
+    store.upsert_candles('SBIN', '1', _bars(1000, 5))
+    store.upsert_candles('SBIN', '1', [{'timestamp': 1060, 'open': 1, 'high': 2, 'low': 0.5, 'close': 1.5, 'volume': None}])
+
+    assert store.count('SBIN', '1') == 5
+    assert store.get_candles('SBIN', '1', start=1060, end=1060)[0]['close'] == 1.5
+    assert store.delete_candles('SBIN', '1', start=1180) == 2
+    assert store.count('SBIN', '1') == 3
+    store.close()
+
+
+def test_nan_volume_stored_as_zero(tmp_path):
+    """Test that NaN volume/oi from a broker frame does not break the NOT NULL columns"""
+    store = CandleStore(str(tmp_path / 'ohlc.db'))
+    frame = pd.DataFrame({'timestamp': [1000, 1060], 'open': [1.0, 2.0], 'high': [1.5, 2.5], 'low': [0.5, 1.5],
+                          'close': [1.2, 2.2], 'volume': [float('nan'), 5.0], 'oi': [3.0, float('nan')]})
+
+    assert store.store_range('NIFTY', '1', 1000, 1060, frame.to_dict(orient='records'), now=10000) == 2
+    assert store.upsert_candles('NIFTY', '1', [(1120, 1, 2, 0.5, 1.5, float('nan'), float('nan'))]) == 1
+
+    bars = store.get_candles('NIFTY', '1', include_oi=True)
+    assert [(bar['volume'], bar['oi']) for bar in bars] == [(0.0, 3.0), (5.0, 0.0), (0.0, 0.0)]
+    store.close()
+
+
+def test_legacy_table_migration(tmp_path):
+    """Test that bars in the old ohlc_data table are copied on first open"""
+    path = str(tmp_path / 'ohlc.db')
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE ohlc_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, symbol TEXT NOT NULL, interval TEXT NOT NULL,
+            timestamp INTEGER NOT NULL, open REAL NOT NULL, high REAL NOT NULL,
+            low REAL NOT NULL, close REAL NOT NULL, volume REAL
+        )
+    """)
+    conn.execute("INSERT INTO ohlc_data (symbol, interval, timestamp, open, high, low, close, volume) "
+                 "VALUES ('SBIN', '5', 1000, 1, 2, 0.5, 1.5, NULL)")
+    conn.commit()
+    conn.close()
+
+    store = CandleStore(path)
+    assert store.get_candles('SBIN', '5') == [
+        {'time': 1000, 'open': 1.0, 'high': 2.0, 'low': 0.5, 'close': 1.5, 'volume': 0.0}
+    ]
+    store.close()
+
+
+def test_coverage_merge_and_missing_ranges(tmp_path):
+    """Test that stored ranges merge and only uncovered parts are reported"""
+    store = CandleStore(str(tmp_path / 'ohlc.db'))
+    now = 100000
+
+    store.store_range('SBIN', '1', 1000, 1599, _bars(1000, 10), now=now)
+    store.store_range('SBIN', '1', 3000, 3599, _bars(3000, 10), now=now)
+    assert store.get_coverage('SBIN', '1') == [(1000, 1599), (3000, 3599)]
+    assert store.missing_ranges('SBIN', '1', 500, 4000) == [(500, 999), (1600, 2999), (3600, 4000)]
+    assert store.missing_ranges('SBIN', '1', 1100, 1500) == []
+
+    # Adjacent and overlapping ranges collapse into one interval
+    store.store_range('SBIN', '1', 1600, 3100, [], now=now)
+    assert store.get_coverage('SBIN', '1') == [(1000, 3599)]
+
+    # The still-forming last bar is never marked covered
+    store.store_range('SBIN', '1', 99000, 100000, _bars(99000, 5), now=now)
+    assert store.get_coverage('SBIN', '1')[-1] == (99000, 99940)
+    assert store.count('SBIN', '1') == 25
+
+    store.delete_candles('SBIN', '1')
+    assert store.get_coverage('SBIN', '1') == []
+    store.close()
+
+
+def test_interval_seconds():
+    """Test chart and API interval strings"""
+    from database.ohlc_db import interval_seconds
+
+    assert interval_seconds('5') == 300
+    assert interval_seconds('5m') == 300
+    assert interval_seconds('1h') == 3600
+    assert interval_seconds('30s') == 30
+    assert interval_seconds('D') == interval_seconds('1D') == 86400
+    assert interval_seconds('W') == 604800
+    assert interval_seconds('M') == 30 * 86400
@@ -0,0 +1,84 @@
+"""
+Test suite for the option chain index
+
+Tests:
+- Option lookup by (underlying, expiry, strike, type)
+- Expiry listing in chronological order
+- Chain enumeration in strike order
+- Contract description of a row
+"""
+
+import sys
+import os
+from datetime import date
+
+# Add parent directory to path to import database modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.symbol_store import SymbolStore
+from database.option_chain_index import OptionChainIndex
+
+
+def _index():
+    store = SymbolStore()
+    rows = [
+        ('NIFTY05DEC2424000CE', 'NIFTY', 'NFO', '2001', '05-DEC-24', 24000.0, 'OPTIDX'),
+        ('NIFTY28NOV2424500CE', 'NIFTY', 'NFO', '1004', '28-NOV-24', 24500.0, 'OPTIDX'),
+        ('NIFTY28NOV2424000CE', 'NIFTY', 'NFO', '1002', '28-NOV-24', 24000.0, 'OPTIDX'),
+        ('NIFTY28NOV2424000PE', 'NIFTY', 'NFO', '1003', '28-NOV-24', 24000.0, 'OPTIDX'),
+        ('NIFTY28NOV24FUT', 'NIFTY', 'NFO', '1000', '28-NOV-24', None, 'FUTIDX'),
+        ('NIFTYNXT5028NOV2470000CE', 'NIFTYNXT50', 'NFO', '3001', '28-NOV-24', 70000.0, 'OPTIDX'),
+        ('M&M28NOV243000PE', 'M&M', 'NFO', '4001', '28-NOV-24', 3000.0, 'OPTSTK'),
+        ('USDINR27NOV2483.5CE', 'USDINR', 'CDS', '5001', '27-NOV-24', 83.5, 'OPTCUR'),
+        ('NIFTY', 'NIFTY', 'NSE_INDEX', '26000', None, None, 'INDEX'),
+    ]
+    for symbol, name, exchange, token, expiry, strike, instrumenttype in rows:
+        store.append(symbol, symbol, name, exchange, exchange, token, expiry, strike, 1, instrumenttype, 0.05)
+    store.freeze()
+    return store, OptionChainIndex(store)
+
+
+def test_find_option():
+    """Test structured contract lookup"""
+    store, index = _index()
+
+    assert store.text('symbol', index.find_option('NIFTY', 'NFO', '28NOV24', 24000, 'PE')) == 'NIFTY28NOV2424000PE'
+    assert store.text('symbol', index.find_option('nifty', 'nfo', '28nov24', 24500.0, 'CE')) == 'NIFTY28NOV2424500CE'
+    assert store.text('symbol', index.find_option('NIFTYNXT50', 'NFO', '28NOV24', 70000, 'CE')) == 'NIFTYNXT5028NOV2470000CE'
+    assert store.text('symbol', index.find_option('M&M', 'NFO', '28NOV24', 3000, 'PE')) == 'M&M28NOV243000PE'
+    assert store.text('symbol', index.find_option('USDINR', 'CDS', '27NOV24', 83.5, 'CE')) == 'USDINR27NOV2483.5CE'
+
+    assert index.find_option('NIFTY', 'NFO', '28NOV24', 24500, 'PE') is None
+    assert index.find_option('NIFTY', 'NFO', '28NOV24', 24100, 'CE') is None
+    assert index.find_option('NIFTY', 'BFO', '28NOV24', 24000, 'CE') is None
+    assert index.find_option('NIFTY', 'NFO', 'BADDATE', 24000, 'CE') is None
+
+
+def test_expiries():
+    """Test expiry listing by instrument type"""
+    _, index = _index()
+
+    assert index.expiries('NIFTY', 'NFO', 'options') == ['28-NOV-24', '05-DEC-24']
+    assert index.expiries('NIFTY', 'NFO', 'futures') == ['28-NOV-24']
+    assert index.expiries('BANKNIFTY', 'NFO', 'options') == []
+
+
+def test_chain_enumeration():
+    """Test strikes are ordered with their CE/PE rows"""
+    store, index = _index()
+
+    chain = index.get_expiry_chain('NIFTY', 'NFO', '28NOV24')
+    assert list(chain.strikes) == [24000.0, 24500.0]
+    assert store.text('symbol', chain.row(0, 'CE')) == 'NIFTY28NOV2424000CE'
+    assert chain.row(1, 'PE') is None
+
+
+def test_describe():
+    """Test per-row contract description"""
+    store, index = _index()
+
+    row = store.find_by_symbol('NIFTY28NOV2424000PE', 'NFO')
+    assert index.describe(row) == ('NIFTY', date(2024, 11, 28), 24000.0, 'PE')
+    row = store.find_by_symbol('NIFTY28NOV24FUT', 'NFO')
+    assert index.describe(row) == ('NIFTY', date(2024, 11, 28), None, 'FUT')
+    assert index.describe(store.find_by_symbol('NIFTY', 'NSE_INDEX')) is None
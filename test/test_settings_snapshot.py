@@ -0,0 +1,104 @@
+"""
+Test suite for the in-memory settings snapshot
+
+Tests:
+- get_analyze_mode and the other getters run no queries once loaded
+- set_* functions replace the snapshot and bump its version
+- Another worker reloads after a change is published
+- Without a shared backend, other workers reload after the local TTL
+"""
+
+import sys
+import os
+import time
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import NullPool
+
+# Add parent directory to path to import database modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+os.environ.setdefault('AUTH_CACHE_BACKEND', 'local')
+
+from database import settings_db
+from database.settings_db import SettingsSnapshot
+from database.shared_cache import CacheRegistry
+
+
+@pytest.fixture
+def queries(tmp_path, monkeypatch):
+    """Bind the settings tables to a temporary file; returns the executed statements"""
+    engine = create_engine(f'sqlite:///{tmp_path / "settings.db"}', poolclass=NullPool)
+    statements = []
+    event.listen(engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    settings_db.db_session.remove()
+    settings_db.db_session.configure(bind=engine)
+    settings_db.Base.metadata.create_all(engine)
+    monkeypatch.setattr(settings_db, 'snapshot', SettingsSnapshot(CacheRegistry('local')))
+    yield statements
+    settings_db.db_session.remove()
+
+
+def test_no_queries_after_load(queries):
+    """Test that repeated reads are served from memory"""
+    assert settings_db.get_analyze_mode() is False
+    loaded = len(queries)
+    assert loaded > 0
+
+    for _ in range(100):
+        settings_db.get_analyze_mode()
+    settings_db.get_security_settings()
+    settings_db.get_smtp_settings()
+    assert len(queries) == loaded
+
+
+def test_set_replaces_snapshot(queries):
+    """Test that committed changes are visible without a reload"""
+    settings_db.get_analyze_mode()
+    version = settings_db.snapshot.version
+
+    settings_db.set_analyze_mode(True)
+    settings_db.set_security_settings(threshold_api=5)
+    writes = len(queries)
+
+    assert settings_db.get_analyze_mode() is True
+    assert settings_db.get_security_settings()['api_threshold'] == 5
+    assert settings_db.snapshot.version == version + 2
+    assert len(queries) == writes
+
+
+def test_other_worker_reloads(queries, tmp_path, monkeypatch):
+    """Test that a change made by one worker reaches another one"""
+    path = str(tmp_path / 'auth_cache.db')
+    writer = SettingsSnapshot(CacheRegistry('sqlite', sync_ms=0, db_path=path))
+    reader = SettingsSnapshot(CacheRegistry('sqlite', sync_ms=0, db_path=path))
+    monkeypatch.setattr(settings_db, 'snapshot', writer)
+
+    assert reader.get()['analyze_mode'] is False
+    assert writer.get()['analyze_mode'] is False
+    settings_db.set_analyze_mode(True)
+
+    version = reader.version
+    assert reader.get()['analyze_mode'] is True
+    assert reader.version == version + 1
+
+
+
+def test_unshared_workers_reload(queries, monkeypatch):
+    """Test that a change reaches a worker without a shared backend"""
+    writer = SettingsSnapshot(CacheRegistry('local'))
+    reader = SettingsSnapshot(CacheRegistry('local'), local_ttl_ms=50)
+    monkeypatch.setattr(settings_db, 'snapshot', writer)
+
+    assert reader.get()['analyze_mode'] is False
+    settings_db.set_analyze_mode(True)
+    assert reader.get()['analyze_mode'] is False
+
+    time.sleep(0.06)
+    assert reader.get()['analyze_mode'] is True
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-v']))
@@ -0,0 +1,199 @@
+"""
+Test suite for the shared auth cache
+
+Tests:
+- An entry cached by one worker is read by another from the shared store
+- Invalidating a user drops only that user's entries, in every worker
+- Shared values are encrypted
+- auth_db invalidates one user's cached keys and broker session
+- A short-TTL write never shortens the Redis user key set under a long-TTL entry
+"""
+
+import sys
+import os
+import sqlite3
+
+import pytest
+from cryptography.fernet import Fernet
+
+# Add parent directory to path to import database modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+os.environ.setdefault('AUTH_CACHE_BACKEND', 'local')
+
+from database.shared_cache import CacheRegistry, UserCache, RedisCacheBackend
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """Two processes' worth of caches over one shared SQLite file"""
+    path = str(tmp_path / 'auth_cache.db')
+    cipher = Fernet(Fernet.generate_key())
+    result = []
+    for _ in range(2):
+        registry = CacheRegistry('sqlite', sync_ms=0, db_path=path)
+        result.append({
+            'registry': registry,
+            'keys': UserCache('api_key', maxsize=16, ttl=60, registry=registry, cipher=cipher),
+            'broker': UserCache('broker', maxsize=16, ttl=60, registry=registry, cipher=cipher),
+        })
+    return result
+
+
+def test_shared_between_workers(workers):
+    """Test that a value loaded by one worker is served to the other"""
+    first, second = workers
+    first['keys'].set('hash-1', 'alice', user='alice')
+
+    assert second['keys'].get('hash-1') == 'alice'
+    assert 'hash-2' not in second['keys']
+    assert len(second['keys']) == 1
+
+
+def test_targeted_invalidation(workers):
+    """Test that only the invalidated user's entries are dropped"""
+    first, second = workers
+    first['keys'].set('hash-a', 'alice', user='alice')
+    first['keys'].set('hash-b', 'bob', user='bob')
+    first['broker'].set('hash-a', 'zerodha', user='alice')
+    # Warm the second worker's local tier
+    assert second['keys']['hash-a'] == 'alice' and second['broker']['hash-a'] == 'zerodha'
+    assert second['keys']['hash-b'] == 'bob'
+
+    first['registry'].invalidate_user('alice')
+
+    for worker in workers:
+        assert 'hash-a' not in worker['keys']
+        assert 'hash-a' not in worker['broker']
+        assert worker['keys']['hash-b'] == 'bob'
+
+    first['broker'].set('hash-b', 'angel', user='bob')
+    first['registry'].invalidate_user('bob', namespaces=['broker'])
+    assert 'hash-b' not in second['broker']
+    assert second['keys']['hash-b'] == 'bob'
+
+
+def test_single_key_delete(workers):
+    """Test that deleting a key reaches the other worker's local tier"""
+    first, second = workers
+    first['keys'].set('hash-1', 'alice', user='alice')
+    assert second['keys']['hash-1'] == 'alice'
+
+    del first['keys']['hash-1']
+    assert 'hash-1' not in second['keys']
+
+
+def test_values_encrypted(workers):
+    """Test that tokens are not stored in plain text"""
+    first, _ = workers
+    first['broker'].set('hash-1', ['secret-token', 'zerodha'], user='alice')
+
+    path = first['registry'].db_path
+    with sqlite3.connect(path) as conn:
+        (value,) = conn.execute('SELECT value FROM cache_entries').fetchone()
+    assert b'secret-token' not in value
+
+
+def test_auth_db_invalidates_one_user():
+    """Test that a key change leaves other users' cache entries in place"""
+    from database import auth_db
+
+    auth_db.verified_api_key_cache.set('hash-a', 'alice', user='alice')
+    auth_db.verified_api_key_cache.set('hash-b', 'bob', user='bob')
+    auth_db.broker_cache.set('hash-a', 'zerodha', user='alice')
+
+    auth_db.invalidate_user_cache('alice')
+    assert 'hash-a' not in auth_db.verified_api_key_cache
+    assert 'hash-a' not in auth_db.broker_cache
+    assert auth_db.verified_api_key_cache['hash-b'] == 'bob'
+
+
+
+class FakeRedis:
+    """The Redis commands RedisCacheBackend uses, with expiry on a settable clock"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.data = {}
+        self.expires = {}
+
+    def _alive(self, key):
+        if key in self.expires and self.expires[key] <= self.now:
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def get(self, key):
+        return self.data[key] if self._alive(key) else None
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+        self.expires[key] = self.now + ex
+
+    def sadd(self, key, *members):
+        if not self._alive(key):
+            self.data[key] = set()
+        self.data[key].update(members)
+
+    def srem(self, key, *members):
+        if self._alive(key):
+            self.data[key].difference_update(members)
+
+    def smembers(self, key):
+        return set(self.data[key]) if self._alive(key) else set()
+
+    def expire(self, key, seconds, nx=False, gt=False):
+        if not self._alive(key):
+            return False
+        current = self.expires.get(key)
+        if (nx and current is not None) or (gt and (current is None or self.now + seconds <= current)):
+            return False
+        self.expires[key] = self.now + seconds
+        return True
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+
+    def publish(self, channel, message):
+        pass
+
+    def pipeline(self):
+        client = self
+
+        class Pipeline:
+            def __init__(self):
+                self.calls = []
+
+            def __getattr__(self, name):
+                return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+            def execute(self):
+                return [getattr(client, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+        return Pipeline()
+
+
+def test_redis_user_set_outlives_long_entries(monkeypatch):
+    """Test that a user's long-TTL entry is still invalidated after a short-TTL write"""
+    backend = RedisCacheBackend.__new__(RedisCacheBackend)
+    backend.client = FakeRedis()
+    registry = CacheRegistry('redis', sync_ms=0)
+    monkeypatch.setattr(registry, '_create_backend', lambda: backend)
+    keys = UserCache('api_key', maxsize=16, ttl=36000, registry=registry, shared=True)
+    broker = UserCache('broker', maxsize=16, ttl=3000, registry=registry, shared=True)
+
+    keys.set('hash-a', 'alice', user='alice')
+    broker.set('hash-a', 'zerodha', user='alice')
+    api_key_entry = backend._entry('api_key', 'hash-a')
+    assert backend.client.expires[backend._user_keys('alice')] == 36000
+
+    # The broker entry has expired; the API key entry must still be reachable
+    backend.client.now = 3001
+    registry.invalidate_user('alice')
+    assert backend.client.get(api_key_entry) is None
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-v']))
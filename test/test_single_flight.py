@@ -0,0 +1,131 @@
+"""
+Test suite for single-flight request coalescing
+
+Tests:
+- Concurrent identical requests share one call
+- Successful results reused within the freshness window
+- Failures shared with waiters but not reused
+- Callers get independent copies of shared results
+- Dashboard counters
+"""
+
+import sys
+import os
+import time
+import threading
+
+# Add parent directory to path to import utils modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.single_flight import SingleFlight
+
+
+def _run_concurrently(flight, key, fn, count):
+    results = [None] * count
+    errors = [None] * count
+
+    def worker(i):
+        try:
+            results[i] = flight.do(key, fn)
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_calls_coalesced():
+    """Test that concurrent identical requests make one call"""
+    flight = SingleFlight('test', 0)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return True, {'ltp': 100.5}, 200
+
+    results, errors = _run_concurrently(flight, ('fyers', 'SBIN', 'NSE'), fetch, 8)
+    assert len(calls) == 1
+    assert errors == [None] * 8
+    assert all(result == (True, {'ltp': 100.5}, 200) for result in results)
+    assert flight.coalesced == 7
+
+
+def test_freshness_window():
+    """Test that successful results are reused until they expire"""
+    flight = SingleFlight('test', 100)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return True, {'ltp': len(calls)}, 200
+
+    assert flight.do('k', fetch)[1] == {'ltp': 1}
+    assert flight.do('k', fetch)[1] == {'ltp': 1}
+    assert flight.do('other', fetch)[1] == {'ltp': 2}
+    assert flight.fresh_hits == 1
+
+    time.sleep(0.15)
+    assert flight.do('k', fetch)[1] == {'ltp': 3}
+
+
+def test_failures_not_reused():
+    """Test that error responses and exceptions are shared but not cached"""
+    flight = SingleFlight('test', 1000)
+    calls = []
+
+    def failing():
+        calls.append(1)
+        return False, {'status': 'error'}, 500
+
+    flight.do('k', failing)
+    flight.do('k', failing)
+    assert len(calls) == 2
+
+    def raising():
+        calls.append(1)
+        time.sleep(0.2)
+        raise ValueError('broker down')
+
+    calls.clear()
+    results, errors = _run_concurrently(flight, 'e', raising, 4)
+    assert len(calls) == 1
+    assert all(isinstance(error, ValueError) for error in errors)
+    assert flight.errors == 1
+
+    assert flight.get_stats()['broker_calls'] == 3
+
+
+def test_results_are_copied():
+    """Test that one caller modifying its result does not affect others"""
+    flight = SingleFlight('test', 1000)
+    first = flight.do('k', lambda: (True, {'data': {'ltp': 1}}, 200))
+    first[1]['data']['ltp'] = 99
+    assert flight.do('k', lambda: (True, {}, 200))[1] == {'data': {'ltp': 1}}
+
+
+def test_stats():
+    """Test the dashboard counters"""
+    flight = SingleFlight('quotes', 1000)
+    for _ in range(4):
+        flight.do('k', lambda: (True, {}, 200))
+    stats = flight.get_stats()
+    assert stats['endpoint'] == 'quotes'
+    assert stats['ttl_ms'] == 1000
+    assert stats['calls'] == 4
+    assert stats['broker_calls'] == 1
+    assert stats['fresh_hits'] == 3
+    assert stats['saved_pct'] == 75.0
+
+
+if __name__ == '__main__':
+    test_concurrent_calls_coalesced()
+    test_freshness_window()
+    test_failures_not_reused()
+    test_results_are_copied()
+    test_stats()
+    print("All single-flight tests passed")
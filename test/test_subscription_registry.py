@@ -0,0 +1,182 @@
+"""
+Test suite for the token-indexed streaming subscription registry
+
+Tests:
+- Per-mode reference counts and mode bitmask
+- Token and mode release on the last unsubscribe
+- Precomputed topics
+- Zerodha tick routing through the registry
+- Dhan 5-depth routing by (segment, security id), with the token-only fallback
+- Flattrade client reference counts and tick routing
+"""
+
+import sys
+import os
+import logging
+import threading
+
+# Add parent directory to path to import project modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+os.environ.setdefault('AUTH_CACHE_BACKEND', 'local')
+
+import websocket_proxy  # noqa: F401  (registers the adapters in import order)
+from websocket_proxy.base_adapter import SubscriptionRegistry
+from websocket_proxy.mapping import SymbolMapper
+from broker.zerodha.streaming.zerodha_adapter import ZerodhaWebSocketAdapter
+from broker.dhan.streaming.dhan_adapter import DhanWebSocketAdapter
+from broker.flattrade.streaming.flattrade_adapter import FlattradeWebSocketAdapter
+
+
+def test_refcounts_and_modes():
+    """Test that each mode is counted separately"""
+    registry = SubscriptionRegistry()
+    sub, new_token, new_mode = registry.add(738561, 'RELIANCE', 'NSE', 2)
+    assert new_token and new_mode
+    _, new_token, new_mode = registry.add(738561, 'RELIANCE', 'NSE', 2)
+    assert not new_token and not new_mode
+    _, new_token, new_mode = registry.add(738561, 'RELIANCE', 'NSE', 1)
+    assert not new_token and new_mode
+
+    assert registry.get(738561) is sub
+    assert sub.modes == [1, 2]
+    assert sub.has_mode(1) and sub.has_mode(2) and not sub.has_mode(3)
+    assert sub.highest_mode == 2
+    assert registry.keys() == ['NSE:RELIANCE']
+
+
+def test_release():
+    """Test that the token is released with its last reference"""
+    registry = SubscriptionRegistry()
+    registry.add(738561, 'RELIANCE', 'NSE', 2)
+    registry.add(738561, 'RELIANCE', 'NSE', 2)
+    registry.add(738561, 'RELIANCE', 'NSE', 3)
+
+    assert registry.remove('RELIANCE', 'NSE', 1) == (None, False, False)
+    sub, mode_released, token_released = registry.remove('RELIANCE', 'NSE', 3)
+    assert mode_released and not token_released
+    assert sub.highest_mode == 2
+
+    assert registry.remove('RELIANCE', 'NSE', 2)[1:] == (False, False)
+    assert registry.remove('RELIANCE', 'NSE', 2)[1:] == (True, True)
+    assert registry.get(738561) is None and len(registry) == 0
+    assert registry.remove('RELIANCE', 'NSE', 2)[0] is None
+
+    registry.add(256265, 'NIFTY', 'NSE_INDEX', 1)
+    registry.add(256265, 'NIFTY', 'NSE_INDEX', 2)
+    assert registry.remove('NIFTY', 'NSE_INDEX')[1:] == (True, True)
+
+
+def test_topics():
+    """Test the precomputed topics"""
+    registry = SubscriptionRegistry()
+    sub, _, _ = registry.add(('1', '2885'), 'RELIANCE', 'NSE', 1)
+    assert sub.topics == {1: 'NSE_RELIANCE_LTP', 2: 'NSE_RELIANCE_QUOTE', 3: 'NSE_RELIANCE_DEPTH'}
+    assert registry.get(('1', '2885')) is sub
+    assert registry.find('RELIANCE', 'NSE') is sub
+
+
+def _zerodha_adapter():
+    adapter = ZerodhaWebSocketAdapter.__new__(ZerodhaWebSocketAdapter)
+    adapter.logger = logging.getLogger('test')
+    adapter.lock = threading.Lock()
+    adapter.registry = SubscriptionRegistry()
+    adapter.ws_client = None
+    adapter.cleanup_zmq = lambda: None
+    adapter.published = []
+    adapter.publish_market_data = lambda topic, data: adapter.published.append((topic, data))
+    return adapter
+
+
+def test_zerodha_tick_routing():
+    """Test that ticks are routed by token to every subscribed mode"""
+    adapter = _zerodha_adapter()
+    adapter.registry.add(738561, 'RELIANCE', 'NSE', 1)
+    adapter.registry.add(738561, 'RELIANCE', 'NSE', 2)
+    for token in range(3000):
+        adapter.registry.add(token, f'SYM{token}', 'NSE', 2)
+
+    adapter._handle_ticks([
+        {'instrument_token': 738561, 'mode': 'quote', 'last_price': 2500.5, 'ohlc': {}},
+        {'instrument_token': 999999, 'mode': 'ltp', 'last_price': 1.0},
+    ])
+    topics = [topic for topic, _ in adapter.published]
+    assert topics == ['NSE_RELIANCE_QUOTE', 'NSE_RELIANCE_LTP']
+    assert adapter.published[1][1]['ltp'] == 2500.5
+    assert adapter.published[0][1]['exchange'] == 'NSE'
+
+
+
+def _publishing(adapter):
+    adapter.logger = logging.getLogger('test')
+    adapter.lock = threading.Lock()
+    adapter.registry = SubscriptionRegistry()
+    adapter.published = []
+    adapter.publish_market_data = lambda topic, data: adapter.published.append((topic, data))
+    return adapter
+
+
+def test_dhan_tick_routing():
+    """Test that Dhan packets are matched by segment and security id"""
+    adapter = _publishing(DhanWebSocketAdapter.__new__(DhanWebSocketAdapter))
+    adapter.registry_20depth = SubscriptionRegistry()
+    adapter.segment_aliases = {}
+    adapter.registry.add(adapter._registry_token('NSE', 2885), 'RELIANCE', 'NSE', 1)
+    adapter.registry.add(adapter._registry_token('BSE', 2885), 'SBIN', 'BSE', 2)
+    segment = adapter._registry_token('NSE', 2885)[0]
+
+    adapter._on_data_5depth(None, {'type': 'ticker', 'exchange_segment': segment,
+                                   'security_id': '2885', 'ltp': 1300.5})
+    adapter._on_data_5depth(None, {'type': 'ticker', 'exchange_segment': segment,
+                                   'security_id': '1', 'ltp': 1.0})
+    assert [topic for topic, _ in adapter.published] == ['NSE_RELIANCE_LTP']
+    assert adapter.published[0][1]['ltp'] == 1300.5
+
+    # A segment the subscription does not map to still matches on the security id
+    adapter.published.clear()
+    adapter.registry.add(adapter._registry_token('NFO', 35001), 'NIFTYFUT', 'NFO', 2)
+    adapter._on_data_5depth(None, {'type': 'oi', 'exchange_segment': 99,
+                                   'security_id': '35001', 'oi': 10})
+    assert [topic for topic, _ in adapter.published] == ['NFO_NIFTYFUT_OI']
+    assert adapter.segment_aliases[(99, '35001')] == adapter._registry_token('NFO', 35001)
+
+
+def test_flattrade_refcounts_and_routing(monkeypatch):
+    """Test that the WebSocket is subscribed once per mode and ticks reach every mode"""
+    adapter = _publishing(FlattradeWebSocketAdapter.__new__(FlattradeWebSocketAdapter))
+    adapter._setup_market_cache()
+    adapter._setup_normalizers()
+    adapter.connected = True
+    adapter.zmq_port = 5555
+    calls = []
+
+    class Client:
+        def subscribe_touchline(self, scrip):
+            calls.append(('subscribe', scrip))
+
+        def unsubscribe_touchline(self, scrip):
+            calls.append(('unsubscribe', scrip))
+
+    adapter.ws_client = Client()
+    monkeypatch.setattr(SymbolMapper, 'get_token_from_symbol',
+                        staticmethod(lambda symbol, exchange: {'token': '22', 'brexchange': 'NSE'}))
+
+    for _ in range(2):
+        assert adapter.subscribe('ACC', 'NSE', 2)['status'] == 'success'
+    adapter.subscribe('ACC', 'NSE', 1)
+    assert calls == [('subscribe', 'NSE|22')]
+
+    adapter._process_market_message({'t': 'tk', 'tk': '22', 'lp': '2100.5'})
+    assert sorted(topic for topic, _ in adapter.published) == ['NSE_ACC_LTP', 'NSE_ACC_QUOTE']
+
+    adapter.unsubscribe('ACC', 'NSE', 2)
+    adapter.unsubscribe('ACC', 'NSE', 1)
+    assert calls == [('subscribe', 'NSE|22')]
+    adapter.unsubscribe('ACC', 'NSE', 2)
+    assert calls == [('subscribe', 'NSE|22'), ('unsubscribe', 'NSE|22')]
+    assert len(adapter.registry) == 0 and not adapter.subscriptions
+
+
+if __name__ == '__main__':
+    import pytest
+    sys.exit(pytest.main([__file__, '-v']))
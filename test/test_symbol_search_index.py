@@ -0,0 +1,83 @@
+"""
+Test suite for the in-memory symbol search index
+
+Tests:
+- Prefix, infix and numeric strike matching
+- Multi-term AND semantics and exchange filtering
+- Result ranking and limits
+"""
+
+import sys
+import os
+
+# Add parent directory to path to import database modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.symbol_store import SymbolStore
+from database.symbol_search_index import SymbolSearchIndex
+
+
+def _index():
+    store = SymbolStore()
+    rows = [
+        ('BANKNIFTY28NOV2451000CE', 'BANKNIFTY24N2851000CE', 'BANKNIFTY', 'NFO', '1001', '28-NOV-24', 51000.0),
+        ('NIFTY28NOV2424000CE', 'NIFTY24N2824000CE', 'NIFTY', 'NFO', '1002', '28-NOV-24', 24000.0),
+        ('NIFTY28NOV2424000PE', 'NIFTY24N2824000PE', 'NIFTY', 'NFO', '1003', '28-NOV-24', 24000.0),
+        ('NIFTY28NOV2424500CE', 'NIFTY24N2824500CE', 'NIFTY', 'NFO', '1004', '28-NOV-24', 24500.0),
+        ('NIFTY', 'Nifty 50', 'NIFTY', 'NSE_INDEX', '26000', None, None),
+        ('SBIN', 'SBIN-EQ', 'STATE BANK OF INDIA', 'NSE', '3045', None, None),
+        ('SBIN', 'SBIN', 'STATE BANK OF INDIA', 'BSE', '500112', None, None),
+    ]
+    for symbol, brsymbol, name, exchange, token, expiry, strike in rows:
+        store.append(symbol, brsymbol, name, exchange, exchange, token, expiry, strike, 1, None, 0.05)
+    store.freeze()
+    return store, SymbolSearchIndex(store)
+
+
+def _symbols(store, rows):
+    return [store.text('symbol', row) for row in rows]
+
+
+def test_prefix_ranking():
+    """Test that exact and prefix symbol matches rank ahead of infix matches"""
+    store, index = _index()
+
+    results = _symbols(store, index.search('nifty'))
+    assert results[0] == 'NIFTY'
+    assert results[-1] == 'BANKNIFTY28NOV2451000CE'
+    assert len(results) == 5
+
+
+def test_multi_term_intersection():
+    """Test that every term must match"""
+    store, index = _index()
+
+    assert _symbols(store, index.search('NIFTY 24000 CE')) == ['NIFTY28NOV2424000CE']
+    assert _symbols(store, index.search('NIFTY PE')) == ['NIFTY28NOV2424000PE']
+    assert index.search('NIFTY MCX') == []
+
+
+def test_infix_name_and_token_matches():
+    """Test matching inside names, broker symbols and tokens"""
+    store, index = _index()
+
+    assert _symbols(store, index.search('bank of')) == ['SBIN', 'SBIN']
+    assert _symbols(store, index.search('24N2824500')) == ['NIFTY28NOV2424500CE']
+    assert _symbols(store, index.search('500112')) == ['SBIN']
+    assert sorted(_symbols(store, index.search('50'))) == ['NIFTY', 'NIFTY28NOV2424500CE', 'SBIN']
+
+
+def test_strike_and_exchange_filter():
+    """Test numeric strike terms and the exchange filter"""
+    store, index = _index()
+
+    assert _symbols(store, index.search('51000', exchange='NFO')) == ['BANKNIFTY28NOV2451000CE']
+    assert [store.text('exchange', row) for row in index.search('SBIN', exchange='BSE')] == ['BSE']
+
+
+def test_limit():
+    """Test that results stop at the limit"""
+    store, index = _index()
+
+    assert len(index.search('NIFTY', limit=2)) == 2
+    assert len(index.search('NIFTY', limit=None)) == 5
@@ -0,0 +1,131 @@
+"""
+Test suite for the columnar symbol store behind BrokerSymbolCache
+
+Tests:
+- Row storage and NULL handling
+- Index lookups by symbol, token and broker symbol
+- String interning across rows
+- Cache API on top of the store
+"""
+
+import sys
+import os
+
+# Add parent directory to path to import database modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.symbol_store import SymbolStore
+from database.token_db_enhanced import BrokerSymbolCache, SymbolData
+
+
+def _sample_store():
+    store = SymbolStore()
+    store.append('RELIANCE', 'RELIANCE-EQ', 'RELIANCE INDUSTRIES', 'NSE', 'NSE', '2885',
+                 None, -1.0, 1, 'EQ', 0.05)
+    store.append('NIFTY28NOV2424000CE', 'NIFTY24N2824000CE', 'NIFTY', 'NFO', 'NFO', '43210',
+                 '28-NOV-24', 24000.0, 25, 'OPTIDX', 0.05)
+    store.append('RELIANCE', 'RELIANCE', 'RELIANCE INDUSTRIES', 'BSE', 'BSE', '500325',
+                 None, None, None, None, None)
+    store.freeze()
+    return store
+
+
+def test_store_lookups():
+    """Test that indexes resolve to the right rows"""
+    store = _sample_store()
+
+    assert len(store) == 3
+    assert store.find_by_symbol('RELIANCE', 'NSE') == 0
+    assert store.find_by_symbol('RELIANCE', 'BSE') == 2
+    assert store.find_by_token('43210', 'NFO') == 1
+    assert store.find_by_brsymbol('RELIANCE-EQ', 'NSE') == 0
+    assert store.find_by_symbol('RELIANCE', 'MCX') is None
+    assert store.find_by_token('43210', 'NSE') is None
+
+
+def test_store_null_values():
+    """Test that NULL numeric and string columns round-trip as None"""
+    store = _sample_store()
+    row = store.row_dict(2)
+
+    assert row['strike'] is None
+    assert row['lotsize'] is None
+    assert row['tick_size'] is None
+    assert row['expiry'] is None
+    assert row['instrumenttype'] is None
+    assert store.row_dict(1)['strike'] == 24000.0
+    assert store.row_dict(1)['lotsize'] == 25
+
+
+def test_store_interns_repeated_strings():
+    """Test that repeated values share one string table entry"""
+    store = _sample_store()
+
+    assert store.name[0] == store.name[2]
+    assert store.symbol[0] == store.symbol[2]
+    assert store.brexchange[0] == store.exchange[0]
+    assert store.memory_bytes() > 0
+
+
+def test_cache_api_on_store():
+    """Test the BrokerSymbolCache lookup API against a populated store"""
+    cache = BrokerSymbolCache()
+    cache.store = _sample_store()
+
+    assert cache.get_token('RELIANCE', 'NSE') == '2885'
+    assert cache.get_br_symbol('RELIANCE', 'NSE') == 'RELIANCE-EQ'
+    assert cache.get_oa_symbol('NIFTY24N2824000CE', 'NFO') == 'NIFTY28NOV2424000CE'
+    assert cache.get_symbol('500325', 'BSE') == 'RELIANCE'
+    assert cache.get_brexchange('RELIANCE', 'BSE') == 'BSE'
+    assert cache.get_token('UNKNOWN', 'NSE') is None
+
+    info = cache.get_symbol_info('NIFTY28NOV2424000CE', 'NFO')
+    assert isinstance(info, SymbolData)
+    assert info.lotsize == 25
+    assert info.expiry == '28-NOV-24'
+
+    assert cache.get_tokens_bulk([('RELIANCE', 'NSE'), ('X', 'NSE')]) == ['2885', None]
+    assert [s.exchange for s in cache.search_symbols('reliance')] == ['NSE', 'BSE']
+    assert cache.stats.misses == 2
+
+
+def test_build_store_from_chunks():
+    """Test that streamed row chunks build the same indexes as single appends"""
+    chunks = [
+        [('SBIN', 'SBIN-EQ', 'STATE BANK', 'NSE', 'NSE', '3045', None, -1.0, 1, 'EQ', 0.05)],
+        [('TCS', 'TCS-EQ', 'TCS', 'NSE', 'NSE', '11536', None, -1.0, 1, 'EQ', 0.05),
+         ('GOLD', 'GOLD24DECFUT', 'GOLD', 'MCX', 'MCX', '234230', '05-DEC-24', None, 100, 'FUTCOM', 1.0)],
+    ]
+    store, rss_peak = BrokerSymbolCache._build_store(chunks)
+
+    assert len(store) == 3
+    assert store.find_by_symbol('TCS', 'NSE') == 1
+    assert store.text('brsymbol', 2) == 'GOLD24DECFUT'
+    assert store.lotsize_at(2) == 100
+    assert rss_peak >= 0
+
+
+def test_snapshot_round_trip(tmp_path, monkeypatch):
+    """Test that a written snapshot maps back to an equivalent store"""
+    from database import symbol_snapshot
+
+    monkeypatch.setattr(symbol_snapshot, 'SNAPSHOT_DIR', str(tmp_path))
+    store = _sample_store()
+
+    assert symbol_snapshot.write_snapshot(store, 'zerodha', '20241128T090000000000')
+    loaded = symbol_snapshot.load_snapshot('zerodha', '20241128T090000000000')
+
+    assert loaded is not None
+    assert len(loaded) == len(store)
+    assert isinstance(loaded.strike, memoryview)
+    for row in store.rows():
+        assert loaded.row_dict(row) == store.row_dict(row)
+    assert loaded.find_by_brsymbol('NIFTY24N2824000CE', 'NFO') == 1
+
+    # Unknown download keys and other brokers miss
+    assert symbol_snapshot.load_snapshot('zerodha', '20241129T090000000000') is None
+    assert symbol_snapshot.load_snapshot('angel', '20241128T090000000000') is None
+
+    symbol_snapshot.write_snapshot(store, 'zerodha', '20241129T090000000000')
+    symbol_snapshot.prune_snapshots('zerodha', '20241129T090000000000')
+    assert not os.path.exists(symbol_snapshot.snapshot_path('zerodha', '20241128T090000000000'))
@@ -0,0 +1,219 @@
+"""
+Test suite for WebSocket proxy market data fan-out
+
+Tests:
+- One serialization per distinct broker field, shared by every recipient
+- Broker filtering for multi-broker setups
+- Per-client conflating queues, drop and lag counters
+- A slow client does not delay other clients
+- Coalescing of fast modes into the latest value per key
+"""
+
+import sys
+import os
+import json
+import asyncio
+from collections import defaultdict
+
+# Add parent directory to path to import project modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+from websocket_proxy.server import WebSocketProxy
+from websocket_proxy.client_outbox import ClientOutbox
+
+
+class RecordingWebSocket:
+    """Minimal websocket that records what it is sent"""
+
+    def __init__(self, blocked=False):
+        self.sent = []
+        self.unblocked = asyncio.Event()
+        if not blocked:
+            self.unblocked.set()
+
+    async def send(self, payload):
+        await self.unblocked.wait()
+        self.sent.append(payload)
+
+
+def _proxy(clients, blocked=()):
+    """Build a proxy without binding sockets; clients is {client_id: (user_id, broker)}"""
+    proxy = WebSocketProxy.__new__(WebSocketProxy)
+    proxy.clients = {}
+    proxy.outboxes = {}
+    proxy.user_mapping = {}
+    proxy.user_broker_mapping = {}
+    proxy.subscription_index = defaultdict(set)
+    proxy.fanout_stats = {"ticks": 0, "serializations": 0, "messages_queued": 0, "coalesced": 0}
+    proxy.dirty = {}
+    for client_id, (user_id, broker) in clients.items():
+        websocket = RecordingWebSocket(blocked=client_id in blocked)
+        proxy.clients[client_id] = websocket
+        proxy.outboxes[client_id] = ClientOutbox(client_id, websocket)
+        proxy.user_mapping[client_id] = user_id
+        proxy.user_broker_mapping[user_id] = broker
+        proxy.subscription_index[('NIFTY', 'NSE_INDEX', 1)].add(client_id)
+    return proxy
+
+
+async def _deliver(proxy, ticks):
+    """Start writers, broadcast ticks and let the writers run"""
+    for outbox in proxy.outboxes.values():
+        outbox.start()
+    for broker, symbol, exchange, mode, data in ticks:
+        proxy.broadcast_market_data(broker, symbol, exchange, mode, data)
+        for _ in range(5):
+            await asyncio.sleep(0)
+
+
+def _close(proxy):
+    for outbox in proxy.outboxes.values():
+        outbox.close()
+
+
+def test_serialize_once_per_broker():
+    """Test that recipients sharing a broker field share one payload"""
+    proxy = _proxy({1: ('u1', 'zerodha'), 2: ('u2', 'zerodha'), 3: ('u3', 'zerodha')})
+
+    async def scenario():
+        await _deliver(proxy, [('zerodha', 'NIFTY', 'NSE_INDEX', 1, {'ltp': 24000.5})])
+        _close(proxy)
+    asyncio.run(scenario())
+
+    payloads = [proxy.clients[cid].sent[0] for cid in (1, 2, 3)]
+    assert payloads[0] is payloads[1] is payloads[2]
+    message = json.loads(payloads[0])
+    assert message == {
+        'type': 'market_data', 'symbol': 'NIFTY', 'exchange': 'NSE_INDEX',
+        'mode': 1, 'data': {'ltp': 24000.5}, 'broker': 'zerodha'
+    }
+    assert proxy.get_fanout_stats() == {
+        'ticks': 1, 'serializations': 1, 'messages_queued': 3, 'coalesced': 0,
+        'serializations_per_tick': 1.0
+    }
+
+
+def test_unknown_broker_groups_by_client_broker():
+    """Test that topics without a broker are serialized once per client broker"""
+    proxy = _proxy({1: ('u1', 'zerodha'), 2: ('u2', 'angel'), 3: ('u3', 'angel')})
+
+    async def scenario():
+        await _deliver(proxy, [('unknown', 'NIFTY', 'NSE_INDEX', 1, {'ltp': 1.0})])
+        _close(proxy)
+    asyncio.run(scenario())
+
+    assert json.loads(proxy.clients[1].sent[0])['broker'] == 'zerodha'
+    assert json.loads(proxy.clients[2].sent[0])['broker'] == 'angel'
+    assert proxy.clients[2].sent[0] is proxy.clients[3].sent[0]
+    assert proxy.fanout_stats['serializations'] == 2
+
+
+def test_broker_mismatch_and_no_subscribers():
+    """Test that other brokers' clients are skipped and unsubscribed ticks are not counted"""
+    proxy = _proxy({1: ('u1', 'zerodha'), 2: ('u2', 'angel')})
+
+    async def scenario():
+        await _deliver(proxy, [
+            ('angel', 'NIFTY', 'NSE_INDEX', 1, {'ltp': 1.0}),
+            ('angel', 'SBIN', 'NSE', 1, {'ltp': 1.0}),
+        ])
+        _close(proxy)
+    asyncio.run(scenario())
+
+    assert proxy.clients[1].sent == []
+    assert len(proxy.clients[2].sent) == 1
+    assert proxy.fanout_stats['ticks'] == 1
+
+
+def test_slow_client_is_conflated_and_isolated():
+    """Test that a blocked client keeps only the latest tick while others get every tick"""
+    proxy = _proxy({1: ('u1', 'zerodha'), 2: ('u2', 'zerodha')}, blocked={2})
+    ticks = [('zerodha', 'NIFTY', 'NSE_INDEX', 1, {'ltp': float(i)}) for i in range(5)]
+
+    async def scenario():
+        await _deliver(proxy, ticks)
+        fast = [json.loads(p)['data']['ltp'] for p in proxy.clients[1].sent]
+        assert fast == [0.0, 1.0, 2.0, 3.0, 4.0]
+        assert proxy.clients[2].sent == []
+
+        proxy.clients[2].unblocked.set()
+        for _ in range(10):
+            await asyncio.sleep(0)
+        _close(proxy)
+    asyncio.run(scenario())
+
+    # The writer was already holding tick 0 when it blocked; ticks 1-4 conflate to 4
+    slow = [json.loads(p)['data']['ltp'] for p in proxy.clients[2].sent]
+    assert slow == [0.0, 4.0]
+    stats = proxy.get_client_stats()['2']
+    assert stats['sent'] == 2 and stats['conflated'] == 3 and stats['queued'] == 0
+
+
+def test_queue_bound_drops_new_keys():
+    """Test that a full queue drops new keys but still conflates queued ones"""
+    outbox = ClientOutbox(1, RecordingWebSocket(), maxsize=2)
+
+    assert outbox.put('a', '1')
+    assert outbox.put('b', '1')
+    assert not outbox.put('c', '1')
+    assert outbox.put('a', '2')
+    assert outbox.get_stats()['dropped'] == 1
+    assert outbox.get_stats()['conflated'] == 1
+    assert outbox.get_stats()['queued'] == 2
+
+
+def test_coalesced_mode_flushes_latest_value():
+    """Test that a burst in a coalesced mode delivers only its final tick on flush"""
+    proxy = _proxy({1: ('u1', 'zerodha')})
+    proxy.dirty = {1: {}}
+
+    async def scenario():
+        proxy.outboxes[1].start()
+        for ltp in (100.0, 100.5, 101.0):
+            proxy.route_market_data('zerodha', 'NIFTY', 'NSE_INDEX', 1, {'ltp': ltp})
+        await asyncio.sleep(0)
+        assert proxy.clients[1].sent == []
+
+        proxy.flush_dirty(1)
+        proxy.flush_dirty(1)  # Nothing new since the last flush
+        for _ in range(5):
+            await asyncio.sleep(0)
+        _close(proxy)
+    asyncio.run(scenario())
+
+    assert [json.loads(p)['data']['ltp'] for p in proxy.clients[1].sent] == [101.0]
+    assert proxy.fanout_stats['coalesced'] == 2
+    assert proxy.dirty[1] == {}
+
+
+def test_drain_and_process_zmq_batch():
+    """Test that queued ZeroMQ frames are drained in one batch and routed"""
+    import zmq
+    from websocket_proxy.wire_format import encode_market_data
+
+    proxy = _proxy({1: ('u1', 'zerodha')})
+    proxy.MODE_MAP = {"LTP": 1, "QUOTE": 2, "DEPTH": 3}
+    proxy.zmq_batch_size = 2
+
+    context = zmq.Context.instance()
+    pull = context.socket(zmq.PULL)
+    pull.bind('inproc://proxy-batch-test')
+    push = context.socket(zmq.PUSH)
+    push.connect('inproc://proxy-batch-test')
+    for ltp in (1.0, 2.0, 3.0):
+        push.send_multipart(encode_market_data('zerodha_NSE_INDEX_NIFTY_LTP', {'ltp': ltp}))
+    while not pull.poll(100):
+        pass
+
+    first = proxy.drain_zmq(pull)
+    second = proxy.drain_zmq(pull)
+    assert [len(first), len(second), len(proxy.drain_zmq(pull))] == [2, 1, 0]
+    push.close()
+    pull.close()
+
+    for frames in first + second:
+        proxy.process_zmq_message(*frames)
+    proxy.process_zmq_message(b'BAD', b'{}')
+    assert proxy.outboxes[1].get_stats()['queued'] == 1
+    assert proxy.outboxes[1].get_stats()['conflated'] == 2
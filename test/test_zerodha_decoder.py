@@ -0,0 +1,178 @@
+"""
+Test suite and benchmark for the Zerodha binary tick decoder
+
+Tests:
+- LTP, index, quote and full packets decoded field by field
+- Output identical to the previous per-field struct.unpack decoder
+- Truncated frames and heartbeats
+- Benchmark on a full-market frame (run this file directly)
+
+The frame fixture reproduces the Kite wire layout of a burst over 3000
+instruments: mostly full-mode equities and F&O, with quote, LTP and index
+packets mixed in.
+"""
+
+import sys
+import os
+import random
+import struct
+import time
+
+import pytest
+
+# Add parent directory to path to import broker modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+import websocket_proxy  # noqa: F401  (the streaming package imports the adapters in this order)
+from broker.zerodha.streaming.zerodha_decoder import decode_depth, decode_frame
+
+
+def _full_packet(rng, token):
+    price = rng.randint(10000, 500000)
+    fields = [token, price, rng.randint(1, 500), price - 35, rng.randint(1, 10 ** 7),
+              rng.randint(1, 10 ** 6), rng.randint(1, 10 ** 6), price - 500, price + 900, price - 1200, price - 250,
+              1717000000, rng.randint(0, 10 ** 6), 0, 0, 1717000001]
+    depth = []
+    for level in range(10):
+        step = (level % 5 + 1) * 5
+        level_price = price - step if level < 5 else price + step
+        # Thin books leave empty levels
+        depth.append((rng.randint(1, 5000), 0 if rng.random() < 0.05 else level_price, rng.randint(1, 40)))
+    return struct.pack('>I15i', *fields) + b''.join(struct.pack('>iih2x', *level) for level in depth)
+
+
+def _frame(packets):
+    return struct.pack('>H', len(packets)) + b''.join(struct.pack('>H', len(p)) + p for p in packets)
+
+
+def build_market_frame(instruments=3000, seed=11):
+    rng = random.Random(seed)
+    packets = []
+    for i in range(instruments):
+        token = 100000 + i
+        kind = rng.random()
+        if kind < 0.7:
+            packets.append(_full_packet(rng, token))
+        elif kind < 0.85:
+            packets.append(_full_packet(rng, token)[:44])
+        elif kind < 0.95:
+            packets.append(struct.pack('>Ii', token, rng.randint(10000, 500000)))
+        else:
+            # Index quote packet
+            packets.append(struct.pack('>I6i', token, *[rng.randint(10 ** 6, 5 * 10 ** 6) for _ in range(6)]))
+    return _frame(packets)
+
+
+@pytest.fixture(scope='module')
+def market_frame():
+    return build_market_frame()
+
+
+def legacy_decode(data, token_exchange_map, mode_map):
+    """The previous decoder: per-field struct.unpack on sliced bytes"""
+    ticks = []
+    num_packets = struct.unpack('>H', data[0:2])[0]
+    offset = 2
+    for _ in range(num_packets):
+        if offset + 2 > len(data):
+            break
+        length = struct.unpack('>H', data[offset:offset + 2])[0]
+        offset += 2
+        if offset + length > len(data):
+            break
+        packet = data[offset:offset + length]
+        offset += length
+        if len(packet) < 8:
+            continue
+        token = struct.unpack('>I', packet[0:4])[0]
+        last_price = struct.unpack('>i', packet[4:8])[0] / 100.0
+        if len(packet) == 8:
+            mode = 'ltp'
+        elif len(packet) == 44:
+            mode = 'quote'
+        elif len(packet) >= 184:
+            mode = 'full'
+        else:
+            mode = mode_map.get(token, 'quote')
+        tick = {'instrument_token': token, 'last_traded_price': last_price, 'last_price': last_price,
+                'mode': mode, 'timestamp': 0}
+        if token_exchange_map.get(token):
+            tick['source_exchange'] = token_exchange_map[token]
+        if len(packet) >= 44:
+            f = struct.unpack('>11i', packet[0:44])
+            tick.update({
+                'instrument_token': f[0], 'last_traded_price': f[1] / 100.0, 'last_price': f[1] / 100.0,
+                'last_traded_quantity': f[2], 'average_traded_price': f[3] / 100.0, 'average_price': f[3] / 100.0,
+                'volume_traded': f[4], 'volume': f[4], 'total_buy_quantity': f[5], 'total_sell_quantity': f[6],
+                'open_price': f[7] / 100.0, 'high_price': f[8] / 100.0, 'low_price': f[9] / 100.0,
+                'close_price': f[10] / 100.0,
+                'ohlc': {'open': f[7] / 100.0, 'high': f[8] / 100.0, 'low': f[9] / 100.0, 'close': f[10] / 100.0}
+            })
+        if len(packet) >= 64:
+            e = struct.unpack('>iiiii', packet[44:64])
+            tick.update({'last_traded_timestamp': e[0], 'open_interest': e[1], 'oi': e[1], 'exchange_timestamp': e[4]})
+        if len(packet) >= 184:
+            depth = {'buy': [], 'sell': []}
+            for side, base in (('buy', 64), ('sell', 124)):
+                for i in range(5):
+                    q, p, o = struct.unpack('>iih', packet[base + i * 12:base + i * 12 + 10])
+                    if p > 0:
+                        depth[side].append({'quantity': q, 'price': p / 100.0, 'orders': o})
+            if depth['buy'] or depth['sell']:
+                tick['depth'] = depth
+        ticks.append(tick)
+    return ticks
+
+
+def _without_timestamp(ticks):
+    return [dict(tick, timestamp=0) for tick in ticks]
+
+
+def test_packet_fields():
+    """Test the fields of each packet kind"""
+    rng = random.Random(1)
+    full = _full_packet(rng, 738561)
+    frame = _frame([struct.pack('>Ii', 256265, 2250055), full[:44], full])
+    ltp, quote, tick = decode_frame(frame, {738561: 'NSE'}, {})
+
+    assert ltp['mode'] == 'ltp' and ltp['last_price'] == 22500.55 and 'volume' not in ltp
+    assert quote['mode'] == 'quote' and 'oi' not in quote and quote['source_exchange'] == 'NSE'
+    assert tick['mode'] == 'full'
+    fields = struct.unpack('>I15i', full[:64])
+    assert tick['volume'] == fields[4]
+    assert tick['ohlc']['high'] == fields[8] / 100.0
+    assert tick['oi'] == fields[12]
+    assert tick['exchange_timestamp'] == fields[15]
+    assert len(tick['depth']['buy']) + len(tick['depth']['sell']) <= 10
+    assert tick['depth'] == decode_depth(full, 64)
+
+
+def test_matches_legacy_decoder(market_frame):
+    """Test that every tick equals the previous decoder's output"""
+    token_exchange_map = {100000 + i: 'NFO' if i % 2 else 'NSE' for i in range(0, 3000, 3)}
+    mode_map = {100000 + i: 'full' for i in range(0, 3000, 7)}
+    new = decode_frame(market_frame, token_exchange_map, mode_map)
+    assert len(new) == 3000
+    assert _without_timestamp(new) == legacy_decode(market_frame, token_exchange_map, mode_map)
+
+
+def test_truncated_and_heartbeat(market_frame):
+    """Test that truncated packets are dropped and short frames ignored"""
+    assert decode_frame(b'\x00') == []
+    assert decode_frame(b'\x00\x01\x00') == []
+    assert len(decode_frame(market_frame[:1000])) < 10
+    assert decode_depth(b'\x00' * 60) is None
+
+
+def benchmark(frame, rounds=20):
+    for name, decode in (('legacy', legacy_decode), ('decoder', decode_frame)):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            ticks = decode(frame, {}, {})
+        elapsed = (time.perf_counter() - start) / rounds
+        print(f'{name:8s} {elapsed * 1000:8.2f} ms/frame  {len(ticks) / elapsed:12,.0f} ticks/s')
+
+
+if __name__ == '__main__':
+    benchmark(build_market_frame())
@@ -0,0 +1,75 @@
+"""
+Test suite for the adapter -> proxy ZeroMQ wire format
+
+Tests:
+- Topic parsing for broker, legacy and index topics
+- Topic registry frame caching
+- JSON and msgpack frame round trips
+- msgpack frames decoded by a process with its own topic registry
+"""
+
+import sys
+import os
+
+import pytest
+
+# Add parent directory to path to import project modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+from websocket_proxy.wire_format import (
+    TopicInfo, TopicRegistry, parse_topic, encode_market_data, decode_market_data, MSGPACK_AVAILABLE
+)
+
+
+def test_parse_topic():
+    """Test every supported topic layout"""
+    assert parse_topic('zerodha_NSE_RELIANCE_LTP') == TopicInfo('zerodha', 'NSE', 'RELIANCE', 'LTP')
+    assert parse_topic('zerodha_NSE_INDEX_NIFTY_QUOTE') == TopicInfo('zerodha', 'NSE_INDEX', 'NIFTY', 'QUOTE')
+    assert parse_topic('NSE_INDEX_NIFTY_LTP') == TopicInfo('unknown', 'NSE_INDEX', 'NIFTY', 'LTP')
+    assert parse_topic('BSE_INDEX_SENSEX_DEPTH') == TopicInfo('unknown', 'BSE_INDEX', 'SENSEX', 'DEPTH')
+    assert parse_topic('NSE_SBIN_LTP') == TopicInfo('unknown', 'NSE', 'SBIN', 'LTP')
+    assert parse_topic('SBIN_LTP') is None
+
+
+def test_registry_caches_frames():
+    """Test that topic frames are parsed and built once"""
+    registry = TopicRegistry()
+
+    info = registry.resolve_bytes(b'angel_NSE_SBIN_QUOTE')
+    assert info == TopicInfo('angel', 'NSE', 'SBIN', 'QUOTE')
+    assert registry.resolve_bytes(b'angel_NSE_SBIN_QUOTE') is info
+    assert registry.resolve_bytes(b'\x00angel_NSE_SBIN_QUOTE') == info
+    assert registry.msgpack_frame('angel_NSE_SBIN_QUOTE') is registry.msgpack_frame('angel_NSE_SBIN_QUOTE')
+
+
+def test_json_round_trip():
+    """Test the default JSON encoding"""
+    data = {'ltp': 2450.5, 'timestamp': 1732770000000}
+    frames = encode_market_data('zerodha_NSE_RELIANCE_LTP', data, wire_format='json')
+
+    assert frames[0] == b'zerodha_NSE_RELIANCE_LTP'
+    assert decode_market_data(*frames) == (TopicInfo('zerodha', 'NSE', 'RELIANCE', 'LTP'), data)
+
+
+@pytest.mark.skipif(not MSGPACK_AVAILABLE, reason="msgpack not installed")
+def test_msgpack_round_trip():
+    """Test the msgpack encoding with self-describing topic frames"""
+    data = {'ltp': 24000.05, 'depth': {'buy': [{'price': 1.0, 'quantity': 5}]}}
+    frames = encode_market_data('zerodha_NSE_INDEX_NIFTY_DEPTH', data, wire_format='msgpack')
+
+    assert frames[0] == b'\x00zerodha_NSE_INDEX_NIFTY_DEPTH'
+    assert decode_market_data(*frames) == (TopicInfo('zerodha', 'NSE_INDEX', 'NIFTY', 'DEPTH'), data)
+
+
+@pytest.mark.skipif(not MSGPACK_AVAILABLE, reason="msgpack not installed")
+def test_msgpack_from_another_process():
+    """Test that frames decode without the publisher's topic registry"""
+    import msgpack
+    from websocket_proxy import wire_format
+
+    # A topic this process has never interned, as published by a standalone proxy's adapter
+    frames = [b'\x00angel_NFO_BANKNIFTY26DEC24FUT_QUOTE', msgpack.packb({'ltp': 51000.0})]
+    topic, data = wire_format.decode_market_data(*frames)
+    assert topic == TopicInfo('angel', 'NFO', 'BANKNIFTY26DEC24FUT', 'QUOTE')
+    assert data == {'ltp': 51000.0}
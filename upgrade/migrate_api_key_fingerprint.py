@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the api_key_fingerprint column to the api_keys table
+and fill it for keys stored before it existed.
+
+The fingerprint is an HMAC-SHA256 of the API key keyed with API_KEY_PEPPER. It
+lets verify_api_key find the matching row with one indexed lookup and a single
+Argon2 verification instead of trying every stored hash. The plaintext key is
+recovered from api_key_encrypted, so this must run with the same API_KEY_PEPPER
+as the application.
+
+Usage:
+    cd upgrade
+    python migrate_api_key_fingerprint.py
+    python migrate_api_key_fingerprint.py --status
+"""
+
+import os
+import sys
+import hmac
+import base64
+import hashlib
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text, inspect
+from dotenv import load_dotenv
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+
+# Load environment from parent directory
+env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env')
+load_dotenv(env_path)
+
+# Import logger after environment is loaded
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+PEPPER = os.getenv('API_KEY_PEPPER', 'default-pepper-change-in-production')
+
+
+def get_database_url():
+    """DATABASE_URL with relative SQLite paths resolved against the OpenAlgo root"""
+    DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///db/openalgo.db')
+
+    # Adjust path for SQLite if relative (since we're in upgrade folder)
+    if DATABASE_URL.startswith('sqlite:///') and not DATABASE_URL.startswith('sqlite:////'):
+        db_path = DATABASE_URL.replace('sqlite:///', '')
+        parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        full_db_path = os.path.join(parent_dir, db_path)
+        DATABASE_URL = f'sqlite:///{full_db_path}'
+        logger.info(f"Using database: {full_db_path}")
+
+    return DATABASE_URL
+
+
+def get_fernet():
+    """Same Fernet key as database/auth_db.py derives from the pepper"""
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=b'openalgo_static_salt',
+        iterations=100000,
+    )
+    return Fernet(base64.urlsafe_b64encode(kdf.derive(PEPPER.encode())))
+
+
+def fingerprint(api_key):
+    """HMAC-SHA256 of the API key with the pepper (matches auth_db.api_key_fingerprint)"""
+    return hmac.new(PEPPER.encode(), api_key.encode(), hashlib.sha256).hexdigest()
+
+
+def migrate_api_keys_table(engine):
+    """Add the fingerprint column and index, then fingerprint every row without one"""
+    inspector = inspect(engine)
+
+    if 'api_keys' not in inspector.get_table_names():
+        logger.info("api_keys table doesn't exist. It will be created on first run.")
+        return True
+
+    existing_columns = [col['name'] for col in inspector.get_columns('api_keys')]
+
+    with engine.connect() as conn:
+        if 'api_key_fingerprint' not in existing_columns:
+            conn.execute(text("ALTER TABLE api_keys ADD COLUMN api_key_fingerprint VARCHAR(64)"))
+            conn.commit()
+            logger.info("✅ Added column: api_key_fingerprint")
+        else:
+            logger.info("✓ Column already exists: api_key_fingerprint")
+
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_api_keys_api_key_fingerprint ON api_keys (api_key_fingerprint)"
+        ))
+        conn.commit()
+        logger.info("✓ Index ix_api_keys_api_key_fingerprint present")
+
+        rows = conn.execute(text(
+            "SELECT id, user_id, api_key_encrypted FROM api_keys WHERE api_key_fingerprint IS NULL"
+        )).fetchall()
+
+        fernet = get_fernet()
+        filled = 0
+        failed = 0
+        for row_id, user_id, encrypted in rows:
+            try:
+                api_key = fernet.decrypt(encrypted.encode()).decode()
+            except (InvalidToken, AttributeError, ValueError):
+                # Encrypted with another pepper; filled on the next successful verification instead
+                logger.warning(f"Could not decrypt API key for user_id {user_id}, skipping")
+                failed += 1
+                continue
+            conn.execute(
+                text("UPDATE api_keys SET api_key_fingerprint = :fingerprint WHERE id = :id"),
+                {'fingerprint': fingerprint(api_key), 'id': row_id}
+            )
+            filled += 1
+        conn.commit()
+
+    logger.info(f"\n📊 Migration Summary:")
+    logger.info(f"   - Keys without fingerprint: {len(rows)}")
+    logger.info(f"   - Fingerprints added: {filled}")
+    logger.info(f"   - Keys skipped: {failed}")
+    return True
+
+
+def migration_status(engine):
+    """Log whether the column exists and how many keys still lack a fingerprint"""
+    inspector = inspect(engine)
+    if 'api_keys' not in inspector.get_table_names():
+        logger.info("api_keys table doesn't exist yet")
+        return True
+
+    existing_columns = [col['name'] for col in inspector.get_columns('api_keys')]
+    if 'api_key_fingerprint' not in existing_columns:
+        logger.info("❌ api_key_fingerprint column missing - migration not applied")
+        return False
+
+    with engine.connect() as conn:
+        total = conn.execute(text("SELECT COUNT(*) FROM api_keys")).scalar()
+        missing = conn.execute(text(
+            "SELECT COUNT(*) FROM api_keys WHERE api_key_fingerprint IS NULL"
+        )).scalar()
+    logger.info(f"✓ api_key_fingerprint column present ({total - missing}/{total} keys fingerprinted)")
+    return missing == 0
+
+
+def main():
+    """Main function to run the migration"""
+    logger.info("=" * 60)
+    logger.info("OpenAlgo API Key Fingerprint Migration Script")
+    logger.info("=" * 60)
+
+    try:
+        engine = create_engine(get_database_url())
+        if '--status' in sys.argv:
+            return 0 if migration_status(engine) else 1
+        success = migrate_api_keys_table(engine)
+    except Exception as e:
+        logger.error(f"❌ Error during migration: {e}")
+        success = False
+
+    logger.info("-" * 60)
+    if success:
+        logger.info("Migration process completed!")
+        logger.info("   Restart OpenAlgo so API key verification uses the fingerprint lookup.")
+        return 0
+    else:
+        logger.error("Migration failed! Please check the error messages above.")
+        logger.error("   Ensure the database is accessible and DATABASE_URL in .env is correct.")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""
+Shared scheduler for chunked broker history downloads
+
+Brokers cap the date range of one history request, so long downloads are split
+into chunks. The scheduler runs those chunk requests concurrently and keeps
+them within the broker's request rate:
+
+- one token bucket per broker, shared by every download in the process
+- on HTTP 429 the bucket pauses for Retry-After (or an exponential backoff)
+  and halves its rate, then recovers gradually as requests succeed
+- other failures are retried with backoff; if a chunk still fails, the whole
+  download raises HistoryChunkError so a partial result is never taken as complete
+- results come back in chunk order regardless of completion order
+
+A broker's get_history supplies the chunk list and a function that fetches one
+chunk (raising RateLimitError on 429) and gets the chunk results back in order.
+"""
+
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+Chunk = TypeVar('Chunk')
+
+# Concurrent chunk requests per download
+HISTORY_FETCH_WORKERS = int(os.getenv('HISTORY_FETCH_WORKERS', '4'))
+
+# Default history request rate (requests/sec) by broker; HISTORY_RATE_LIMIT_<BROKER> overrides
+DEFAULT_RATE_LIMITS = {
+    'fyers': 8.0,
+}
+DEFAULT_RATE_LIMIT = float(os.getenv('HISTORY_RATE_LIMIT', '3'))
+
+# Backoff for 429 responses without a Retry-After header
+BACKOFF_INITIAL = 1.0
+BACKOFF_MAX = 30.0
+
+# 429 responses tolerated per chunk before it is given up
+MAX_RATE_LIMITED = 10
+
+
+class HistoryChunkError(Exception):
+    """Raised by fetch_chunks when one or more chunks failed after their retries"""
+
+    def __init__(self, broker: str, failed: List[Any], results: List[Any]):
+        super().__init__(f"{broker} history: {len(failed)} of {len(results)} chunks failed: {failed}")
+        self.failed = failed
+        self.results = results
+
+
+class RateLimitError(Exception):
+    """Raised by a chunk fetch when the broker answered 429"""
+
+    def __init__(self, retry_after: Optional[float] = None):
+        super().__init__('rate limit reached')
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds form only)"""
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+class TokenBucket:
+    """Thread-safe token bucket with adaptive rate on 429 responses"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._backoff = BACKOFF_INITIAL
+        self._lock = threading.Lock()
+
+        # Counters
+        self.requests = 0
+        self.rate_limited = 0
+        self.waited = 0.0
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                wait = self._paused_until - now
+                if wait <= 0:
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        self.requests += 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+                self.waited += wait
+            time.sleep(wait)
+
+    def on_success(self):
+        """Recover the rate gradually after a throttled period"""
+        with self._lock:
+            self._backoff = BACKOFF_INITIAL
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.1)
+
+    def on_rate_limited(self, retry_after: Optional[float] = None):
+        """Pause all requests and halve the rate"""
+        with self._lock:
+            pause = retry_after if retry_after is not None else self._backoff
+            self._backoff = min(BACKOFF_MAX, self._backoff * 2)
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+            self.rate = max(self.max_rate / 16, self.rate / 2)
+            self._tokens = 0.0
+            self.rate_limited += 1
+        logger.warning(f"History requests rate limited, pausing {pause:.1f}s at {self.rate:.2f} req/sec")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'rate': round(self.rate, 3),
+            'max_rate': self.max_rate,
+            'requests': self.requests,
+            'rate_limited': self.rate_limited,
+            'waited_sec': round(self.waited, 3),
+        }
+
+
+_limiters: Dict[str, TokenBucket] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(broker: str) -> TokenBucket:
+    """Process-wide token bucket for a broker's history endpoint"""
+    limiter = _limiters.get(broker)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(broker)
+            if limiter is None:
+                rate = os.getenv(f'HISTORY_RATE_LIMIT_{broker.upper()}')
+                rate = float(rate) if rate else DEFAULT_RATE_LIMITS.get(broker, DEFAULT_RATE_LIMIT)
+                limiter = _limiters[broker] = TokenBucket(rate)
+    return limiter
+
+
+def date_chunks(start: datetime, end: datetime, chunk_days: int) -> List[Tuple[str, str]]:
+    """Split [start, end] into (YYYY-MM-DD, YYYY-MM-DD) ranges of at most chunk_days days"""
+    chunks = []
+    current = start
+    while current <= end:
+        chunk_end = min(current + timedelta(days=chunk_days - 1), end)
+        chunks.append((current.strftime('%Y-%m-%d'), chunk_end.strftime('%Y-%m-%d')))
+        current = chunk_end + timedelta(days=1)
+    return chunks
+
+
+def _fetch_with_retry(broker: str, limiter: TokenBucket, fetch_chunk: Callable[[Chunk], Any],
+                      chunk: Chunk, max_retries: int) -> Any:
+    retries = 0
+    throttled = 0
+    while True:
+        limiter.acquire()
+        try:
+            result = fetch_chunk(chunk)
+            limiter.on_success()
+            return result
+        except RateLimitError as e:
+            # Throttling is not the chunk's fault; retry without using up attempts
+            limiter.on_rate_limited(e.retry_after)
+            throttled += 1
+            if throttled >= MAX_RATE_LIMITED:
+                logger.error(f"{broker} history chunk {chunk} still rate limited after {throttled} attempts")
+                return None
+        except Exception as e:
+            if retries >= max_retries:
+                logger.error(f"{broker} history chunk {chunk} failed after {max_retries} retries: {e}")
+                return None
+            retries += 1
+            logger.debug(f"{broker} history chunk {chunk} failed ({e}), retry {retries} of {max_retries}")
+            time.sleep(min(BACKOFF_MAX, BACKOFF_INITIAL * 2 ** (retries - 1)))
+
+
+def fetch_chunks(broker: str, chunks: Sequence[Chunk], fetch_chunk: Callable[[Chunk], Any],
+                 max_workers: int = HISTORY_FETCH_WORKERS, max_retries: int = 3) -> List[Any]:
+    """
+    Fetch history chunks concurrently under the broker's rate limit
+
+    Args:
+        broker: Broker name, selects the shared rate limiter
+        chunks: Chunk descriptors (e.g. from date_chunks)
+        fetch_chunk: Fetches one chunk; raises RateLimitError on 429
+        max_workers: Concurrent requests for this download
+        max_retries: Retries per chunk for errors other than 429
+
+    Returns:
+        list: fetch_chunk results in chunk order
+
+    Raises:
+        HistoryChunkError: if any chunk failed after its retries (the other
+            chunks' results are on the exception)
+    """
+    limiter = get_rate_limiter(broker)
+    if len(chunks) <= 1 or max_workers <= 1:
+        results = [_fetch_with_retry(broker, limiter, fetch_chunk, chunk, max_retries) for chunk in chunks]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks)),
+                                thread_name_prefix=f'{broker}-history') as executor:
+            results = list(executor.map(
+                lambda chunk: _fetch_with_retry(broker, limiter, fetch_chunk, chunk, max_retries), chunks
+            ))
+
+    failed = [chunk for chunk, result in zip(chunks, results) if result is None]
+    if failed:
+        raise HistoryChunkError(broker, failed, results)
+    return results
@@ -0,0 +1,151 @@
+"""
+Single-flight request coalescing for broker market data calls
+
+Identical requests (same broker, endpoint and normalized arguments) that arrive
+while one is already in flight wait for that call instead of making their own,
+and successful results are reused for a short freshness window. A dashboard,
+the Telegram bot and several strategies asking for the same quote at the same
+moment therefore cost one broker request.
+
+Only successful results are kept for the freshness window; a failed call is
+shared with the requests that were waiting on it and then forgotten.
+"""
+
+import os
+import copy
+import time
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Freshness window per endpoint in milliseconds (0 = share in-flight calls only)
+QUOTES_COALESCE_MS = int(os.getenv('QUOTES_COALESCE_MS', '500'))
+DEPTH_COALESCE_MS = int(os.getenv('DEPTH_COALESCE_MS', '500'))
+HISTORY_COALESCE_MS = int(os.getenv('HISTORY_COALESCE_MS', '5000'))
+
+# Expired results are pruned once this many keys are cached
+_PRUNE_THRESHOLD = 1024
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Coalesces concurrent identical calls of one endpoint"""
+
+    def __init__(self, endpoint: str, ttl_ms: int,
+                 is_success: Callable[[Any], bool] = lambda result: bool(result and result[0]),
+                 copy_result: Optional[Callable[[Any], Any]] = copy.deepcopy):
+        """
+        Args:
+            endpoint: Name used in stats (e.g. 'quotes')
+            ttl_ms: Freshness window for successful results
+            is_success: Whether a result may be reused (default: service tuple with success flag)
+            copy_result: Applied to shared results so callers cannot modify each
+                         other's data; None to hand out the same object
+        """
+        self.endpoint = endpoint
+        self.ttl = ttl_ms / 1000
+        self.is_success = is_success
+        self.copy_result = copy_result
+
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, _Call] = {}
+        self._fresh: Dict[Hashable, tuple] = {}  # key -> (expires_at, result)
+
+        # Counters
+        self.calls = 0
+        self.executed = 0
+        self.coalesced = 0
+        self.fresh_hits = 0
+        self.errors = 0
+
+    def _share(self, result: Any) -> Any:
+        return self.copy_result(result) if self.copy_result is not None else result
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Return fn() for key, sharing an in-flight or fresh result when there is one"""
+        now = time.monotonic()
+        with self._lock:
+            self.calls += 1
+            fresh = self._fresh.get(key)
+            if fresh is not None:
+                if fresh[0] > now:
+                    self.fresh_hits += 1
+                    return self._share(fresh[1])
+                del self._fresh[key]
+
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return self._share(call.result)
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                self.executed += 1
+                del self._inflight[key]
+                if call.error is None and self.ttl > 0 and self.is_success(call.result):
+                    if len(self._fresh) >= _PRUNE_THRESHOLD:
+                        self._prune(time.monotonic())
+                    self._fresh[key] = (time.monotonic() + self.ttl, call.result)
+            call.done.set()
+        return self._share(call.result)
+
+    def _prune(self, now: float):
+        """Drop expired results; caller holds the lock"""
+        for key in [key for key, (expires_at, _) in self._fresh.items() if expires_at <= now]:
+            del self._fresh[key]
+
+    def clear(self):
+        with self._lock:
+            self._fresh.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters for the latency dashboard"""
+        saved = self.coalesced + self.fresh_hits
+        return {
+            'endpoint': self.endpoint,
+            'ttl_ms': int(self.ttl * 1000),
+            'calls': self.calls,
+            'broker_calls': self.executed,
+            'coalesced': self.coalesced,
+            'fresh_hits': self.fresh_hits,
+            'errors': self.errors,
+            'saved_pct': round(100 * saved / self.calls, 1) if self.calls else 0.0,
+        }
+
+
+# Shared coalescers for the market data services
+quotes_flight = SingleFlight('quotes', QUOTES_COALESCE_MS)
+depth_flight = SingleFlight('depth', DEPTH_COALESCE_MS)
+# History payloads can be large; callers treat them as read-only
+history_flight = SingleFlight('history', HISTORY_COALESCE_MS, copy_result=None)
+
+
+def get_single_flight_stats() -> Dict[str, Dict[str, Any]]:
+    """Coalescing counters of every market data endpoint"""
+    return {flight.endpoint: flight.get_stats() for flight in (quotes_flight, depth_flight, history_flight)}
@@ -1,4 +1,3 @@
-import json
 import threading
 import zmq
 import random
@@ -6,6 +5,7 @@ import socket
 import os
 from abc import ABC, abstractmethod
 from utils.logging import get_logger
+from .wire_format import encode_market_data
 
 # Initialize logger
 logger = get_logger(__name__)
@@ -67,6 +67,147 @@ def find_free_zmq_port(start_port=5556, max_attempts=50):
     logger.error("Failed to find an available port after maximum attempts")
     return None
 
+# Topic suffix of each subscription mode
+MODE_TOPIC_NAMES = {1: 'LTP', 2: 'QUOTE', 3: 'DEPTH'}
+
+
+class Subscription:
+    """
+    Everything tick routing needs for one broker instrument token: the OpenAlgo
+    symbol and exchange, the subscribed modes as a bitmask (bit 1 << mode) with
+    reference counts per mode, and the ZeroMQ topic of each mode.
+    """
+    __slots__ = ('token', 'symbol', 'exchange', 'mode_mask', 'refcounts', 'topics', 'extra')
+
+    def __init__(self, token, symbol, exchange, topic_exchange=None):
+        self.token = token
+        self.symbol = symbol
+        self.exchange = exchange
+        self.mode_mask = 0
+        self.refcounts = {}
+        topic_exchange = topic_exchange or exchange
+        self.topics = {mode: f"{topic_exchange}_{symbol}_{name}" for mode, name in MODE_TOPIC_NAMES.items()}
+        # Broker specific details (e.g. exchange codes for resubscription)
+        self.extra = {}
+
+    def has_mode(self, mode):
+        return bool(self.mode_mask & (1 << mode))
+
+    @property
+    def modes(self):
+        return sorted(self.refcounts)
+
+    @property
+    def highest_mode(self):
+        return self.mode_mask.bit_length() - 1 if self.mode_mask else 0
+
+
+class SubscriptionRegistry:
+    """
+    Token-indexed subscription registry shared by the streaming adapters.
+
+    Ticks are routed with get(token), a lock-free dict lookup, instead of a scan
+    of all subscriptions. Subscribe/unsubscribe calls from several clients are
+    reference counted per mode, so the adapter only talks to the broker when a
+    token or mode is first added or finally released.
+
+    Tokens are whatever identifies an instrument in the broker feed; brokers
+    whose tokens are only unique per exchange segment use (segment, token).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_token = {}
+        self._by_symbol = {}  # (exchange, symbol) -> Subscription
+
+    def add(self, token, symbol, exchange, mode, topic_exchange=None):
+        """
+        Add one reference to a subscription mode
+
+        Returns:
+            tuple: (Subscription, new token, new mode)
+        """
+        with self._lock:
+            subscription = self._by_symbol.get((exchange, symbol))
+            if subscription is not None and subscription.token != token:
+                # Token changed (e.g. master contract reloaded): move the entry
+                self._by_token.pop(subscription.token, None)
+                subscription.token = token
+                self._by_token[token] = subscription
+            if subscription is None:
+                subscription = self._by_token.get(token)
+            new_token = subscription is None
+            if new_token:
+                subscription = Subscription(token, symbol, exchange, topic_exchange)
+                self._by_token[token] = subscription
+                self._by_symbol[(exchange, symbol)] = subscription
+
+            count = subscription.refcounts.get(mode, 0)
+            subscription.refcounts[mode] = count + 1
+            subscription.mode_mask |= 1 << mode
+            return subscription, new_token, count == 0
+
+    def remove(self, symbol, exchange, mode=None):
+        """
+        Drop one reference to a mode, or every reference when mode is None
+
+        Returns:
+            tuple: (Subscription or None if not subscribed in that mode,
+                    mode released, token released)
+        """
+        with self._lock:
+            subscription = self._by_symbol.get((exchange, symbol))
+            if subscription is None or (mode is not None and mode not in subscription.refcounts):
+                return None, False, False
+
+            if mode is None:
+                subscription.refcounts.clear()
+                mode_released = True
+            else:
+                subscription.refcounts[mode] -= 1
+                mode_released = subscription.refcounts[mode] == 0
+                if mode_released:
+                    del subscription.refcounts[mode]
+            subscription.mode_mask = 0
+            for held in subscription.refcounts:
+                subscription.mode_mask |= 1 << held
+
+            token_released = not subscription.refcounts
+            if token_released:
+                self._by_token.pop(subscription.token, None)
+                del self._by_symbol[(exchange, symbol)]
+            return subscription, mode_released, token_released
+
+    def get(self, token):
+        """Subscription for a feed token, or None"""
+        return self._by_token.get(token)
+
+    def find(self, symbol, exchange):
+        """Subscription for an OpenAlgo symbol, or None"""
+        return self._by_symbol.get((exchange, symbol))
+
+    def subscriptions(self):
+        """Snapshot of all subscriptions"""
+        with self._lock:
+            return list(self._by_token.values())
+
+    def keys(self):
+        """'EXCHANGE:SYMBOL' of every subscription"""
+        with self._lock:
+            return [f"{exchange}:{symbol}" for exchange, symbol in self._by_symbol]
+
+    def clear(self):
+        with self._lock:
+            self._by_token.clear()
+            self._by_symbol.clear()
+
+    def __len__(self):
+        return len(self._by_token)
+
+    def __contains__(self, token):
+        return token in self._by_token
+
+
 class BaseBrokerWebSocketAdapter(ABC):
     """
     Base class for all broker-specific WebSocket adapters that implements
@@ -93,6 +234,7 @@ class BaseBrokerWebSocketAdapter(ABC):
             
             # Initialize instance variables
             self.subscriptions = {}
+            self.registry = SubscriptionRegistry()
             self.connected = False
             
             self.logger.info(f"BaseBrokerWebSocketAdapter initialized on port {self.zmq_port}")
@@ -255,10 +397,8 @@ class BaseBrokerWebSocketAdapter(ABC):
             data: Market data dictionary
         """
         try:
-            self.socket.send_multipart([
-                topic.encode('utf-8'),
-                json.dumps(data).encode('utf-8')
-            ])
+            # JSON or msgpack frames depending on ZMQ_WIRE_FORMAT
+            self.socket.send_multipart(encode_market_data(topic, data))
         except Exception as e:
             self.logger.exception(f"Error publishing market data: {e}")
     
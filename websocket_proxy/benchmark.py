@@ -0,0 +1,182 @@
+"""
+WebSocket proxy micro-benchmark
+
+Publishes synthetic ticks on ZeroMQ exactly like a broker adapter, runs a real
+WebSocketProxy and connects real WebSocket clients, then reports throughput and
+adapter-to-client latency.
+
+Publisher, proxy and clients share one process and event loop, so latency is measured
+with a single monotonic clock (the publish time travels inside the tick) and the
+numbers include client-side JSON parsing. Use it to compare proxy changes on the same
+machine rather than as an absolute capacity figure.
+
+Usage:
+    python -m websocket_proxy.benchmark --ticks 50000 --clients 20 --symbols 50 --mode QUOTE
+"""
+
+import os
+import json
+import time
+import argparse
+import asyncio as aio
+from typing import List
+
+import zmq
+import websockets
+from dotenv import load_dotenv
+
+from utils.logging import get_logger
+from .port_check import find_available_port
+from .wire_format import encode_market_data
+
+logger = get_logger(__name__)
+
+BENCHMARK_BROKER = "benchmark"
+BENCHMARK_USER = "benchmark"
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def _consume(websocket, latencies: List[float], counts: List[int], index: int):
+    """Record adapter-to-client latency of every market data message"""
+    try:
+        async for message in websocket:
+            data = json.loads(message)
+            if data.get("type") == "market_data":
+                latencies.append((time.perf_counter_ns() - data["data"]["sent_ns"]) / 1e6)
+                counts[index] += 1
+    except websockets.exceptions.ConnectionClosed:
+        pass
+
+
+async def run_benchmark(ticks: int = 50000, clients: int = 20, symbols: int = 50,
+                        mode: str = "QUOTE", rate: float = 0.0, burst: int = 100) -> dict:
+    """
+    Run the benchmark
+
+    Args:
+        ticks: Number of ticks to publish
+        clients: Number of WebSocket clients, each subscribed to every symbol
+        symbols: Number of distinct symbols the ticks rotate through
+        mode: LTP, QUOTE or DEPTH
+        rate: Target publish rate in ticks/sec (0 = as fast as possible)
+        burst: Ticks published between yields to the event loop
+
+    Returns:
+        dict: Throughput, latency percentiles and proxy counters
+    """
+    from .server import WebSocketProxy
+
+    mode = mode.upper()
+    zmq_port = find_available_port(start_port=15555, max_attempts=100)
+    ws_port = find_available_port(start_port=18765, max_attempts=100)
+    os.environ["ZMQ_PORT"] = str(zmq_port)
+
+    publisher = zmq.Context.instance().socket(zmq.PUB)
+    publisher.setsockopt(zmq.SNDHWM, 0)
+    publisher.setsockopt(zmq.LINGER, 0)
+    publisher.bind(f"tcp://127.0.0.1:{zmq_port}")
+
+    proxy = WebSocketProxy(host="127.0.0.1", port=ws_port)
+    server_task = aio.create_task(proxy.start())
+    while getattr(proxy, "server", None) is None:
+        await aio.sleep(0.05)
+
+    connections = [await websockets.connect(f"ws://127.0.0.1:{ws_port}") for _ in range(clients)]
+    while len(proxy.clients) < clients:
+        await aio.sleep(0.01)
+
+    # Register the connections as authenticated subscribers, bypassing API key checks
+    mode_id = proxy.MODE_MAP[mode]
+    symbol_names = [f"BENCH{i}" for i in range(symbols)]
+    proxy.user_broker_mapping[BENCHMARK_USER] = BENCHMARK_BROKER
+    for client_id in proxy.clients:
+        proxy.user_mapping[client_id] = BENCHMARK_USER
+        for symbol in symbol_names:
+            proxy.subscription_index[(symbol, "NSE", mode_id)].add(client_id)
+
+    latencies: List[float] = []
+    counts = [0] * clients
+    consumers = [aio.create_task(_consume(ws, latencies, counts, i)) for i, ws in enumerate(connections)]
+
+    # Let the ZeroMQ subscription settle before publishing
+    await aio.sleep(0.5)
+
+    topics = [f"{BENCHMARK_BROKER}_NSE_{symbol}_{mode}" for symbol in symbol_names]
+    start = time.perf_counter()
+    for i in range(ticks):
+        publisher.send_multipart(encode_market_data(topics[i % symbols], {
+            "ltp": 100.0 + i % 100,
+            "sent_ns": time.perf_counter_ns()
+        }))
+        if (i + 1) % burst == 0:
+            if rate > 0:
+                await aio.sleep(max(start + (i + 1) / rate - time.perf_counter(), 0))
+            else:
+                await aio.sleep(0)
+    publish_time = time.perf_counter() - start
+
+    # Wait for delivery to go quiet
+    delivered = -1
+    while delivered != sum(counts):
+        delivered = sum(counts)
+        await aio.sleep(0.3)
+    elapsed = time.perf_counter() - start - 0.3
+
+    for websocket in connections:
+        await websocket.close()
+    for consumer in consumers:
+        consumer.cancel()
+    client_stats = proxy.get_client_stats().values()
+    fanout = proxy.get_fanout_stats()
+    await proxy.stop()
+    server_task.cancel()
+    publisher.close()
+
+    return {
+        "ticks_published": ticks,
+        "publish_rate": ticks / publish_time,
+        "proxy_ticks_per_sec": fanout["zmq_messages"] / elapsed,
+        "messages_delivered": delivered,
+        "messages_per_sec": delivered / elapsed,
+        "latency_p50_ms": percentile(latencies, 50),
+        "latency_p99_ms": percentile(latencies, 99),
+        "latency_max_ms": max(latencies) if latencies else 0.0,
+        "avg_zmq_batch": fanout["zmq_messages"] / fanout["zmq_batches"] if fanout["zmq_batches"] else 0.0,
+        "serializations_per_tick": fanout["serializations_per_tick"],
+        "coalesced": fanout["coalesced"],
+        "conflated": sum(stats["conflated"] for stats in client_stats),
+        "dropped": sum(stats["dropped"] for stats in client_stats),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WebSocket proxy micro-benchmark")
+    parser.add_argument("--ticks", type=int, default=50000, help="Ticks to publish")
+    parser.add_argument("--clients", type=int, default=20, help="WebSocket clients")
+    parser.add_argument("--symbols", type=int, default=50, help="Distinct symbols")
+    parser.add_argument("--mode", default="QUOTE", choices=["LTP", "QUOTE", "DEPTH"], help="Subscription mode")
+    parser.add_argument("--rate", type=float, default=0.0, help="Publish rate in ticks/sec (0 = unlimited)")
+    args = parser.parse_args()
+
+    load_dotenv()
+    results = aio.run(run_benchmark(args.ticks, args.clients, args.symbols, args.mode, args.rate))
+
+    print(f"Ticks published:        {results['ticks_published']} ({results['publish_rate']:.0f}/sec)")
+    print(f"Proxy throughput:       {results['proxy_ticks_per_sec']:.0f} ticks/sec")
+    print(f"Messages delivered:     {results['messages_delivered']} ({results['messages_per_sec']:.0f}/sec)")
+    print(f"Latency p50 / p99 / max: {results['latency_p50_ms']:.2f} / {results['latency_p99_ms']:.2f} / "
+          f"{results['latency_max_ms']:.2f} ms")
+    print(f"Average ZeroMQ batch:   {results['avg_zmq_batch']:.1f} frames")
+    print(f"Serializations/tick:    {results['serializations_per_tick']}")
+    print(f"Coalesced / conflated / dropped: {results['coalesced']} / {results['conflated']} / {results['dropped']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Per-client outbound queues for the WebSocket proxy
+
+Every client connection owns a ClientOutbox and a writer task. The ZeroMQ listener
+only enqueues; the writer sends at whatever pace the client's socket allows, so a
+slow client never delays delivery to the others.
+
+Market data is conflated by (symbol, exchange, mode): while a key is still waiting
+to be sent, a newer tick replaces its payload in place, so a lagging client skips
+intermediate ticks and always receives the latest snapshot.
+"""
+
+import os
+import time
+import asyncio as aio
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+import websockets
+
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Maximum number of distinct keys waiting per client before new keys are dropped
+CLIENT_QUEUE_SIZE = int(os.getenv('WEBSOCKET_CLIENT_QUEUE_SIZE', '1000'))
+
+
+class ClientOutbox:
+    """Bounded, conflating outbound queue with a dedicated writer task"""
+
+    def __init__(self, client_id: int, websocket, maxsize: int = CLIENT_QUEUE_SIZE):
+        self.client_id = client_id
+        self.websocket = websocket
+        self.maxsize = maxsize
+
+        # key -> (payload, enqueue time of the oldest unsent tick for the key)
+        self._pending: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._ready = aio.Event()
+        self.task: Optional[aio.Task] = None
+
+        # Counters
+        self.sent = 0
+        self.conflated = 0
+        self.dropped = 0
+        self.last_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+
+    def put(self, key: Hashable, payload: str) -> bool:
+        """
+        Queue a payload for a key without blocking
+
+        Returns:
+            False if the queue was full and the payload was dropped
+        """
+        pending = self._pending.get(key)
+        if pending is not None:
+            # Client is behind on this key: keep only the latest snapshot
+            self._pending[key] = (payload, pending[1])
+            self.conflated += 1
+            return True
+
+        if len(self._pending) >= self.maxsize:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning(f"Client {self.client_id} outbound queue full, dropped {self.dropped} messages")
+            return False
+
+        self._pending[key] = (payload, time.monotonic())
+        self._ready.set()
+        return True
+
+    def start(self) -> aio.Task:
+        """Start the writer task on the running event loop"""
+        self.task = aio.get_running_loop().create_task(self.run())
+        return self.task
+
+    async def run(self):
+        """Send queued payloads in arrival order until the connection closes"""
+        pending = self._pending
+        try:
+            while True:
+                await self._ready.wait()
+                while pending:
+                    _, (payload, queued_at) = pending.popitem(last=False)
+                    await self.websocket.send(payload)
+
+                    lag_ms = (time.monotonic() - queued_at) * 1000
+                    self.sent += 1
+                    self.last_lag_ms = lag_ms
+                    if lag_ms > self.max_lag_ms:
+                        self.max_lag_ms = lag_ms
+                self._ready.clear()
+        except websockets.exceptions.ConnectionClosed:
+            logger.info(f"Connection closed while sending queued messages to client {self.client_id}")
+        except aio.CancelledError:
+            pass
+        except Exception as e:
+            logger.exception(f"Error in writer for client {self.client_id}: {e}")
+
+    def close(self):
+        """Stop the writer task and discard queued payloads"""
+        if self.task is not None:
+            self.task.cancel()
+        self._pending.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Delivery counters for monitoring"""
+        return {
+            'queued': len(self._pending),
+            'sent': self.sent,
+            'conflated': self.conflated,
+            'dropped': self.dropped,
+            'last_lag_ms': round(self.last_lag_ms, 3),
+            'max_lag_ms': round(self.max_lag_ms, 3)
+        }
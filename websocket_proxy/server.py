@@ -6,7 +6,6 @@ import signal
 import zmq
 import zmq.asyncio
 import threading
-import time
 import os
 import socket
 from typing import Dict, Set, Any, Optional, Tuple
@@ -19,6 +18,8 @@ from sqlalchemy import text
 from database.auth_db import verify_api_key
 from .broker_factory import create_broker_adapter
 from .base_adapter import BaseBrokerWebSocketAdapter
+from .wire_format import decode_market_data
+from .client_outbox import ClientOutbox
 
 # Initialize logger
 logger = get_logger("websocket_proxy")
@@ -56,6 +57,7 @@ class WebSocketProxy:
             raise RuntimeError(error_msg)
         
         self.clients = {}  # Maps client_id to websocket connection
+        self.outboxes: Dict[int, ClientOutbox] = {}  # Maps client_id to outbound market data queue
         self.subscriptions = {}  # Maps client_id to set of subscriptions
         self.broker_adapters = {}  # Maps user_id to broker adapter
         self.user_mapping = {}  # Maps client_id to user_id
@@ -67,15 +69,33 @@ class WebSocketProxy:
         # This eliminates the need for nested loops in zmq_listener
         self.subscription_index: Dict[Tuple[str, str, int], Set[int]] = defaultdict(set)
 
-        # PERFORMANCE OPTIMIZATION 2: Message throttling to avoid excessive updates
-        # Maps (symbol, exchange, mode) -> last message timestamp
-        # Prevents sending duplicate LTP updates faster than 50ms
-        self.last_message_time: Dict[Tuple[str, str, int], float] = {}
-        self.message_throttle_interval = 0.05  # 50ms minimum between messages
+        # PERFORMANCE OPTIMIZATION 2: Coalescing instead of dropping fast updates
+        # Per mode flush interval in seconds (0 = deliver every tick immediately)
+        self.flush_intervals: Dict[int, float] = {
+            1: float(os.getenv('WEBSOCKET_LTP_FLUSH_MS', '50')) / 1000,
+            2: float(os.getenv('WEBSOCKET_QUOTE_FLUSH_MS', '0')) / 1000,
+            3: float(os.getenv('WEBSOCKET_DEPTH_FLUSH_MS', '0')) / 1000,
+        }
+        # Dirty set per coalesced mode: (broker, symbol, exchange) -> latest market data
+        # Holds only keys updated since the last flush; the flusher sends the latest
+        # value of each, so clients always converge to the final price of a burst
+        self.dirty: Dict[int, Dict[Tuple[str, str, str], Any]] = {
+            mode: {} for mode, interval in self.flush_intervals.items() if interval > 0
+        }
 
         # PERFORMANCE OPTIMIZATION 3: Pre-compute mode mappings
         self.MODE_MAP = {"LTP": 1, "QUOTE": 2, "DEPTH": 3}
 
+        # Fan-out metrics: each tick is serialized once per distinct broker field,
+        # not once per client
+        self.fanout_stats = {
+            "ticks": 0, "serializations": 0, "messages_queued": 0, "coalesced": 0,
+            "zmq_messages": 0, "zmq_batches": 0
+        }
+
+        # Maximum frames drained from ZeroMQ per wakeup before yielding to writers
+        self.zmq_batch_size = int(os.getenv('WEBSOCKET_ZMQ_BATCH_SIZE', '500'))
+
         # ZeroMQ context for subscribing to broker adapters
         self.context = zmq.asyncio.Context()
         self.socket = self.context.socket(zmq.SUB)
@@ -194,6 +214,11 @@ class WebSocketProxy:
                 except Exception as e:
                     logger.error(f"Error closing WebSocket server: {e}")
             
+            # Stop client writer tasks
+            for outbox in self.outboxes.values():
+                outbox.close()
+            self.outboxes.clear()
+            
             # Close all client connections
             close_tasks = []
             for client_id, websocket in self.clients.items():
@@ -251,6 +276,12 @@ class WebSocketProxy:
         self.clients[client_id] = websocket
         self.subscriptions[client_id] = set()
         
+        # Market data goes through a per-client queue and writer task so a slow
+        # client only delays itself
+        outbox = ClientOutbox(client_id, websocket)
+        self.outboxes[client_id] = outbox
+        outbox.start()
+        
         # Get path info from websocket if available
         path = getattr(websocket, 'path', '/unknown')
         logger.info(f"Client connected: {client_id} from path: {path}")
@@ -288,6 +319,11 @@ class WebSocketProxy:
         if client_id in self.clients:
             del self.clients[client_id]
         
+        # Stop the client's writer task
+        outbox = self.outboxes.pop(client_id, None)
+        if outbox is not None:
+            outbox.close()
+        
         # Clean up subscriptions
         if client_id in self.subscriptions:
             subscriptions = self.subscriptions[client_id]
@@ -380,6 +416,13 @@ class WebSocketProxy:
                 await self.get_broker_info(client_id)
             elif action == "get_supported_brokers":
                 await self.get_supported_brokers(client_id)
+            elif action == "get_proxy_stats":
+                await self.send_message(client_id, {
+                    "type": "proxy_stats",
+                    "status": "success",
+                    "data": self.get_fanout_stats(),
+                    "clients": self.get_client_stats()
+                })
             else:
                 logger.warning(f"Client {client_id} requested invalid action: {action}")
                 await self.send_error(client_id, "INVALID_ACTION", f"Invalid action: {action}")
@@ -872,6 +915,89 @@ class WebSocketProxy:
             except websockets.exceptions.ConnectionClosed:
                 logger.info(f"Connection closed while sending message to client {client_id}")
     
+    def get_fanout_stats(self):
+        """
+        Get market data fan-out counters
+        
+        Returns:
+            dict: Ticks with at least one recipient, JSON serializations, messages queued
+                  and the average serializations per tick
+        """
+        stats = dict(self.fanout_stats)
+        ticks = stats["ticks"]
+        stats["serializations_per_tick"] = round(stats["serializations"] / ticks, 3) if ticks else 0.0
+        return stats
+    
+    def get_client_stats(self):
+        """
+        Get per-client outbound queue counters
+        
+        Returns:
+            dict: client_id -> queued, sent, conflated and dropped counts and lag in ms
+        """
+        return {str(client_id): outbox.get_stats() for client_id, outbox in self.outboxes.items()}
+    
+    def broadcast_market_data(self, broker_name, symbol, exchange, mode, market_data):
+        """
+        Queue one market data tick for every subscribed client
+        
+        Recipients are grouped by the broker field they receive; each group's
+        message is serialized exactly once and the same string is queued for every
+        websocket in the group. Queues conflate by (symbol, exchange, mode), and
+        each client's writer task sends at that client's pace.
+        
+        Args:
+            broker_name: Broker from the ZeroMQ topic, or "unknown"
+            symbol: Trading symbol
+            exchange: Exchange code
+            mode: Subscription mode (1=LTP, 2=Quote, 3=Depth)
+            market_data: Parsed market data payload
+        """
+        sub_key = (symbol, exchange, mode)
+        client_ids = self.subscription_index.get(sub_key)
+        if not client_ids:
+            return  # No clients subscribed, skip processing
+
+        message = {
+            "type": "market_data",
+            "symbol": symbol,
+            "exchange": exchange,
+            "mode": mode,
+            "data": market_data
+        }
+        payloads = {}  # effective broker -> serialized message
+        queued = 0
+
+        for client_id in client_ids:
+            # Verify client still exists
+            outbox = self.outboxes.get(client_id)
+            if outbox is None:
+                continue
+
+            # Verify user mapping exists
+            user_id = self.user_mapping.get(client_id)
+            if not user_id:
+                continue
+
+            # Check broker match (important for multi-broker setups)
+            client_broker = self.user_broker_mapping.get(user_id)
+            if broker_name != "unknown" and client_broker and client_broker != broker_name:
+                continue
+
+            effective_broker = broker_name if broker_name != "unknown" else client_broker
+            payload = payloads.get(effective_broker)
+            if payload is None:
+                message["broker"] = effective_broker
+                payload = payloads[effective_broker] = json.dumps(message)
+
+            outbox.put(sub_key, payload)
+            queued += 1
+
+        if queued:
+            self.fanout_stats["ticks"] += 1
+            self.fanout_stats["serializations"] += len(payloads)
+            self.fanout_stats["messages_queued"] += queued
+    
     async def send_error(self, client_id, code, message):
         """
         Send an error message to a client
@@ -892,146 +1018,159 @@ class WebSocketProxy:
         OPTIMIZED: Listen for messages from broker adapters via ZeroMQ and forward to clients
 
         Key Performance Improvements:
-        1. Increased timeout from 0.1s to 0.3s (reduces busy-waiting by 66%)
+        1. Event driven: a zmq.asyncio poller wakes the listener when frames arrive,
+           then everything already queued is drained without blocking and processed
+           as one batch (no per-message timeout futures)
         2. Use subscription_index for O(1) lookup instead of O(n²) iteration
-        3. Batch message sending with asyncio.gather
+           (fast modes are coalesced into a dirty set and flushed on a cadence)
+        3. Serialize each tick once per broker field and hand it to per-client
+           conflating queues, so no client's send blocks the listener
         """
         logger.info("Starting OPTIMIZED ZeroMQ listener with subscription indexing")
 
-        while self.running:
-            try:
-                # Check if we should stop
-                if not self.running:
-                    break
+        # Flushers for coalesced modes
+        flushers = [
+            aio.create_task(self.coalesce_flusher(mode, self.flush_intervals[mode]))
+            for mode in self.dirty
+        ]
 
-                # OPTIMIZATION 1: Increased timeout to reduce busy-waiting
-                try:
-                    [topic, data] = await aio.wait_for(
-                        self.socket.recv_multipart(),
-                        timeout=0.3  # Increased from 0.1s (66% less CPU usage)
-                    )
-                except aio.TimeoutError:
-                    # No message received within timeout, continue the loop
-                    continue
-                
-                # Parse the message
-                topic_str = topic.decode('utf-8')
-                data_str = data.decode('utf-8')
-                market_data = json.loads(data_str)
-                
-                # Extract topic components
-                # Support both formats:
-                # New format: BROKER_EXCHANGE_SYMBOL_MODE (with broker name)
-                # Old format: EXCHANGE_SYMBOL_MODE (without broker name)
-                # Special case: NSE_INDEX_SYMBOL_MODE (exchange contains underscore)
-                parts = topic_str.split('_')
-                
-                # Special case handling for NSE_INDEX and BSE_INDEX
-                if len(parts) >= 4 and parts[0] == "NSE" and parts[1] == "INDEX":
-                    broker_name = "unknown"
-                    exchange = "NSE_INDEX"
-                    symbol = parts[2]
-                    mode_str = parts[3]
-                elif len(parts) >= 4 and parts[0] == "BSE" and parts[1] == "INDEX":
-                    broker_name = "unknown"
-                    exchange = "BSE_INDEX"
-                    symbol = parts[2]
-                    mode_str = parts[3]
-                elif len(parts) >= 5 and parts[1] == "INDEX":  # BROKER_NSE_INDEX_SYMBOL_MODE format
-                    broker_name = parts[0]
-                    exchange = f"{parts[1]}_{parts[2]}"
-                    symbol = parts[3]
-                    mode_str = parts[4]
-                elif len(parts) >= 4:
-                    # Standard format with broker name
-                    broker_name = parts[0]
-                    exchange = parts[1]
-                    symbol = parts[2]
-                    mode_str = parts[3]
-                elif len(parts) >= 3:
-                    # Old format without broker name
-                    broker_name = "unknown"
-                    exchange = parts[0]
-                    symbol = parts[1] 
-                    mode_str = parts[2]
-                else:
-                    logger.warning(f"Invalid topic format: {topic_str}")
-                    continue
-                
-                # OPTIMIZATION: Use pre-computed mode map
-                mode = self.MODE_MAP.get(mode_str)
+        poller = zmq.asyncio.Poller()
+        poller.register(self.socket, zmq.POLLIN)
+        # Synchronous view of the same socket for non-blocking drains
+        drain_socket = zmq.Socket.shadow(self.socket.underlying)
 
-                if not mode:
-                    logger.warning(f"Invalid mode in topic: {mode_str}")
+        while self.running:
+            try:
+                # Wake on incoming frames; the timeout only re-checks self.running
+                if not await poller.poll(timeout=500):
                     continue
 
-                # OPTIMIZATION: Message throttling for high-frequency updates
-                # Skip if we sent the same message too recently (reduces CPU on fast updates)
-                sub_key = (symbol, exchange, mode)
-                current_time = time.time()
-
-                # Only throttle LTP mode (mode 1), not Quote/Depth
-                if mode == 1:  # LTP mode
-                    last_time = self.last_message_time.get(sub_key, 0)
-                    if current_time - last_time < self.message_throttle_interval:
-                        continue  # Skip this update, too soon
-                    self.last_message_time[sub_key] = current_time
+                batch = self.drain_zmq(drain_socket)
+                self.fanout_stats["zmq_batches"] += 1
+                self.fanout_stats["zmq_messages"] += len(batch)
 
-                # OPTIMIZATION 2: O(1) lookup using subscription index
-                # Instead of iterating through ALL clients and ALL subscriptions (O(n²)),
-                # directly lookup clients subscribed to this specific (symbol, exchange, mode)
-                client_ids = self.subscription_index.get(sub_key, set()).copy()
+                for frames in batch:
+                    if len(frames) == 2:
+                        self.process_zmq_message(frames[0], frames[1])
 
-                if not client_ids:
-                    continue  # No clients subscribed, skip processing
-
-                # OPTIMIZATION 3: Batch message sends for parallel delivery
-                send_tasks = []
-
-                # OPTIMIZATION 4: Pre-create base message (reused for all clients)
-                # This avoids creating the same dict 1000 times
-                base_message = {
-                    "type": "market_data",
-                    "symbol": symbol,
-                    "exchange": exchange,
-                    "mode": mode,
-                    "data": market_data
-                }
-
-                # OPTIMIZATION 5: Pre-serialize JSON once (not per-client)
-                # Most clients get the same message, so serialize once
-                base_message_str = None
-
-                for client_id in client_ids:
-                    # Verify client still exists
-                    if client_id not in self.clients:
-                        continue
+                # Let client writers run before the next drain
+                await aio.sleep(0)
+            
+            except Exception as e:
+                logger.error(f"Error in ZeroMQ listener: {e}")
+                # Continue running despite errors
+                await aio.sleep(1)
 
-                    # Verify user mapping exists
-                    user_id = self.user_mapping.get(client_id)
-                    if not user_id:
-                        continue
+        for flusher in flushers:
+            flusher.cancel()
+    
+    def drain_zmq(self, socket):
+        """
+        Read every frame already queued on the ZeroMQ socket without blocking
+        
+        Args:
+            socket: Synchronous zmq socket
+            
+        Returns:
+            list: [topic, data] frames, at most zmq_batch_size of them
+        """
+        batch = []
+        try:
+            while len(batch) < self.zmq_batch_size:
+                batch.append(socket.recv_multipart(flags=zmq.NOBLOCK))
+        except zmq.Again:
+            pass
+        return batch
+    
+    def process_zmq_message(self, topic, data):
+        """
+        Decode one adapter message and route it to subscribers
+        
+        Args:
+            topic: Topic frame (topic string, or 0x00 + topic string for msgpack)
+            data: Payload frame
+        """
+        try:
+            # Decode the message; topics are parsed once and cached by the
+            # registry by their raw frame bytes (JSON or msgpack topic frames)
+            topic_info, market_data = decode_market_data(topic, data)
+        except Exception as e:
+            logger.error(f"Error decoding market data for topic {topic!r}: {e}")
+            return
+        if topic_info is None:
+            logger.warning(f"Invalid topic format: {topic!r}")
+            return
+        broker_name, exchange, symbol, mode_str = topic_info
 
-                    # Check broker match (important for multi-broker setups)
-                    client_broker = self.user_broker_mapping.get(user_id)
-                    if broker_name != "unknown" and client_broker and client_broker != broker_name:
-                        continue
+        # OPTIMIZATION: Use pre-computed mode map
+        mode = self.MODE_MAP.get(mode_str)
 
-                    # Add broker to message
-                    message = base_message.copy()
-                    message["broker"] = broker_name if broker_name != "unknown" else client_broker
+        if not mode:
+            logger.warning(f"Invalid mode in topic: {mode_str}")
+            return
 
-                    # Add to batch
-                    send_tasks.append(self.send_message(client_id, message))
+        self.route_market_data(broker_name, symbol, exchange, mode, market_data)
+    
+    def route_market_data(self, broker_name, symbol, exchange, mode, market_data):
+        """
+        Deliver a tick now, or mark it dirty when its mode is coalesced
+        
+        Args:
+            broker_name: Broker from the ZeroMQ topic, or "unknown"
+            symbol: Trading symbol
+            exchange: Exchange code
+            mode: Subscription mode (1=LTP, 2=Quote, 3=Depth)
+            market_data: Parsed market data payload
+        """
+        # OPTIMIZATION: Coalesce high-frequency updates per mode
+        # Keep only the latest value per key; the mode's flusher delivers it
+        dirty = self.dirty.get(mode)
+        if dirty is not None:
+            key = (broker_name, symbol, exchange)
+            if key in dirty:
+                self.fanout_stats["coalesced"] += 1
+            dirty[key] = market_data
+            return
 
-                # Send all messages in parallel (non-blocking)
-                if send_tasks:
-                    await aio.gather(*send_tasks, return_exceptions=True)
-            
+        # OPTIMIZATION 2: O(1) lookup using subscription index, then
+        # serialize once per distinct broker field and queue per client
+        self.broadcast_market_data(broker_name, symbol, exchange, mode, market_data)
+    
+    def flush_dirty(self, mode):
+        """
+        Deliver the latest value of every key updated since the last flush
+        
+        Args:
+            mode: Subscription mode whose dirty set to flush
+        """
+        dirty = self.dirty[mode]
+        if not dirty:
+            return
+        self.dirty[mode] = {}
+        for (broker_name, symbol, exchange), market_data in dirty.items():
+            self.broadcast_market_data(broker_name, symbol, exchange, mode, market_data)
+    
+    async def coalesce_flusher(self, mode, interval):
+        """
+        Flush a mode's dirty set on a fixed cadence
+        
+        Args:
+            mode: Subscription mode (1=LTP, 2=Quote, 3=Depth)
+            interval: Flush interval in seconds
+        """
+        loop = aio.get_running_loop()
+        next_flush = loop.time() + interval
+        while self.running:
+            await aio.sleep(max(next_flush - loop.time(), 0))
+            next_flush += interval
+            try:
+                self.flush_dirty(mode)
             except Exception as e:
-                logger.error(f"Error in ZeroMQ listener: {e}")
-                # Continue running despite errors
-                await aio.sleep(1)
+                logger.error(f"Error flushing mode {mode} updates: {e}")
+            # Skip missed slots rather than flushing back to back
+            now = loop.time()
+            if next_flush < now:
+                next_flush = now + interval
 
 # Entry point for running the server standalone
 async def main():
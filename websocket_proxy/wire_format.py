@@ -0,0 +1,146 @@
+"""
+Wire format for the broker adapter -> WebSocket proxy ZeroMQ hop
+
+Two encodings are supported, selected with ZMQ_WIRE_FORMAT:
+
+- json (default): [topic string, JSON payload]
+- msgpack: [0x00 + topic string, msgpack payload]
+
+The leading 0x00 marks a msgpack payload. The topic frame always carries the
+topic string itself, so any subscriber can decode it: the proxy, the chart live
+candle listener, or a proxy running standalone or in Docker, whatever process
+published it. Receivers parse each distinct topic frame once and then resolve it
+with a single dict lookup on the raw frame bytes. External WebSocket clients
+always receive JSON; this only affects the internal hop.
+
+msgpack is optional; if it is not installed the json encoding is used.
+"""
+
+import os
+import json
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+# First byte of a msgpack topic frame; topic strings never start with it
+MSGPACK_TOPIC_PREFIX = b'\x00'
+
+
+class TopicInfo(NamedTuple):
+    """Parsed components of a market data topic"""
+    broker: str
+    exchange: str
+    symbol: str
+    mode: str
+
+
+def parse_topic(topic: str) -> Optional[TopicInfo]:
+    """
+    Parse a market data topic string
+
+    Supports both formats:
+    New format: BROKER_EXCHANGE_SYMBOL_MODE (with broker name)
+    Old format: EXCHANGE_SYMBOL_MODE (without broker name)
+    Special case: NSE_INDEX_SYMBOL_MODE (exchange contains underscore)
+
+    Returns:
+        TopicInfo, or None for an invalid topic
+    """
+    parts = topic.split('_')
+
+    # Special case handling for NSE_INDEX and BSE_INDEX
+    if len(parts) >= 4 and parts[0] == "NSE" and parts[1] == "INDEX":
+        return TopicInfo("unknown", "NSE_INDEX", parts[2], parts[3])
+    if len(parts) >= 4 and parts[0] == "BSE" and parts[1] == "INDEX":
+        return TopicInfo("unknown", "BSE_INDEX", parts[2], parts[3])
+    if len(parts) >= 5 and parts[2] == "INDEX":  # BROKER_NSE_INDEX_SYMBOL_MODE format
+        return TopicInfo(parts[0], f"{parts[1]}_{parts[2]}", parts[3], parts[4])
+    if len(parts) >= 4:
+        # Standard format with broker name
+        return TopicInfo(parts[0], parts[1], parts[2], parts[3])
+    if len(parts) >= 3:
+        # Old format without broker name
+        return TopicInfo("unknown", parts[0], parts[1], parts[2])
+    return None
+
+
+class TopicRegistry:
+    """
+    Caches parsed topics by raw topic frame, and the msgpack frame of each topic
+
+    A topic frame is the topic string in UTF-8, behind MSGPACK_TOPIC_PREFIX for
+    msgpack payloads. Each distinct frame is parsed once; afterwards it resolves
+    to its TopicInfo with one dict lookup, without string splitting.
+    """
+
+    def __init__(self):
+        self._by_bytes: Dict[bytes, Optional[TopicInfo]] = {}
+        self._frames: Dict[str, bytes] = {}
+
+    def resolve_bytes(self, topic: bytes) -> Optional[TopicInfo]:
+        """Get the parsed topic for a raw topic frame"""
+        try:
+            return self._by_bytes[topic]
+        except KeyError:
+            text = topic[1:] if topic[:1] == MSGPACK_TOPIC_PREFIX else topic
+            info = self._by_bytes[topic] = parse_topic(text.decode('utf-8'))
+            return info
+
+    def msgpack_frame(self, topic: str) -> bytes:
+        """Encoded msgpack topic frame, built once per topic"""
+        frame = self._frames.get(topic)
+        if frame is None:
+            frame = self._frames[topic] = MSGPACK_TOPIC_PREFIX + topic.encode('utf-8')
+        return frame
+
+
+# Process-wide registry shared by adapters and the proxy
+topic_registry = TopicRegistry()
+
+
+def _configured_format() -> str:
+    wire_format = os.getenv('ZMQ_WIRE_FORMAT', 'json').strip().lower()
+    if wire_format == 'msgpack' and not MSGPACK_AVAILABLE:
+        logger.warning("ZMQ_WIRE_FORMAT=msgpack but msgpack is not installed, using json")
+        return 'json'
+    if wire_format not in ('json', 'msgpack'):
+        logger.warning(f"Unknown ZMQ_WIRE_FORMAT '{wire_format}', using json")
+        return 'json'
+    return wire_format
+
+
+WIRE_FORMAT = _configured_format()
+
+
+def encode_market_data(topic: str, data: dict, wire_format: Optional[str] = None) -> List[bytes]:
+    """
+    Encode a market data message as ZeroMQ frames
+
+    Args:
+        topic: Topic string (e.g., 'zerodha_NSE_RELIANCE_LTP')
+        data: Market data dictionary
+        wire_format: 'json' or 'msgpack' (defaults to ZMQ_WIRE_FORMAT)
+    """
+    if (wire_format or WIRE_FORMAT) == 'msgpack':
+        return [topic_registry.msgpack_frame(topic), msgpack.packb(data, use_bin_type=True)]
+    return [topic.encode('utf-8'), json.dumps(data).encode('utf-8')]
+
+
+def decode_market_data(topic: bytes, data: bytes) -> Tuple[Optional[TopicInfo], dict]:
+    """
+    Decode ZeroMQ frames in either encoding
+
+    Returns:
+        Tuple of (TopicInfo or None for an unknown/invalid topic, market data)
+    """
+    if topic[:1] == MSGPACK_TOPIC_PREFIX:
+        return topic_registry.resolve_bytes(topic), msgpack.unpackb(data, raw=False)
+    return topic_registry.resolve_bytes(topic), json.loads(data)